@@ -2,14 +2,51 @@
 """
 Automatically export the correct CLIP model based on .env configuration.
 This script reads the .env file and ensures the matching ONNX models are available.
+
+Model bundles are role-specific (--role or MODEL_ROLE):
+    search  text_model.onnx + tokenizer/   (pods serving /api/search/semantic)
+    ingest  vision_model.onnx              (pods embedding uploads)
+    full    everything (default)
 """
 
 import os
 import sys
+import json
+import shutil
 import argparse
 import subprocess
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from profiling import add_profile_arguments, profiled_run, stage
+
+ROLE_FILES = {
+    'search': ['text_model.onnx', 'tokenizer'],
+    'ingest': ['vision_model.onnx'],
+    'full': ['vision_model.onnx', 'text_model.onnx', 'tokenizer'],
+}
+ROLE_PARTS = {'search': ['text'], 'ingest': ['vision'], 'full': ['vision', 'text']}
+VARIANT_DIMENSIONS = {'base': '512', 'large': '768', 'huge': '1024'}
+
+# Loads one role's sessions in a fresh interpreter and reports startup time and peak RSS.
+_ROLE_LOAD_SNIPPET = """
+import json, os, resource, sys, time
+started = time.perf_counter()
+import onnxruntime as ort
+imported = time.perf_counter()
+models_dir, files = sys.argv[1], sys.argv[2:]
+sessions = [ort.InferenceSession(os.path.join(models_dir, f)) for f in files if f.endswith('.onnx')]
+if 'tokenizer' in files:
+    from transformers import CLIPTokenizer
+    CLIPTokenizer.from_pretrained(os.path.join(models_dir, 'tokenizer'))
+loaded = time.perf_counter()
+print(json.dumps({
+    'import_seconds': round(imported - started, 3),
+    'load_seconds': round(loaded - imported, 3),
+    'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+}))
+"""
 
 def load_env_file(env_path: str = ".env") -> Dict[str, str]:
     """Load environment variables from .env file."""
@@ -39,14 +76,12 @@ def get_embedding_config(env_vars: Dict[str, str]) -> Dict[str, str]:
     }
     
     # Validate configuration
-    valid_variants = ['base', 'large', 'huge']
-    if config['variant'] not in valid_variants:
+    if config['variant'] not in VARIANT_DIMENSIONS:
         print(f"⚠️  Invalid model variant '{config['variant']}'. Using 'base' instead.")
         config['variant'] = 'base'
     
     # Auto-correct dimension based on variant if mismatch
-    expected_dims = {'base': '512', 'large': '768', 'huge': '1024'}
-    expected_dim = expected_dims[config['variant']]
+    expected_dim = VARIANT_DIMENSIONS[config['variant']]
     
     if config['dimension'] != expected_dim:
         print(f"🔧 Dimension mismatch: variant '{config['variant']}' expects {expected_dim}D, but config has {config['dimension']}D")
@@ -55,39 +90,76 @@ def get_embedding_config(env_vars: Dict[str, str]) -> Dict[str, str]:
     
     return config
 
-def check_models_exist(models_dir: str, config: Dict[str, str]) -> bool:
-    """Check if the required models already exist and are valid."""
+def get_model_role(env_vars: Dict[str, str], role: Optional[str] = None) -> str:
+    """Resolve the bundle role from --role, then MODEL_ROLE, defaulting to 'full'."""
+    role = role or env_vars.get('MODEL_ROLE', 'full')
+    if role not in ROLE_FILES:
+        print(f"⚠️  Invalid model role '{role}'. Using 'full' instead.")
+        role = 'full'
+    return role
+
+def read_model_info(models_dir: str) -> Dict[str, str]:
+    """Parse model_info.txt (key=value lines); empty if missing."""
+    info = {}
+    info_file = Path(models_dir) / "model_info.txt"
+    if info_file.exists():
+        with open(info_file, 'r') as f:
+            for line in f:
+                if '=' in line:
+                    key, value = line.strip().split('=', 1)
+                    info[key] = value
+    return info
+
+def check_models_exist(models_dir: str, config: Dict[str, str], role: str = 'full') -> bool:
+    """Check if the models required by a role already exist and are valid."""
     models_path = Path(models_dir)
     
-    vision_model = models_path / "vision_model.onnx"
-    text_model = models_path / "text_model.onnx"
-    tokenizer_dir = models_path / "tokenizer"
-    
-    if not all([vision_model.exists(), text_model.exists(), tokenizer_dir.exists()]):
-        print(f"📋 Missing model files in {models_dir}")
+    missing = [name for name in ROLE_FILES[role] if not (models_path / name).exists()]
+    if missing:
+        print(f"📋 Missing model files for role '{role}' in {models_dir}: {', '.join(missing)}")
         return False
     
     # Check if there's a model_info.txt file that tracks the current model variant
-    info_file = models_path / "model_info.txt"
-    if info_file.exists():
-        try:
-            with open(info_file, 'r') as f:
-                content = f.read().strip()
-                if f"variant={config['variant']}" in content and f"dimension={config['dimension']}" in content:
-                    print(f"✅ Correct {config['variant']} model ({config['dimension']}D) already exists")
-                    return True
-        except Exception as e:
-            print(f"⚠️  Could not read model info: {e}")
+    try:
+        info = read_model_info(models_dir)
+        if info.get('variant') == config['variant'] and info.get('dimension') == config['dimension']:
+            # Bundles exported before roles existed always contain everything
+            bundle_role = info.get('role', 'full')
+            if bundle_role in (role, 'full'):
+                print(f"✅ Correct {config['variant']} model ({config['dimension']}D) already exists for role '{role}'")
+                return True
+            print(f"🔄 Bundle was exported for role '{bundle_role}', not '{role}'.")
+            return False
+    except Exception as e:
+        print(f"⚠️  Could not read model info: {e}")
     
     print(f"🔄 Model variant mismatch or info missing. Need to export {config['variant']} model.")
     return False
 
-def export_models(models_dir: str, config: Dict[str, str], force: bool = False) -> bool:
+def prune_bundle(models_dir: str, role: str) -> List[str]:
+    """Remove model files the role does not need; returns the removed names."""
+    models_path = Path(models_dir)
+    removed = []
+    for name in ROLE_FILES['full']:
+        path = models_path / name
+        if name in ROLE_FILES[role] or not path.exists():
+            continue
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+        removed.append(name)
+    legacy = models_path / "model.onnx"
+    if 'vision_model.onnx' in removed and legacy.is_symlink():
+        legacy.unlink()
+    return removed
+
+def export_models(models_dir: str, config: Dict[str, str], force: bool = False, role: str = 'full') -> bool:
     """Export CLIP models using the existing export script."""
-    if not force and check_models_exist(models_dir, config):
+    if not force and check_models_exist(models_dir, config, role):
         return True
     
-    print(f"📦 Exporting CLIP {config['variant']} model ({config['dimension']} dimensions)...")
+    print(f"📦 Exporting CLIP {config['variant']} model ({config['dimension']} dimensions) for role '{role}'...")
     
     # Find the export script
     script_dir = Path(__file__).parent
@@ -103,7 +175,8 @@ def export_models(models_dir: str, config: Dict[str, str], force: bool = False)
             sys.executable, 
             str(export_script),
             "--variant", config['variant'],
-            "--output", models_dir
+            "--output", models_dir,
+            "--parts", *ROLE_PARTS[role]
         ]
         
         print(f"🚀 Running: {' '.join(cmd)}")
@@ -112,12 +185,18 @@ def export_models(models_dir: str, config: Dict[str, str], force: bool = False)
         print("✅ Model export completed successfully!")
         print(result.stdout)
         
+        removed = prune_bundle(models_dir, role)
+        if removed:
+            print(f"🧹 Removed files not needed by role '{role}': {', '.join(removed)}")
+        
         # Create model info file to track what we exported
         info_file = Path(models_dir) / "model_info.txt"
         with open(info_file, 'w') as f:
             f.write(f"variant={config['variant']}\n")
             f.write(f"dimension={config['dimension']}\n")
             f.write(f"distance_metric={config['distance_metric']}\n")
+            f.write(f"role={role}\n")
+            f.write(f"files={','.join(ROLE_FILES[role])}\n")
             f.write(f"exported_by=auto_export_models.py\n")
         
         return True
@@ -131,6 +210,33 @@ def export_models(models_dir: str, config: Dict[str, str], force: bool = False)
         print(f"❌ Unexpected error during export: {e}")
         return False
 
+def bundle_size(models_dir: str, role: str) -> int:
+    """Total bytes on disk of a role's model files."""
+    total = 0
+    for name in ROLE_FILES[role]:
+        path = Path(models_dir) / name
+        files = path.rglob('*') if path.is_dir() else [path]
+        total += sum(f.stat().st_size for f in files if f.is_file())
+    return total
+
+def benchmark_roles(models_dir: str, roles: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Measure cold startup time and peak RSS of loading each role's bundle in a fresh process."""
+    results = {}
+    for role in roles or list(ROLE_FILES):
+        if any(not (Path(models_dir) / name).exists() for name in ROLE_FILES[role]):
+            results[role] = {'error': 'bundle files missing'}
+            continue
+        proc = subprocess.run(
+            [sys.executable, "-c", _ROLE_LOAD_SNIPPET, models_dir, *ROLE_FILES[role]],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            results[role] = {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+            continue
+        results[role] = json.loads(proc.stdout.strip().splitlines()[-1])
+        results[role]['bundle_mb'] = round(bundle_size(models_dir, role) / 1e6, 1)
+    return results
+
 def update_env_file(env_path: str, config: Dict[str, str]) -> None:
     """Update .env file with corrected configuration if needed."""
     env_vars = load_env_file(env_path)
@@ -162,54 +268,78 @@ def main():
     parser.add_argument("--force", action="store_true", help="Force re-export even if models exist")
     parser.add_argument("--check-only", action="store_true", help="Only check configuration, don't export")
     parser.add_argument("--update-env", action="store_true", help="Update .env file with corrected values")
+    parser.add_argument("--role", choices=list(ROLE_FILES), help="Bundle role: search, ingest or full (default: MODEL_ROLE or full)")
+    parser.add_argument("--benchmark-roles", action="store_true", help="Report startup time and peak RSS per role and exit")
+    parser.add_argument("--benchmark-output", help="Write --benchmark-roles results to this JSON file")
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+
+    with profiled_run("auto_export_models", args):
+        print("🤖 AzurePhotoFlow Auto Model Export")
+        print("=" * 40)
     
-    print("🤖 AzurePhotoFlow Auto Model Export")
-    print("=" * 40)
-    
-    # Load environment configuration
-    env_vars = load_env_file(args.env_file)
-    if not env_vars:
-        print(f"❌ Could not load environment from {args.env_file}")
-        sys.exit(1)
-    
-    # Get embedding configuration
-    config = get_embedding_config(env_vars)
-    print(f"📋 Configuration from {args.env_file}:")
-    print(f"   • Model Variant: {config['variant']}")
-    print(f"   • Embedding Dimension: {config['dimension']}")
-    print(f"   • Distance Metric: {config['distance_metric']}")
-    print()
-    
-    # Update .env file if requested and corrections were made
-    if args.update_env:
-        update_env_file(args.env_file, config)
-    
-    # Check if models exist
-    models_exist = check_models_exist(args.models_dir, config)
-    
-    if args.check_only:
-        if models_exist:
-            print("✅ All required models are available and match configuration")
-            sys.exit(0)
-        else:
-            print("❌ Models missing or don't match configuration")
+        # Load environment configuration
+        with stage("load_env"):
+            env_vars = load_env_file(args.env_file)
+        if not env_vars:
+            print(f"❌ Could not load environment from {args.env_file}")
             sys.exit(1)
     
-    # Create models directory if it doesn't exist
-    os.makedirs(args.models_dir, exist_ok=True)
+        # Get embedding configuration
+        config = get_embedding_config(env_vars)
+        role = get_model_role(env_vars, args.role)
+        print(f"📋 Configuration from {args.env_file}:")
+        print(f"   • Model Variant: {config['variant']}")
+        print(f"   • Embedding Dimension: {config['dimension']}")
+        print(f"   • Distance Metric: {config['distance_metric']}")
+        print(f"   • Bundle Role: {role}")
+        print()
+    
+        if args.benchmark_roles:
+            with stage("benchmark_roles"):
+                results = benchmark_roles(args.models_dir)
+            for name, result in results.items():
+                if 'error' in result:
+                    print(f"⚠️  {name}: {result['error']}")
+                else:
+                    print(f"📊 {name}: startup {result['import_seconds'] + result['load_seconds']:.2f}s, "
+                          f"peak RSS {result['max_rss_mb']:.0f} MB, bundle {result['bundle_mb']:.0f} MB")
+            if args.benchmark_output:
+                with open(args.benchmark_output, 'w') as f:
+                    json.dump(results, f, indent=2)
+            sys.exit(0)
     
-    # Export models if needed
-    success = export_models(args.models_dir, config, args.force)
+        # Update .env file if requested and corrections were made
+        if args.update_env:
+            update_env_file(args.env_file, config)
     
-    if success:
-        print(f"\n🎉 Ready to use {config['variant']} CLIP model with {config['dimension']} dimensions!")
-        print(f"📁 Models available in: {os.path.abspath(args.models_dir)}")
-        sys.exit(0)
-    else:
-        print("\n❌ Model export failed!")
-        sys.exit(1)
+        # Check if models exist
+        with stage("check_models", role=role):
+            models_exist = check_models_exist(args.models_dir, config, role)
+    
+        if args.check_only:
+            if models_exist:
+                print("✅ All required models are available and match configuration")
+                sys.exit(0)
+            else:
+                print("❌ Models missing or don't match configuration")
+                sys.exit(1)
+    
+        # Create models directory if it doesn't exist
+        os.makedirs(args.models_dir, exist_ok=True)
+    
+        # Export models if needed
+        with stage("export_models", variant=config['variant'], role=role):
+            success = export_models(args.models_dir, config, args.force, role)
+    
+        if success:
+            print(f"\n🎉 Ready to use {config['variant']} CLIP model with {config['dimension']} dimensions ({role} bundle)!")
+            print(f"📁 Models available in: {os.path.abspath(args.models_dir)}")
+            sys.exit(0)
+        else:
+            print("\n❌ Model export failed!")
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Micro-batching CLIP embedding server over the models exported by export_clip_onnx.py.
+
+Concurrent requests are queued and gathered into dynamic batches bounded by
+--max-batch-size and --max-wait-ms, so a burst of uploads or searches runs as a
+few batched ONNX Runtime calls instead of many batch-1 calls. One copy of the
+vision and text sessions serves every client on the node.
+
+HTTP API (TCP or Unix socket):
+    POST /embed/image     raw image bytes          → {"embedding": [...]}
+    POST /embed/text      {"text": "..."}          → {"embedding": [...]}
+    GET  /metrics         queue depth, batch-size histogram, latency percentiles
+    GET  /health
+
+Usage:
+    python3 scripts/ai-ml/embedding_server.py --models-dir models --port 8090
+    python3 scripts/ai-ml/embedding_server.py --models-dir models --unix-socket /tmp/clip.sock
+    python3 scripts/ai-ml/embedding_server.py --models-dir models --benchmark --requests 512
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+
+import numpy as np  # noqa: E402
+
+from clip_preprocessing import INPUT_SIZE, open_image, resize_for_model, to_model_input  # noqa: E402
+
+MAX_TOKENS = 77
+
+
+class BatchMetrics:
+    """Counters for one batcher: batch-size histogram and a window of request latencies."""
+
+    def __init__(self, latency_window: int = 10000):
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=latency_window)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+
+    def snapshot(self, queue_depth: int) -> Dict[str, Any]:
+        latencies = np.array(self.latencies, dtype=np.float64) * 1000
+        percentiles = {}
+        if len(latencies):
+            for p in (50, 90, 99):
+                percentiles[f"p{p}"] = round(float(np.percentile(latencies, p)), 2)
+            percentiles["max"] = round(float(latencies.max()), 2)
+        return {
+            "queue_depth": queue_depth,
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            "latency_ms": percentiles,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class MicroBatcher:
+    """Gather concurrent submissions into batches and run them on a worker thread."""
+
+    def __init__(self, run_batch: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, executor: Optional[ThreadPoolExecutor] = None):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.metrics = BatchMetrics()
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # Requests still queued would otherwise wait forever on a batcher that no longer runs.
+        while self.queue is not None and not self.queue.empty():
+            _, future, _ = self.queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def submit(self, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting, then wait out the remaining budget.
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.run_batch, items)
+                error = None
+            except asyncio.CancelledError:
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                results, error = None, e
+            finished = time.perf_counter()
+
+            self.metrics.batches += 1
+            self.metrics.batch_sizes[len(batch)] += 1
+            self.metrics.busy_seconds += finished - started
+            for i, (_, future, enqueued) in enumerate(batch):
+                self.metrics.requests += 1
+                self.metrics.latencies.append(finished - enqueued)
+                if future.done():
+                    continue
+                # run_batch reports a failure of one item by returning the exception in its slot.
+                failure = error if error is not None else results[i] if isinstance(results[i], Exception) else None
+                if failure is not None:
+                    self.metrics.errors += 1
+                    future.set_exception(failure)
+                else:
+                    future.set_result(results[i])
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class ClipOnnxModels:
+    """Batched image and text embedding over vision_model.onnx, text_model.onnx and tokenizer/."""
+
+    def __init__(self, models_dir: str, intra_op_threads: int = 0, load_vision: bool = True,
+                 load_text: bool = True):
+        import onnxruntime as ort
+
+        from tune_onnx_sessions import load_session_config, session_options
+
+        def open_session(name: str):
+            # Options tuned for this node by tune_onnx_sessions.py; --threads still overrides.
+            options = dict(load_session_config(models_dir, name) or {})
+            if intra_op_threads:
+                options["intra_op_num_threads"] = intra_op_threads
+            return ort.InferenceSession(os.path.join(models_dir, name), session_options(ort, options))
+
+        self.vision_session = None
+        self.text_session = None
+        self.tokenizer = None
+        if load_vision:
+            self.vision_session = open_session("vision_model.onnx")
+        if load_text:
+            from transformers import CLIPTokenizer
+
+            self.text_session = open_session("text_model.onnx")
+            self.tokenizer = CLIPTokenizer.from_pretrained(os.path.join(models_dir, "tokenizer"))
+
+    def embed_images(self, images: List[bytes]) -> List[Any]:
+        """Embed a batch of encoded images; an image that fails to decode gets a ValueError in its slot."""
+        if self.vision_session is None:
+            raise RuntimeError("vision model is not loaded by this server's --role")
+        results: List[Any] = [None] * len(images)
+        decoded, rows = [], []
+        for i, data in enumerate(images):
+            try:
+                decoded.append(resize_for_model(open_image(data), INPUT_SIZE))
+                rows.append(i)
+            except Exception as e:
+                results[i] = ValueError(f"could not decode image: {type(e).__name__}: {e}")
+        if decoded:
+            for i, vector in zip(rows, self.embed_pixels(np.stack(decoded)).tolist()):
+                results[i] = vector
+        return results
+
+    def embed_pixels(self, pixels: np.ndarray) -> np.ndarray:
+        """Embed a (batch, INPUT_SIZE, INPUT_SIZE, 3) uint8 batch decoded by the caller."""
+        if self.vision_session is None:
+            raise RuntimeError("vision model is not loaded by this server's --role")
+        output = self.vision_session.run(None, {"input": to_model_input(pixels)})[0]
+        return l2_normalize(output)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if self.text_session is None:
+            raise RuntimeError("text model is not loaded by this server's --role")
+        tokens = self.tokenizer(texts, padding="max_length", truncation=True, max_length=MAX_TOKENS,
+                                return_tensors="np")
+        output = self.text_session.run(None, {
+            "input_ids": tokens["input_ids"].astype(np.int64),
+            "attention_mask": tokens["attention_mask"].astype(np.int64),
+        })[0]
+        return l2_normalize(output).tolist()
+
+
+class EmbeddingServer:
+    """Minimal asyncio HTTP/1.1 front end for an image and a text MicroBatcher."""
+
+    def __init__(self, models, max_batch_size: int = 32, max_wait_ms: float = 5.0, workers: int = 1):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onnx")
+        self.batchers = {
+            "image": MicroBatcher(models.embed_images, max_batch_size, max_wait_ms, self.executor),
+            "text": MicroBatcher(models.embed_texts, max_batch_size, max_wait_ms, self.executor),
+        }
+        self.started = time.time()
+
+    def start(self) -> None:
+        for batcher in self.batchers.values():
+            batcher.start()
+
+    async def stop(self) -> None:
+        for batcher in self.batchers.values():
+            await batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            **{name: b.metrics.snapshot(b.queue.qsize() if b.queue else 0) for name, b in self.batchers.items()},
+        }
+
+    async def handle_request(self, method: str, path: str, body: bytes):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics()
+        if method == "POST" and path == "/embed/image":
+            if not body:
+                return 400, {"error": "request body must contain image bytes"}
+            try:
+                return 200, {"embedding": await self.batchers["image"].submit(body)}
+            except ValueError as e:
+                return 400, {"error": str(e)}
+        if method == "POST" and path == "/embed/text":
+            try:
+                text = json.loads(body or b"{}")["text"]
+            except (ValueError, KeyError, TypeError):
+                return 400, {"error": "request body must be JSON like {\"text\": \"...\"}"}
+            return 200, {"embedding": await self.batchers["text"].submit(text)}
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+
+                try:
+                    status, payload = await self.handle_request(method, path, body)
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8090, unix_socket: Optional[str] = None):
+        self.start()
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            print(f"🚀 Embedding server listening on unix:{unix_socket}")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"🚀 Embedding server listening on http://{host}:{port}")
+        return server
+
+
+async def run_benchmark(run_batch: Callable[[List[Any]], Sequence[Any]], items: List[Any],
+                        max_batch_size: int, max_wait_ms: float = 5.0) -> Dict[str, Any]:
+    """Submit every item at once (a burst) and report throughput and batch statistics."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    batcher = MicroBatcher(run_batch, max_batch_size, max_wait_ms, executor)
+    batcher.start()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(batcher.submit(item) for item in items))
+    finally:
+        await batcher.stop()
+        executor.shutdown(wait=True)
+    elapsed = time.perf_counter() - started
+    return {
+        "max_batch_size": max_batch_size,
+        "requests": len(items),
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(items) / elapsed, 1),
+        **batcher.metrics.snapshot(0),
+    }
+
+
+def _benchmark_models(models, kind: str, requests: int, max_batch_size: int, max_wait_ms: float) -> None:
+    if kind == "image":
+        from PIL import Image
+        import io
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), (90, 120, 200)).save(buffer, "JPEG")
+        items, run_batch = [buffer.getvalue()] * requests, models.embed_images
+    else:
+        items, run_batch = [f"a photo of item {i}" for i in range(requests)], models.embed_texts
+
+    results = []
+    for batch_size in (1, max_batch_size):
+        result = asyncio.run(run_benchmark(run_batch, items, batch_size, max_wait_ms))
+        results.append(result)
+        print(f"📊 {kind} batch≤{batch_size}: {result['requests_per_second']} req/s, "
+              f"mean batch {result['mean_batch_size']}, p99 {result['latency_ms'].get('p99')} ms")
+    print(f"⚡ Speedup from batching: {results[1]['requests_per_second'] / results[0]['requests_per_second']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching CLIP embedding server")
+    parser.add_argument("--models-dir", default="models", help="Directory with exported ONNX models")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8090, help="TCP port (default: 8090)")
+    parser.add_argument("--unix-socket", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Largest batch per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Longest a request waits for a batch")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="ONNX Runtime intra-op threads (0 = tuned for this node, else all cores)")
+    parser.add_argument("--role", choices=["search", "ingest", "full"], default="full",
+                        help="Load only the text (search) or vision (ingest) model")
+    parser.add_argument("--benchmark", action="store_true", help="Compare batch-1 and batched throughput and exit")
+    parser.add_argument("--benchmark-kind", choices=["image", "text"], default="image")
+    parser.add_argument("--requests", type=int, default=256, help="Requests per benchmark run")
+    args = parser.parse_args()
+
+    models = ClipOnnxModels(args.models_dir, args.threads, load_vision=args.role != "search",
+                            load_text=args.role != "ingest")
+    if args.benchmark:
+        _benchmark_models(models, args.benchmark_kind, args.requests, args.max_batch_size, args.max_wait_ms)
+        return
+
+    async def run():
+        server = EmbeddingServer(models, args.max_batch_size, args.max_wait_ms)
+        listener = await server.serve(args.host, args.port, args.unix_socket)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n👋 Embedding server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,24 @@
 
 import argparse
 import os
+import sys
 import importlib.util
 
 import torch
 from transformers import CLIPModel, CLIPTokenizer
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from profiling import add_profile_arguments, profiled_run, stage
+
 
 os.environ["HF_HOME"] = "./.hf_cache"
 
 
-def export_clip_model(output_dir: str, model_name: str = "openai/clip-vit-base-patch32"):
-    """Export both vision and text parts of a CLIP model to ONNX."""
+EXPORT_PARTS = ("vision", "text")
+
+
+def export_clip_model(output_dir: str, model_name: str = "openai/clip-vit-base-patch32", parts=EXPORT_PARTS):
+    """Export the vision and/or text parts of a CLIP model to ONNX."""
     if importlib.util.find_spec("onnx") is None:
         raise RuntimeError(
             "onnx package is required to export the model. Install it via 'pip install onnx'."
@@ -22,16 +29,55 @@ def export_clip_model(output_dir: str, model_name: str = "openai/clip-vit-base-p
     # Using the "eager" attention implementation avoids PyTorch's
     # scaled_dot_product_attention operator which currently fails
     # during ONNX export.
-    model = CLIPModel.from_pretrained(
-        model_name,
-        use_safetensors=True,
-        attn_implementation="eager",
-    )
-    model.eval()
+    with stage("load_model", model=model_name):
+        model = CLIPModel.from_pretrained(
+            model_name,
+            use_safetensors=True,
+            attn_implementation="eager",
+        )
+        model.eval()
 
     os.makedirs(output_dir, exist_ok=True)
 
-    # Export Vision Model
+    exports = []
+    if "vision" in parts:
+        with stage("export_vision"):
+            export_vision_model(model, output_dir)
+        exports.append("vision_model.onnx")
+    if "text" in parts:
+        with stage("export_text"):
+            tokenizer = export_text_model(model, model_name, output_dir)
+        exports.extend(["text_model.onnx", "tokenizer/"])
+    else:
+        tokenizer = None
+
+    # Create model info file
+    info_path = os.path.join(output_dir, "model_info.txt")
+    with open(info_path, "w") as f:
+        f.write(f"model_name={model_name}\n")
+        if tokenizer is not None:
+            f.write(f"tokenizer_type=CLIPTokenizer\n")
+            f.write(f"tokenizer_method=BPE\n")
+            f.write(f"max_tokens=77\n")
+            f.write(f"vocab_size={tokenizer.vocab_size}\n")
+        f.write(f"exports={','.join(exports)}\n")
+    print(f"Model info saved to {info_path}")
+
+    # Create backward compatibility symlink for vision model
+    legacy_path = os.path.join(output_dir, "model.onnx")
+    if "vision" in parts and not os.path.exists(legacy_path):
+        os.symlink("vision_model.onnx", legacy_path)
+        print(f"Created backward compatibility symlink: {legacy_path}")
+
+    print("✅ CLIP model export complete!")
+    
+    # Validate the exported models
+    with stage("validate"):
+        validate_exported_models(output_dir)
+
+
+def export_vision_model(model, output_dir: str):
+    """Export the CLIP image tower to vision_model.onnx."""
     class VisionWrapper(torch.nn.Module):
         def __init__(self, clip_model):
             super().__init__()
@@ -58,7 +104,9 @@ def export_clip_model(output_dir: str, model_name: str = "openai/clip-vit-base-p
 
     print(f"Vision model exported to {vision_output_path}")
 
-    # Export Text Model
+
+def export_text_model(model, model_name: str, output_dir: str):
+    """Export the CLIP text tower to text_model.onnx and save its tokenizer."""
     class TextWrapper(torch.nn.Module):
         def __init__(self, clip_model):
             super().__init__()
@@ -97,28 +145,7 @@ def export_clip_model(output_dir: str, model_name: str = "openai/clip-vit-base-p
     tokenizer_path = os.path.join(output_dir, "tokenizer")
     tokenizer.save_pretrained(tokenizer_path)
     print(f"Tokenizer saved to {tokenizer_path}")
-
-    # Create model info file
-    info_path = os.path.join(output_dir, "model_info.txt")
-    with open(info_path, "w") as f:
-        f.write(f"model_name={model_name}\n")
-        f.write(f"tokenizer_type=CLIPTokenizer\n")
-        f.write(f"tokenizer_method=BPE\n")
-        f.write(f"max_tokens=77\n")
-        f.write(f"vocab_size={tokenizer.vocab_size}\n")
-        f.write(f"exports=vision_model.onnx,text_model.onnx,tokenizer/\n")
-    print(f"Model info saved to {info_path}")
-
-    # Create backward compatibility symlink for vision model
-    legacy_path = os.path.join(output_dir, "model.onnx")
-    if not os.path.exists(legacy_path):
-        os.symlink("vision_model.onnx", legacy_path)
-        print(f"Created backward compatibility symlink: {legacy_path}")
-
-    print("✅ CLIP model export complete!")
-    
-    # Validate the exported models
-    validate_exported_models(output_dir)
+    return tokenizer
 
 def validate_exported_models(output_dir: str):
     """Validate that exported ONNX models have correct output dimensions."""
@@ -165,6 +192,9 @@ def main():
     parser.add_argument("--model", default="openai/clip-vit-base-patch32", help="HuggingFace model name")
     parser.add_argument("--variant", choices=["base", "large", "huge"], help="Model variant (overrides --model)")
     parser.add_argument("--output", default="models", help="Output directory for ONNX models")
+    parser.add_argument("--parts", nargs="+", choices=list(EXPORT_PARTS), default=list(EXPORT_PARTS),
+                        help="Model towers to export (default: vision text)")
+    add_profile_arguments(parser)
     args = parser.parse_args()
     
     # Map variant to model name
@@ -184,7 +214,8 @@ def main():
         model_name = args.model
         print(f"🎯 Using custom model: {model_name}")
     
-    export_clip_model(args.output, model_name)
+    with profiled_run("export_clip_onnx", args):
+        export_clip_model(args.output, model_name, args.parts)
 
 
 if __name__ == "__main__":
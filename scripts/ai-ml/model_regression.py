@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Golden-vector regression gate for optimized or quantized CLIP model artifacts.
+
+`record` embeds a fixed image and query corpus with the reference models from
+export_clip_onnx.py and stores the vectors in a golden .npz file. `check` embeds
+the same corpus with a candidate models directory and scores it on:
+
+  * cosine agreement  - per-vector cosine between candidate and golden embeddings
+  * top-k overlap     - overlap of text→image and image→image top-k results
+  * speedup           - reference time / candidate time for the whole corpus
+
+The candidate passes only if both the cosine and the top-k thresholds hold, so a
+faster model is never promoted on speed alone.
+
+Usage:
+    python3 scripts/ai-ml/model_regression.py record --models-dir models --golden golden.npz
+    python3 scripts/ai-ml/model_regression.py check --golden golden.npz --candidate models-int8 \
+        --reference models --report regression.json
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from embedding_server import ClipOnnxModels, l2_normalize  # noqa: E402
+
+DEFAULT_QUERIES = [
+    "a photo of a dog", "a photo of a cat", "a beach at sunset", "snow covered mountains",
+    "a city skyline at night", "a bowl of fruit", "people at a wedding", "a red car",
+    "a forest path", "a birthday cake with candles", "a black and white portrait", "fireworks",
+    "a plate of pasta", "children playing football", "a sailing boat", "a green field",
+]
+MIN_COSINE = 0.99
+MIN_TOPK_OVERLAP = 0.9
+TOP_K = 5
+
+
+def synthetic_images(count: int = 64, seed: int = 0, size: Tuple[int, int] = (320, 240)) -> List[Tuple[str, bytes]]:
+    """Deterministic JPEGs (gradients plus shapes) used when no local image corpus is given."""
+    from PIL import Image, ImageDraw
+
+    rng = np.random.default_rng(seed)
+    images = []
+    width, height = size
+    ramp = np.linspace(0, 1, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    for i in range(count):
+        start, end = rng.integers(0, 256, 3), rng.integers(0, 256, 3)
+        pixels = np.repeat(start + (end - start) * ramp, height, axis=0).astype(np.uint8)
+        img = Image.fromarray(pixels)
+        draw = ImageDraw.Draw(img)
+        for _ in range(3):
+            x0, y0 = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+            box = (x0, y0, x0 + int(rng.integers(20, 120)), y0 + int(rng.integers(20, 120)))
+            fill = tuple(int(c) for c in rng.integers(0, 256, 3))
+            (draw.ellipse if rng.random() < 0.5 else draw.rectangle)(box, fill=fill)
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=90)
+        images.append((f"synthetic-{i:04d}.jpg", buffer.getvalue()))
+    return images
+
+
+def load_image_corpus(directory: str) -> List[Tuple[str, bytes]]:
+    """Read every image file in a directory, sorted by name so the corpus order is stable."""
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if os.path.splitext(name)[1].lower() in (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"):
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append((name, f.read()))
+    return images
+
+
+def embed_corpus(models, images: List[Tuple[str, bytes]], queries: List[str],
+                 batch_size: int = 16) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Embed images and queries in batches; returns (image vectors, text vectors, seconds)."""
+    started = time.perf_counter()
+    image_vectors, text_vectors = [], []
+    for i in range(0, len(images), batch_size):
+        batch = images[i:i + batch_size]
+        for (name, _), vector in zip(batch, models.embed_images([data for _, data in batch])):
+            if isinstance(vector, Exception):
+                raise ValueError(f"{name}: {vector}")
+            image_vectors.append(vector)
+    for i in range(0, len(queries), batch_size):
+        text_vectors.extend(models.embed_texts(queries[i:i + batch_size]))
+    elapsed = time.perf_counter() - started
+    return (np.asarray(image_vectors, dtype=np.float32), np.asarray(text_vectors, dtype=np.float32), elapsed)
+
+
+def record_golden(models, images: List[Tuple[str, bytes]], queries: List[str], golden_path: str) -> Dict:
+    """Embed the corpus with the reference models and save the golden vectors."""
+    image_vectors, text_vectors, elapsed = embed_corpus(models, images, queries)
+    np.savez(golden_path, image_embeddings=image_vectors, text_embeddings=text_vectors,
+             image_names=np.array([name for name, _ in images]), queries=np.array(queries),
+             reference_seconds=np.float64(elapsed))
+    return {"images": len(images), "queries": len(queries), "dimension": int(image_vectors.shape[1]),
+            "reference_seconds": round(elapsed, 3)}
+
+
+def load_golden(golden_path: str) -> Dict:
+    with np.load(golden_path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _topk(queries: np.ndarray, corpus: np.ndarray, k: int, exclude_self: bool = False) -> np.ndarray:
+    scores = l2_normalize(queries) @ l2_normalize(corpus).T
+    if exclude_self:
+        np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def topk_overlap(golden_top: np.ndarray, candidate_top: np.ndarray) -> float:
+    """Mean fraction of each golden top-k list that the candidate also returns."""
+    k = golden_top.shape[1]
+    return float(np.mean([len(set(g) & set(c)) / k for g, c in zip(golden_top, candidate_top)]))
+
+
+def score_candidate(golden: Dict, image_vectors: np.ndarray, text_vectors: np.ndarray, k: int = TOP_K) -> Dict:
+    """Compare candidate vectors with the golden ones on cosine agreement and top-k overlap."""
+    gold_images, gold_texts = golden["image_embeddings"], golden["text_embeddings"]
+    if image_vectors.shape != gold_images.shape or text_vectors.shape != gold_texts.shape:
+        raise ValueError(f"candidate shapes {image_vectors.shape}/{text_vectors.shape} do not match golden "
+                         f"{gold_images.shape}/{gold_texts.shape}")
+
+    image_cos = np.sum(l2_normalize(image_vectors) * l2_normalize(gold_images), axis=1)
+    text_cos = np.sum(l2_normalize(text_vectors) * l2_normalize(gold_texts), axis=1)
+    k = min(k, len(gold_images) - 1)
+    return {
+        "cosine": {
+            "image_mean": round(float(image_cos.mean()), 6), "image_min": round(float(image_cos.min()), 6),
+            "text_mean": round(float(text_cos.mean()), 6), "text_min": round(float(text_cos.min()), 6),
+            "min": round(float(min(image_cos.min(), text_cos.min())), 6),
+        },
+        "topk": {
+            "k": k,
+            "text_to_image": round(topk_overlap(_topk(gold_texts, gold_images, k),
+                                                _topk(text_vectors, image_vectors, k)), 4),
+            "image_to_image": round(topk_overlap(_topk(gold_images, gold_images, k, True),
+                                                 _topk(image_vectors, image_vectors, k, True)), 4),
+        },
+    }
+
+
+def check_candidate(golden: Dict, candidate, images: List[Tuple[str, bytes]], reference=None,
+                    min_cosine: float = MIN_COSINE, min_topk: float = MIN_TOPK_OVERLAP,
+                    k: int = TOP_K, min_speedup: Optional[float] = None) -> Dict:
+    """Score a candidate against the golden vectors and decide whether it may be promoted."""
+    queries = [str(q) for q in golden["queries"]]
+    image_vectors, text_vectors, candidate_seconds = embed_corpus(candidate, images, queries)
+    report = score_candidate(golden, image_vectors, text_vectors, k)
+
+    if reference is not None:
+        # Time the reference on this machine so the speedup is not skewed by different hardware.
+        _, _, reference_seconds = embed_corpus(reference, images, queries)
+        report["reference_timed"] = "now"
+    else:
+        reference_seconds = float(golden["reference_seconds"])
+        report["reference_timed"] = "golden"
+    report["timing"] = {
+        "reference_seconds": round(reference_seconds, 3),
+        "candidate_seconds": round(candidate_seconds, 3),
+        "speedup": round(reference_seconds / candidate_seconds, 2) if candidate_seconds else None,
+    }
+
+    failures = []
+    if report["cosine"]["min"] < min_cosine:
+        failures.append(f"min cosine {report['cosine']['min']:.4f} < {min_cosine}")
+    worst_topk = min(report["topk"]["text_to_image"], report["topk"]["image_to_image"])
+    if worst_topk < min_topk:
+        failures.append(f"top-{report['topk']['k']} overlap {worst_topk:.3f} < {min_topk}")
+    if min_speedup is not None and (report["timing"]["speedup"] or 0) < min_speedup:
+        failures.append(f"speedup {report['timing']['speedup']}x < {min_speedup}x")
+    report["thresholds"] = {"min_cosine": min_cosine, "min_topk_overlap": min_topk, "min_speedup": min_speedup}
+    report["failures"] = failures
+    report["passed"] = not failures
+    return report
+
+
+def _corpus(args) -> List[Tuple[str, bytes]]:
+    return load_image_corpus(args.images) if args.images else synthetic_images(args.synthetic_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden-vector regression gate for CLIP model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record = sub.add_parser("record", help="Record golden vectors from the reference models")
+    record.add_argument("--models-dir", default="models", help="Reference models directory")
+    record.add_argument("--queries", help="Text file with one query per line (default: built-in list)")
+
+    check = sub.add_parser("check", help="Score a candidate models directory against the golden vectors")
+    check.add_argument("--candidate", required=True, help="Candidate models directory")
+    check.add_argument("--reference", help="Reference models directory to time on this machine")
+    check.add_argument("--min-cosine", type=float, default=MIN_COSINE, help=f"Default: {MIN_COSINE}")
+    check.add_argument("--min-topk", type=float, default=MIN_TOPK_OVERLAP, help=f"Default: {MIN_TOPK_OVERLAP}")
+    check.add_argument("--min-speedup", type=float, help="Also require this speedup over the reference")
+    check.add_argument("--k", type=int, default=TOP_K, help=f"Top-k for retrieval overlap (default: {TOP_K})")
+    check.add_argument("--report", help="Write the JSON report to this file")
+
+    for p in (record, check):
+        p.add_argument("--golden", default="golden_vectors.npz", help="Golden vectors file")
+        p.add_argument("--images", help="Directory of corpus images (default: synthetic corpus)")
+        p.add_argument("--synthetic-count", type=int, default=64, help="Synthetic corpus size")
+    args = parser.parse_args()
+
+    images = _corpus(args)
+    if args.command == "record":
+        queries = DEFAULT_QUERIES
+        if args.queries:
+            with open(args.queries) as f:
+                queries = [line.strip() for line in f if line.strip()]
+        summary = record_golden(ClipOnnxModels(args.models_dir), images, queries, args.golden)
+        print(f"✅ Recorded {summary['images']} image and {summary['queries']} query vectors "
+              f"({summary['dimension']}D) to {args.golden}")
+        return
+
+    golden = load_golden(args.golden)
+    if [name for name, _ in images] != [str(n) for n in golden["image_names"]]:
+        print("❌ Image corpus does not match the one the golden vectors were recorded from")
+        sys.exit(2)
+    reference = ClipOnnxModels(args.reference) if args.reference else None
+    report = check_candidate(golden, ClipOnnxModels(args.candidate), images, reference,
+                             args.min_cosine, args.min_topk, args.k, args.min_speedup)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"📊 Cosine: min {report['cosine']['min']:.4f}, image mean {report['cosine']['image_mean']:.4f}, "
+          f"text mean {report['cosine']['text_mean']:.4f}")
+    print(f"📊 Top-{report['topk']['k']} overlap: text→image {report['topk']['text_to_image']:.3f}, "
+          f"image→image {report['topk']['image_to_image']:.3f}")
+    print(f"⚡ Speedup: {report['timing']['speedup']}x (reference timed {report['reference_timed']})")
+    if report["passed"]:
+        print("✅ Candidate passes the regression gate")
+    else:
+        for failure in report["failures"]:
+            print(f"❌ {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
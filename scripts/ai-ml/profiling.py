@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Stage timings and opt-in profiling for the tooling entry points.
+
+The export, setup and cluster-check scripts run as long, print-heavy steps inside
+ensure-models.sh and the deploy scripts. When one is slow, the console log does not
+say where the time went. Wrapping an entry point in `profiled_run` records every
+`stage(...)` it passes through. When timings are requested (--profile, --profile-dir or
+PHOTOFLOW_TIMINGS_DIR), the timings file is written however the run ends, including
+failures and sys.exit, so a slow run can be diagnosed after the fact. Plain runs write
+nothing, so routine invocations do not fill the directory:
+
+    {dir}/{name}-{timestamp}-{pid}.timings.json    stages with offsets, durations, status
+
+`--profile` adds, in the same directory:
+
+    cprofile    .prof (pstats, for snakeviz) and .top.txt (top functions by cumulative time)
+    sample      .stacks.txt collapsed stacks ("a;b;c count", for flamegraph.pl or speedscope)
+
+Both also trace allocations with tracemalloc, adding each stage's peak memory to the
+timings and writing the top allocation sites to .memory.txt. The directory is
+--profile-dir, else PHOTOFLOW_TIMINGS_DIR, else .timings/. The profile mode, directory
+and run id are exported as PHOTOFLOW_PROFILE, PHOTOFLOW_TIMINGS_DIR and
+PHOTOFLOW_RUN_ID, so a child script started by a profiled one (auto_export_models.py
+running export_clip_onnx.py) profiles itself into the same directory under the same run.
+
+Usage in an entry point:
+
+    parser = argparse.ArgumentParser(...)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiled_run("export_clip_onnx", args):
+        with stage("load_model", model=name):
+            ...
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+PROFILE_MODES = ("cprofile", "sample")
+DEFAULT_DIR = ".timings"
+SAMPLE_INTERVAL = 0.005
+_current: Optional["RunProfile"] = None
+
+
+class StackSampler:
+    """Samples every thread's Python stack on a background thread into collapsed-stack counts."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.counts[";".join([names.get(ident, str(ident))] + stack[::-1])] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class RunProfile:
+    """Timings (when requested) and cProfile / sampling / tracemalloc (with a profile mode) for one run."""
+
+    def __init__(self, name: str, output_dir: Optional[str] = None, mode: Optional[str] = None,
+                 argv: Optional[List[str]] = None):
+        if mode not in (None,) + PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (expected one of {', '.join(PROFILE_MODES)})")
+        self.name = name
+        self.mode = mode
+        explicit_dir = output_dir or os.environ.get("PHOTOFLOW_TIMINGS_DIR")
+        self.output_dir = explicit_dir or DEFAULT_DIR
+        self.enabled = bool(mode or explicit_dir)
+        self.run_id = os.environ.get("PHOTOFLOW_RUN_ID") or uuid.uuid4().hex[:12]
+        self.argv = list(sys.argv if argv is None else argv)
+        self.stages: List[Dict] = []
+        self.status = "ok"
+        self.exit_code = 0
+        self.error: Optional[str] = None
+        self._depth = 0
+        self._peaks: List[int] = []
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._started = 0.0
+        self._started_at = 0.0
+        self.stem = ""
+
+    def start(self) -> "RunProfile":
+        global _current
+        self._started, self._started_at = time.perf_counter(), time.time()
+        timestamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._started_at))
+        self.stem = os.path.join(self.output_dir, f"{self.name}-{timestamp}-{os.getpid()}")
+        os.environ["PHOTOFLOW_RUN_ID"] = self.run_id
+        if self.enabled:
+            os.environ["PHOTOFLOW_TIMINGS_DIR"] = os.path.abspath(self.output_dir)
+        if self.mode:
+            os.environ["PHOTOFLOW_PROFILE"] = self.mode
+            tracemalloc.start()
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.mode == "sample":
+            self._sampler = StackSampler()
+            self._sampler.start()
+        _current = self
+        return self
+
+    @contextmanager
+    def stage(self, name: str, **attrs) -> Iterator[Dict]:
+        """Time a block; nested stages are recorded with their depth. Yields the record for extra attrs."""
+        record = {"name": name, "depth": self._depth, "start": round(time.perf_counter() - self._started, 6),
+                  "status": "ok", **attrs}
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # tracemalloc has a single peak counter: fold it into the enclosing stage before resetting.
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        self._depth += 1
+        try:
+            yield record
+        except SystemExit as e:
+            record["status"] = "exit" if e.code not in (None, 0) else "ok"
+            raise
+        except BaseException as e:
+            record["status"] = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._depth -= 1
+            record["seconds"] = round(time.perf_counter() - self._started - record["start"], 6)
+            if tracing and tracemalloc.is_tracing():
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["peak_mb"] = round(peak / 1e6, 2)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                tracemalloc.reset_peak()
+            self.stages.append(record)
+
+    def finish(self) -> Dict[str, str]:
+        """Stop profilers and write the files; returns their paths by kind (none when timings are off)."""
+        global _current
+        total = time.perf_counter() - self._started
+        written = {}
+        if not self.enabled:
+            _current = None
+            return written
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self._profiler:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.stem + ".prof")
+            text = io.StringIO()
+            pstats.Stats(self._profiler, stream=text).sort_stats("cumulative").print_stats(40)
+            with open(self.stem + ".top.txt", "w") as f:
+                f.write(text.getvalue())
+            written.update(cprofile=self.stem + ".prof", top=self.stem + ".top.txt")
+        if self._sampler:
+            self._sampler.stop()
+            with open(self.stem + ".stacks.txt", "w") as f:
+                f.write(self._sampler.collapsed())
+            written["stacks"] = self.stem + ".stacks.txt"
+        if self.mode and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            peak_mb = max((s.get("peak_mb", 0) for s in self.stages), default=0)
+            with open(self.stem + ".memory.txt", "w") as f:
+                f.write(f"# tracemalloc: allocation sites still held at exit (run peak {peak_mb} MB)\n")
+                for stat in snapshot.statistics("lineno")[:30]:
+                    f.write(f"{stat}\n")
+            written["memory"] = self.stem + ".memory.txt"
+
+        timings = {
+            "name": self.name, "run_id": self.run_id, "argv": self.argv, "host": socket.gethostname(),
+            "pid": os.getpid(), "python": sys.version.split()[0], "started_at": self._started_at,
+            "seconds": round(total, 6), "status": self.status, "exit_code": self.exit_code,
+            "error": self.error, "profile": self.mode, "files": written,
+            "stages": sorted(self.stages, key=lambda s: s["start"]),
+        }
+        with open(self.stem + ".timings.json", "w") as f:
+            json.dump(timings, f, indent=2)
+        written["timings"] = self.stem + ".timings.json"
+        _current = None
+        return written
+
+
+def current() -> Optional[RunProfile]:
+    return _current
+
+
+@contextmanager
+def stage(name: str, **attrs) -> Iterator[Dict]:
+    """Time a block in the active run; a no-op outside profiled_run."""
+    if _current is None:
+        yield dict(attrs)
+        return
+    with _current.stage(name, **attrs) as record:
+        yield record
+
+
+def add_profile_arguments(parser) -> None:
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILE_MODES,
+                        default=os.environ.get("PHOTOFLOW_PROFILE") or None,
+                        help="Profile the run: cprofile (default) or sample (stack sampling); "
+                             "both add tracemalloc peaks (default: PHOTOFLOW_PROFILE)")
+    parser.add_argument("--profile-dir", help=f"Directory for timings and profiles "
+                                              f"(default: PHOTOFLOW_TIMINGS_DIR or {DEFAULT_DIR})")
+
+
+@contextmanager
+def profiled_run(name: str, args=None, output_dir: Optional[str] = None,
+                 mode: Optional[str] = None) -> Iterator[RunProfile]:
+    """Wrap an entry point; requested timings are written however the block ends (return, exception, sys.exit)."""
+    run = RunProfile(name, output_dir or getattr(args, "profile_dir", None), mode or getattr(args, "profile", None))
+    run.start()
+    try:
+        with run.stage("total"):
+            yield run
+    except SystemExit as e:
+        run.exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        run.status = "ok" if run.exit_code == 0 else "exit"
+        raise
+    except BaseException as e:
+        run.status, run.exit_code = "error", 1
+        run.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        try:
+            written = run.finish()
+            if run.mode:
+                print(f"⏱️  Profile ({run.mode}) and timings written to {run.stem}.*", file=sys.stderr)
+            elif run.status != "ok" and written:
+                print(f"⏱️  Timings written to {written['timings']}", file=sys.stderr)
+        except OSError as e:
+            print(f"⚠️  Could not write timings: {e}", file=sys.stderr)
@@ -1,12 +1,260 @@
+"""
+Create the Python 3.11 virtual environment used for CLIP export.
+
+With a cache directory (the default from the command line), environments are keyed by a
+hash of the interpreter, requirements.txt and the pinned extras (torch and any --extra):
+
+    {cache}/envs/{key}/      a finished environment, restored by hard-linking it into --path
+    {cache}/wheels/{key}/    every wheel the environment needs, built in parallel on a miss
+
+A matching environment is restored without running pip at all. A matching wheelhouse is
+installed with --no-index, so no network is needed. On a miss the wheels are built
+concurrently (torch, each extra and the remaining requirements as separate pip processes),
+then installed from the wheelhouse, and both caches are filled for the next run. CI can
+persist only {cache}/wheels between agents; an environment is only restored for the same
+interpreter path it was built with.
+
+Usage:
+    python scripts/ai-ml/setup_venv.py --path .venv
+    python scripts/ai-ml/setup_venv.py --path .venv --extra onnxruntime==1.17.3
+    python scripts/ai-ml/setup_venv.py --path .venv --offline        # fail rather than download
+    python scripts/ai-ml/setup_venv.py --path .venv --no-cache       # always a fresh install
+"""
+
 import argparse
+import hashlib
+import json
 import os
+import re
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import shutil
+from typing import Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from profiling import add_profile_arguments, profiled_run, stage
+
+TORCH_REQUIREMENT = "torch>=2.1.0"
+TORCH_INDEX_URL = "https://download.pytorch.org/whl/cpu"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "photoflow", "venv")
+ENV_MARKER = ".photoflow-env.json"
+WHEELHOUSE_MARKER = "wheelhouse.json"
+# Everything about the interpreter that changes which wheels pip picks.
+_INTERPRETER_FINGERPRINT = (
+    "import platform, sys, sysconfig; "
+    "print(sys.version, sys.implementation.cache_tag, sysconfig.get_platform(), platform.libc_ver())"
+)
+
+
+def _bin_dir(venv_path: Path) -> Path:
+    return venv_path / ("Scripts" if os.name == "nt" else "bin")
+
+
+def requirement_lines(requirements: str) -> List[str]:
+    """Requirement specifiers from a requirements file, without comments or blank lines."""
+    if not Path(requirements).is_file():
+        return []
+    lines = []
+    with open(requirements) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                lines.append(line)
+    return lines
+
+
+def requirement_name(spec: str) -> str:
+    match = re.match(r"[A-Za-z0-9._-]+", spec)
+    return re.sub(r"[-_.]+", "-", match.group(0)).lower() if match else spec
+
+
+def environment_key(python_exe: str, requirements: str, extras: Sequence[str] = ()) -> str:
+    """Hash of the interpreter, the requirements and the pinned extras."""
+    interpreter = subprocess.check_output([python_exe, "-c", _INTERPRETER_FINGERPRINT], text=True).strip()
+    digest = hashlib.sha256()
+    for part in [interpreter, TORCH_INDEX_URL, *sorted(requirement_lines(requirements)), "--", *extras]:
+        digest.update(part.encode() + b"\n")
+    return digest.hexdigest()[:24]
+
+
+def install_groups(requirements: str, extras: Sequence[str]) -> List[List[str]]:
+    """Independent pip invocations for the wheel build: torch, each extra, then the rest."""
+    pinned = [TORCH_REQUIREMENT, *extras]
+    pinned_names = {requirement_name(spec) for spec in pinned}
+    rest = [spec for spec in requirement_lines(requirements) if requirement_name(spec) not in pinned_names]
+    groups = [["pip", TORCH_REQUIREMENT]] + [[spec] for spec in extras]
+    return groups + ([rest] if rest else [])
+
+
+def build_wheelhouse(pip: Path, wheel_dir: Path, groups: List[List[str]]) -> float:
+    """Build every group's wheels concurrently into wheel_dir/NN; returns the seconds taken."""
+    started = time.perf_counter()
+    commands = [
+        [str(pip), "wheel", "--wheel-dir", str(wheel_dir / f"{i:02d}"), "--extra-index-url", TORCH_INDEX_URL, *group]
+        for i, group in enumerate(groups)
+    ]
+    print(f"📥 Building wheels for {len(commands)} requirement groups in parallel...")
+    with ThreadPoolExecutor(max_workers=len(commands)) as pool:
+        for future in [pool.submit(subprocess.check_call, cmd) for cmd in commands]:
+            future.result()
+    return time.perf_counter() - started
+
+
+def install_from_wheelhouse(pip: Path, wheel_dir: Path, groups: List[List[str]]) -> None:
+    """Install the groups from the wheelhouse only (--no-index): works offline."""
+    find_links = []
+    for sub in sorted(p for p in wheel_dir.iterdir() if p.is_dir()):
+        find_links += ["--find-links", str(sub)]
+    subprocess.check_call([str(pip), "install", "--no-index", *find_links, "--upgrade", "pip"])
+    specs = [spec for group in groups for spec in group if spec != "pip"]
+    subprocess.check_call([str(pip), "install", "--no-index", *find_links, *specs])
+
 
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
 
-def create_venv(path: str = "venv", requirements: str = "requirements.txt") -> None:
+
+def relocate(venv_path: Path, old_prefix: str) -> int:
+    """Rewrite the absolute prefix in scripts and pyvenv.cfg; returns the number of files changed.
+
+    Files are replaced rather than edited in place, as they may be hard links into the cache.
+    """
+    old, new = old_prefix.encode(), str(venv_path.resolve()).encode()
+    if old == new:
+        return 0
+    changed = 0
+    candidates = [p for p in _bin_dir(venv_path).iterdir() if p.is_file() and not p.is_symlink()]
+    for path in candidates + [venv_path / "pyvenv.cfg"]:
+        data = path.read_bytes()
+        if old not in data or b"\0" in data:
+            continue
+        tmp = path.with_name(path.name + ".relocate")
+        tmp.write_bytes(data.replace(old, new))
+        shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+        changed += 1
+    return changed
+
+
+def _read_json(path: Path) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: Path, data: Dict) -> None:
+    # Replace, never truncate: a restored environment's marker is a hard link to the cached one.
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _publish(src: Path, dest: Path, copy_function) -> None:
+    """Copy src into the cache as dest, atomically; a concurrent builder that got there first wins."""
+    partial = dest.with_name(f"{dest.name}.partial-{os.getpid()}")
+    shutil.rmtree(partial, ignore_errors=True)
+    shutil.copytree(src, partial, symlinks=True, copy_function=copy_function)
+    try:
+        os.replace(partial, dest)
+    except OSError:
+        shutil.rmtree(partial, ignore_errors=True)
+
+
+def _clear_target(venv_path: Path) -> None:
+    if not venv_path.exists():
+        return
+    if not (venv_path / "pyvenv.cfg").is_file() and any(venv_path.iterdir()):
+        sys.exit(f"❌ {venv_path} exists and is not a virtual environment; refusing to replace it")
+    shutil.rmtree(venv_path)
+
+
+def cached_create_venv(python_exe: str, venv_path: Path, requirements: str, cache_dir: str,
+                       extras: Sequence[str] = (), offline: bool = False) -> Dict:
+    """Restore, install offline or build the keyed environment; returns what happened and the time saved."""
+    started = time.perf_counter()
+    with stage("hash_inputs"):
+        key = environment_key(python_exe, requirements, extras)
+    env_cache = Path(cache_dir) / "envs" / key
+    wheel_cache = Path(cache_dir) / "wheels" / key
+    groups = install_groups(requirements, extras)
+    print(f"🔑 Environment key: {key}")
+
+    current = _read_json(venv_path / ENV_MARKER)
+    if current and current.get("key") == key:
+        print(f"✅ {venv_path} already matches; nothing to do")
+        return {"key": key, "source": "up-to-date", "seconds": time.perf_counter() - started,
+                "saved_seconds": current.get("build_seconds", 0.0)}
+
+    interpreter = os.path.realpath(python_exe)
+    record = _read_json(env_cache / ENV_MARKER)
+    if record and record.get("interpreter") != interpreter:
+        # Same version elsewhere on disk: pyvenv.cfg would point at the wrong home, so use the wheels.
+        record = None
+    if record:
+        with stage("restore_env", key=key):
+            _clear_target(venv_path)
+            shutil.copytree(env_cache, venv_path, symlinks=True, copy_function=_link_or_copy)
+            relocate(venv_path, record["prefix"])
+        source, saved_from = "env-cache", record["build_seconds"]
+    else:
+        wheelhouse = _read_json(wheel_cache / WHEELHOUSE_MARKER)
+        if wheelhouse is None and offline:
+            sys.exit(f"❌ Offline and no cached environment or wheelhouse for key {key} in {cache_dir}")
+        _clear_target(venv_path)
+        print(f"📦 Creating virtual environment at: {venv_path}")
+        with stage("create_venv"):
+            subprocess.check_call([python_exe, "-m", "venv", str(venv_path)])
+        pip = _bin_dir(venv_path) / "pip"
+        if wheelhouse is None:
+            with stage("build_wheelhouse", groups=len(groups)):
+                building = Path(f"{wheel_cache}.building-{os.getpid()}")
+                building.mkdir(parents=True, exist_ok=True)
+                try:
+                    wheel_seconds = build_wheelhouse(pip, building, groups)
+                except BaseException:
+                    shutil.rmtree(building, ignore_errors=True)
+                    raise
+                _write_json(building / WHEELHOUSE_MARKER,
+                            {"key": key, "groups": groups, "build_seconds": round(wheel_seconds, 3)})
+                try:
+                    os.replace(building, wheel_cache)
+                except OSError:  # another build published the same key first
+                    shutil.rmtree(building, ignore_errors=True)
+            source, saved_from = "built", 0.0
+        else:
+            source, saved_from = "wheelhouse", wheelhouse["build_seconds"]
+        print("📥 Installing from the local wheelhouse (no index)...")
+        with stage("install_wheelhouse"):
+            install_from_wheelhouse(pip, wheel_cache, groups)
+
+    seconds = time.perf_counter() - started
+    build_seconds = seconds if source == "built" else (record or {}).get("build_seconds", seconds + saved_from)
+    marker = {"key": key, "prefix": str(venv_path.resolve()), "interpreter": interpreter,
+              "build_seconds": round(build_seconds, 3),
+              "source": source, "created_at": time.time(), "requirements": groups}
+    _write_json(venv_path / ENV_MARKER, marker)
+    if source != "env-cache":
+        with stage("cache_env"):
+            env_cache.parent.mkdir(parents=True, exist_ok=True)
+            _publish(venv_path, env_cache, _link_or_copy)
+
+    saved = max(0.0, build_seconds - seconds) if source != "built" else 0.0
+    labels = {"built": "Built", "wheelhouse": "Installed from cached wheels", "env-cache": "Restored cached environment"}
+    print(f"♻️  {labels[source]} in {seconds:.1f}s" + (f" (saved ~{saved:.0f}s)" if saved else ""))
+    return {"key": key, "source": source, "seconds": seconds, "saved_seconds": saved}
+
+
+def create_venv(path: str = "venv", requirements: str = "requirements.txt", cache_dir: Optional[str] = None,
+                extras: Sequence[str] = (), offline: bool = False) -> Optional[Dict]:
     """Create a Python 3.11 virtual environment and install dependencies."""
     venv_path = Path(path)
 
@@ -19,31 +267,45 @@ def create_venv(path: str = "venv", requirements: str = "requirements.txt") -> N
             "📌 And add to your shell config: export PATH=\"/opt/homebrew/opt/python@3.11/bin:$PATH\""
         )
 
+    if cache_dir:
+        report = cached_create_venv(python_exe, venv_path, requirements, cache_dir, extras, offline)
+        print(f"✅ Virtual environment setup complete at: {venv_path}")
+        return report
+
     print(f"📦 Creating virtual environment at: {venv_path}")
-    subprocess.check_call([python_exe, "-m", "venv", str(venv_path)])
+    with stage("create_venv"):
+        subprocess.check_call([python_exe, "-m", "venv", str(venv_path)])
 
-    pip_executable = venv_path / ("Scripts" if os.name == "nt" else "bin") / "pip"
+    pip_executable = _bin_dir(venv_path) / "pip"
 
     # Upgrade pip first
-    subprocess.check_call([str(pip_executable), "install", "--upgrade", "pip"])
+    with stage("upgrade_pip"):
+        subprocess.check_call([str(pip_executable), "install", "--upgrade", "pip"])
 
     # Install latest safe version of torch
     print("📥 Installing PyTorch >= 2.1.0 (CPU version)...")
-    subprocess.check_call([
-        str(pip_executable),
-        "install",
-        "torch>=2.1.0",
-        "--extra-index-url", "https://download.pytorch.org/whl/cpu"
-    ])
+    with stage("install_torch"):
+        subprocess.check_call([
+            str(pip_executable),
+            "install",
+            TORCH_REQUIREMENT,
+            "--extra-index-url", TORCH_INDEX_URL
+        ])
+
+    if extras:
+        with stage("install_extras"):
+            subprocess.check_call([str(pip_executable), "install", *extras])
 
     # Install other requirements
     if Path(requirements).is_file():
         print(f"📥 Installing additional dependencies from {requirements}...")
-        subprocess.check_call([str(pip_executable), "install", "-r", requirements])
+        with stage("install_requirements", requirements=requirements):
+            subprocess.check_call([str(pip_executable), "install", "-r", requirements])
     else:
         print(f"⚠️  No requirements.txt found at: {requirements}")
 
     print(f"✅ Virtual environment setup complete at: {venv_path}")
+    return None
 
 
 def main() -> None:
@@ -54,8 +316,19 @@ def main() -> None:
         default="requirements.txt",
         help="Path to requirements.txt",
     )
+    parser.add_argument("--extra", action="append", default=[],
+                        help="Additional pinned requirement, part of the cache key (repeatable)")
+    parser.add_argument("--cache-dir", default=os.environ.get("PHOTOFLOW_VENV_CACHE", DEFAULT_CACHE_DIR),
+                        help=f"Environment and wheel cache (default: PHOTOFLOW_VENV_CACHE or {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Install from the network into a fresh environment")
+    parser.add_argument("--offline", action="store_true",
+                        help="Never download: fail unless the environment or its wheels are cached")
+    add_profile_arguments(parser)
     args = parser.parse_args()
-    create_venv(args.path, args.requirements)
+    if args.no_cache and args.offline:
+        parser.error("--offline needs the cache")
+    with profiled_run("setup_venv", args):
+        create_venv(args.path, args.requirements, None if args.no_cache else args.cache_dir, args.extra, args.offline)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Tune ONNX Runtime session options for the exported CLIP models on the current node.
+
+Every session is built with default SessionOptions today, although the MicroK8s nodes
+differ in core count and cache size. This tool times each model of the bundle in
+models/ (see model_info.txt) under different settings and records the fastest:
+
+    intra_op_num_threads       1, 2, 4, ... up to the cores this process may use
+    execution_mode             sequential, or parallel with 2+ inter-op threads
+    graph_optimization_level   disable, basic, extended, all
+    enable_cpu_mem_arena       on / off
+    enable_mem_pattern         on / off
+
+A full grid is hundreds of sessions, so the search is coordinate descent: it starts
+from the defaults and improves one setting at a time, thread count first, until a
+pass changes nothing. A change is only kept if it beats the current best by more
+than --min-gain, so noise does not replace the defaults.
+
+Results are written to session_config.json next to model_info.txt, one entry per
+node (NODE_NAME from the pod's downward API, else the hostname), together with the
+node's CPU count, model and cache sizes and the size of the model file tuned. Pods
+read their node's entry with `load_session_config`; an entry for a different model
+file is ignored.
+
+Usage:
+    python3 scripts/ai-ml/tune_onnx_sessions.py tune --models-dir models
+    python3 scripts/ai-ml/tune_onnx_sessions.py tune --models-dir models --models vision_model.onnx --batch-size 16
+    python3 scripts/ai-ml/tune_onnx_sessions.py show --models-dir models --node worker-2
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from auto_export_models import ROLE_FILES, read_model_info  # noqa: E402
+
+CONFIG_FILE = "session_config.json"
+CONFIG_VERSION = 1
+SEQUENCE_LENGTH = 77
+DEFAULT_OPTIONS = {
+    "intra_op_num_threads": 0,
+    "inter_op_num_threads": 0,
+    "execution_mode": "sequential",
+    "graph_optimization_level": "all",
+    "enable_cpu_mem_arena": True,
+    "enable_mem_pattern": True,
+}
+OPTIMIZATION_LEVELS = {"disable": "ORT_DISABLE_ALL", "basic": "ORT_ENABLE_BASIC",
+                       "extended": "ORT_ENABLE_EXTENDED", "all": "ORT_ENABLE_ALL"}
+EXECUTION_MODES = {"sequential": "ORT_SEQUENTIAL", "parallel": "ORT_PARALLEL"}
+
+
+def available_cpus() -> int:
+    """Cores this process may run on (respects cpusets, unlike os.cpu_count)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def hardware_profile() -> Dict:
+    """CPU count, model name and cache sizes of this node, used to match configs to hardware."""
+    profile = {"cpus": available_cpus(), "cpu_model": "", "caches_kb": {}}
+    try:
+        with open("/proc/cpuinfo") as f:
+            profile["cpu_model"] = next((line.split(":", 1)[1].strip() for line in f
+                                         if line.startswith("model name")), "")
+    except OSError:
+        pass
+    cache_dir = "/sys/devices/system/cpu/cpu0/cache"
+    for index in sorted(os.listdir(cache_dir)) if os.path.isdir(cache_dir) else []:
+        try:
+            with open(os.path.join(cache_dir, index, "level")) as f:
+                level = f.read().strip()
+            with open(os.path.join(cache_dir, index, "type")) as f:
+                kind = f.read().strip()
+            with open(os.path.join(cache_dir, index, "size")) as f:
+                size = f.read().strip()
+        except OSError:
+            continue
+        if kind != "Instruction":
+            profile["caches_kb"][f"L{level}"] = int(size.rstrip("K")) if size.endswith("K") else size
+    return profile
+
+
+def node_name() -> str:
+    return os.environ.get("NODE_NAME") or socket.gethostname()
+
+
+def thread_counts(cpus: int) -> List[int]:
+    counts, n = [], 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    return counts + [cpus]
+
+
+def search_space(cpus: int) -> Dict[str, List]:
+    """Values tried per option, in the order coordinate descent visits them."""
+    return {
+        "intra_op_num_threads": thread_counts(cpus),
+        "graph_optimization_level": list(OPTIMIZATION_LEVELS),
+        "execution_mode": ["sequential", "parallel"],
+        "inter_op_num_threads": [0] + [n for n in (2, 4) if n <= cpus],
+        "enable_cpu_mem_arena": [True, False],
+        "enable_mem_pattern": [True, False],
+    }
+
+
+def coordinate_search(measure: Callable[[Dict], float], space: Dict[str, List], start: Optional[Dict] = None,
+                      min_gain: float = 0.03, max_passes: int = 3) -> Dict:
+    """Maximise measure(options) one option at a time; returns the best options, score and every trial."""
+    best = dict(start or DEFAULT_OPTIONS)
+    trials: Dict[str, float] = {}
+
+    def score(options: Dict) -> float:
+        key = json.dumps(options, sort_keys=True)
+        if key not in trials:
+            trials[key] = measure(options)
+        return trials[key]
+
+    baseline = best_score = score(best)
+    for _ in range(max_passes):
+        changed = False
+        for name, values in space.items():
+            if name == "inter_op_num_threads" and best["execution_mode"] == "sequential":
+                continue  # inter-op threads only run in parallel mode
+            for value in values:
+                if value == best[name]:
+                    continue
+                candidate = dict(best, **{name: value})
+                if name == "execution_mode" and value == "parallel" and not candidate["inter_op_num_threads"]:
+                    candidate["inter_op_num_threads"] = 2
+                candidate_score = score(candidate)
+                if candidate_score > best_score * (1 + min_gain):
+                    best, best_score, changed = candidate, candidate_score, True
+        if not changed:
+            break
+    return {"options": best, "score": best_score, "baseline_score": baseline, "trials": len(trials)}
+
+
+def session_options(ort, options: Dict):
+    """An ort.SessionOptions with the tuned settings applied."""
+    session = ort.SessionOptions()
+    session.intra_op_num_threads = int(options.get("intra_op_num_threads", 0))
+    session.inter_op_num_threads = int(options.get("inter_op_num_threads", 0))
+    session.execution_mode = getattr(ort.ExecutionMode, EXECUTION_MODES[options.get("execution_mode", "sequential")])
+    session.graph_optimization_level = getattr(
+        ort.GraphOptimizationLevel, OPTIMIZATION_LEVELS[options.get("graph_optimization_level", "all")])
+    session.enable_cpu_mem_arena = bool(options.get("enable_cpu_mem_arena", True))
+    session.enable_mem_pattern = bool(options.get("enable_mem_pattern", True))
+    return session
+
+
+def _sample_inputs(session, batch_size: int) -> Dict:
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    feed = {}
+    for model_input in session.get_inputs():
+        # Symbolic dims are the batch (first) and the text sequence, which the server pads to 77.
+        shape = [dim if isinstance(dim, int) else (batch_size if axis == 0 else SEQUENCE_LENGTH)
+                 for axis, dim in enumerate(model_input.shape)]
+        if "int64" in model_input.type:
+            feed[model_input.name] = (np.ones(shape, dtype=np.int64) if "mask" in model_input.name
+                                      else rng.integers(0, 49408, shape, dtype=np.int64))
+        else:
+            feed[model_input.name] = rng.standard_normal(shape).astype(np.float32)
+    return feed
+
+
+def onnx_throughput(model_path: str, batch_size: int = 8, warmup: int = 2, runs: int = 5) -> Callable[[Dict], float]:
+    """measure() for coordinate_search: items per second of one model under the given options."""
+    import onnxruntime as ort
+
+    def measure(options: Dict) -> float:
+        session = ort.InferenceSession(model_path, session_options(ort, options), providers=["CPUExecutionProvider"])
+        feed = _sample_inputs(session, batch_size)
+        for _ in range(warmup):
+            session.run(None, feed)
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            session.run(None, feed)
+            timings.append(time.perf_counter() - started)
+        return batch_size / statistics.median(timings)
+
+    return measure
+
+
+def read_config(models_dir: str) -> Dict:
+    path = os.path.join(models_dir, CONFIG_FILE)
+    if not os.path.exists(path):
+        return {"version": CONFIG_VERSION, "nodes": {}}
+    with open(path) as f:
+        config = json.load(f)
+    if config.get("version") != CONFIG_VERSION:
+        raise ValueError(f"Unsupported {CONFIG_FILE} version {config.get('version')} in {models_dir}")
+    return config
+
+
+def write_node_config(models_dir: str, node: str, hardware: Dict, results: Dict[str, Dict]) -> str:
+    """Merge this node's results into session_config.json, keeping other nodes' entries."""
+    config = read_config(models_dir)
+    entry = config["nodes"].setdefault(node, {"models": {}})
+    entry.update(hardware=hardware, tuned_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+    entry["models"].update(results)
+    info = read_model_info(models_dir)
+    if info:
+        config["bundle"] = {key: info[key] for key in ("variant", "dimension", "role") if key in info}
+    path = os.path.join(models_dir, CONFIG_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(config, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_session_config(models_dir: str, model_name: str, node: Optional[str] = None,
+                        hardware: Optional[Dict] = None) -> Optional[Dict]:
+    """Tuned options for model_name on this node, else from a node with the same CPUs; None if untuned.
+
+    Entries tuned on a model file of a different size (a re-export) are skipped.
+    """
+    try:
+        config = read_config(models_dir)
+    except (OSError, ValueError):
+        return None
+    model_path = os.path.join(models_dir, model_name)
+    size = os.path.getsize(model_path) if os.path.exists(model_path) else None
+
+    def usable(entry: Dict) -> Optional[Dict]:
+        result = entry.get("models", {}).get(model_name)
+        return result["options"] if result and result.get("model_bytes") == size else None
+
+    nodes = config["nodes"]
+    own = nodes.get(node or node_name())
+    if own and usable(own):
+        return usable(own)
+    hardware = hardware or hardware_profile()
+    for entry in nodes.values():
+        same = entry.get("hardware", {})
+        if (same.get("cpus"), same.get("cpu_model")) == (hardware["cpus"], hardware["cpu_model"]) and usable(entry):
+            return usable(entry)
+    return None
+
+
+def tune_models(models_dir: str, model_names: List[str], batch_size: int, min_gain: float,
+                measure_factory: Callable[[str, int], Callable[[Dict], float]] = onnx_throughput) -> Dict[str, Dict]:
+    results = {}
+    cpus = available_cpus()
+    for name in model_names:
+        path = os.path.join(models_dir, name)
+        started = time.perf_counter()
+        found = coordinate_search(measure_factory(path, batch_size), search_space(cpus), min_gain=min_gain)
+        results[name] = {
+            "options": found["options"], "batch_size": batch_size, "model_bytes": os.path.getsize(path),
+            "items_per_second": round(found["score"], 2),
+            "default_items_per_second": round(found["baseline_score"], 2),
+            "speedup": round(found["score"] / found["baseline_score"], 3), "trials": found["trials"],
+            "seconds": round(time.perf_counter() - started, 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune ONNX Runtime session options per node")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tune = subparsers.add_parser("tune", help="Time the bundle's models and record the fastest options")
+    tune.add_argument("--models-dir", default="models", help="Directory with the exported models")
+    tune.add_argument("--models", nargs="+", help="Model files to tune (default: the .onnx files of the bundle)")
+    tune.add_argument("--batch-size", type=int, default=8, help="Items per inference call while timing")
+    tune.add_argument("--min-gain", type=float, default=0.03, help="Relative gain needed to keep a change")
+    tune.add_argument("--node", help="Node name to record (default: NODE_NAME or hostname)")
+
+    show = subparsers.add_parser("show", help="Print the options a node would use")
+    show.add_argument("--models-dir", default="models", help="Directory with the exported models")
+    show.add_argument("--node", help="Node name (default: NODE_NAME or hostname)")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        bundle = ROLE_FILES[read_model_info(args.models_dir).get("role", "full")]
+        for name in (n for n in bundle if n.endswith(".onnx")):
+            options = load_session_config(args.models_dir, name, args.node)
+            print(f"⚙️  {name}: {json.dumps(options) if options else 'defaults (not tuned for this node)'}")
+        return
+
+    names = args.models or [name for name in ROLE_FILES[read_model_info(args.models_dir).get("role", "full")]
+                            if name.endswith(".onnx") and os.path.exists(os.path.join(args.models_dir, name))]
+    if not names:
+        sys.exit(f"❌ No ONNX models found in {args.models_dir}")
+    node = args.node or node_name()
+    hardware = hardware_profile()
+    print(f"🔧 Tuning {', '.join(names)} on {node} ({hardware['cpus']} CPUs, {hardware['cpu_model'] or 'unknown CPU'})")
+    results = tune_models(args.models_dir, names, args.batch_size, args.min_gain)
+    path = write_node_config(args.models_dir, node, hardware, results)
+    for name, result in results.items():
+        print(f"📊 {name}: {result['items_per_second']} items/s vs {result['default_items_per_second']} with defaults "
+              f"({result['speedup']}x, {result['trials']} sessions timed)")
+        print(f"   {json.dumps(result['options'])}")
+    print(f"💾 Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Zero-shot batch auto-tagging of stored image embeddings.
+
+The label vocabulary is encoded once with text_model.onnx ("a photo of {label}")
+into an (L, D) matrix. Stored image embeddings are then scored in blocks with one
+matrix product per block, and the top-k labels per image are written in bulk. The
+text model runs once per label, never once per image-label pair.
+
+Embeddings come from a .npy file (row i = ImageMappings row i by rowid, as
+generate_dataset.py writes them, or the lines of --keys) or straight from the
+Qdrant collection. Tags go to an ImageTags table (ObjectKey, Rank, Tag, Score) in
+a SQLite file, and with --write-qdrant also to a `tags` payload on each point.
+
+Usage:
+    python3 scripts/data/auto_tag.py --labels labels.txt --models-dir models \
+        --embeddings embeddings.npy --db photoflow.db --output tags.db
+    python3 scripts/data/auto_tag.py --labels labels.txt --models-dir models --qdrant --write-qdrant
+    python3 scripts/data/auto_tag.py --benchmark 1000000 --benchmark-labels 1000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+import numpy as np  # noqa: E402
+
+from photoflow_db import connect, iter_mappings  # noqa: E402
+from qdrant_rest import DEFAULT_COLLECTION, QdrantRestClient, client_from_env_file  # noqa: E402
+
+PROMPT_TEMPLATE = "a photo of {label}"
+BLOCK_ROWS = 8192
+# CLIP's learned logit scale; softmax over 100 * cosine gives zero-shot label probabilities.
+LOGIT_SCALE = 100.0
+
+IMAGE_TAGS_DDL = '''CREATE TABLE IF NOT EXISTS "ImageTags" (
+    "ObjectKey" TEXT NOT NULL,
+    "Rank" INTEGER NOT NULL,
+    "Tag" TEXT NOT NULL,
+    "Score" REAL NOT NULL,
+    "Probability" REAL NOT NULL,
+    PRIMARY KEY ("ObjectKey", "Rank")
+)'''
+
+
+def load_labels(path: str) -> List[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def encode_labels(models, labels: Sequence[str], template: str = PROMPT_TEMPLATE,
+                  cache_path: Optional[str] = None, batch_size: int = 64) -> np.ndarray:
+    """Embed every label prompt once; reuse a cached matrix if labels and template are unchanged."""
+    digest = hashlib.sha256(json.dumps([template, list(labels)]).encode()).hexdigest()
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached["digest"]) == digest:
+                return cached["matrix"]
+
+    prompts = [template.format(label=label) for label in labels]
+    vectors = []
+    for i in range(0, len(prompts), batch_size):
+        vectors.extend(models.embed_texts(prompts[i:i + batch_size]))
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    if cache_path:
+        np.savez(cache_path, digest=np.array(digest), matrix=matrix)
+    return matrix
+
+
+def score_block(block: np.ndarray, label_matrix: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Top-k (label indices, cosine scores, softmax probabilities) for each row, best first."""
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    scores = (block / np.maximum(norms, 1e-12)) @ label_matrix.T
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    logits = LOGIT_SCALE * scores
+    logits -= logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    probabilities = np.take_along_axis(logits, top, axis=1) / logits.sum(axis=1, keepdims=True)
+    return top, top_scores, probabilities
+
+
+class SqliteTagWriter:
+    """Bulk-writes ranked tags to the ImageTags table, replacing earlier tags of the same images."""
+
+    def __init__(self, path: str, k: int):
+        self.k = k
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(IMAGE_TAGS_DDL)
+            self.conn.execute('CREATE INDEX IF NOT EXISTS "IX_ImageTags_Tag" ON "ImageTags" ("Tag", "Score")')
+
+    def write(self, keys: Sequence[str], labels: Sequence[str], top: np.ndarray, scores: np.ndarray,
+              probabilities: np.ndarray) -> None:
+        rows = [(key, rank, labels[top[i, rank]], float(scores[i, rank]), float(probabilities[i, rank]))
+                for i, key in enumerate(keys) for rank in range(top.shape[1])]
+        with self.conn:
+            # A run with a smaller k leaves the images' higher ranks behind; images not in this run keep theirs.
+            self.conn.executemany('DELETE FROM "ImageTags" WHERE "ObjectKey" = ? AND "Rank" >= ?',
+                                  [(key, self.k) for key in keys])
+            self.conn.executemany('INSERT OR REPLACE INTO "ImageTags" VALUES (?, ?, ?, ?, ?)', rows)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class QdrantTagWriter:
+    """Writes tags and tag_scores payloads with one batch request per block."""
+
+    def __init__(self, client: QdrantRestClient, collection: str):
+        self.client = client
+        self.collection = collection
+
+    def write(self, ids: Sequence, labels: Sequence[str], top: np.ndarray, scores: np.ndarray,
+              probabilities: np.ndarray) -> None:
+        operations = [{"set_payload": {"points": [point_id], "payload": {
+            "tags": [labels[j] for j in top[i]],
+            "tag_scores": [round(float(s), 4) for s in scores[i]],
+        }}} for i, point_id in enumerate(ids)]
+        self.client.batch_update(self.collection, operations)
+
+    def close(self) -> None:
+        pass
+
+
+def npy_blocks(path: str, keys: Sequence[str], block_rows: int = BLOCK_ROWS) -> Iterator[Tuple[List, np.ndarray]]:
+    """(keys, float32 block) pairs from a memory-mapped .npy whose rows are aligned with `keys`."""
+    vectors = np.load(path, mmap_mode="r")
+    keys = list(keys)
+    if len(keys) != len(vectors):
+        raise ValueError(f"{len(keys)} keys but {len(vectors)} embedding rows in {path}")
+
+    def blocks():
+        for start in range(0, len(vectors), block_rows):
+            yield keys[start:start + block_rows], np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+    return blocks()
+
+
+def qdrant_blocks(client: QdrantRestClient, collection: str,
+                  block_rows: int = BLOCK_ROWS) -> Iterator[Tuple[List, List, np.ndarray]]:
+    """Yield (point ids, object keys, vectors) pages scrolled from the collection."""
+    ids, keys, vectors = [], [], []
+    for point in client.iter_points(collection, min(block_rows, 1000), with_payload=["object_key", "path"],
+                                    with_vector=True):
+        payload = point.get("payload") or {}
+        ids.append(point["id"])
+        keys.append(payload.get("object_key") or payload.get("path") or str(point["id"]))
+        vectors.append(point["vector"])
+        if len(ids) >= block_rows:
+            yield ids, keys, np.asarray(vectors, dtype=np.float32)
+            ids, keys, vectors = [], [], []
+    if ids:
+        yield ids, keys, np.asarray(vectors, dtype=np.float32)
+
+
+def tag_blocks(blocks: Iterator[Tuple[List, List, np.ndarray]], labels: Sequence[str], label_matrix: np.ndarray,
+               writers: Sequence[Tuple[object, int]], k: int = 5) -> Dict:
+    """Score every block and hand results to each writer; writers take ids (0) or object keys (1)."""
+    stats = {"images": 0, "blocks": 0, "score_seconds": 0.0, "write_seconds": 0.0}
+    tag_counts: Dict[str, int] = {}
+    for ids, keys, block in blocks:
+        started = time.perf_counter()
+        top, scores, probabilities = score_block(block, label_matrix, k)
+        scored = time.perf_counter()
+        for writer, field in writers:
+            writer.write(ids if field == 0 else keys, labels, top, scores, probabilities)
+        stats["score_seconds"] += scored - started
+        stats["write_seconds"] += time.perf_counter() - scored
+        stats["images"] += len(block)
+        stats["blocks"] += 1
+        for index, count in zip(*np.unique(top[:, 0], return_counts=True)):
+            tag_counts[labels[index]] = tag_counts.get(labels[index], 0) + int(count)
+    stats["top_tags"] = sorted(tag_counts.items(), key=lambda item: -item[1])[:10]
+    return stats
+
+
+def run_benchmark(images: int, labels: int, dimension: int = 512, k: int = 5,
+                  block_rows: int = BLOCK_ROWS) -> Dict:
+    """Time blocked scoring of random unit embeddings against a random label matrix (no I/O)."""
+    rng = np.random.default_rng(0)
+    label_matrix = rng.standard_normal((labels, dimension), dtype=np.float32)
+    label_matrix /= np.linalg.norm(label_matrix, axis=1, keepdims=True)
+    block = rng.standard_normal((block_rows, dimension), dtype=np.float32)
+    started = time.perf_counter()
+    done = 0
+    while done < images:
+        rows = min(block_rows, images - done)
+        score_block(block[:rows], label_matrix, k)
+        done += rows
+    elapsed = time.perf_counter() - started
+    return {"images": images, "labels": labels, "dimension": dimension, "k": k, "block_rows": block_rows,
+            "seconds": round(elapsed, 2), "images_per_second": round(images / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zero-shot batch auto-tagging of stored image embeddings")
+    parser.add_argument("--labels", help="Label vocabulary, one label per line")
+    parser.add_argument("--template", default=PROMPT_TEMPLATE, help=f"Prompt template (default: '{PROMPT_TEMPLATE}')")
+    parser.add_argument("--models-dir", default="models", help="Directory with text_model.onnx and tokenizer/")
+    parser.add_argument("--label-cache", help="Cache the label matrix in this .npz")
+    parser.add_argument("--embeddings", help="Image embeddings .npy (rows aligned with --db or --keys)")
+    parser.add_argument("--db", help="photoflow.db whose ImageMappings rowid order matches --embeddings")
+    parser.add_argument("--keys", help="Text file of object keys, one per --embeddings row")
+    parser.add_argument("--qdrant", action="store_true", help="Read embeddings from the Qdrant collection")
+    parser.add_argument("--write-qdrant", action="store_true", help="Also write tags payloads to Qdrant")
+    parser.add_argument("--env-file", default=".env", help="Qdrant settings (QDRANT_HOST/PORT/COLLECTION)")
+    parser.add_argument("--output", default="tags.db", help="SQLite file for the ImageTags table")
+    parser.add_argument("--top-k", type=int, default=5, help="Tags per image (default: 5)")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS, help="Images scored per matrix product")
+    parser.add_argument("--benchmark", type=int, metavar="IMAGES", help="Time scoring of IMAGES random embeddings")
+    parser.add_argument("--benchmark-labels", type=int, default=1000, help="Label count for --benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        result = run_benchmark(args.benchmark, args.benchmark_labels, k=args.top_k, block_rows=args.block_rows)
+        print(f"📊 Scored {result['images']:,} images × {result['labels']} labels in {result['seconds']}s "
+              f"({result['images_per_second']:,} images/s)")
+        return
+    if not args.labels or not (args.qdrant or args.embeddings):
+        parser.error("--labels and one of --embeddings or --qdrant are required")
+
+    from embedding_server import ClipOnnxModels
+
+    labels = load_labels(args.labels)
+    label_matrix = encode_labels(ClipOnnxModels(args.models_dir, load_vision=False), labels, args.template,
+                                 args.label_cache)
+    print(f"🏷️  Encoded {len(labels)} labels")
+
+    client, collection = None, DEFAULT_COLLECTION
+    if args.qdrant:
+        client, collection = client_from_env_file(args.env_file)
+
+    if args.qdrant:
+        blocks = qdrant_blocks(client, collection, args.block_rows)
+    else:
+        if args.keys:
+            with open(args.keys) as f:
+                keys = [line.strip() for line in f if line.strip()]
+        elif args.db:
+            conn = connect(args.db)
+            try:
+                keys = [row[0] for row in iter_mappings(conn, ["ObjectKey"], order_by="rowid")]
+            finally:
+                conn.close()
+        else:
+            parser.error("--embeddings needs --db or --keys to name its rows")
+        try:
+            rows = npy_blocks(args.embeddings, keys, args.block_rows)
+        except ValueError as e:
+            parser.error(str(e))
+        blocks = ((block_keys, block_keys, block) for block_keys, block in rows)
+
+    writers = [(SqliteTagWriter(args.output, args.top_k), 1)]
+    if args.write_qdrant:
+        if not args.qdrant:
+            parser.error("--write-qdrant needs --qdrant so tags can be matched to point ids")
+        writers.append((QdrantTagWriter(client, collection), 0))
+    try:
+        stats = tag_blocks(blocks, labels, label_matrix, writers, args.top_k)
+    finally:
+        for writer, _ in writers:
+            writer.close()
+
+    print(f"✅ Tagged {stats['images']:,} images in {stats['blocks']} blocks "
+          f"(scoring {stats['score_seconds']:.1f}s, writing {stats['write_seconds']:.1f}s)")
+    print("📊 Most common top tags: " + ", ".join(f"{tag} ({count})" for tag, count in stats["top_tags"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Minimal Azure Queue Storage REST client, and an in-memory Azurite stand-in for tests.
+
+Queue workers need batch receive, visibility-timeout updates and deletes against
+`image-metadata-queue`. This client speaks the Queue service REST API directly with
+Shared Key authorization, so workers run without the azure-storage-queue package.
+It talks to Azurite (the `UseDevelopmentStorage=true` account the Functions and test
+utilities use) as well as to a real storage account. FakeAzureQueue serves the same
+operations from memory, with the service's visibility and pop-receipt rules. It also
+checks each request's signature.
+"""
+
+import base64
+import hashlib
+import hmac
+import http.client
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, quote, unquote, urlparse
+from xml.sax.saxutils import escape
+
+API_VERSION = "2021-08-06"
+AZURITE_ACCOUNT = "devstoreaccount1"
+AZURITE_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+AZURITE_QUEUE_ENDPOINT = f"http://127.0.0.1:10001/{AZURITE_ACCOUNT}"
+MAX_MESSAGES_PER_RECEIVE = 32
+
+
+class QueueError(Exception):
+    """A non-2xx response from the queue service."""
+
+    def __init__(self, status: int, code: str, message: str = ""):
+        super().__init__(f"Queue {status} {code}: {message}")
+        self.status = status
+        self.code = code
+
+
+def parse_connection_string(connection_string: str) -> Dict[str, str]:
+    """{endpoint, account, key} of a storage connection string, including UseDevelopmentStorage=true."""
+    parts = dict(part.split("=", 1) for part in connection_string.split(";") if "=" in part)
+    if parts.get("UseDevelopmentStorage", "").lower() == "true":
+        return {"endpoint": AZURITE_QUEUE_ENDPOINT, "account": AZURITE_ACCOUNT, "key": AZURITE_KEY}
+    account = parts["AccountName"]
+    protocol, suffix = parts.get("DefaultEndpointsProtocol", "https"), parts.get("EndpointSuffix", "core.windows.net")
+    endpoint = parts.get("QueueEndpoint") or f"{protocol}://{account}.queue.{suffix}"
+    return {"endpoint": endpoint.rstrip("/"), "account": account, "key": parts["AccountKey"]}
+
+
+def sign_shared_key(method: str, path: str, query: Dict[str, str], headers: Dict[str, str], account: str,
+                    key: str) -> str:
+    """The Authorization header value for a Queue service request (headers must include x-ms-date)."""
+    lowered = {name.lower(): str(value).strip() for name, value in headers.items()}
+    content_length = lowered.get("content-length", "")
+    canonical_headers = "".join(f"{name}:{lowered[name]}\n" for name in sorted(lowered) if name.startswith("x-ms-"))
+    canonical_resource = f"/{account}{path}" + "".join(
+        f"\n{name.lower()}:{value}" for name, value in sorted(query.items(), key=lambda item: item[0].lower()))
+    string_to_sign = "\n".join([
+        method, lowered.get("content-encoding", ""), lowered.get("content-language", ""),
+        "" if content_length == "0" else content_length, lowered.get("content-md5", ""),
+        lowered.get("content-type", ""), "", "", "", "", "", "",
+    ]) + "\n" + canonical_headers + canonical_resource
+    signature = hmac.new(base64.b64decode(key), string_to_sign.encode(), hashlib.sha256).digest()
+    return f"SharedKey {account}:{base64.b64encode(signature).decode()}"
+
+
+def _message(element: ET.Element) -> Dict:
+    return {
+        "id": element.findtext("MessageId"),
+        "pop_receipt": element.findtext("PopReceipt"),
+        "text": element.findtext("MessageText") or "",
+        "dequeue_count": int(element.findtext("DequeueCount") or 0),
+        "time_next_visible": element.findtext("TimeNextVisible"),
+    }
+
+
+class QueueRestClient:
+    """Thread-safe client for one queue; each thread keeps its own keep-alive connection."""
+
+    def __init__(self, endpoint: str, account: str, key: str, queue: str, timeout: float = 60.0):
+        parsed = urlparse(endpoint if "://" in endpoint else f"http://{endpoint}")
+        self.host = parsed.netloc
+        self.secure = parsed.scheme == "https"
+        self.base_path = parsed.path.rstrip("/")  # "/devstoreaccount1" on Azurite, "" on Azure
+        self.account = account
+        self.key = key
+        self.queue = queue
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_connection_string(cls, connection_string: str, queue: str, **kwargs) -> "QueueRestClient":
+        settings = parse_connection_string(connection_string)
+        return cls(settings["endpoint"], settings["account"], settings["key"], queue, **kwargs)
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, timeout=self.timeout)
+        return conn
+
+    def request(self, method: str, resource: str = "", query: Optional[Dict[str, str]] = None,
+                body: bytes = b"") -> Tuple[int, Dict[str, str], bytes]:
+        query = query or {}
+        path = f"{self.base_path}/{self.queue}{resource}"
+        headers = {"x-ms-date": formatdate(usegmt=True), "x-ms-version": API_VERSION,
+                   "Content-Length": str(len(body))}
+        if body:
+            headers["Content-Type"] = "application/xml"
+        headers["Authorization"] = sign_shared_key(method, path, query, headers, self.account, self.key)
+        url = quote(path) + ("?" + "&".join(f"{quote(k)}={quote(v, safe='')}" for k, v in query.items())
+                             if query else "")
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # A pooled keep-alive connection the server has closed; retry once on a fresh one.
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        if response.status >= 300:
+            code, message = response_headers.get("x-ms-error-code", str(response.status)), ""
+            if data:
+                try:
+                    root = ET.fromstring(data)
+                    code, message = root.findtext("Code", code), root.findtext("Message", "")
+                except ET.ParseError:
+                    message = data[:200].decode(errors="replace")
+            raise QueueError(response.status, code, message)
+        return response.status, response_headers, data
+
+    def create_queue(self) -> None:
+        """Create the queue; succeeds when it already exists."""
+        self.request("PUT")
+
+    def approximate_count(self) -> int:
+        _, headers, _ = self.request("GET", query={"comp": "metadata"})
+        return int(headers.get("x-ms-approximate-messages-count", 0))
+
+    def send_message(self, text: str, visibility_timeout: int = 0, ttl: Optional[int] = None) -> Dict:
+        query = {"visibilitytimeout": str(visibility_timeout)}
+        if ttl is not None:
+            query["messagettl"] = str(ttl)
+        body = f"<QueueMessage><MessageText>{escape(text)}</MessageText></QueueMessage>".encode()
+        _, _, data = self.request("POST", "/messages", query, body)
+        return _message(ET.fromstring(data).find("QueueMessage"))
+
+    def receive_messages(self, count: int = MAX_MESSAGES_PER_RECEIVE, visibility_timeout: int = 30) -> List[Dict]:
+        """Dequeue up to 32 messages, hidden from other receivers for visibility_timeout seconds."""
+        _, _, data = self.request("GET", "/messages", {"numofmessages": str(min(count, MAX_MESSAGES_PER_RECEIVE)),
+                                                       "visibilitytimeout": str(visibility_timeout)})
+        return [_message(element) for element in ET.fromstring(data).findall("QueueMessage")]
+
+    def update_message(self, message_id: str, pop_receipt: str, visibility_timeout: int,
+                       text: Optional[str] = None) -> str:
+        """Reset a dequeued message's visibility timeout; returns its new pop receipt."""
+        body = f"<QueueMessage><MessageText>{escape(text)}</MessageText></QueueMessage>".encode() \
+            if text is not None else b""
+        _, headers, _ = self.request("PUT", f"/messages/{message_id}",
+                                     {"popreceipt": pop_receipt, "visibilitytimeout": str(visibility_timeout)}, body)
+        return headers["x-ms-popreceipt"]
+
+    def delete_message(self, message_id: str, pop_receipt: str) -> None:
+        self.request("DELETE", f"/messages/{message_id}", {"popreceipt": pop_receipt})
+
+    def clear(self) -> None:
+        self.request("DELETE", "/messages")
+
+
+class FakeAzureQueue:
+    """In-memory Azurite queue service for tests; messages live in `queues[name]`.
+
+    `advance(seconds)` moves the service clock forward, so visibility timeouts can
+    expire without sleeping.
+    """
+
+    def __init__(self, account: str = AZURITE_ACCOUNT, key: str = AZURITE_KEY):
+        self.account = account
+        self.key = key
+        self.queues: Dict[str, List[Dict]] = {}
+        self.requests: List[Tuple[str, str, Dict[str, str]]] = []
+        self.offset = 0.0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def now(self) -> float:
+        return time.time() + self.offset
+
+    def advance(self, seconds: float) -> None:
+        self.offset += seconds
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeAzureQueue":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self):
+                parsed = urlparse(self.path)
+                query = dict(parse_qsl(parsed.query, keep_blank_values=True))
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+                status, headers, payload = fake.handle(self.command, unquote(parsed.path), query,
+                                                       dict(self.headers.items()), body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_PUT = do_POST = do_DELETE = _dispatch
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{self.account}"
+
+    @property
+    def connection_string(self) -> str:
+        return f"DefaultEndpointsProtocol=http;AccountName={self.account};AccountKey={self.key};QueueEndpoint={self.url}"
+
+    def client(self, queue: str, **kwargs) -> QueueRestClient:
+        return QueueRestClient(self.url, self.account, self.key, queue, **kwargs)
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @staticmethod
+    def _error(status: int, code: str) -> Tuple[int, Dict[str, str], bytes]:
+        return status, {"Content-Type": "application/xml", "x-ms-error-code": code}, \
+            f"<Error><Code>{code}</Code><Message>{code}</Message></Error>".encode()
+
+    def _authorized(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str]) -> bool:
+        lowered = {name.lower(): value for name, value in headers.items()}
+        signed = {name: value for name, value in lowered.items()
+                  if name.startswith("x-ms-") or name in ("content-length", "content-type")}
+        expected = sign_shared_key(method, path, query, signed, self.account, self.key)
+        return hmac.compare_digest(expected, lowered.get("authorization", ""))
+
+    def _xml(self, messages: List[Dict], with_text: bool = True) -> bytes:
+        items = []
+        for message in messages:
+            fields = [("MessageId", message["id"]), ("InsertionTime", formatdate(message["inserted"], usegmt=True)),
+                      ("ExpirationTime", formatdate(message["expires"], usegmt=True)),
+                      ("PopReceipt", message["pop_receipt"]),
+                      ("TimeNextVisible", formatdate(message["visible_at"], usegmt=True)),
+                      ("DequeueCount", str(message["dequeue_count"]))]
+            if with_text:
+                fields.append(("MessageText", escape(message["text"])))
+            items.append("<QueueMessage>" + "".join(f"<{tag}>{value}</{tag}>" for tag, value in fields)
+                         + "</QueueMessage>")
+        return f"<?xml version=\"1.0\" encoding=\"utf-8\"?><QueueMessagesList>{''.join(items)}</QueueMessagesList>" \
+            .encode()
+
+    def handle(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+               body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        with self._lock:
+            self.requests.append((method, path, query))
+        if not self._authorized(method, path, query, headers):
+            return self._error(403, "AuthenticationFailed")
+
+        parts = path.strip("/").split("/")
+        if parts[0] != self.account or len(parts) < 2:
+            return self._error(400, "InvalidUri")
+        name, resource = parts[1], parts[2:]
+        now = self.now()
+        with self._lock:
+            if not resource:
+                if method == "PUT":
+                    self.queues.setdefault(name, [])
+                    return 201, {}, b""
+                if name not in self.queues:
+                    return self._error(404, "QueueNotFound")
+                if method == "DELETE":
+                    del self.queues[name]
+                    return 204, {}, b""
+                return 200, {"x-ms-approximate-messages-count": str(len(self.queues[name]))}, b""
+
+            queue = self.queues.get(name)
+            if queue is None:
+                return self._error(404, "QueueNotFound")
+            queue[:] = [message for message in queue if message["expires"] > now]
+            if len(resource) == 1 and method == "POST":
+                text = ET.fromstring(body).findtext("MessageText") or ""
+                ttl = int(query.get("messagettl", 7 * 24 * 3600))
+                message = {"id": str(uuid.uuid4()), "text": text, "pop_receipt": uuid.uuid4().hex[:16],
+                           "inserted": now, "expires": now + ttl if ttl >= 0 else float("inf"),
+                           "visible_at": now + int(query.get("visibilitytimeout", 0)), "dequeue_count": 0}
+                queue.append(message)
+                return 201, {"Content-Type": "application/xml"}, self._xml([message], with_text=False)
+            if len(resource) == 1 and method == "GET":
+                count = int(query.get("numofmessages", 1))
+                if not 1 <= count <= MAX_MESSAGES_PER_RECEIVE:
+                    return self._error(400, "OutOfRangeQueryParameterValue")
+                taken = [message for message in queue if message["visible_at"] <= now][:count]
+                for message in taken:
+                    message["visible_at"] = now + int(query.get("visibilitytimeout", 30))
+                    message["pop_receipt"] = uuid.uuid4().hex[:16]
+                    message["dequeue_count"] += 1
+                return 200, {"Content-Type": "application/xml"}, self._xml(taken)
+            if len(resource) == 1 and method == "DELETE":
+                queue.clear()
+                return 204, {}, b""
+
+            message = next((m for m in queue if m["id"] == resource[1]), None)
+            if message is None:
+                return self._error(404, "MessageNotFound")
+            if message["pop_receipt"] != query.get("popreceipt"):
+                return self._error(400, "PopReceiptMismatch")
+            if method == "DELETE":
+                queue.remove(message)
+                return 204, {}, b""
+            if method == "PUT":
+                if body:
+                    message["text"] = ET.fromstring(body).findtext("MessageText") or ""
+                message["visible_at"] = now + int(query["visibilitytimeout"])
+                message["pop_receipt"] = uuid.uuid4().hex[:16]
+                return 204, {"x-ms-popreceipt": message["pop_receipt"],
+                             "x-ms-time-next-visible": formatdate(message["visible_at"], usegmt=True)}, b""
+        return self._error(405, "UnsupportedHttpVerb")
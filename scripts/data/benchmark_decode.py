@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Benchmark decode time and peak memory of large images, per format, for the model-input path.
+
+Synthetic large files are written once per format: JPEG, PNG, uncompressed 8- and
+16-bit strip TIFF, LZW TIFF, and a pyramidal TIFF with reduced-resolution pages.
+Each file is then decoded to a 224x224 model input in a fresh process. "full" is a
+plain full-resolution decode (Image.open(...).convert("RGB")), and "fast" is
+clip_preprocessing.open_image. The child reports wall time and peak RSS, so each
+measurement starts from the same clean process.
+
+Usage:
+    python3 scripts/data/benchmark_decode.py --output /tmp/decode-bench --megapixels 48
+    python3 scripts/data/benchmark_decode.py --output /tmp/decode-bench --formats tiff-raw16 tiff-pyramid --json
+"""
+
+import argparse
+import json
+import os
+import resource
+import struct
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, List, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from clip_preprocessing import INPUT_SIZE, open_image, resize_for_model  # noqa: E402
+
+FORMATS = ("jpeg", "png", "tiff-raw8", "tiff-raw16", "tiff-lzw", "tiff-pyramid")
+EXTENSIONS = {"jpeg": ".jpg", "png": ".png"}
+ROWS_PER_STRIP = 64
+
+
+def synthetic_rows(width: int, height: int, seed: int = 0, band: int = 256) -> Iterator[np.ndarray]:
+    """Yield uint16 RGB bands of a smooth gradient with grain, so codecs see photo-like content."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    for start in range(0, height, band):
+        y = np.linspace(start / height, min(start + band, height) / height, min(band, height - start),
+                        dtype=np.float32)[:, None]
+        rows = np.stack([x[None, :] * 0.7 + y * 0.3, np.abs(np.sin(6 * x[None, :] + 4 * y)), 1 - y * x[None, :]],
+                        axis=-1)
+        rows = rows * 60000 + rng.normal(0, 1500, rows.shape).astype(np.float32)
+        yield np.clip(rows, 0, 65535).astype(np.uint16)
+
+
+def write_strip_tiff(path: str, width: int, height: int, bits: int = 8, seed: int = 0,
+                     reduced_pages: Sequence[int] = (), big_endian: bool = False) -> None:
+    """Write an uncompressed RGB strip TIFF row band by row band, optionally with reduced-resolution pages.
+
+    Pillow can only save such files from a full in-memory image; this writer never holds more
+    than one band, so files of any size can be generated.
+    """
+    endian = ">" if big_endian else "<"
+    dtype = np.dtype(f"{endian}u2") if bits == 16 else np.dtype(np.uint8)
+    pages = [(width, height, 1)] + [(width // factor, height // factor, factor) for factor in reduced_pages]
+
+    with open(path, "wb") as f:
+        f.write((b"MM" if big_endian else b"II") + struct.pack(f"{endian}HI", 42, 0))
+        directories = []
+        for page_width, page_height, factor in pages:
+            strip_offsets, strip_counts = [], []
+            row_bytes = page_width * 3 * bits // 8
+            pending = bytearray()
+            for band in synthetic_rows(width, page_height * factor, seed, band=ROWS_PER_STRIP * factor):
+                if factor > 1:
+                    rows = band.shape[0] // factor * factor
+                    band = band[:rows, :page_width * factor].reshape(
+                        rows // factor, factor, page_width, factor, 3).mean(axis=(1, 3))
+                pixels = (band.astype(np.uint16) >> 8).astype(dtype) if bits == 8 else band.astype(dtype)
+                pending += pixels.tobytes()
+                while len(pending) >= ROWS_PER_STRIP * row_bytes:
+                    strip_offsets.append(f.tell())
+                    strip_counts.append(ROWS_PER_STRIP * row_bytes)
+                    f.write(pending[:ROWS_PER_STRIP * row_bytes])
+                    del pending[:ROWS_PER_STRIP * row_bytes]
+            if pending:
+                strip_offsets.append(f.tell())
+                strip_counts.append(len(pending))
+                f.write(pending)
+            directories.append((page_width, page_height, factor > 1, strip_offsets, strip_counts))
+
+        previous_link = 4
+        for page_width, page_height, reduced, strip_offsets, strip_counts in directories:
+            if f.tell() % 2:
+                f.write(b"\0")
+            bits_offset = f.tell()
+            f.write(struct.pack(f"{endian}3H", bits, bits, bits))
+            offsets_at = f.tell()
+            f.write(struct.pack(f"{endian}{len(strip_offsets)}I", *strip_offsets))
+            counts_at = f.tell()
+            f.write(struct.pack(f"{endian}{len(strip_counts)}I", *strip_counts))
+            entries = [
+                (254, 4, 1, int(reduced)), (256, 4, 1, page_width), (257, 4, 1, page_height),
+                (258, 3, 3, bits_offset), (259, 3, 1, 1), (262, 3, 1, 2),
+                (273, 4, len(strip_offsets), strip_offsets[0] if len(strip_offsets) == 1 else offsets_at),
+                (277, 3, 1, 3), (278, 4, 1, ROWS_PER_STRIP),
+                (279, 4, len(strip_counts), strip_counts[0] if len(strip_counts) == 1 else counts_at),
+                (284, 3, 1, 1),
+            ]
+            if f.tell() % 2:
+                f.write(b"\0")
+            ifd_offset = f.tell()
+            f.write(struct.pack(f"{endian}H", len(entries)))
+            for tag, field_type, count, value in entries:
+                packed = struct.pack(f"{endian}H", value) + b"\0\0" if field_type == 3 and count == 1 \
+                    else struct.pack(f"{endian}I", value)
+                f.write(struct.pack(f"{endian}HHI", tag, field_type, count) + packed)
+            link_at = f.tell()
+            f.write(struct.pack(f"{endian}I", 0))
+            f.seek(previous_link)
+            f.write(struct.pack(f"{endian}I", ifd_offset))
+            f.seek(0, os.SEEK_END)
+            previous_link = link_at
+
+
+def write_synthetic(path: str, fmt: str, width: int, height: int, seed: int = 0) -> None:
+    """Write one synthetic image of the given benchmark format."""
+    if fmt == "tiff-raw8":
+        return write_strip_tiff(path, width, height, 8, seed)
+    if fmt == "tiff-raw16":
+        return write_strip_tiff(path, width, height, 16, seed)
+    if fmt == "tiff-pyramid":
+        return write_strip_tiff(path, width, height, 8, seed, reduced_pages=(4, 16))
+
+    from PIL import Image
+
+    pixels = np.concatenate([(band >> 8).astype(np.uint8) for band in synthetic_rows(width, height, seed)])
+    img = Image.fromarray(pixels, "RGB")
+    if fmt == "jpeg":
+        img.save(path, "JPEG", quality=92)
+    elif fmt == "png":
+        img.save(path, "PNG", compress_level=1)
+    elif fmt == "tiff-lzw":
+        img.save(path, "TIFF", compression="tiff_lzw")
+    else:
+        raise ValueError(f"Unknown format '{fmt}'")
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS of this process. VmHWM restarts at exec; ru_maxrss can carry the parent's peak over on Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def decode(path: str, mode: str, input_size: int = INPUT_SIZE) -> Dict:
+    """Decode one file to model-input pixels in this process; report time and peak RSS."""
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = None
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    if mode == "fast":
+        img = open_image(path, (input_size, input_size))
+    else:
+        with Image.open(path) as original:
+            img = original.convert("RGB")
+    decoded_size = img.size
+    pixels = resize_for_model(img, input_size)
+    return {"mode": mode, "seconds": round(time.perf_counter() - started, 3), "decoded_size": list(decoded_size),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "baseline_rss_mb": round(rss_before, 1), "checksum": int(pixels.astype(np.int64).sum())}
+
+
+def decode_in_subprocess(path: str, mode: str) -> Dict:
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--decode", path, "--mode", mode],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmark(output_dir: str, formats: Sequence[str] = FORMATS, megapixels: float = 48.0,
+                  aspect: float = 1.5) -> List[Dict]:
+    """Write (or reuse) one synthetic file per format and decode it both ways in fresh processes."""
+    os.makedirs(output_dir, exist_ok=True)
+    height = int((megapixels * 1e6 / aspect) ** 0.5)
+    width = int(height * aspect)
+    results = []
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{fmt}-{width}x{height}{EXTENSIONS.get(fmt, '.tif')}")
+        if not os.path.exists(path):
+            write_synthetic(path, fmt, width, height)
+        row = {"format": fmt, "file_mb": round(os.path.getsize(path) / 1e6, 1), "size": [width, height]}
+        for mode in ("full", "fast"):
+            row[mode] = decode_in_subprocess(path, mode)
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decode time and peak RSS of large images per format")
+    parser.add_argument("--output", default="/tmp/photoflow-decode-bench", help="Directory for synthetic files")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--megapixels", type=float, default=48.0, help="Image size (default: 48 MP, 8485x5657)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--decode", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["full", "fast"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.decode:
+        print(json.dumps(decode(args.decode, args.mode)))
+        return
+
+    results = run_benchmark(args.output, args.formats, args.megapixels)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'format':<14}{'file MB':>9}{'full s':>9}{'fast s':>9}{'full MB':>10}{'fast MB':>10}  decoded at")
+    for row in results:
+        full, fast = row["full"], row["fast"]
+        print(f"{row['format']:<14}{row['file_mb']:>9}{full['seconds']:>9}{fast['seconds']:>9}"
+              f"{full['peak_rss_mb']:>10}{fast['peak_rss_mb']:>10}  {fast['decoded_size'][0]}x{fast['decoded_size'][1]}")
+    print(f"(peak RSS includes ~{results[0]['fast']['baseline_rss_mb']} MB of interpreter and imports)")
+
+
+if __name__ == "__main__":
+    main()
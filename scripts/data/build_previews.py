@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Precompute preview pyramids and CLIP model inputs for every image in the archive.
+
+Each original is decoded exactly once, at the smallest resolution that is still large
+enough for the biggest preview (JPEG draft mode, TIFF reduced-resolution pages or
+band-wise strip reduction; see clip_preprocessing.open_image), and the remaining
+sizes are produced by downscaling the previous level.
+For every original the job writes, under the Derived category of its project:
+
+    {date}/{project}/Derived/w{size}/{category}/{directory}/{name}.jpg   (one per --sizes entry)
+    {date}/{project}/Derived/clip{input}/{category}/{directory}/{name}.npy
+
+The .npy holds the resized uint8 HWC pixels; clip_preprocessing.to_model_input
+turns one or a stack of them into the normalised float32 tensor the vision model takes.
+Previews honour EXIF orientation; the model input does not, matching the backend.
+
+Usage:
+    python3 scripts/data/build_previews.py --source /data/photostore --sizes 1024 512 256
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from clip_preprocessing import INPUT_SIZE, open_image, required_draft_size, resize_for_model  # noqa: E402
+from photoflow_storage import get_derived_key, is_image_file, open_object_store, parse_object_key  # noqa: E402
+
+DEFAULT_SIZES = (1024, 512, 256)
+JPEG_QUALITY = 85
+
+_store = None
+
+
+def _init_worker(store) -> None:
+    global _store
+    _store = store
+
+
+def derivative_keys(object_key: str, sizes: Sequence[int], input_size: int = INPUT_SIZE) -> Dict[str, str]:
+    """Return {variant: derived key} for every preview size plus the model input."""
+    keys = {f"w{size}": get_derived_key(object_key, f"w{size}", ".jpg") for size in sizes}
+    keys[f"clip{input_size}"] = get_derived_key(object_key, f"clip{input_size}", ".npy")
+    return keys
+
+
+def build_derivatives(source: Union[bytes, str], sizes: Sequence[int],
+                      input_size: int = INPUT_SIZE) -> Dict[str, bytes]:
+    """Decode one image (bytes or a file path) once and return encoded previews and the model input."""
+    from PIL import Image, ImageOps
+
+    sizes = sorted(sizes, reverse=True)
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as probe:
+        original_size = probe.size
+    img = open_image(source, required_draft_size(original_size, sizes[0], input_size))
+
+    outputs = {}
+    buffer = io.BytesIO()
+    np.save(buffer, resize_for_model(img, input_size))
+    outputs[f"clip{input_size}"] = buffer.getvalue()
+
+    preview = ImageOps.exif_transpose(img)
+    for size in sizes:
+        # Each level is reduced from the previous one rather than from the full decode.
+        preview.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+        buffer = io.BytesIO()
+        preview.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        outputs[f"w{size}"] = buffer.getvalue()
+    return outputs
+
+
+def process_one(task: Tuple[str, List[int], int]) -> Dict:
+    """Worker entry point: build and store all derivatives of one original."""
+    key, sizes, input_size = task
+    result = {"key": key, "error": None, "bytes_in": 0, "bytes_out": 0}
+    try:
+        # Local originals are decoded from the file, so large TIFFs are never read into memory whole.
+        source = _store.local_path(key) or _store.get_object(key)
+        result["bytes_in"] = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+        keys = derivative_keys(key, sizes, input_size)
+        for variant, payload in build_derivatives(source, sizes, input_size).items():
+            content_type = "image/jpeg" if variant.startswith("w") else "application/octet-stream"
+            _store.put_object(keys[variant], payload, content_type)
+            result["bytes_out"] += len(payload)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def build_previews(store, prefix: str = "", sizes: Sequence[int] = DEFAULT_SIZES, input_size: int = INPUT_SIZE,
+                   workers: Optional[int] = None, force: bool = False) -> Dict:
+    """Build derivatives for every original under prefix that does not have a complete set yet."""
+    start_time = time.time()
+    sizes = sorted(set(sizes), reverse=True)
+    originals = []
+    existing = set()
+    # One listing serves both purposes: originals to process and derivatives already present.
+    for obj in store.list_objects(prefix):
+        if parse_object_key(obj["key"]) is not None:
+            if is_image_file(obj["key"]):
+                originals.append(obj["key"])
+        else:
+            existing.add(obj["key"])
+
+    tasks = [
+        (key, sizes, input_size) for key in originals
+        if force or not all(k in existing for k in derivative_keys(key, sizes, input_size).values())
+    ]
+    print(f"📋 {len(tasks)} of {len(originals)} images need derivatives")
+
+    stats = {"originals": len(originals), "processed": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0}
+    if tasks:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, min(64, len(tasks) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store,)) as pool:
+            for result in pool.map(process_one, tasks, chunksize=chunksize):
+                stats["processed"] += 1
+                stats["bytes_in"] += result["bytes_in"]
+                stats["bytes_out"] += result["bytes_out"]
+                if result["error"]:
+                    stats["failed"] += 1
+                    print(f"⚠️  {result['key']}: {result['error']}")
+
+    stats["elapsed"] = round(time.time() - start_time, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute preview pyramids and CLIP model inputs")
+    parser.add_argument("--source", required=True, help="Local mirror directory of the bucket, or 'minio'")
+    parser.add_argument("--bucket", default="photostore", help="Bucket name when --source is minio")
+    parser.add_argument("--prefix", default="", help="Only process object keys with this prefix")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Preview long-edge sizes in pixels (default: 1024 512 256)")
+    parser.add_argument("--input-size", type=int, default=INPUT_SIZE, help="Model input size (default: 224)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rebuild derivatives that already exist")
+    args = parser.parse_args()
+
+    store = open_object_store(args.source, args.bucket)
+    stats = build_previews(store, args.prefix, args.sizes, args.input_size, args.workers, args.force)
+
+    print(f"✅ Built derivatives for {stats['processed'] - stats['failed']} images in {stats['elapsed']:.1f}s")
+    if stats["bytes_in"]:
+        print(f"📊 Read {stats['bytes_in'] / 1e6:.1f} MB of originals, wrote {stats['bytes_out'] / 1e6:.1f} MB "
+              f"({stats['bytes_out'] / stats['bytes_in']:.1%})")
+    if stats["failed"]:
+        print(f"⚠️  {stats['failed']} images failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+CLIP image preprocessing shared by the Python tooling.
+
+Mirrors OnnxImageEmbeddingModel.GenerateImageEmbedding: the image is resized
+(without preserving aspect ratio) to INPUT_SIZE x INPUT_SIZE, scaled to [0, 1],
+normalised with the ImageNet mean/std and laid out as float32 NCHW.
+
+open_image never decodes more pixels than the caller needs where the format allows
+it. Scanned film TIFFs of 100+ MB would otherwise be decoded at full resolution just
+to produce a 224x224 input:
+
+- JPEG: libjpeg draft mode decodes at 1/2, 1/4 or 1/8 scale.
+- TIFF with reduced-resolution subfiles (pyramids, or the preview page some scanners
+  embed): the smallest page that is still large enough is decoded.
+- Uncompressed strip TIFF (8 or 16 bits per sample): rows are read from the file one
+  band at a time and box-averaged by an integer factor, so memory is bounded by the
+  band, not the image.
+- Anything else: decoded in full, then box-reduced by an integer factor.
+
+Only the first image of multi-page files is used, as in the backend.
+"""
+
+import io
+import math
+from typing import BinaryIO, Optional, Tuple, Union
+
+import numpy as np
+
+INPUT_SIZE = 224
+IMAGE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+# (x / 255 - mean) / std folded into x * scale + bias, per channel, broadcast over CHW.
+_CHANNEL_SCALE = (1.0 / (255.0 * IMAGE_STD)).astype(np.float32)[:, None, None]
+_CHANNEL_BIAS = (-IMAGE_MEAN / IMAGE_STD).astype(np.float32)[:, None, None]
+
+
+# Rows box-averaged per read in the strip path; bounds its memory to roughly this many bytes.
+BAND_BYTES = 16 * 1024 * 1024
+TIFF_REDUCED_IMAGE = 1  # NewSubfileType bit for a reduced-resolution version of another page
+
+
+def reduction_factor(size: Tuple[int, int], min_size: Tuple[int, int]) -> int:
+    """Largest integer factor that keeps both dimensions >= min_size."""
+    return max(1, min(size[0] // max(min_size[0], 1), size[1] // max(min_size[1], 1)))
+
+
+def _select_tiff_page(img, min_size: Tuple[int, int]) -> None:
+    """Seek to the smallest reduced-resolution subfile of page 0 that still covers min_size."""
+    base_size = img.size
+    best = (base_size[0] * base_size[1], 0)
+    for page in range(1, getattr(img, "n_frames", 1)):
+        img.seek(page)
+        width, height = img.size
+        reduced = img.tag_v2.get(254, 0) & TIFF_REDUCED_IMAGE
+        same_aspect = abs(width / height - base_size[0] / base_size[1]) < 0.02
+        if reduced and same_aspect and width >= min_size[0] and height >= min_size[1] and width * height < best[0]:
+            best = (width * height, page)
+    img.seek(best[1])
+
+
+# (SamplesPerPixel, BitsPerSample) -> Pillow mode; the rawmode also depends on byte order.
+_STRIP_MODES = {(1, 8): "L", (1, 16): "L", (2, 8): "LA", (3, 8): "RGB", (3, 16): "RGB", (4, 8): "RGBA",
+                (4, 16): "RGBA"}
+
+
+def _strip_layout(img) -> Optional[dict]:
+    """Describe an uncompressed, contiguous strip TIFF page, or None if the fast path cannot read it."""
+    tags = img.tag_v2
+    bits = tags.get(258, (8,))
+    bits = bits if isinstance(bits, tuple) else (bits,)
+    samples = tags.get(277, 1)
+    photometric = tags.get(262)
+    mode = _STRIP_MODES.get((samples, bits[0]))
+    if (tags.get(259, 1) != 1 or tags.get(322) is not None or tags.get(284, 1) != 1 or len(set(bits)) != 1
+            or mode is None or photometric not in (0, 1, 2) or (photometric == 0 and (samples, bits[0]) != (1, 8))
+            or not tags.get(273)):
+        return None
+    width, height = img.size
+    return {"width": width, "height": height, "mode": mode, "bits": bits[0], "invert": photometric == 0,
+            "rows_per_strip": min(tags.get(278, height), height), "offsets": tags.get(273),
+            "row_bytes": width * samples * bits[0] // 8}
+
+
+def _read_rows(fp: BinaryIO, layout: dict, first: int, last: int) -> bytearray:
+    """Raw bytes of rows [first, last), gathered from the strips that hold them."""
+    rows_per_strip, row_bytes = layout["rows_per_strip"], layout["row_bytes"]
+    out = bytearray((last - first) * row_bytes)
+    row = first
+    while row < last:
+        strip, within = divmod(row, rows_per_strip)
+        take = min(last - row, rows_per_strip - within)
+        fp.seek(layout["offsets"][strip] + within * row_bytes)
+        start = (row - first) * row_bytes
+        fp.readinto(memoryview(out)[start:start + take * row_bytes])
+        row += take
+    return out
+
+
+def _reduce_strips(fp: BinaryIO, layout: dict, factor: int, big_endian: bool):
+    """Box-reduce an uncompressed strip TIFF by `factor`, reading one band of rows at a time."""
+    from PIL import Image
+
+    mode, width = layout["mode"], layout["width"]
+    rawmode = "L;I" if layout["invert"] else mode
+    if layout["bits"] == 16:
+        rawmode = f"{mode};16{'B' if big_endian else ('' if mode == 'L' else 'L')}"
+    out_height = layout["height"] // factor
+    band_rows = factor * max(1, BAND_BYTES // max(layout["row_bytes"] * factor, 1))
+    result = Image.new(mode, (width // factor, out_height))
+
+    for first in range(0, out_height * factor, band_rows):
+        last = min(first + band_rows, out_height * factor)
+        band = Image.frombuffer(mode, (width, last - first), _read_rows(fp, layout, first, last),
+                                "raw", rawmode, 0, 1)
+        result.paste(band.reduce(factor, (0, 0, width // factor * factor, last - first)), (0, first // factor))
+    return result.convert("RGB")
+
+
+def _copy_orientation(source, target):
+    orientation = source.getexif().get(0x0112)
+    if orientation and orientation != 1:
+        target.getexif()[0x0112] = orientation
+        target.info["exif"] = target.getexif().tobytes()
+    return target
+
+
+def open_image(source: Union[bytes, str, BinaryIO], min_size: Tuple[int, int] = (INPUT_SIZE, INPUT_SIZE)):
+    """Open an image as RGB at the smallest resolution that is still >= min_size in both dimensions.
+
+    `source` is the encoded bytes, a file path or a seekable binary file. Paths and files are
+    read as streams, which the strip TIFF path relies on to keep memory bounded.
+    """
+    from PIL import Image
+
+    fp = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    img = Image.open(fp)
+    if img.format == "JPEG":
+        img.draft("RGB", min_size)
+        return img.convert("RGB")
+
+    if img.format == "TIFF":
+        _select_tiff_page(img, min_size)
+        layout = _strip_layout(img)
+        factor = reduction_factor(img.size, min_size)
+        if layout is not None and factor > 1:
+            stream = img.fp
+            stream.seek(0)
+            big_endian = stream.read(2) == b"MM"
+            return _copy_orientation(img, _reduce_strips(stream, layout, factor, big_endian))
+
+    factor = reduction_factor(img.size, min_size)
+    rgb = img.convert("RGB")
+    return _copy_orientation(img, rgb.reduce(factor)) if factor > 1 else rgb
+
+
+def required_draft_size(size: Tuple[int, int], long_edge: int, input_size: int = INPUT_SIZE) -> Tuple[int, int]:
+    """Smallest decode size that still yields a `long_edge` preview and an input_size model input."""
+    width, height = size
+    scale = min(1.0, long_edge / max(width, height))
+    return (max(math.ceil(width * scale), input_size), max(math.ceil(height * scale), input_size))
+
+
+def resize_for_model(img, input_size: int = INPUT_SIZE) -> np.ndarray:
+    """Resize a PIL image to the model input size and return uint8 HWC pixels."""
+    from PIL import Image
+
+    return np.asarray(img.resize((input_size, input_size), Image.BICUBIC), dtype=np.uint8)
+
+
+def normalize_into(pixels: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Normalise uint8 NHWC pixels into a preallocated float32 NCHW `out`, without temporaries.
+
+    The HWC->CHW transpose is a view read by the multiply, so each output element is written
+    once by the multiply and once by the add; nothing else is allocated.
+    """
+    np.multiply(pixels.transpose(0, 3, 1, 2), _CHANNEL_SCALE, out=out, dtype=np.float32)
+    np.add(out, _CHANNEL_BIAS, out=out)
+    return out
+
+
+def to_model_input(pixels: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Turn uint8 HWC (or NHWC) pixels into a normalised float32 NCHW tensor (into `out` if given)."""
+    batch = pixels[np.newaxis] if pixels.ndim == 3 else pixels
+    if out is None:
+        out = np.empty((batch.shape[0], 3) + batch.shape[1:3], dtype=np.float32)
+    return normalize_into(batch, out)
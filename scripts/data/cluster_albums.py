@@ -0,0 +1,657 @@
+#!/usr/bin/env python3
+"""
+Albums and events from stored embeddings, with incremental assignment of new uploads.
+
+The dashboard groups photos only by their upload folder. This job groups them by content
+and time, in two levels:
+
+- Albums: spherical mini-batch k-means over the unit-normalised CLIP embeddings.
+  Centres start from k-means++ on a sample. Each step draws a batch of rows and moves
+  every centre towards its batch members with a per-centre learning rate of 1 / (points
+  seen), so centres settle as they fill. One blocked pass then assigns every image.
+  Neither step holds more than a block of vectors in memory, so a memory-mapped .npy of
+  any size works.
+- Events: within an album, photos whose capture times (DateTimeOriginal, else
+  DateTimeDigitized from extract_metadata.py's CameraGeneratedMetadata table, else the
+  date the object key starts with) are less than --event-gap-hours apart form one event.
+
+`assign` handles new uploads without re-clustering. Each new image joins its nearest
+album centre, and that centre moves by the same 1 / count rule. An image less similar to
+every centre than the least similar 0.01% of fitted images opens a new album. New photos
+extend, bridge or start events; bridged events are merged. Keys already assigned are skipped.
+
+Results are written in bulk to {model}/clusters.db:
+
+    ImageClusters (ObjectKey, PointId, AlbumId, EventId, Similarity, CapturedAt)
+    ClusterEvents (EventId, AlbumId, StartTime, EndTime, Images)
+
+With --write-qdrant, they also become album_id / event_id payloads. There is one
+set_payload operation per (album, event) group of points, and 64 operations per request.
+
+Usage:
+    python3 scripts/data/cluster_albums.py fit --embeddings embeddings.npy --db photoflow.db \
+        --metadata metadata.db --model albums/ --albums 512
+    python3 scripts/data/cluster_albums.py fit --qdrant --model albums/ --write-qdrant
+    python3 scripts/data/cluster_albums.py assign --model albums/ --embeddings new.npy --keys new_keys.txt \
+        --db photoflow.db
+    python3 scripts/data/cluster_albums.py show --model albums/
+    python3 scripts/data/cluster_albums.py benchmark --images 1000000 --dimension 512 --albums 256
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+import numpy as np  # noqa: E402
+
+from knn_graph import normalize  # noqa: E402
+from qdrant_rest import QdrantRestClient, client_from_env_file, point_id_for_key  # noqa: E402
+
+MODEL_VERSION = 1
+DEFAULT_ALBUMS = 256
+BATCH_ROWS = 4096
+BLOCK_ROWS = 8192
+DEFAULT_ITERATIONS = 300
+DEFAULT_EVENT_GAP_HOURS = 6.0
+SPAWN_PERCENTILE = 0.01
+WRITE_ROWS = 10000
+PAYLOAD_POINTS_PER_OPERATION = 1000
+OPERATIONS_PER_REQUEST = 64
+_KEY_DATE = re.compile(r"^(\d{4}-\d{2}-\d{2})/")
+
+CLUSTERS_DDL = [
+    '''CREATE TABLE IF NOT EXISTS "ImageClusters" (
+    "ObjectKey" TEXT NOT NULL PRIMARY KEY,
+    "PointId" TEXT NOT NULL,
+    "AlbumId" INTEGER NOT NULL,
+    "EventId" INTEGER NULL,
+    "Similarity" REAL NOT NULL,
+    "CapturedAt" TEXT NULL
+)''',
+    'CREATE INDEX IF NOT EXISTS "IX_ImageClusters_AlbumId" ON "ImageClusters" ("AlbumId")',
+    'CREATE INDEX IF NOT EXISTS "IX_ImageClusters_EventId" ON "ImageClusters" ("EventId")',
+    '''CREATE TABLE IF NOT EXISTS "ClusterEvents" (
+    "EventId" INTEGER NOT NULL PRIMARY KEY,
+    "AlbumId" INTEGER NOT NULL,
+    "StartTime" TEXT NOT NULL,
+    "EndTime" TEXT NOT NULL,
+    "Images" INTEGER NOT NULL
+)''',
+    'CREATE INDEX IF NOT EXISTS "IX_ClusterEvents_AlbumId" ON "ClusterEvents" ("AlbumId", "StartTime")',
+]
+
+
+# --- albums: spherical mini-batch k-means -------------------------------------------------------
+
+def kmeans_plus_plus(sample: np.ndarray, albums: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding on unit vectors (squared distance = 2 - 2 cos)."""
+    centroids = np.empty((albums, sample.shape[1]), dtype=np.float32)
+    centroids[0] = sample[rng.integers(len(sample))]
+    distances = np.maximum(2.0 - 2.0 * (sample @ centroids[0]), 0.0)
+    for i in range(1, albums):
+        total = distances.sum()
+        index = rng.choice(len(sample), p=distances / total) if total > 0 else rng.integers(len(sample))
+        centroids[i] = sample[index]
+        np.minimum(distances, np.maximum(2.0 - 2.0 * (sample @ centroids[i]), 0.0), out=distances)
+    return centroids
+
+
+def nearest(block: np.ndarray, centroids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Index and cosine similarity of each row's nearest centre."""
+    similarities = block @ centroids.T
+    labels = similarities.argmax(axis=1)
+    return labels, similarities[np.arange(len(block)), labels]
+
+
+def update_centroids(centroids: np.ndarray, counts: np.ndarray, block: np.ndarray, labels: np.ndarray) -> float:
+    """Move each centre towards its members with learning rate 1 / count; returns the mean shift."""
+    order = np.argsort(labels, kind="stable")
+    members, starts, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+    sums = np.add.reduceat(block[order], starts, axis=0)
+    counts[members] += sizes
+    before = centroids[members]
+    moved = before + (sums - sizes[:, None] * before) / counts[members][:, None]
+    centroids[members] = normalize(moved)
+    return float(np.linalg.norm(centroids[members] - before, axis=1).mean())
+
+
+def fit_albums(vectors: np.ndarray, albums: int = DEFAULT_ALBUMS, batch_rows: int = BATCH_ROWS,
+               iterations: int = DEFAULT_ITERATIONS, tolerance: float = 1e-4, seed: int = 0) -> Dict:
+    """Mini-batch k-means over (possibly memory-mapped) vectors; returns centroids and run stats."""
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    albums = min(albums, count)
+    started = time.perf_counter()
+    sample_rows = np.sort(rng.choice(count, min(count, max(albums * 20, 10000)), replace=False))
+    centroids = kmeans_plus_plus(normalize(vectors[sample_rows]), albums, rng)
+    counts = np.zeros(albums, dtype=np.int64)
+    seeded = time.perf_counter()
+
+    shifts: List[float] = []
+    for step in range(iterations):
+        rows = np.sort(rng.choice(count, min(count, batch_rows), replace=False))
+        block = normalize(vectors[rows])
+        shifts.append(update_centroids(centroids, counts, block, nearest(block, centroids)[0]))
+        # Stop once the centres have stopped moving (averaged over 10 steps to smooth batch noise).
+        if step >= 20 and np.mean(shifts[-10:]) < tolerance:
+            break
+    return {"centroids": centroids, "steps": len(shifts), "seed_seconds": round(seeded - started, 2),
+            "fit_seconds": round(time.perf_counter() - seeded, 2), "final_shift": shifts[-1] if shifts else 0.0}
+
+
+def assign_all(vectors: np.ndarray, centroids: np.ndarray,
+               block_rows: int = BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """Nearest album and similarity of every row, one block of rows at a time."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    similarities = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        stop = min(start + block_rows, len(vectors))
+        labels[start:stop], similarities[start:stop] = nearest(normalize(vectors[start:stop]), centroids)
+    return labels, similarities
+
+
+# --- events: capture-time gaps within an album --------------------------------------------------
+
+def segment_events(albums: np.ndarray, times: np.ndarray, gap: float, existing: Optional[Dict] = None,
+                   next_id: int = 0) -> Dict:
+    """Group photos of one album into events split by capture-time gaps larger than `gap` seconds.
+
+    `existing` holds known events as arrays (ids, albums, starts, ends, counts). Each one joins
+    the run of photos it overlaps. A run that spans several known events keeps the smallest
+    id, and the other ids are reported in `merged`. Photos without a time get event -1.
+    Times are epoch seconds (NaN = unknown).
+    """
+    existing = existing or {"ids": np.zeros(0, np.int64), "albums": np.zeros(0, np.int64),
+                            "starts": np.zeros(0), "ends": np.zeros(0), "counts": np.zeros(0, np.int64)}
+    known = ~np.isnan(times)
+    points = np.nonzero(known)[0]
+    item_album = np.concatenate([existing["albums"], albums[points]]).astype(np.int64)
+    item_start = np.concatenate([existing["starts"], times[points]]).astype(np.float64)
+    item_end = np.concatenate([existing["ends"], times[points]]).astype(np.float64)
+    item_owner = np.concatenate([existing["ids"], np.full(len(points), -1)]).astype(np.int64)
+    item_count = np.concatenate([existing["counts"], np.ones(len(points))]).astype(np.int64)
+    event_of_point = np.full(len(times), -1, dtype=np.int64)
+    empty = {"ids": np.zeros(0, np.int64), "albums": np.zeros(0, np.int64), "starts": np.zeros(0),
+             "ends": np.zeros(0), "counts": np.zeros(0, np.int64)}
+    if not len(item_album):
+        return {"event_of_point": event_of_point, "events": empty, "merged": {}, "next_id": next_id}
+
+    order = np.lexsort((item_start, item_album))
+    # Offsetting each album by more than the whole time span keeps runs from crossing albums.
+    origin = item_start.min()
+    span = item_end.max() - origin + 2 * gap + 1
+    starts = item_start[order] - origin + item_album[order] * span
+    reach = np.maximum.accumulate(item_end[order] - origin + item_album[order] * span)
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = starts[1:] > reach[:-1] + gap
+    run_starts = np.nonzero(new_run)[0]
+    run_of_item = np.cumsum(new_run) - 1
+
+    owners = item_owner[order]
+    unowned = np.iinfo(np.int64).max
+    run_id = np.minimum.reduceat(np.where(owners >= 0, owners, unowned), run_starts)
+    fresh = run_id == unowned
+    run_id[fresh] = next_id + np.arange(fresh.sum())
+    absorbed = (owners >= 0) & (owners != run_id[run_of_item])
+    merged = dict(zip(owners[absorbed].tolist(), run_id[run_of_item[absorbed]].tolist()))
+
+    is_point = owners < 0
+    event_of_point[points[order[is_point] - len(existing["ids"])]] = run_id[run_of_item[is_point]]
+    events = {"ids": run_id, "albums": item_album[order][run_starts],
+              "starts": np.minimum.reduceat(item_start[order], run_starts),
+              "ends": np.maximum.reduceat(item_end[order], run_starts),
+              "counts": np.add.reduceat(item_count[order], run_starts)}
+    return {"event_of_point": event_of_point, "events": events, "merged": merged,
+            "next_id": next_id + int(fresh.sum())}
+
+
+def _parse_times(texts: Sequence[Optional[str]]) -> np.ndarray:
+    values = np.array([text if text else "NaT" for text in texts], dtype="datetime64[s]")
+    seconds = values.astype(np.int64).astype(np.float64)
+    seconds[np.isnat(values)] = np.nan
+    return seconds
+
+
+def _format_time(seconds: float) -> Optional[str]:
+    return None if np.isnan(seconds) else str(np.datetime64(int(seconds), "s"))
+
+
+def capture_times(keys: Sequence[str], metadata_db: Optional[str] = None, chunk: int = 900) -> np.ndarray:
+    """Capture time per key (epoch seconds, NaN if unknown): EXIF original/digitized, else the key's date."""
+    texts: List[Optional[str]] = [None] * len(keys)
+    if metadata_db:
+        conn = sqlite3.connect(metadata_db)
+        try:
+            for start in range(0, len(keys), chunk):
+                batch = keys[start:start + chunk]
+                found = dict(conn.execute(
+                    "SELECT ObjectKey, COALESCE(DateTimeOriginal, DateTimeDigitized) FROM CameraGeneratedMetadata "
+                    f"WHERE ObjectKey IN ({', '.join('?' for _ in batch)})", list(batch)))
+                for offset, key in enumerate(batch):
+                    texts[start + offset] = found.get(key)
+        finally:
+            conn.close()
+    for i, key in enumerate(keys):
+        if not texts[i]:
+            match = _KEY_DATE.match(key)
+            texts[i] = match.group(1) if match else None
+    return _parse_times(texts)
+
+
+# --- model directory ------------------------------------------------------------------------------
+
+def _manifest_path(model_dir: str) -> str:
+    return os.path.join(model_dir, "manifest.json")
+
+
+def open_clusters_db(model_dir: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(model_dir, "clusters.db"))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with conn:
+        for statement in CLUSTERS_DDL:
+            conn.execute(statement)
+    return conn
+
+
+def load_model(model_dir: str) -> Dict:
+    with open(_manifest_path(model_dir)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MODEL_VERSION:
+        raise SystemExit(f"{model_dir} was written by model version {manifest.get('version')}, not {MODEL_VERSION}")
+    manifest["centroids"] = np.load(os.path.join(model_dir, "centroids.npy"))
+    manifest["counts"] = np.load(os.path.join(model_dir, "counts.npy"))
+    return manifest
+
+
+def save_model(model_dir: str, model: Dict) -> None:
+    os.makedirs(model_dir, exist_ok=True)
+    np.save(os.path.join(model_dir, "centroids.npy"), model["centroids"])
+    np.save(os.path.join(model_dir, "counts.npy"), model["counts"])
+    manifest = {k: v for k, v in model.items() if k not in ("centroids", "counts")}
+    tmp = _manifest_path(model_dir) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, _manifest_path(model_dir))
+
+
+def write_assignments(conn: sqlite3.Connection, ids: Sequence, keys: Sequence[str], albums: np.ndarray,
+                      events: np.ndarray, similarities: np.ndarray, times: np.ndarray) -> None:
+    """Bulk upsert ImageClusters rows, WRITE_ROWS per transaction."""
+    sql = 'INSERT OR REPLACE INTO "ImageClusters" VALUES (?, ?, ?, ?, ?, ?)'
+    for start in range(0, len(keys), WRITE_ROWS):
+        stop = min(start + WRITE_ROWS, len(keys))
+        rows = [(keys[i], str(ids[i]), int(albums[i]), int(events[i]) if events[i] >= 0 else None,
+                 round(float(similarities[i]), 4), _format_time(times[i])) for i in range(start, stop)]
+        with conn:
+            conn.executemany(sql, rows)
+
+
+def write_events(conn: sqlite3.Connection, events: Dict, merged: Dict[int, int]) -> None:
+    rows = [(int(event_id), int(album), _format_time(start), _format_time(end), int(count)) for
+            event_id, album, start, end, count in zip(events["ids"], events["albums"], events["starts"],
+                                                      events["ends"], events["counts"])]
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO "ClusterEvents" VALUES (?, ?, ?, ?, ?)', rows)
+        for old, new in merged.items():
+            conn.execute('UPDATE "ImageClusters" SET "EventId" = ? WHERE "EventId" = ?', (new, old))
+            conn.execute('DELETE FROM "ClusterEvents" WHERE "EventId" = ?', (old,))
+
+
+def load_events(conn: sqlite3.Connection, albums: Sequence[int]) -> Dict:
+    """Known events of the given albums, as segment_events expects them."""
+    rows = []
+    albums = [int(a) for a in albums]
+    for start in range(0, len(albums), 900):
+        batch = albums[start:start + 900]
+        rows += conn.execute('SELECT "EventId", "AlbumId", "StartTime", "EndTime", "Images" FROM "ClusterEvents" '
+                             f'WHERE "AlbumId" IN ({", ".join("?" for _ in batch)})', batch).fetchall()
+    return {"ids": np.array([r[0] for r in rows], dtype=np.int64), "albums": np.array([r[1] for r in rows], np.int64),
+            "starts": _parse_times([r[2] for r in rows]), "ends": _parse_times([r[3] for r in rows]),
+            "counts": np.array([r[4] for r in rows], dtype=np.int64)}
+
+
+def write_qdrant(client: QdrantRestClient, collection: str, conn: sqlite3.Connection, where: str = "",
+                 params: Sequence = ()) -> int:
+    """Set album_id / event_id payloads with one operation per (album, event) group; returns points written."""
+    cursor = conn.execute(f'SELECT "PointId", "AlbumId", "EventId" FROM "ImageClusters" {where} '
+                          'ORDER BY "AlbumId", "EventId"', list(params))
+    operations, written = [], 0
+    group, ids = None, []
+
+    def flush():
+        nonlocal operations
+        if ids:
+            operations.append({"set_payload": {"points": list(ids), "payload": {
+                "album_id": group[0], "event_id": group[1]}}})
+            ids.clear()
+        if len(operations) >= OPERATIONS_PER_REQUEST:
+            client.batch_update(collection, operations)
+            operations = []
+
+    for point_id, album, event in cursor:
+        if (album, event) != group or len(ids) >= PAYLOAD_POINTS_PER_OPERATION:
+            flush()
+            group = (album, event)
+        # PointId is stored as text; Qdrant ids are unsigned integers or UUID strings.
+        ids.append(int(point_id) if point_id.isdigit() else point_id)
+        written += 1
+    flush()
+    if operations:
+        client.batch_update(collection, operations)
+    return written
+
+
+# --- fit / assign -----------------------------------------------------------------------------------
+
+def fit(model_dir: str, ids: Sequence, keys: Sequence[str], vectors: np.ndarray, times: np.ndarray,
+        albums: int = DEFAULT_ALBUMS, event_gap_hours: float = DEFAULT_EVENT_GAP_HOURS,
+        batch_rows: int = BATCH_ROWS, iterations: int = DEFAULT_ITERATIONS, seed: int = 0) -> Dict:
+    """Cluster every image from scratch and replace the model directory's contents."""
+    started = time.perf_counter()
+    result = fit_albums(vectors, albums, batch_rows, iterations, seed=seed)
+    centroids = result["centroids"]
+    assigned = time.perf_counter()
+    labels, similarities = assign_all(vectors, centroids)
+    counts = np.bincount(labels, minlength=len(centroids)).astype(np.int64)
+    assign_seconds = time.perf_counter() - assigned
+
+    events_started = time.perf_counter()
+    segmented = segment_events(labels, times, event_gap_hours * 3600)
+    events_seconds = time.perf_counter() - events_started
+
+    write_started = time.perf_counter()
+    os.makedirs(model_dir, exist_ok=True)
+    conn = open_clusters_db(model_dir)
+    with conn:
+        conn.execute('DELETE FROM "ImageClusters"')
+        conn.execute('DELETE FROM "ClusterEvents"')
+    write_assignments(conn, ids, keys, labels, segmented["event_of_point"], similarities, times)
+    write_events(conn, segmented["events"], {})
+    conn.close()
+    model = {"version": MODEL_VERSION, "dimension": int(vectors.shape[1]), "albums": len(centroids),
+             "images": len(keys), "event_gap_hours": event_gap_hours, "next_event_id": segmented["next_id"],
+             "spawn_similarity": float(np.percentile(similarities, SPAWN_PERCENTILE)) if len(keys) else 0.0,
+             "fitted_at": time.time(), "centroids": centroids, "counts": counts}
+    save_model(model_dir, model)
+    return {"images": len(keys), "albums": len(centroids), "events": len(segmented["events"]["ids"]),
+            "steps": result["steps"], "seed_seconds": result["seed_seconds"], "fit_seconds": result["fit_seconds"],
+            "assign_seconds": round(assign_seconds, 2), "events_seconds": round(events_seconds, 2),
+            "write_seconds": round(time.perf_counter() - write_started, 2),
+            "seconds": round(time.perf_counter() - started, 2)}
+
+
+def assign(model_dir: str, ids: Sequence, keys: Sequence[str], vectors: np.ndarray, times: np.ndarray,
+           update: bool = True) -> Dict:
+    """Add new images to the existing albums and events; returns stats and the keys written."""
+    started = time.perf_counter()
+    model = load_model(model_dir)
+    conn = open_clusters_db(model_dir)
+    known = set()
+    for start in range(0, len(keys), 900):
+        batch = list(keys[start:start + 900])
+        known.update(row[0] for row in conn.execute(
+            f'SELECT "ObjectKey" FROM "ImageClusters" WHERE "ObjectKey" IN ({", ".join("?" for _ in batch)})', batch))
+    fresh = np.array([i for i, key in enumerate(keys) if key not in known], dtype=np.int64)
+    stats = {"added": len(fresh), "skipped": len(keys) - len(fresh), "new_albums": 0, "merged_events": 0}
+    if not len(fresh):
+        conn.close()
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+    centroids, counts = model["centroids"], model["counts"]
+    block = normalize(vectors[fresh])
+    labels, similarities = nearest(block, centroids)
+    # Images unlike every album open new ones; each later outlier may join an album opened before it.
+    for row in np.nonzero(similarities < model["spawn_similarity"])[0]:
+        if len(centroids) > model["albums"]:
+            extra = centroids[model["albums"]:] @ block[row]
+            best = int(extra.argmax())
+            if extra[best] >= model["spawn_similarity"] and extra[best] > similarities[row]:
+                labels[row], similarities[row] = model["albums"] + best, extra[best]
+                continue
+        centroids = np.vstack([centroids, block[row][None, :]])
+        counts = np.append(counts, 0)
+        labels[row], similarities[row] = len(centroids) - 1, 1.0
+    stats["new_albums"] = len(centroids) - model["albums"]
+    if update:
+        update_centroids(centroids, counts, block, labels)
+    else:
+        counts += np.bincount(labels, minlength=len(counts))
+
+    fresh_times = times[fresh]
+    touched = np.unique(labels[~np.isnan(fresh_times)])
+    segmented = segment_events(labels, fresh_times, model["event_gap_hours"] * 3600, load_events(conn, touched),
+                               model["next_event_id"])
+    fresh_keys = [keys[i] for i in fresh]
+    write_assignments(conn, [ids[i] for i in fresh], fresh_keys, labels, segmented["event_of_point"], similarities,
+                      fresh_times)
+    write_events(conn, segmented["events"], segmented["merged"])
+    conn.close()
+    stats["merged_events"] = len(segmented["merged"])
+    model.update(centroids=centroids, counts=counts, albums=len(centroids), images=model["images"] + len(fresh),
+                 next_event_id=segmented["next_id"])
+    save_model(model_dir, model)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["keys"] = fresh_keys
+    stats["merged"] = segmented["merged"]
+    return stats
+
+
+def load_source(args) -> Tuple[List, List[str], np.ndarray]:
+    """Point ids, keys and vectors from --embeddings with --db/--keys, or from the Qdrant collection."""
+    from auto_tag import qdrant_blocks
+    from photoflow_db import connect, iter_mappings
+
+    if args.qdrant:
+        client, collection = client_from_env_file(args.env_file)
+        ids, keys, blocks = [], [], []
+        for block_ids, block_keys, block in qdrant_blocks(client, collection):
+            ids.extend(block_ids)
+            keys.extend(block_keys)
+            blocks.append(block)
+        return ids, keys, np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+    vectors = np.load(args.embeddings, mmap_mode="r")
+    if args.keys:
+        if not args.db:
+            raise SystemExit("--keys needs --db to resolve the ImageMappings ids the points are stored under")
+        with open(args.keys) as f:
+            keys = [line.strip() for line in f if line.strip()]
+        # The same rule as embed_worker.py: the ImageMappings Id, else the key-derived id
+        guids = {}
+        conn = connect(args.db)
+        try:
+            for start in range(0, len(keys), 900):
+                batch = keys[start:start + 900]
+                guids.update((key, guid.lower()) for key, guid in conn.execute(
+                    f'SELECT "ObjectKey", "Id" FROM "ImageMappings" WHERE "ObjectKey" IN ({",".join("?" * len(batch))})',
+                    batch))
+        finally:
+            conn.close()
+        ids = [guids.get(key) or point_id_for_key(key) for key in keys]
+    elif args.db:
+        rows = list(iter_mappings(connect(args.db), ["Id", "ObjectKey"], order_by="rowid"))
+        ids, keys = [row[0] for row in rows], [row[1] for row in rows]
+    else:
+        raise SystemExit("--embeddings needs --db or --keys to name its rows")
+    if len(keys) != len(vectors):
+        raise SystemExit(f"{len(keys)} keys but {len(vectors)} embedding rows")
+    return ids, keys, vectors
+
+
+def iter_albums(model_dir: str, limit: int = 20) -> Iterator[Tuple]:
+    """(album, images, events, first capture, last capture) of the largest albums."""
+    conn = open_clusters_db(model_dir)
+    try:
+        yield from conn.execute(
+            'SELECT c."AlbumId", COUNT(*), COUNT(DISTINCT c."EventId"), MIN(c."CapturedAt"), MAX(c."CapturedAt") '
+            'FROM "ImageClusters" c GROUP BY c."AlbumId" ORDER BY COUNT(*) DESC LIMIT ?', (limit,))
+    finally:
+        conn.close()
+
+
+# --- benchmark ------------------------------------------------------------------------------------
+
+def normalized_mutual_information(truth: np.ndarray, predicted: np.ndarray) -> float:
+    _, truth = np.unique(truth, return_inverse=True)
+    _, predicted = np.unique(predicted, return_inverse=True)
+    table = np.zeros((truth.max() + 1, predicted.max() + 1), dtype=np.float64)
+    np.add.at(table, (truth, predicted), 1)
+    joint = table / table.sum()
+    rows, cols = joint.sum(axis=1), joint.sum(axis=0)
+    nonzero = joint > 0
+    mutual = (joint[nonzero] * np.log(joint[nonzero] / np.outer(rows, cols)[nonzero])).sum()
+    entropy = -(rows[rows > 0] * np.log(rows[rows > 0])).sum() - (cols[cols > 0] * np.log(cols[cols > 0])).sum()
+    return float(2 * mutual / entropy) if entropy > 0 else 1.0
+
+
+def _synthetic_times(truth: np.ndarray, sessions: int = 4, seed: int = 0) -> np.ndarray:
+    """Each true cluster is shot in a few sessions of up to 2 hours, spread over two years."""
+    rng = np.random.default_rng(seed)
+    session_starts = 1.6e9 + rng.uniform(0, 2 * 365 * 86400, (truth.max() + 1, sessions))
+    return session_starts[truth, rng.integers(0, sessions, len(truth))] + rng.uniform(0, 7200, len(truth))
+
+
+def run_benchmark(images: int, dimension: int, albums: int, output_dir: str, new_images: int = 10000,
+                  clusters: Optional[int] = None) -> Dict:
+    """Fit over clustered synthetic vectors, then assign held-out new uploads incrementally."""
+    from generate_dataset import write_embeddings
+
+    os.makedirs(output_dir, exist_ok=True)
+    vectors_path = os.path.join(output_dir, "embeddings.npy")
+    labels_path = os.path.join(output_dir, "clusters.npy")
+    total = images + new_images
+    generated = time.perf_counter()
+    write_embeddings(vectors_path, total, dimension, "clustered", clusters or albums, labels_path=labels_path)
+    generate_seconds = time.perf_counter() - generated
+    vectors = np.load(vectors_path, mmap_mode="r")
+    truth = np.load(labels_path)
+    times = _synthetic_times(truth)
+    keys = [f"bench/{i}.jpg" for i in range(total)]
+    model_dir = os.path.join(output_dir, "model")
+    if os.path.exists(model_dir):
+        for name in os.listdir(model_dir):
+            os.remove(os.path.join(model_dir, name))
+
+    result = fit(model_dir, keys[:images], keys[:images], vectors[:images], times[:images], albums)
+    rss_after_fit = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    conn = open_clusters_db(model_dir)
+    predicted = np.array([row[0] for row in conn.execute('SELECT "AlbumId" FROM "ImageClusters" ORDER BY rowid')])
+    conn.close()
+    result.update({"dimension": dimension, "true_clusters": int(truth.max() + 1),
+                   "generate_seconds": round(generate_seconds, 2), "peak_rss_mb": round(rss_after_fit),
+                   "embeddings_mb": round(vectors[:images].nbytes / 1e6),
+                   "nmi": round(normalized_mutual_information(truth[:images], predicted), 4),
+                   "images_per_second": round(images / result["seconds"])})
+
+    batches, batch_size = [], max(1, new_images // 10)
+    for start in range(images, total, batch_size):
+        stop = min(start + batch_size, total)
+        added = assign(model_dir, keys[start:stop], keys[start:stop], vectors[start:stop], times[start:stop])
+        batches.append(added)
+    conn = open_clusters_db(model_dir)
+    new_labels = np.array([row[0] for row in conn.execute(
+        'SELECT "AlbumId" FROM "ImageClusters" WHERE rowid > ? ORDER BY rowid', (images,))])
+    conn.close()
+    assign_seconds = sum(b["seconds"] for b in batches)
+    result["incremental"] = {
+        "images": new_images, "batches": len(batches), "seconds": round(assign_seconds, 2),
+        "images_per_second": round(new_images / assign_seconds) if assign_seconds else None,
+        "new_albums": sum(b["new_albums"] for b in batches),
+        "merged_events": sum(b["merged_events"] for b in batches),
+        "nmi": round(normalized_mutual_information(truth[images:], new_labels), 4),
+        "speedup_vs_refit": round(result["seconds"] / (assign_seconds / len(batches)), 1) if batches else None,
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Albums and events from stored image embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def source_arguments(sub):
+        sub.add_argument("--model", required=True, help="Model directory (centroids, manifest, clusters.db)")
+        sub.add_argument("--embeddings", help="Embeddings .npy (rows aligned with --db or --keys)")
+        sub.add_argument("--db", help="photoflow.db whose ImageMappings rowid order matches --embeddings")
+        sub.add_argument("--keys", help="Text file of object keys, one per --embeddings row (ids resolved via --db)")
+        sub.add_argument("--qdrant", action="store_true", help="Read embeddings from the Qdrant collection")
+        sub.add_argument("--metadata", help="extract_metadata.py SQLite output with CameraGeneratedMetadata")
+        sub.add_argument("--write-qdrant", action="store_true", help="Write album_id / event_id payloads to Qdrant")
+        sub.add_argument("--env-file", default=".env", help="Qdrant settings (QDRANT_HOST/PORT/COLLECTION)")
+
+    fit_parser = subparsers.add_parser("fit", help="Cluster every image from scratch")
+    source_arguments(fit_parser)
+    fit_parser.add_argument("--albums", type=int, default=DEFAULT_ALBUMS, help=f"Albums (default: {DEFAULT_ALBUMS})")
+    fit_parser.add_argument("--event-gap-hours", type=float, default=DEFAULT_EVENT_GAP_HOURS,
+                            help=f"Capture-time gap that starts a new event (default: {DEFAULT_EVENT_GAP_HOURS})")
+    fit_parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="Rows per mini-batch step")
+    fit_parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Maximum mini-batch steps")
+    fit_parser.add_argument("--seed", type=int, default=0)
+
+    assign_parser = subparsers.add_parser("assign", help="Add new uploads to the existing albums and events")
+    source_arguments(assign_parser)
+    assign_parser.add_argument("--frozen", action="store_true", help="Do not move album centres")
+
+    show = subparsers.add_parser("show", help="Print the largest albums")
+    show.add_argument("--model", required=True, help="Model directory")
+    show.add_argument("--limit", type=int, default=20)
+
+    bench = subparsers.add_parser("benchmark", help="Fit and incremental assignment on synthetic vectors")
+    bench.add_argument("--images", type=int, default=1000000)
+    bench.add_argument("--dimension", type=int, default=512)
+    bench.add_argument("--albums", type=int, default=DEFAULT_ALBUMS)
+    bench.add_argument("--clusters", type=int, help="True clusters in the synthetic data (default: --albums)")
+    bench.add_argument("--new-images", type=int, default=10000, help="Held-out uploads assigned incrementally")
+    bench.add_argument("--output", default="/tmp/photoflow-cluster-bench", help="Directory for benchmark files")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(f"{'album':>6}{'images':>9}{'events':>8}  first capture        last capture")
+        for album, images, events, first, last in iter_albums(args.model, args.limit):
+            print(f"{album:>6}{images:>9}{events:>8}  {first or '-':<20} {last or '-'}")
+        return
+    if args.command == "benchmark":
+        result = run_benchmark(args.images, args.dimension, args.albums, args.output, args.new_images, args.clusters)
+        print(json.dumps(result, indent=2))
+        return
+
+    ids, keys, vectors = load_source(args)
+    times = capture_times(keys, args.metadata)
+    if args.command == "fit":
+        result = fit(args.model, ids, keys, vectors, times, args.albums, args.event_gap_hours, args.batch_rows,
+                     args.iterations, args.seed)
+        print(f"🗂️  {result['images']:,} images → {result['albums']} albums, {result['events']:,} events "
+              f"in {result['seconds']}s ({result['steps']} mini-batch steps)")
+        where, params = "", ()
+    else:
+        result = assign(args.model, ids, keys, vectors, times, update=not args.frozen)
+        print(f"➕ Assigned {result['added']:,} images ({result['skipped']:,} already assigned), "
+              f"{result['new_albums']} new albums, {result['merged_events']} events merged in {result['seconds']}s")
+        changed = result.get("keys", []) or []
+        merged_into = sorted(set(result.get("merged", {}).values()))
+        where = ('WHERE "ObjectKey" IN (SELECT value FROM json_each(?)) '
+                 'OR "EventId" IN (SELECT value FROM json_each(?))')
+        params = (json.dumps(changed), json.dumps(merged_into))
+        if not changed:
+            return
+
+    if args.write_qdrant:
+        client, collection = client_from_env_file(args.env_file)
+        conn = open_clusters_db(args.model)
+        written = write_qdrant(client, collection, conn, where, params)
+        conn.close()
+        print(f"📝 Wrote album_id / event_id payloads for {written:,} points to {collection}")
+
+
+if __name__ == "__main__":
+    main()
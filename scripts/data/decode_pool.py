@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Process-pool image decoding into shared memory, assembled into preallocated model batches.
+
+Decoding and resizing hold the GIL for most of their time, so a thread pool decodes
+one image at a time no matter how many threads it has. DecodePool runs
+clip_preprocessing.open_image and the resize in worker processes. Each worker writes
+the uint8 HWC result straight into a slot of a shared-memory ring. Only the encoded bytes
+(or a path) go to the worker, and only the slot index and an error string come back.
+The parent then builds the float32 NCHW batch from the ring with
+clip_preprocessing.normalize_into, a multiply-add over a transposed view. That step
+writes into a batch tensor allocated once, so the parent allocates nothing per image.
+
+    with DecodePool(workers=4, batch_size=32) as pool:
+        for tensor, errors in pool.imap_batches(paths_or_bytes):
+            session.run(None, {"input": tensor})     # valid until the next batch is requested
+
+The ring holds prefetch + 1 batches, so workers decode the next batch while the
+caller runs the current one. Rows of images that fail to decode are zero pixels, and
+`errors` maps their row to the message.
+
+Usage:
+    python3 scripts/data/decode_pool.py benchmark --images 256 --batch-size 32 --workers 4
+    python3 scripts/data/decode_pool.py benchmark --size 4000x3000 --json
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from clip_preprocessing import (IMAGE_MEAN, IMAGE_STD, INPUT_SIZE, normalize_into, open_image,  # noqa: E402
+                                resize_for_model, to_model_input)
+
+Source = Union[bytes, str]
+
+# Per worker process: the shared ring, attached once by the pool initializer.
+_ring: Optional[np.ndarray] = None
+_ring_memory: Optional[shared_memory.SharedMemory] = None
+
+
+def _attach(name: str, shape: Tuple[int, ...]) -> None:
+    global _ring, _ring_memory
+    _ring_memory = shared_memory.SharedMemory(name=name)
+    _ring = np.ndarray(shape, dtype=np.uint8, buffer=_ring_memory.buf)
+
+
+def _decode_into(task: Tuple[int, Source]) -> Tuple[int, Optional[str]]:
+    slot, source = task
+    try:
+        size = _ring.shape[1]
+        np.copyto(_ring[slot], resize_for_model(open_image(source, (size, size)), size))
+        return slot, None
+    except Exception as e:
+        _ring[slot] = 0
+        return slot, f"{type(e).__name__}: {e}"
+
+
+class DecodePool:
+    """Worker processes decoding into a shared uint8 ring; batches are normalised into reused tensors."""
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 32, input_size: int = INPUT_SIZE,
+                 prefetch: int = 1):
+        self.batch_size = batch_size
+        self.input_size = input_size
+        self.regions = prefetch + 1
+        shape = (self.regions * batch_size, input_size, input_size, 3)
+        self._memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        self.pixels = np.ndarray(shape, dtype=np.uint8, buffer=self._memory.buf)
+        self.tensors = [np.empty((batch_size, 3, input_size, input_size), dtype=np.float32)
+                        for _ in range(self.regions)]
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_attach,
+                                         initargs=(self._memory.name, shape))
+
+    def __enter__(self) -> "DecodePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is None:
+            return
+        self._pool.shutdown()
+        self._pool = None
+        del self.pixels
+        self._memory.close()
+        self._memory.unlink()
+
+    def _submit(self, sources: Sequence[Source], region: int):
+        base = region * self.batch_size
+        return self._pool.map(_decode_into, [(base + i, source) for i, source in enumerate(sources)],
+                              chunksize=max(1, len(sources) // (self.workers * 4)))
+
+    def _assemble(self, pending, count: int, region: int) -> Tuple[np.ndarray, Dict[int, str]]:
+        base = region * self.batch_size
+        errors = {slot - base: error for slot, error in pending if error is not None}
+        tensor = self.tensors[region][:count]
+        normalize_into(self.pixels[base:base + count], tensor)
+        return tensor, errors
+
+    def decode_batch(self, sources: Sequence[Source]) -> Tuple[np.ndarray, Dict[int, str]]:
+        """Decode up to batch_size images into a (n, 3, size, size) tensor; valid until the next call."""
+        if len(sources) > self.batch_size:
+            raise ValueError(f"{len(sources)} images do not fit a batch of {self.batch_size}")
+        return self._assemble(self._submit(sources, 0), len(sources), 0)
+
+    def imap_batches(self, sources: Iterable[Source]) -> Iterator[Tuple[np.ndarray, Dict[int, str]]]:
+        """Decode `sources` in order, batch_size at a time, keeping `prefetch` batches decoding ahead."""
+        iterator = iter(sources)
+        in_flight: List[Tuple[object, int, int]] = []
+        batch_index = 0
+
+        def submit_next() -> bool:
+            nonlocal batch_index
+            chunk = [source for _, source in zip(range(self.batch_size), iterator)]
+            if not chunk:
+                return False
+            region = batch_index % self.regions
+            in_flight.append((self._submit(chunk, region), len(chunk), region))
+            batch_index += 1
+            return True
+
+        for _ in range(self.regions):
+            if not submit_next():
+                break
+        while in_flight:
+            pending, count, region = in_flight.pop(0)
+            tensor, errors = self._assemble(pending, count, region)
+            # The region just read is free again (its tensor is separate), so refill it first.
+            submit_next()
+            yield tensor, errors
+
+
+def naive_model_input(source: Source, input_size: int = INPUT_SIZE) -> np.ndarray:
+    """Per-image, per-pixel preprocessing, as OnnxImageEmbeddingModel does; the benchmark baseline."""
+    pixels = resize_for_model(open_image(source, (input_size, input_size)), input_size)
+    tensor = np.zeros((1, 3, input_size, input_size), dtype=np.float32)
+    mean, std = IMAGE_MEAN.tolist(), IMAGE_STD.tolist()
+    for y in range(input_size):
+        row = pixels[y].tolist()
+        for x in range(input_size):
+            red, green, blue = row[x]
+            tensor[0, 0, y, x] = (red / 255.0 - mean[0]) / std[0]
+            tensor[0, 1, y, x] = (green / 255.0 - mean[1]) / std[1]
+            tensor[0, 2, y, x] = (blue / 255.0 - mean[2]) / std[2]
+    return tensor
+
+
+def synthetic_jpegs(count: int, size: Tuple[int, int] = (1600, 1200), seed: int = 0) -> List[bytes]:
+    """Distinct photo-like JPEGs (a gradient with grain) of the given size."""
+    from PIL import Image
+
+    width, height = size
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    images = []
+    for i in range(count):
+        phase = rng.uniform(0, 6)
+        rgb = np.stack([x / width, np.abs(np.sin(phase + 6 * x / width + 4 * y / height)), 1 - y / height], axis=-1)
+        rgb = np.clip(rgb * 230 + rng.normal(0, 8, rgb.shape), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(rgb).save(buffer, "JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def _measure(run, images: int) -> Dict:
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+    return {"images": images, "seconds": round(seconds, 3), "images_per_second": round(images / seconds, 1)}
+
+
+def _allocations(run, images: int) -> Dict:
+    """Allocation peak of the parent process while preprocessing, per image (tracemalloc)."""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_kb_per_image": round((peak - baseline) / 1024 / images, 1)}
+
+
+def run_benchmark(images: int = 256, batch_size: int = 32, workers: Optional[int] = None,
+                  size: Tuple[int, int] = (1600, 1200), naive_images: int = 8) -> Dict:
+    """Images/sec and parent allocations of the naive loop, per-image NumPy, and the pool."""
+    distinct = synthetic_jpegs(min(images, 16), size)
+    sources = [distinct[i % len(distinct)] for i in range(images)]
+
+    def naive(count):
+        def run():
+            for source in sources[:count]:
+                naive_model_input(source)
+        return run
+
+    def per_image(count):
+        def run():
+            for start in range(0, count, batch_size):
+                chunk = sources[start:min(start + batch_size, count)]
+                np.concatenate([to_model_input(resize_for_model(open_image(s), INPUT_SIZE)) for s in chunk])
+        return run
+
+    results = {"images": images, "batch_size": batch_size, "source_size": list(size),
+               "encoded_kb": round(sum(map(len, distinct)) / len(distinct) / 1024, 1)}
+    results["naive"] = _measure(naive(naive_images), naive_images)
+    results["naive"].update(_allocations(naive(2), 2))
+    results["per_image_numpy"] = _measure(per_image(images), images)
+    results["per_image_numpy"].update(_allocations(per_image(batch_size), batch_size))
+
+    with DecodePool(workers, batch_size) as pool:
+        results["workers"] = pool.workers
+
+        def pooled(count):
+            def run():
+                for _ in pool.imap_batches(sources[:count]):
+                    pass
+            return run
+
+        pooled(batch_size)()  # warm the workers up
+        results["pool"] = _measure(pooled(images), images)
+        results["pool"].update(_allocations(pooled(batch_size * 2), batch_size * 2))
+        tensor, _ = pool.decode_batch(sources[:4])
+        reference = np.concatenate([to_model_input(resize_for_model(open_image(s), INPUT_SIZE)) for s in sources[:4]])
+        results["max_abs_diff_vs_per_image"] = float(np.abs(tensor - reference).max())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory decode pool and its preprocessing benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("benchmark", help="Compare the naive loop, per-image NumPy and the pool")
+    bench.add_argument("--images", type=int, default=256)
+    bench.add_argument("--batch-size", type=int, default=32)
+    bench.add_argument("--workers", type=int, help="Decode processes (default: CPU count)")
+    bench.add_argument("--size", default="1600x1200", help="Synthetic JPEG size WIDTHxHEIGHT")
+    bench.add_argument("--naive-images", type=int, default=8, help="Images for the (slow) per-pixel baseline")
+    bench.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    results = run_benchmark(args.images, args.batch_size, args.workers, (width, height), args.naive_images)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"🖼️  {args.images} JPEGs of {width}x{height} (~{results['encoded_kb']} kB), batch {args.batch_size}, "
+          f"{results['workers']} decode workers")
+    print(f"{'path':<18}{'images/s':>10}{'alloc kB/img':>14}")
+    for name in ("naive", "per_image_numpy", "pool"):
+        row = results[name]
+        print(f"{name:<18}{row['images_per_second']:>10}{row['alloc_peak_kb_per_image']:>14}")
+    print(f"📏 max |pool - per-image| = {results['max_abs_diff_vs_per_image']:.2e}")
+
+
+if __name__ == "__main__":
+    main()
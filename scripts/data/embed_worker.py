@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Queue-driven embedding worker for image-embedding-queue.
+
+Uploads should not wait for embeddings. The API writes an ImageMetadata message per
+uploaded object (the enqueue in MinIOImageUploadService.ExtractAndUploadImagesAsync),
+and this worker does the rest asynchronously:
+
+    receive up to --batch-size messages (32 per request, the service maximum)
+      → fetch and decode their objects concurrently (--fetch-workers threads)
+      → embed the batch with one vision_model.onnx call
+      → upsert the points to Qdrant with the backend's ids and payload
+      → delete the messages
+
+The next batch is received and fetched while the current one is embedded. Messages
+stay invisible to other workers while they are in flight. A lease thread renews
+their visibility timeout before it runs out, so a slow batch is never handed to a
+second worker. A message whose images fail is made visible again after
+--retry-delay seconds. After --max-dequeue attempts it moves to
+`{queue}-poison`, as the Functions queue trigger does. Messages may be ImageMetadata
+JSON (raw or base64, as the Functions SDK encodes them), a JSON list of ImageMetadata
+objects or object keys, or a bare object key. A message that cannot be parsed is
+retried and poisoned like any other failure.
+
+The worker has its own queue. ProcessQueueMessage (AzurePhotoFlow.Functions) consumes
+image-metadata-queue, and two consumers of one queue would each delete messages the
+other needs, so the API must send every ImageMetadata message to both queues. `run`
+refuses to consume image-metadata-queue.
+
+Usage:
+    python3 scripts/data/embed_worker.py run --source minio --models-dir models
+    python3 scripts/data/embed_worker.py run --source minio --models-dir models --db photoflow.db --once
+    python3 scripts/data/embed_worker.py run --source minio --models-dir models --partition-by-year
+    python3 scripts/data/embed_worker.py enqueue --source minio --prefix 2025-05-13/WeddingSmith/
+    python3 scripts/data/embed_worker.py enqueue --keys drift/to_embed.txt
+
+The queue is read from AzureWebJobsStorage / AZURE_STORAGE_CONNECTION_STRING (default:
+UseDevelopmentStorage=true, i.e. Azurite on 127.0.0.1:10001), and Qdrant from --env-file.
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+import numpy as np  # noqa: E402
+
+from azure_queue_rest import MAX_MESSAGES_PER_RECEIVE, QueueError, QueueRestClient  # noqa: E402
+from clip_preprocessing import INPUT_SIZE, open_image, resize_for_model  # noqa: E402
+from photoflow_storage import BUCKET_NAME, is_image_file, open_object_store  # noqa: E402
+from qdrant_rest import (DEFAULT_COLLECTION, QdrantRestClient, client_from_env_file, image_payload,  # noqa: E402
+                         point_id_for_key)
+
+DEFAULT_QUEUE = "image-embedding-queue"
+FUNCTIONS_QUEUE = "image-metadata-queue"  # consumed by ProcessQueueMessage's QueueTrigger
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_VISIBILITY_TIMEOUT = 120
+MAX_DEQUEUE_COUNT = 5  # the Functions queue trigger's default maxDequeueCount
+POISON_SUFFIX = "-poison"
+
+
+def object_keys_from_message(text: str) -> List[str]:
+    """Object keys named by a queue message: ImageMetadata JSON (raw or base64), a list of them or of keys, or a key."""
+    body = text.strip()
+    if not body.startswith(("{", "[")):
+        try:
+            decoded = base64.b64decode(body, validate=True).decode().strip()
+            if decoded.startswith(("{", "[")):
+                body = decoded
+        except (binascii.Error, UnicodeDecodeError):
+            pass
+    if not body.startswith(("{", "[")):
+        return [body] if body else []
+
+    items = json.loads(body)
+    keys = []
+    for item in items if isinstance(items, list) else [items]:
+        if isinstance(item, str) and item.strip():
+            keys.append(item.strip())
+            continue
+        if not isinstance(item, dict):
+            raise ValueError(f"Message item is neither ImageMetadata nor an object key: {text[:200]}")
+        uri = item.get("blobUri") or item.get("BlobUri") or ""
+        if uri.startswith("s3://"):
+            keys.append(uri[len("s3://"):].partition("/")[2])  # s3://{bucket}/{key}
+        elif item.get("objectKey") or item.get("ObjectKey"):
+            keys.append(item.get("objectKey") or item.get("ObjectKey"))
+        else:
+            raise ValueError(f"Message names no object: {text[:200]}")
+    return keys
+
+
+def metadata_message(object_key: str, bucket: str = BUCKET_NAME, uploaded: Optional[float] = None) -> str:
+    """The ImageMetadata JSON the API enqueues for an uploaded object."""
+    upload_date = datetime.fromtimestamp(uploaded or time.time(), timezone.utc).isoformat()
+    return json.dumps({"id": point_id_for_key(object_key), "blobUri": f"s3://{bucket}/{object_key}",
+                       "uploadedBy": "Admin", "uploadDate": upload_date})
+
+
+class LeaseKeeper:
+    """Renews the visibility timeout of in-flight messages in a background thread."""
+
+    def __init__(self, queue: QueueRestClient, visibility_timeout: int, renew_fraction: float = 0.5):
+        self.queue = queue
+        self.visibility_timeout = visibility_timeout
+        self.renew_after = visibility_timeout * renew_fraction
+        self.leases: Dict[str, Dict] = {}
+        self.renewals = 0
+        self.lost = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def hold(self, messages: Sequence[Dict]) -> None:
+        renew_at = time.monotonic() + self.renew_after
+        with self._lock:
+            for message in messages:
+                self.leases[message["id"]] = {"pop_receipt": message["pop_receipt"], "renew_at": renew_at}
+
+    def _run(self) -> None:
+        while not self._stop.wait(min(1.0, self.renew_after / 4)):
+            with self._lock:
+                now = time.monotonic()
+                for message_id, lease in list(self.leases.items()):
+                    if lease["renew_at"] > now:
+                        continue
+                    try:
+                        lease["pop_receipt"] = self.queue.update_message(message_id, lease["pop_receipt"],
+                                                                         self.visibility_timeout)
+                        lease["renew_at"] = now + self.renew_after
+                        self.renewals += 1
+                    except QueueError:
+                        # The timeout ran out before renewal and another receiver may own the message now.
+                        del self.leases[message_id]
+                        self.lost += 1
+
+    def delete(self, message_id: str) -> bool:
+        """Acknowledge a message; False if its lease was lost."""
+        with self._lock:
+            lease = self.leases.pop(message_id, None)
+            if lease is None:
+                return False
+            try:
+                self.queue.delete_message(message_id, lease["pop_receipt"])
+                return True
+            except QueueError:
+                self.lost += 1
+                return False
+
+    def release(self, message_id: str, delay: int) -> bool:
+        """Stop renewing a message and make it visible again after delay seconds."""
+        with self._lock:
+            lease = self.leases.pop(message_id, None)
+            if lease is None:
+                return False
+            try:
+                self.queue.update_message(message_id, lease["pop_receipt"], delay)
+                return True
+            except QueueError:
+                self.lost += 1
+                return False
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class EmbedWorker:
+    """Receives, fetches, embeds and acknowledges batches of upload messages."""
+
+    def __init__(self, queue: QueueRestClient, store, embed: Callable[[np.ndarray], np.ndarray],
+                 qdrant: QdrantRestClient, collection: str = DEFAULT_COLLECTION,
+                 poison_queue: Optional[QueueRestClient] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 fetch_workers: int = 8, visibility_timeout: int = DEFAULT_VISIBILITY_TIMEOUT,
+                 max_dequeue: int = MAX_DEQUEUE_COUNT, retry_delay: int = 30,
+                 lookup_guids: Optional[Callable[[List[str]], Dict[str, str]]] = None):
+        self.queue = queue
+        self.store = store
+        self.embed = embed
+        self.qdrant = qdrant
+        self.collection = collection
+        self.poison_queue = poison_queue
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.max_dequeue = max_dequeue
+        self.retry_delay = retry_delay
+        self.lookup_guids = lookup_guids
+        self.stats = {"batches": 0, "messages": 0, "images": 0, "failed": 0, "poisoned": 0,
+                      "fetch_seconds": 0.0, "embed_seconds": 0.0}
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers)
+        self._leases: Optional[LeaseKeeper] = None
+
+    def _load(self, key: str):
+        try:
+            source = self.store.local_path(key) or self.store.get_object(key)
+            return resize_for_model(open_image(source, (INPUT_SIZE, INPUT_SIZE)), INPUT_SIZE)
+        except Exception as e:
+            return e
+
+    def _next_batch(self) -> Dict:
+        """Receive up to batch_size messages, then fetch and decode every image they name."""
+        messages = []
+        while len(messages) < self.batch_size:
+            wanted = min(MAX_MESSAGES_PER_RECEIVE, self.batch_size - len(messages))
+            page = self.queue.receive_messages(wanted, self.visibility_timeout)
+            self._leases.hold(page)
+            messages.extend(page)
+            if len(page) < wanted:
+                break
+
+        started = time.perf_counter()
+        items = []  # (message index, key)
+        errors: Dict[int, str] = {}
+        for index, message in enumerate(messages):
+            # Any parse failure stays with its message, so it counts towards --max-dequeue.
+            try:
+                items.extend((index, key) for key in object_keys_from_message(message["text"]))
+            except Exception as e:
+                errors[index] = f"unreadable message: {type(e).__name__}: {e}"
+        pixels = list(self._fetch_pool.map(self._load, [key for _, key in items]))
+        for (index, key), result in zip(items, pixels):
+            if isinstance(result, Exception):
+                errors.setdefault(index, f"{key}: {result}")
+        self.stats["fetch_seconds"] += time.perf_counter() - started
+        return {"messages": messages, "items": items, "pixels": pixels, "errors": errors}
+
+    def _finish(self, batch: Dict) -> None:
+        messages, errors = batch["messages"], dict(batch["errors"])
+        ready = [(index, key, pixels) for (index, key), pixels in zip(batch["items"], batch["pixels"])
+                 if index not in errors]
+        if ready:
+            started = time.perf_counter()
+            try:
+                keys = [key for _, key, _ in ready]
+                vectors = np.asarray(self.embed(np.stack([pixels for _, _, pixels in ready])), dtype=np.float32)
+                guids = self.lookup_guids(keys) if self.lookup_guids else {}
+                points = []
+                for key, vector in zip(keys, vectors):
+                    guid = guids.get(key) or point_id_for_key(key)
+                    points.append({"id": guid, "vector": vector.tolist(), "payload": image_payload(key, guid)})
+                self.qdrant.upsert_points(self.collection, points)
+                self.stats["images"] += len(points)
+            except Exception as e:
+                for index, _, _ in ready:
+                    errors.setdefault(index, f"batch failed: {e}")
+            self.stats["embed_seconds"] += time.perf_counter() - started
+
+        for index, message in enumerate(messages):
+            if index not in errors:
+                self._leases.delete(message["id"])
+            elif message["dequeue_count"] >= self.max_dequeue and self.poison_queue is not None:
+                self.poison_queue.send_message(message["text"])
+                self._leases.delete(message["id"])
+                self.stats["poisoned"] += 1
+                print(f"☠️  Moved message {message['id']} to the poison queue: {errors[index]}")
+            else:
+                self._leases.release(message["id"], self.retry_delay)
+                self.stats["failed"] += 1
+        self.stats["batches"] += 1
+        self.stats["messages"] += len(messages)
+
+    def run(self, stop_when_empty: bool = False, max_batches: Optional[int] = None,
+            idle_sleep: float = 2.0) -> Dict:
+        """Process batches until the queue is empty (stop_when_empty), max_batches, or interrupted."""
+        started = time.perf_counter()
+        self._leases = LeaseKeeper(self.queue, self.visibility_timeout)
+        receiver = ThreadPoolExecutor(max_workers=1)
+        pending = receiver.submit(self._next_batch)
+        try:
+            while True:
+                batch = pending.result()
+                if not batch["messages"]:
+                    if stop_when_empty:
+                        break
+                    time.sleep(idle_sleep)
+                    pending = receiver.submit(self._next_batch)
+                    continue
+                last = max_batches is not None and self.stats["batches"] + 1 >= max_batches
+                if not last:
+                    pending = receiver.submit(self._next_batch)  # overlap the next fetch with this embed
+                self._finish(batch)
+                if last:
+                    break
+        finally:
+            receiver.shutdown(wait=True)
+            # Anything still leased was received but not processed (a prefetched batch, or an interruption).
+            for message_id in list(self._leases.leases):
+                self._leases.release(message_id, 0)
+            self._leases.stop()
+        seconds = time.perf_counter() - started
+        return {**self.stats, "renewals": self._leases.renewals, "lost": self._leases.lost,
+                "seconds": round(seconds, 2), "images_per_second": round(self.stats["images"] / max(seconds, 1e-9), 1),
+                "fetch_seconds": round(self.stats["fetch_seconds"], 2),
+                "embed_seconds": round(self.stats["embed_seconds"], 2)}
+
+
+def enqueue_objects(queue: QueueRestClient, store, prefix: str, bucket: str = BUCKET_NAME) -> int:
+    """Send one ImageMetadata message per image under prefix (backfills, or uploads made while disabled)."""
+    sent = 0
+    for obj in store.list_objects(prefix):
+        if is_image_file(obj["key"]):
+            queue.send_message(metadata_message(obj["key"], bucket, obj.get("last_modified")))
+            sent += 1
+    return sent
+
+
+def guid_lookup(db_path: str) -> Callable[[List[str]], Dict[str, str]]:
+    """ImageMappings ids for object keys, so points get the same ids the API assigns."""
+    from photoflow_db import connect
+
+    conn = connect(db_path)
+    lock = threading.Lock()
+
+    def lookup(keys: List[str]) -> Dict[str, str]:
+        with lock:
+            rows = conn.execute(f'SELECT "ObjectKey", "Id" FROM "ImageMappings" WHERE "ObjectKey" IN '
+                                f'({",".join("?" * len(keys))})', keys).fetchall()
+        return {key: guid.lower() for key, guid in rows}
+
+    return lookup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch embedding worker for image-embedding-queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def queue_arguments(sub):
+        sub.add_argument("--connection-string", default=os.getenv("AzureWebJobsStorage") or os.getenv(
+            "AZURE_STORAGE_CONNECTION_STRING", "UseDevelopmentStorage=true"), help="Storage account with the queue")
+        sub.add_argument("--queue", default=os.getenv("EMBEDDING_QUEUE", DEFAULT_QUEUE),
+                         help=f"Queue name (default: EMBEDDING_QUEUE or {DEFAULT_QUEUE})")
+        sub.add_argument("--source", default="minio", help="Local bucket directory or 'minio'")
+        sub.add_argument("--bucket", default=BUCKET_NAME, help=f"Bucket name (default: {BUCKET_NAME})")
+
+    run = subparsers.add_parser("run", help="Embed queued uploads")
+    queue_arguments(run)
+    run.add_argument("--models-dir", default="models", help="Directory with vision_model.onnx")
+    run.add_argument("--env-file", default=".env", help="Qdrant settings (QDRANT_HOST/PORT/COLLECTION)")
+    run.add_argument("--db", help="photoflow.db, to use ImageMappings ids as point ids")
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Messages per batch")
+    run.add_argument("--fetch-workers", type=int, default=8, help="Concurrent object fetches and decodes")
+    run.add_argument("--visibility-timeout", type=int, default=DEFAULT_VISIBILITY_TIMEOUT,
+                     help="Seconds a received message stays hidden (renewed while in flight)")
+    run.add_argument("--retry-delay", type=int, default=30, help="Seconds before a failed message is retried")
+    run.add_argument("--max-dequeue", type=int, default=MAX_DEQUEUE_COUNT, help="Attempts before the poison queue")
+    run.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    run.add_argument("--partition-by-year", action="store_true",
+                     help="Upsert into per-year partitions of the collection (partitioned_collections.py)")
+
+    enqueue = subparsers.add_parser("enqueue", help="Queue every image under a prefix, or a list of keys")
+    queue_arguments(enqueue)
+    enqueue.add_argument("--prefix", default="", help="Object key prefix")
+    enqueue.add_argument("--keys", help="Text file of object keys (e.g. to_embed.txt from reconcile.py)")
+    args = parser.parse_args()
+    if args.command == "run" and args.queue == FUNCTIONS_QUEUE:
+        parser.error(f"{FUNCTIONS_QUEUE} is consumed by the Functions app; the worker reads its own queue "
+                     f"(default: {DEFAULT_QUEUE})")
+
+    queue = QueueRestClient.from_connection_string(args.connection_string, args.queue)
+    queue.create_queue()
+    if args.command == "enqueue" and args.keys:
+        with open(args.keys) as f:
+            keys = [line.strip() for line in f if line.strip()]
+        for key in keys:
+            queue.send_message(metadata_message(key, args.bucket))
+        print(f"📨 Queued {len(keys):,} images on {args.queue}")
+        return
+    store = open_object_store(args.source, args.bucket)
+    if args.command == "enqueue":
+        print(f"📨 Queued {enqueue_objects(queue, store, args.prefix, args.bucket):,} images on {args.queue}")
+        return
+
+    from embedding_server import ClipOnnxModels
+
+    qdrant, collection = client_from_env_file(args.env_file)
+    if args.partition_by_year:
+        from partitioned_collections import PartitionedCollections
+
+        qdrant = PartitionedCollections(qdrant, collection)
+    poison_queue = QueueRestClient.from_connection_string(args.connection_string, args.queue + POISON_SUFFIX)
+    poison_queue.create_queue()
+
+    worker = EmbedWorker(queue, store, ClipOnnxModels(args.models_dir, load_text=False).embed_pixels, qdrant,
+                         collection, poison_queue, args.batch_size, args.fetch_workers, args.visibility_timeout,
+                         args.max_dequeue, args.retry_delay,
+                         guid_lookup(args.db) if args.db else None)
+    print(f"👷 Embedding worker on {args.queue} (batch {args.batch_size}, {args.fetch_workers} fetchers)")
+    try:
+        stats = worker.run(stop_when_empty=args.once)
+    except KeyboardInterrupt:
+        stats = worker.stats
+        print("\n👋 Embedding worker stopped")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
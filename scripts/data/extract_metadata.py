@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Batch camera metadata extractor for backfilling an existing photo archive.
+
+Only the first HEADER_BYTES of every object are read (a range request for MinIO,
+a short read for local files); the full object is fetched only when the header
+does not contain the metadata (e.g. TIFFs whose IFDs sit at the end of the file).
+Work is fanned out over a process pool and results are written in bulk, one row
+per object, using the same field names as CameraGeneratedMetadata.
+
+Usage:
+    python3 scripts/data/extract_metadata.py --source /data/photostore --output metadata.db
+    python3 scripts/data/extract_metadata.py --source minio --prefix 2024- --format parquet --output metadata.parquet
+"""
+
+import argparse
+import io
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from photoflow_storage import is_image_file, open_object_store  # noqa: E402
+
+HEADER_BYTES = 256 * 1024
+
+# Column order matches the property order of CameraGeneratedMetadata.
+METADATA_FIELDS = [
+    "DateTimeOriginal", "DateTimeDigitized", "CameraMake", "CameraModel", "FocalLength", "Aperture",
+    "ShutterSpeed", "Iso", "Orientation",
+    "ImageWidth", "ImageHeight", "CompressionType", "DataPrecision", "NumberOfComponents",
+    "XResolution", "YResolution", "ResolutionUnit", "Software", "Artist",
+    "ExposureTime", "ExposureProgram", "SensitivityType", "RecommendedExposureIndex", "ExifVersion",
+    "SubSecTimeOriginal", "SubSecTimeDigitized", "ColorSpace", "FocalPlaneXResolution",
+    "FocalPlaneYResolution", "FocalPlaneResolutionUnit", "CustomRendered", "ExposureMode", "WhiteBalance",
+    "SceneCaptureType", "BodySerialNumber", "LensSpecification", "LensModel", "LensSerialNumber",
+    "ExposureBiasValue", "MaxApertureValue", "MeteringMode",
+    "GpsLatitude", "GpsLongitude", "GpsAltitude",
+    "XmpValueCount",
+    "IccProfileSize", "IccCmmType", "IccVersion", "IccClass", "IccColorSpace", "IccProfileConnectionSpace",
+    "IccProfileDateTime", "IccPrimaryPlatform", "IccDeviceManufacturer", "IccDeviceModel", "IccTagCount",
+    "IccProfileCopyright", "IccProfileDescription",
+    "PhotoshopResolutionInfo", "PhotoshopThumbnailData", "PhotoshopCaptionDigest",
+    "IptcCodedCharacterSet", "IptcApplicationRecordVersion", "IptcDateCreated", "IptcTimeCreated",
+    "IptcDigitalDateCreated", "IptcDigitalTimeCreated", "IptcByLine",
+    "AdobeDctEncodeVersion", "AdobeFlags0", "AdobeFlags1", "AdobeColorTransform",
+    "DetectedFileTypeName", "DetectedFileTypeLongName", "DetectedMimeType", "ExpectedFileNameExtension",
+]
+
+INTEGER_FIELDS = {
+    "Iso", "ImageWidth", "ImageHeight", "DataPrecision", "NumberOfComponents", "RecommendedExposureIndex",
+    "XmpValueCount", "IccProfileSize", "IccTagCount", "IptcApplicationRecordVersion",
+}
+REAL_FIELDS = {
+    "FocalLength", "Aperture", "XResolution", "YResolution", "FocalPlaneXResolution", "FocalPlaneYResolution",
+    "ExposureBiasValue", "MaxApertureValue", "GpsLatitude", "GpsLongitude", "GpsAltitude",
+}
+
+# EXIF tag ids (IFD0, Exif SubIFD and GPS IFD)
+IFD0_TAGS = {
+    "CameraMake": 0x010F, "CameraModel": 0x0110, "Software": 0x0131, "Artist": 0x013B,
+}
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+SUBIFD_STRING_TAGS = {
+    "SubSecTimeOriginal": 0x9291, "SubSecTimeDigitized": 0x9292, "BodySerialNumber": 0xA431,
+    "LensModel": 0xA434, "LensSerialNumber": 0xA435,
+}
+SUBIFD_RATIONAL_TAGS = {
+    "FocalLength": 0x920A, "Aperture": 0x829D, "FocalPlaneXResolution": 0xA20E,
+    "FocalPlaneYResolution": 0xA20F, "ExposureBiasValue": 0x9204, "MaxApertureValue": 0x9205,
+}
+
+# Descriptions follow the wording of MetadataExtractor's tag descriptors.
+ORIENTATIONS = {
+    1: "Top, left side (Horizontal / normal)", 2: "Top, right side (Mirror horizontal)",
+    3: "Bottom, right side (Rotate 180)", 4: "Bottom, left side (Mirror vertical)",
+    5: "Left side, top (Mirror horizontal and rotate 270 CW)", 6: "Right side, top (Rotate 90 CW)",
+    7: "Right side, bottom (Mirror horizontal and rotate 90 CW)", 8: "Left side, bottom (Rotate 270 CW)",
+}
+RESOLUTION_UNITS = {1: "(No unit)", 2: "Inch", 3: "cm"}
+FOCAL_PLANE_UNITS = {1: "(No unit)", 2: "Inches", 3: "cm"}
+EXPOSURE_PROGRAMS = {
+    1: "Manual control", 2: "Program normal", 3: "Aperture priority", 4: "Shutter priority",
+    5: "Program creative (slow program)", 6: "Program action (high-speed program)",
+    7: "Portrait mode", 8: "Landscape mode",
+}
+SENSITIVITY_TYPES = {
+    1: "Standard Output Sensitivity", 2: "Recommended Exposure Index", 3: "ISO Speed",
+    4: "Standard Output Sensitivity and Recommended Exposure Index",
+    5: "Standard Output Sensitivity and ISO Speed", 6: "Recommended Exposure Index and ISO Speed",
+    7: "Standard Output Sensitivity, Recommended Exposure Index and ISO Speed",
+}
+METERING_MODES = {
+    1: "Average", 2: "Center weighted average", 3: "Spot", 4: "Multi-spot", 5: "Multi-segment",
+    6: "Partial", 255: "(Other)",
+}
+COLOR_SPACES = {1: "sRGB", 65535: "Undefined"}
+CUSTOM_RENDERED = {0: "Normal process", 1: "Custom process"}
+EXPOSURE_MODES = {0: "Auto exposure", 1: "Manual exposure", 2: "Auto bracket"}
+WHITE_BALANCES = {0: "Auto white balance", 1: "Manual white balance"}
+SCENE_CAPTURE_TYPES = {0: "Standard", 1: "Landscape", 2: "Portrait", 3: "Night scene"}
+ADOBE_TRANSFORMS = {0: "Unknown (RGB or CMYK)", 1: "YCbCr", 2: "YCCK"}
+# MetadataExtractor's preferred extension per format; Pillow lists .jfif before .jpg and .tiff before .tif.
+FILE_EXTENSIONS = {
+    "JPEG": "jpg", "MPO": "jpg", "TIFF": "tif", "PNG": "png", "GIF": "gif", "BMP": "bmp", "WEBP": "webp",
+    "HEIF": "heic", "PSD": "psd", "JPEG2000": "jp2",
+}
+
+_store = None
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+
+def _to_rational_string(value) -> Optional[str]:
+    if value is None:
+        return None
+    numerator = getattr(value, "numerator", None)
+    denominator = getattr(value, "denominator", None)
+    if numerator is None or denominator is None:
+        return str(value)
+    return f"{numerator}/{denominator}"
+
+
+def _to_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("ascii", errors="replace")
+    value = str(value).strip("\x00 ").strip()
+    return value or None
+
+
+def _to_iso_datetime(value) -> Optional[str]:
+    text = _to_text(value)
+    if not text or len(text) < 19:
+        return None
+    return f"{text[0:4]}-{text[5:7]}-{text[8:10]}T{text[11:19]}"
+
+
+def _gps_to_degrees(dms, ref) -> Optional[float]:
+    try:
+        degrees = float(dms[0]) + float(dms[1]) / 60 + float(dms[2]) / 3600
+    except (TypeError, ValueError, IndexError, ZeroDivisionError):
+        return None
+    return -degrees if _to_text(ref) in ("S", "W") else degrees
+
+
+def _describe(mapping: Dict[int, str], value) -> Optional[str]:
+    if value is None:
+        return None
+    return mapping.get(value, f"Unknown ({value})")
+
+
+def _parse_icc_header(profile: bytes, metadata: Dict) -> None:
+    """Read the fixed 128-byte ICC header plus the tag count."""
+    if not profile or len(profile) < 132:
+        return
+    metadata["IccProfileSize"] = int.from_bytes(profile[0:4], "big")
+    metadata["IccCmmType"] = _to_text(profile[4:8])
+    metadata["IccVersion"] = f"{profile[8]}.{profile[9] >> 4}.{profile[9] & 0x0F}"
+    metadata["IccClass"] = _to_text(profile[12:16])
+    metadata["IccColorSpace"] = _to_text(profile[16:20])
+    metadata["IccProfileConnectionSpace"] = _to_text(profile[20:24])
+    year, month, day, hour, minute, second = (int.from_bytes(profile[i:i + 2], "big") for i in range(24, 36, 2))
+    if year:
+        metadata["IccProfileDateTime"] = f"{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}:{second:02d}"
+    metadata["IccPrimaryPlatform"] = _to_text(profile[40:44])
+    metadata["IccDeviceManufacturer"] = _to_text(profile[48:52])
+    metadata["IccDeviceModel"] = _to_text(profile[52:56])
+    metadata["IccTagCount"] = int.from_bytes(profile[128:132], "big")
+
+
+def parse_metadata(data: bytes, file_name: str = "") -> Dict:
+    """Parse CameraGeneratedMetadata fields from (the header of) an image without decoding pixels."""
+    from PIL import Image
+
+    metadata = dict.fromkeys(METADATA_FIELDS)
+    with Image.open(io.BytesIO(data)) as img:
+        metadata["ImageWidth"], metadata["ImageHeight"] = img.size
+        metadata["DetectedFileTypeName"] = img.format
+        metadata["DetectedFileTypeLongName"] = img.format_description
+        metadata["DetectedMimeType"] = Image.MIME.get(img.format)
+        extension = FILE_EXTENSIONS.get(img.format)
+        if extension is None:
+            extensions = [ext for ext, fmt in Image.registered_extensions().items() if fmt == img.format]
+            extension = extensions[0].lstrip(".") if extensions else None
+        metadata["ExpectedFileNameExtension"] = extension
+
+        if img.format == "JPEG":
+            metadata["CompressionType"] = "Progressive, Huffman" if img.info.get("progressive") else "Baseline"
+            metadata["DataPrecision"] = getattr(img, "bits", None)
+            metadata["NumberOfComponents"] = getattr(img, "layers", None)
+            if "adobe" in img.info:
+                metadata["AdobeDctEncodeVersion"] = str(img.info["adobe"])
+                metadata["AdobeColorTransform"] = _describe(ADOBE_TRANSFORMS, img.info.get("adobe_transform"))
+
+        _parse_icc_header(img.info.get("icc_profile"), metadata)
+
+        xmp = img.info.get("xmp")
+        if xmp:
+            metadata["XmpValueCount"] = xmp.count(b"=\"") if isinstance(xmp, bytes) else None
+
+        exif = img.getexif()
+        for field, tag in IFD0_TAGS.items():
+            metadata[field] = _to_text(exif.get(tag))
+        metadata["Orientation"] = _describe(ORIENTATIONS, exif.get(0x0112))
+        metadata["XResolution"] = _to_float(exif.get(0x011A))
+        metadata["YResolution"] = _to_float(exif.get(0x011B))
+        metadata["ResolutionUnit"] = _describe(RESOLUTION_UNITS, exif.get(0x0128))
+
+        sub = exif.get_ifd(EXIF_IFD)
+        if sub:
+            metadata["DateTimeOriginal"] = _to_iso_datetime(sub.get(0x9003))
+            metadata["DateTimeDigitized"] = _to_iso_datetime(sub.get(0x9004))
+            metadata["ShutterSpeed"] = metadata["ExposureTime"] = _to_rational_string(sub.get(0x829A))
+            iso = sub.get(0x8827)
+            metadata["Iso"] = iso[0] if isinstance(iso, tuple) else iso
+            metadata["ExposureProgram"] = _describe(EXPOSURE_PROGRAMS, sub.get(0x8822))
+            metadata["SensitivityType"] = _describe(SENSITIVITY_TYPES, sub.get(0x8830))
+            metadata["RecommendedExposureIndex"] = sub.get(0x8832)
+            metadata["ExifVersion"] = _to_text(sub.get(0x9000))
+            metadata["ColorSpace"] = _describe(COLOR_SPACES, sub.get(0xA001))
+            metadata["FocalPlaneResolutionUnit"] = _describe(FOCAL_PLANE_UNITS, sub.get(0xA210))
+            metadata["CustomRendered"] = _describe(CUSTOM_RENDERED, sub.get(0xA401))
+            metadata["ExposureMode"] = _describe(EXPOSURE_MODES, sub.get(0xA402))
+            metadata["WhiteBalance"] = _describe(WHITE_BALANCES, sub.get(0xA403))
+            metadata["SceneCaptureType"] = _describe(SCENE_CAPTURE_TYPES, sub.get(0xA406))
+            metadata["MeteringMode"] = _describe(METERING_MODES, sub.get(0x9207))
+            lens_spec = sub.get(0xA432)
+            if lens_spec:
+                metadata["LensSpecification"] = " ".join(_to_rational_string(v) for v in lens_spec)
+            for field, tag in SUBIFD_STRING_TAGS.items():
+                metadata[field] = _to_text(sub.get(tag))
+            for field, tag in SUBIFD_RATIONAL_TAGS.items():
+                metadata[field] = _to_float(sub.get(tag))
+
+        gps = exif.get_ifd(GPS_IFD)
+        if gps:
+            if 2 in gps and 4 in gps:
+                metadata["GpsLatitude"] = _gps_to_degrees(gps[2], gps.get(1))
+                metadata["GpsLongitude"] = _gps_to_degrees(gps[4], gps.get(3))
+            altitude = _to_float(gps.get(6))
+            if altitude is not None and gps.get(5) in (1, b"\x01"):
+                altitude = -altitude
+            metadata["GpsAltitude"] = altitude
+
+    if not metadata["ExpectedFileNameExtension"] and file_name:
+        metadata["ExpectedFileNameExtension"] = os.path.splitext(file_name)[1].lstrip(".").lower() or None
+    return metadata
+
+
+def _init_worker(store) -> None:
+    global _store
+    _store = store
+
+
+def _read_header(key: str, path: Optional[str], length: Optional[int]) -> bytes:
+    if path is not None:
+        with open(path, "rb") as f:
+            return f.read() if length is None else f.read(length)
+    return _store.get_object(key, 0, length)
+
+
+def extract_one(task: Tuple[str, Optional[str], int]) -> Dict:
+    """Worker entry point: extract one object's metadata, falling back to a full read if needed."""
+    key, path, header_bytes = task
+    row = {"ObjectKey": key, "Error": None, "BytesRead": 0}
+    try:
+        data = _read_header(key, path, header_bytes)
+        row["BytesRead"] = len(data)
+        try:
+            metadata = parse_metadata(data, key)
+        except Exception:
+            if len(data) < header_bytes:
+                raise
+            data = _read_header(key, path, None)
+            row["BytesRead"] += len(data)
+            metadata = parse_metadata(data, key)
+        row.update(metadata)
+    except Exception as e:
+        row.update(dict.fromkeys(METADATA_FIELDS))
+        row["Error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def _column_type(field: str) -> str:
+    if field in INTEGER_FIELDS:
+        return "INTEGER"
+    if field in REAL_FIELDS:
+        return "REAL"
+    return "TEXT"
+
+
+class SqliteMetadataWriter:
+    """Bulk-insert metadata rows into a SQLite table, one transaction per batch."""
+
+    columns = ["ObjectKey"] + METADATA_FIELDS + ["Error"]
+
+    def __init__(self, path: str, table: str = "CameraGeneratedMetadata"):
+        self.table = table
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        column_defs = ", ".join(
+            ["ObjectKey TEXT PRIMARY KEY"] + [f"{f} {_column_type(f)}" for f in METADATA_FIELDS] + ["Error TEXT"]
+        )
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_defs})")
+        placeholders = ", ".join("?" for _ in self.columns)
+        self.insert_sql = f"INSERT OR REPLACE INTO {table} ({', '.join(self.columns)}) VALUES ({placeholders})"
+
+    def existing_keys(self) -> set:
+        return {row[0] for row in self.conn.execute(f"SELECT ObjectKey FROM {self.table} WHERE Error IS NULL")}
+
+    def write_batch(self, rows: List[Dict]) -> None:
+        with self.conn:
+            self.conn.executemany(self.insert_sql, [tuple(row.get(c) for c in self.columns) for row in rows])
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class ParquetMetadataWriter:
+    """Write metadata rows to a Parquet file, one row group per batch (requires pyarrow)."""
+
+    columns = ["ObjectKey"] + METADATA_FIELDS + ["Error"]
+
+    def __init__(self, path: str):
+        import importlib.util
+        if importlib.util.find_spec("pyarrow") is None:
+            raise RuntimeError("pyarrow package is required for Parquet output. Install it via 'pip install pyarrow'.")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        type_map = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+        self.pa = pa
+        self.schema = pa.schema(
+            [("ObjectKey", pa.string())]
+            + [(f, type_map[_column_type(f)]) for f in METADATA_FIELDS]
+            + [("Error", pa.string())]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_batch(self, rows: List[Dict]) -> None:
+        table = self.pa.Table.from_pydict({c: [row.get(c) for row in rows] for c in self.columns}, schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def _batched(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def extract_metadata(store, writer, prefix: str = "", workers: Optional[int] = None,
+                     header_bytes: int = HEADER_BYTES, batch_size: int = 1000,
+                     skip_existing: bool = False) -> Dict:
+    """Extract metadata for every image under prefix and write it through writer."""
+    start_time = time.time()
+    existing = writer.existing_keys() if skip_existing else set()
+    tasks = []
+    skipped = 0
+    for obj in store.list_objects(prefix):
+        if not is_image_file(obj["key"]):
+            continue
+        if obj["key"] in existing:
+            skipped += 1
+        else:
+            tasks.append((obj["key"], store.local_path(obj["key"]), header_bytes))
+    print(f"📋 {len(tasks)} images to process ({skipped} already extracted)")
+
+    stats = {"processed": 0, "failed": 0, "bytes_read": 0, "skipped": skipped}
+    if tasks:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, min(256, len(tasks) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store,)) as pool:
+            for batch in _batched(pool.map(extract_one, tasks, chunksize=chunksize), batch_size):
+                writer.write_batch(batch)
+                stats["processed"] += len(batch)
+                stats["failed"] += sum(1 for row in batch if row["Error"])
+                stats["bytes_read"] += sum(row["BytesRead"] for row in batch)
+                print(f"📊 {stats['processed']}/{len(tasks)} images processed")
+
+    stats["elapsed"] = round(time.time() - start_time, 3)
+    stats["images_per_second"] = round(stats["processed"] / stats["elapsed"], 1) if stats["elapsed"] else None
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract camera metadata for a photo archive in bulk")
+    parser.add_argument("--source", required=True, help="Local mirror directory of the bucket, or 'minio'")
+    parser.add_argument("--bucket", default="photostore", help="Bucket name when --source is minio")
+    parser.add_argument("--prefix", default="", help="Only process object keys with this prefix")
+    parser.add_argument("--output", default="metadata.db", help="Output file (default: metadata.db)")
+    parser.add_argument("--format", choices=["sqlite", "parquet"], default="sqlite", help="Output format")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--header-bytes", type=int, default=HEADER_BYTES, help="Bytes read per object")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk write")
+    parser.add_argument("--skip-existing", action="store_true", help="Skip keys already in the SQLite output")
+    args = parser.parse_args()
+    if args.skip_existing and args.format != "sqlite":
+        parser.error("--skip-existing needs --format sqlite; a Parquet output cannot be appended to")
+
+    store = open_object_store(args.source, args.bucket)
+    writer = SqliteMetadataWriter(args.output) if args.format == "sqlite" else ParquetMetadataWriter(args.output)
+    try:
+        stats = extract_metadata(store, writer, args.prefix, args.workers, args.header_bytes,
+                                 args.batch_size, args.skip_existing)
+    finally:
+        writer.close()
+
+    print(f"✅ Extracted {stats['processed']} images in {stats['elapsed']:.1f}s "
+          f"({stats['images_per_second'] or 0} images/s, {stats['bytes_read'] / 1e6:.1f} MB read)")
+    if stats["failed"]:
+        print(f"⚠️  {stats['failed']} images could not be parsed (see the Error column)")
+    print(f"💾 Metadata saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Generate reproducible synthetic PhotoFlow datasets at chosen scales.
+
+One seed drives every artifact, so benchmarks can run at production scale on a
+laptop and compare like with like:
+
+    OUTPUT/zips/{project}__{directory}.zip   uploads laid out as MinIODirectoryHelper expects
+    OUTPUT/zips/uploads.jsonl                one line per zip: projectName, directoryName, timestamp
+    OUTPUT/photoflow.db                      ImageMappings rows, one per image
+    OUTPUT/embeddings.npy                    float32 (images, dimension), L2-normalised, memory-mapped
+    OUTPUT/clusters.npy                      int32 cluster of each embedding (--embeddings clustered)
+    OUTPUT/manifest.json                     the spec used and what was written
+
+Row i of embeddings.npy belongs to ImageMappings row i (ordered by rowid) and to
+the i-th object key. The embedding dimension follows get_embedding_config for the
+--variant, or for the .env file given with --env-file.
+
+Usage:
+    python3 scripts/data/generate_dataset.py --output /data/synthetic-1m --images 1000000 --no-zips
+    python3 scripts/data/generate_dataset.py --output /tmp/small --images 2000 --projects 5 --variant large
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import uuid
+import zipfile
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+import numpy as np  # noqa: E402
+
+from auto_export_models import VARIANT_DIMENSIONS, get_embedding_config, load_env_file  # noqa: E402
+from photoflow_db import connect, insert_mappings  # noqa: E402
+from photoflow_storage import get_destination_path  # noqa: E402
+
+EMBEDDING_CHUNK_ROWS = 65536
+START_DATE = date(2015, 1, 1)
+DAYS_SPAN = 365 * 10
+
+
+def plan_dataset(images: int, projects: int = 20, directories: int = 10, seed: int = 0) -> Iterator[Dict]:
+    """Yield one deterministic record per synthetic image, grouped by project and directory."""
+    rng = random.Random(seed)
+    per_project = max(1, -(-images // projects))
+    index = 0
+    for p in range(projects):
+        project = f"Project{p:04d}"
+        shoot_date = START_DATE + timedelta(days=rng.randrange(DAYS_SPAN))
+        count = min(per_project, images - index)
+        per_directory = max(1, -(-count // directories))
+        for d in range(directories):
+            if count <= 0:
+                break
+            directory = f"Camera{d:02d}"
+            destination = get_destination_path(shoot_date, project, directory, True)
+            for n in range(min(per_directory, count)):
+                file_name = f"IMG_{n:06d}.jpg"
+                yield {
+                    "index": index,
+                    "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)).upper(),
+                    "object_key": f"{destination}/{file_name}",
+                    "file_name": file_name,
+                    "project_name": project,
+                    "directory_name": directory,
+                    "date": shoot_date.isoformat(),
+                    "year": str(shoot_date.year),
+                }
+                index += 1
+            count -= min(per_directory, count)
+        if index >= images:
+            return
+
+
+def synthetic_jpegs(count: int, size: int = 256, seed: int = 0) -> List[bytes]:
+    """A pool of small distinct JPEGs (noisy gradients) that zip entries cycle through."""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 1, size, dtype=np.float32)[:, np.newaxis, np.newaxis]
+    pool = []
+    for _ in range(count):
+        start, end = rng.integers(0, 256, 3), rng.integers(0, 256, 3)
+        pixels = start + (end - start) * ramp + rng.normal(0, 12, (size, size, 3))
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=80)
+        pool.append(buffer.getvalue())
+    return pool
+
+
+def write_zips(records: Iterator[Dict], zip_dir: str, image_pool: List[bytes]) -> Dict:
+    """Write one zip per project/directory with `{directory}/{file}` entries, as the upload API expects."""
+    os.makedirs(zip_dir, exist_ok=True)
+    stats = {"zips": 0, "entries": 0, "bytes": 0}
+    current, archive = None, None
+    with open(os.path.join(zip_dir, "uploads.jsonl"), "w") as uploads:
+        for record in records:
+            group = (record["project_name"], record["directory_name"])
+            if group != current:
+                if archive:
+                    archive.close()
+                current = group
+                zip_name = f"{record['project_name']}__{record['directory_name']}.zip"
+                archive = zipfile.ZipFile(os.path.join(zip_dir, zip_name), "w", zipfile.ZIP_STORED)
+                uploads.write(json.dumps({"zip": zip_name, "projectName": record["project_name"],
+                                          "directoryName": record["directory_name"],
+                                          "timestamp": record["date"]}) + "\n")
+                stats["zips"] += 1
+            data = image_pool[record["index"] % len(image_pool)]
+            archive.writestr(f"{record['directory_name']}/{record['file_name']}", data)
+            stats["entries"] += 1
+            stats["bytes"] += len(data)
+    if archive:
+        archive.close()
+    return stats
+
+
+def mapping_rows(records: Iterator[Dict], image_pool_sizes: Optional[List[int]] = None) -> Iterator[Dict]:
+    """Turn planned records into ImageMappings rows."""
+    for record in records:
+        size = image_pool_sizes[record["index"] % len(image_pool_sizes)] if image_pool_sizes else 0
+        timestamp = f"{record['date']} 12:00:00"
+        yield {
+            "Id": record["id"], "ObjectKey": record["object_key"], "FileName": record["file_name"],
+            "ProjectName": record["project_name"], "UploadDate": timestamp, "FileSize": size,
+            "ContentType": "image/jpeg", "Width": 256 if size else None, "Height": 256 if size else None,
+            "DirectoryName": record["directory_name"], "Year": record["year"], "IsActive": 1,
+            "UpdatedDate": timestamp, "MetadataJson": None,
+        }
+
+
+def write_embeddings(path: str, count: int, dimension: int, mode: str = "random", clusters: int = 256,
+                     spread: float = 0.35, seed: int = 0, labels_path: Optional[str] = None) -> Dict:
+    """Fill a memory-mapped float32 .npy with unit vectors, chunk by chunk so memory stays flat.
+
+    In clustered mode each vector is a random centre plus noise scaled by `spread`, and the
+    centre index is written to labels_path (default: clusters.npy next to path).
+    """
+    vectors = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(count, dimension))
+    labels = None
+    if mode == "clustered":
+        centers = np.random.default_rng([seed, 0]).standard_normal((clusters, dimension)).astype(np.float32)
+        centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+        labels_path = labels_path or os.path.join(os.path.dirname(path), "clusters.npy")
+        labels = np.lib.format.open_memmap(labels_path, mode="w+", dtype=np.int32, shape=(count,))
+
+    for chunk, start in enumerate(range(0, count, EMBEDDING_CHUNK_ROWS)):
+        stop = min(count, start + EMBEDDING_CHUNK_ROWS)
+        rng = np.random.default_rng([seed, chunk + 1])
+        noise = rng.standard_normal((stop - start, dimension), dtype=np.float32)
+        if mode == "clustered":
+            assigned = rng.integers(0, clusters, stop - start)
+            block = centers[assigned] + noise * (spread / np.sqrt(dimension))
+            labels[start:stop] = assigned
+        else:
+            block = noise
+        vectors[start:stop] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    vectors.flush()
+    if labels is not None:
+        labels.flush()
+    return {"path": path, "shape": [count, dimension], "mode": mode,
+            "clusters": clusters if mode == "clustered" else None, "bytes": os.path.getsize(path)}
+
+
+def generate_dataset(output_dir: str, images: int, projects: int = 20, directories: int = 10,
+                     dimension: int = 512, embeddings: str = "random", clusters: int = 256, zips: bool = True,
+                     db: bool = True, unique_images: int = 256, image_size: int = 256, seed: int = 0) -> Dict:
+    """Write every requested artifact for one seed and return the manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.time()
+    manifest = {"spec": {"images": images, "projects": projects, "directories": directories, "dimension": dimension,
+                         "embeddings": embeddings, "clusters": clusters, "unique_images": unique_images,
+                         "image_size": image_size, "seed": seed},
+                "outputs": {}}
+
+    pool = synthetic_jpegs(unique_images, image_size, seed) if zips else []
+    if zips:
+        manifest["outputs"]["zips"] = write_zips(plan_dataset(images, projects, directories, seed),
+                                                 os.path.join(output_dir, "zips"), pool)
+    if db:
+        db_path = os.path.join(output_dir, "photoflow.db")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        conn = connect(db_path, create=True)
+        try:
+            rows = insert_mappings(conn, mapping_rows(plan_dataset(images, projects, directories, seed),
+                                                      [len(p) for p in pool] or None))
+        finally:
+            conn.close()
+        manifest["outputs"]["photoflow_db"] = {"path": db_path, "rows": rows}
+    if embeddings != "none":
+        manifest["outputs"]["embeddings"] = write_embeddings(os.path.join(output_dir, "embeddings.npy"), images,
+                                                             dimension, embeddings, clusters, seed=seed)
+
+    manifest["elapsed_seconds"] = round(time.time() - started, 3)
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reproducible synthetic PhotoFlow datasets")
+    parser.add_argument("--output", required=True, help="Output directory")
+    parser.add_argument("--images", type=int, default=10000, help="Number of images (default: 10000)")
+    parser.add_argument("--projects", type=int, default=20, help="Number of projects (default: 20)")
+    parser.add_argument("--directories", type=int, default=10, help="Directories per project (default: 10)")
+    parser.add_argument("--variant", choices=["base", "large", "huge"], help="Embedding model variant")
+    parser.add_argument("--env-file", default=".env", help="Read the variant from this .env when --variant is unset")
+    parser.add_argument("--embeddings", choices=["random", "clustered", "none"], default="random")
+    parser.add_argument("--clusters", type=int, default=256, help="Cluster count for --embeddings clustered")
+    parser.add_argument("--unique-images", type=int, default=256, help="Distinct JPEGs cycled through the zips")
+    parser.add_argument("--image-size", type=int, default=256, help="Synthetic JPEG edge in pixels")
+    parser.add_argument("--no-zips", action="store_true", help="Skip the upload zips")
+    parser.add_argument("--no-db", action="store_true", help="Skip photoflow.db")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for every artifact (default: 0)")
+    args = parser.parse_args()
+
+    if args.variant:
+        env_vars = {"EMBEDDING_MODEL_VARIANT": args.variant, "EMBEDDING_DIMENSION": VARIANT_DIMENSIONS[args.variant]}
+    else:
+        env_vars = load_env_file(args.env_file)
+    config = get_embedding_config(env_vars)
+    print(f"🧪 Generating {args.images:,} images across {args.projects} projects "
+          f"({config['variant']}, {config['dimension']}D, seed {args.seed})")
+
+    manifest = generate_dataset(args.output, args.images, args.projects, args.directories, int(config["dimension"]),
+                                args.embeddings, args.clusters, not args.no_zips, not args.no_db,
+                                args.unique_images, args.image_size, args.seed)
+    outputs = manifest["outputs"]
+    if "zips" in outputs:
+        print(f"📦 {outputs['zips']['zips']} zips, {outputs['zips']['entries']:,} entries, "
+              f"{outputs['zips']['bytes'] / 1e6:.1f} MB")
+    if "photoflow_db" in outputs:
+        print(f"🗄️  {outputs['photoflow_db']['rows']:,} ImageMappings rows in {outputs['photoflow_db']['path']}")
+    if "embeddings" in outputs:
+        print(f"🧮 Embeddings {outputs['embeddings']['shape']} ({outputs['embeddings']['mode']}), "
+              f"{outputs['embeddings']['bytes'] / 1e6:.1f} MB")
+    print(f"✅ Done in {manifest['elapsed_seconds']:.1f}s → {os.path.join(args.output, 'manifest.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Precomputed k-nearest-neighbour graph for instant "more like this" lookups.
+
+SearchController.SimilaritySearch fetches the reference vector and then runs a fresh
+ANN search on every click. The library changes slowly, so this job computes every
+image's top-k neighbours offline instead, using blocked matrix products over the
+stored embeddings. A similar-image lookup then reads one row of a memory-mapped file.
+
+The graph is a directory of flat little-endian files whose shapes are in manifest.json,
+so new rows are plain appends:
+
+    vectors.f16     (N, D) float16   unit-normalised embeddings (needed for updates)
+    neighbors.i32   (N, k) int32     row numbers of each row's neighbours, best first (-1 = none)
+    scores.f16      (N, k) float16   cosine similarity of each neighbour
+    keys.txt        N lines          object key of each row
+
+`add` appends new uploads. It scores them against every row, and merges them into the
+existing rows whose k-th neighbour they beat. The cost is O(N x new), not O(N^2).
+Keys already in the graph are skipped. Deleted images stay in the graph until the
+next `build`; lookups should skip keys the caller no longer knows.
+
+Usage:
+    python3 scripts/data/knn_graph.py build --embeddings embeddings.npy --db photoflow.db --output knn/
+    python3 scripts/data/knn_graph.py build --qdrant --output knn/ --k 32
+    python3 scripts/data/knn_graph.py add --graph knn/ --embeddings new.npy --keys new_keys.txt
+    python3 scripts/data/knn_graph.py query --graph knn/ --key 2025-05-13/Wedding/RawFiles/A/IMG_1.jpg
+    python3 scripts/data/knn_graph.py benchmark --images 100000 --dimension 512
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+import numpy as np  # noqa: E402
+
+from qdrant_rest import QdrantRestClient, client_from_env_file  # noqa: E402
+
+GRAPH_VERSION = 1
+DEFAULT_K = 32
+BLOCK_ROWS = 1024
+BLOCK_COLS = 16384
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def merge_top_k(indices: np.ndarray, scores: np.ndarray, new_indices: np.ndarray, new_scores: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per row, keep the k best of two candidate lists (unsorted)."""
+    indices = np.concatenate([indices, new_indices], axis=1)
+    scores = np.concatenate([scores, new_scores], axis=1)
+    if scores.shape[1] <= k:
+        return indices, scores
+    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(indices, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+
+def sort_rows(indices: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def block_top_k(queries: np.ndarray, vectors: np.ndarray, k: int, first_row: Optional[int] = None,
+                column_offset: int = 0, block_cols: int = BLOCK_COLS) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k columns of queries @ vectors.T, computed one column block at a time.
+
+    first_row is the graph row of queries[0] when the queries are themselves rows of
+    `vectors`, so that each row's match with itself is excluded.
+    """
+    rows = len(queries)
+    best_indices = np.full((rows, k), -1, dtype=np.int64)
+    best_scores = np.full((rows, k), -np.inf, dtype=np.float32)
+    for start in range(0, len(vectors), block_cols):
+        block = np.asarray(vectors[start:start + block_cols], dtype=np.float32)
+        scores = queries @ block.T
+        if first_row is not None:
+            own = np.arange(first_row, first_row + rows) - start
+            inside = (own >= 0) & (own < len(block))
+            scores[np.nonzero(inside)[0], own[inside]] = -np.inf
+        threshold = best_scores.min(axis=1)
+        if np.isneginf(threshold).any():
+            take = min(k, scores.shape[1])
+            top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_indices, best_scores = merge_top_k(best_indices, best_scores, top + start + column_offset,
+                                                    np.take_along_axis(scores, top, axis=1), k)
+        else:
+            # Once every row holds k neighbours, few columns of a later block can beat its k-th
+            # score, so select those instead of partitioning the whole block.
+            hit_rows, hit_cols = np.nonzero(scores > threshold[:, None])
+            best_indices, best_scores = _merge_hits(best_indices, best_scores, hit_rows,
+                                                    hit_cols + start + column_offset, scores[hit_rows, hit_cols])
+    return sort_rows(best_indices, best_scores)
+
+
+def _merge_hits(indices: np.ndarray, scores: np.ndarray, hit_rows: np.ndarray, hit_indices: np.ndarray,
+                hit_scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge a ragged list of (row, index, score) candidates into full (rows, k) lists."""
+    rows, k = indices.shape
+    all_rows = np.concatenate([np.repeat(np.arange(rows), k), hit_rows])
+    all_indices = np.concatenate([indices.ravel(), hit_indices])
+    all_scores = np.concatenate([scores.ravel(), hit_scores])
+    order = np.lexsort((-all_scores, all_rows))
+    row_starts = np.concatenate([[0], np.cumsum(np.bincount(all_rows, minlength=rows))[:-1]])
+    keep = order[np.arange(len(order)) - row_starts[all_rows[order]] < k]
+    return all_indices[keep].reshape(rows, k), all_scores[keep].reshape(rows, k)
+
+
+def _manifest_path(graph_dir: str) -> str:
+    return os.path.join(graph_dir, "manifest.json")
+
+
+class KnnGraph:
+    """A k-NN graph directory opened through memory maps; lookups read one row."""
+
+    def __init__(self, graph_dir: str, writable: bool = False):
+        self.graph_dir = graph_dir
+        with open(_manifest_path(graph_dir)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != GRAPH_VERSION:
+            raise ValueError(f"Unsupported k-NN graph version {self.manifest.get('version')} in {graph_dir}")
+        self.count, self.k, self.dimension = self.manifest["count"], self.manifest["k"], self.manifest["dimension"]
+        mode = "r+" if writable else "r"
+        self.vectors = self._map("vectors.f16", np.float16, self.dimension, mode)
+        self.neighbors = self._map("neighbors.i32", np.int32, self.k, mode)
+        self.scores = self._map("scores.f16", np.float16, self.k, mode)
+        with open(os.path.join(graph_dir, "keys.txt")) as f:
+            self.keys = f.read().splitlines()
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+
+    def _map(self, name: str, dtype, width: int, mode: str) -> np.ndarray:
+        if self.count == 0:
+            return np.zeros((0, width), dtype=dtype)
+        return np.memmap(os.path.join(self.graph_dir, name), dtype=np.dtype(dtype).newbyteorder("<"), mode=mode,
+                         shape=(self.count, width))
+
+    def similar(self, key: str, limit: Optional[int] = None) -> Optional[List[Tuple[str, float]]]:
+        """The stored neighbours of key as (key, score), best first; None if key is not in the graph."""
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        neighbors, scores = self.neighbors[row], self.scores[row]
+        found = [(self.keys[n], float(s)) for n, s in zip(neighbors, scores) if n >= 0]
+        return found[:limit] if limit else found
+
+
+def _write_manifest(graph_dir: str, count: int, k: int, dimension: int) -> None:
+    manifest = {"version": GRAPH_VERSION, "count": count, "k": k, "dimension": dimension, "metric": "cosine",
+                "updated_at": time.time()}
+    tmp_path = _manifest_path(graph_dir) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path(graph_dir))
+
+
+def _append_rows(graph_dir: str, keys: Sequence[str], vectors: np.ndarray, k: int) -> None:
+    """Append vectors and keys plus placeholder neighbour rows; the manifest is written last."""
+    with open(os.path.join(graph_dir, "vectors.f16"), "ab") as f:
+        f.write(np.ascontiguousarray(vectors, dtype="<f2").tobytes())
+    with open(os.path.join(graph_dir, "neighbors.i32"), "ab") as f:
+        f.write(np.full((len(keys), k), -1, dtype="<i4").tobytes())
+    with open(os.path.join(graph_dir, "scores.f16"), "ab") as f:
+        f.write(np.full((len(keys), k), -np.inf, dtype="<f2").tobytes())
+    with open(os.path.join(graph_dir, "keys.txt"), "a") as f:
+        f.writelines(f"{key}\n" for key in keys)
+
+
+def _fill_rows(graph: KnnGraph, first_row: int, block_rows: int, block_cols: int, workers: int) -> None:
+    """Compute the neighbour lists of rows [first_row, count) against all rows, one row block per task."""
+
+    def run(start: int) -> None:
+        stop = min(start + block_rows, graph.count)
+        queries = np.asarray(graph.vectors[start:stop], dtype=np.float32)
+        indices, scores = block_top_k(queries, graph.vectors, graph.k, start, block_cols=block_cols)
+        graph.neighbors[start:stop] = indices
+        graph.scores[start:stop] = scores
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, range(first_row, graph.count, block_rows)))
+
+
+def build_graph(graph_dir: str, keys: Sequence[str], vectors: np.ndarray, k: int = DEFAULT_K,
+                block_rows: int = BLOCK_ROWS, block_cols: int = BLOCK_COLS, workers: int = 1) -> Dict:
+    """Build a graph from scratch; vectors may be a memmap, normalised here in blocks."""
+    os.makedirs(graph_dir, exist_ok=True)
+    for name in ("vectors.f16", "neighbors.i32", "scores.f16", "keys.txt"):
+        open(os.path.join(graph_dir, name), "w").close()
+    started = time.perf_counter()
+    for start in range(0, len(keys), BLOCK_COLS):
+        _append_rows(graph_dir, keys[start:start + BLOCK_COLS], normalize(vectors[start:start + BLOCK_COLS]), k)
+    _write_manifest(graph_dir, len(keys), k, int(vectors.shape[1]))
+
+    graph = KnnGraph(graph_dir, writable=True)
+    _fill_rows(graph, 0, block_rows, block_cols, workers)
+    graph.neighbors.flush()
+    graph.scores.flush()
+    return {"rows": graph.count, "k": k, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def add_to_graph(graph_dir: str, keys: Sequence[str], vectors: np.ndarray, block_rows: int = BLOCK_ROWS,
+                 block_cols: int = BLOCK_COLS, workers: int = 1) -> Dict:
+    """Append rows for keys not yet in the graph and merge them into existing neighbour lists."""
+    started = time.perf_counter()
+    graph = KnnGraph(graph_dir)
+    seen, fresh = set(graph.rows), []
+    for i, key in enumerate(keys):
+        if key not in seen:
+            seen.add(key)
+            fresh.append(i)
+    old_count, k = graph.count, graph.k
+    if not fresh:
+        return {"added": 0, "skipped": len(keys), "rows": old_count, "seconds": 0.0}
+
+    new_vectors = normalize(np.asarray(vectors)[fresh])
+    _append_rows(graph_dir, [keys[i] for i in fresh], new_vectors, k)
+    _write_manifest(graph_dir, old_count + len(fresh), k, graph.dimension)
+    graph = KnnGraph(graph_dir, writable=True)
+
+    _fill_rows(graph, old_count, block_rows, block_cols, workers)
+    stored_new = np.asarray(graph.vectors[old_count:], dtype=np.float32)
+
+    def merge(start: int) -> int:
+        stop = min(start + block_rows, old_count)
+        queries = np.asarray(graph.vectors[start:stop], dtype=np.float32)
+        indices, scores = block_top_k(queries, stored_new, k, column_offset=old_count, block_cols=block_cols)
+        current_scores = graph.scores[start:stop].astype(np.float32)
+        improved = scores[:, 0] > current_scores.min(axis=1)
+        if not improved.any():
+            return 0
+        merged_indices, merged_scores = sort_rows(*merge_top_k(
+            graph.neighbors[start:stop][improved].astype(np.int64), current_scores[improved],
+            indices[improved], scores[improved], k))
+        rows = np.nonzero(improved)[0] + start
+        graph.neighbors[rows] = merged_indices
+        graph.scores[rows] = merged_scores
+        return int(improved.sum())
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        updated = sum(pool.map(merge, range(0, old_count, block_rows)))
+    graph.neighbors.flush()
+    graph.scores.flush()
+    return {"added": len(fresh), "skipped": len(keys) - len(fresh), "rows": graph.count,
+            "existing_rows_updated": updated, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def qdrant_similar(client: QdrantRestClient, collection: str, key: str, limit: int = 10) -> List[Tuple[str, float]]:
+    """Fallback for keys missing from the graph: fetch the key's vector and run a live search."""
+    page = client.scroll(collection, limit=1, filter={"must": [{"key": "object_key", "match": {"value": key}}]},
+                         with_payload=False, with_vector=True)
+    if not page["points"]:
+        return []
+    hits = client.search(collection, page["points"][0]["vector"], limit=limit + 1, with_payload=["object_key"])
+    return [(hit["payload"]["object_key"], hit["score"]) for hit in hits
+            if hit["payload"].get("object_key") != key][:limit]
+
+
+def load_source(args) -> Tuple[List[str], np.ndarray]:
+    """Keys and vectors from --embeddings with --db/--keys, or from the Qdrant collection."""
+    from auto_tag import qdrant_blocks
+    from photoflow_db import connect, iter_mappings
+
+    if args.qdrant:
+        client, collection = client_from_env_file(args.env_file)
+        keys, blocks = [], []
+        for _, block_keys, block in qdrant_blocks(client, collection):
+            keys.extend(block_keys)
+            blocks.append(block)
+        return keys, np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+    vectors = np.load(args.embeddings, mmap_mode="r")
+    if args.keys:
+        with open(args.keys) as f:
+            keys = [line.strip() for line in f if line.strip()]
+    elif args.db:
+        keys = [row[0] for row in iter_mappings(connect(args.db), ["ObjectKey"], order_by="rowid")]
+    else:
+        raise SystemExit("--embeddings needs --db or --keys to name its rows")
+    if len(keys) != len(vectors):
+        raise SystemExit(f"{len(keys)} keys but {len(vectors)} embedding rows")
+    return keys, vectors
+
+
+def run_benchmark(images: int, dimension: int, k: int, workers: int, output_dir: str,
+                  lookups: int = 10000) -> Dict:
+    """Build a graph over clustered random vectors, then time an incremental add and row lookups."""
+    rng = np.random.default_rng(0)
+    centers = normalize(rng.standard_normal((max(1, images // 500), dimension)))
+    labels = rng.integers(0, len(centers), images + images // 100)
+    vectors = centers[labels] + rng.standard_normal((len(labels), dimension)).astype(np.float32) * 0.05
+    keys = [f"bench/{i}.jpg" for i in range(len(labels))]
+
+    build = build_graph(output_dir, keys[:images], vectors[:images], k, workers=workers)
+    add = add_to_graph(output_dir, keys[images:], vectors[images:], workers=workers)
+    graph = KnnGraph(output_dir)
+    sample = rng.integers(0, graph.count, lookups)
+    started = time.perf_counter()
+    for row in sample:
+        graph.similar(graph.keys[row], 10)
+    lookup_us = (time.perf_counter() - started) / lookups * 1e6
+    size_mb = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir)) / 1e6
+    return {"images": images, "dimension": dimension, "k": k, "build_seconds": build["seconds"],
+            "added": add["added"], "add_seconds": add["seconds"], "lookup_us": round(lookup_us, 1),
+            "graph_mb": round(size_mb, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precomputed k-NN graph over stored image embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def source_arguments(sub):
+        sub.add_argument("--embeddings", help="Embeddings .npy (rows aligned with --db or --keys)")
+        sub.add_argument("--db", help="photoflow.db whose ImageMappings rowid order matches --embeddings")
+        sub.add_argument("--keys", help="Text file of object keys, one per --embeddings row")
+        sub.add_argument("--qdrant", action="store_true", help="Read embeddings from the Qdrant collection")
+        sub.add_argument("--env-file", default=".env", help="Qdrant settings (QDRANT_HOST/PORT/COLLECTION)")
+        sub.add_argument("--block-rows", type=int, default=BLOCK_ROWS, help="Query rows per matrix product")
+        sub.add_argument("--block-cols", type=int, default=BLOCK_COLS, help="Graph rows per matrix product")
+        sub.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Row blocks computed in parallel")
+
+    build = subparsers.add_parser("build", help="Build the graph from all stored embeddings")
+    source_arguments(build)
+    build.add_argument("--output", required=True, help="Graph directory")
+    build.add_argument("--k", type=int, default=DEFAULT_K, help=f"Neighbours per image (default: {DEFAULT_K})")
+
+    add = subparsers.add_parser("add", help="Add new uploads to an existing graph")
+    source_arguments(add)
+    add.add_argument("--graph", required=True, help="Graph directory")
+
+    query = subparsers.add_parser("query", help="Look up the neighbours of one image")
+    query.add_argument("--graph", required=True, help="Graph directory")
+    query.add_argument("--key", required=True, help="Object key")
+    query.add_argument("--limit", type=int, default=10, help="Neighbours to print")
+    query.add_argument("--fallback-qdrant", action="store_true", help="Search Qdrant if the key is not in the graph")
+    query.add_argument("--env-file", default=".env", help="Qdrant settings for --fallback-qdrant")
+
+    bench = subparsers.add_parser("benchmark", help="Time build, add and lookups on synthetic vectors")
+    bench.add_argument("--images", type=int, default=100000)
+    bench.add_argument("--dimension", type=int, default=512)
+    bench.add_argument("--k", type=int, default=DEFAULT_K)
+    bench.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    bench.add_argument("--output", default="/tmp/photoflow-knn-bench", help="Graph directory for the benchmark")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        keys, vectors = load_source(args)
+        result = build_graph(args.output, keys, vectors, args.k, args.block_rows, args.block_cols, args.workers)
+        print(f"🕸️  Built {result['k']}-NN graph over {result['rows']:,} images in {result['seconds']}s")
+    elif args.command == "add":
+        keys, vectors = load_source(args)
+        result = add_to_graph(args.graph, keys, vectors, args.block_rows, args.block_cols, args.workers)
+        print(f"➕ Added {result['added']:,} images ({result['skipped']:,} already present), "
+              f"updated {result.get('existing_rows_updated', 0):,} existing rows in {result['seconds']}s")
+    elif args.command == "query":
+        found = KnnGraph(args.graph).similar(args.key, args.limit)
+        source = "graph"
+        if found is None and args.fallback_qdrant:
+            client, collection = client_from_env_file(args.env_file)
+            found, source = qdrant_similar(client, collection, args.key, args.limit), "qdrant"
+        if found is None:
+            sys.exit(f"❌ {args.key} is not in the graph")
+        print(f"🔎 {len(found)} similar images ({source}):")
+        for key, score in found:
+            print(f"   {score:.3f}  {key}")
+    else:
+        result = run_benchmark(args.images, args.dimension, args.k, args.workers, args.output)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped object key → ImageMapping lookup index built from photoflow.db.
+
+QdrantVectorStore.UpsertAsync and search hydration resolve object keys one
+`GetByObjectKeyAsync` query at a time. This index answers whole batches of keys
+with a single vectorised binary search over memory-mapped arrays:
+
+    index_dir/
+        manifest.json            current generation, watermarks, project names
+        gen-000001/hashes.npy    sorted uint64 hashes of active object keys
+        gen-000001/records.npy   parallel (guid, project id, year) records
+
+Updates are incremental: rows whose rowid is past the stored watermark, or whose
+UpdatedDate is at or past it, are merged into a new generation, and manifest.json is
+swapped atomically so open readers keep using the previous generation. Rows at exactly
+the UpdatedDate watermark are fingerprinted (gen-*/boundary.npy), so a row updated
+later within the same timestamp is picked up and an unchanged one is not merged twice.
+Hard-deleted rows leave no delta to merge. After each update the index's key count is
+compared with the active rows in the table, and if they differ, the update becomes a
+full rebuild.
+
+Usage:
+    python3 scripts/data/mapping_index.py build --db photoflow.db --index mapping-index
+    python3 scripts/data/mapping_index.py update --db photoflow.db --index mapping-index
+    python3 scripts/data/mapping_index.py lookup --index mapping-index KEY [KEY ...]
+    python3 scripts/data/mapping_index.py benchmark --rows 1000000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from photoflow_db import connect, insert_mappings, iter_mappings  # noqa: E402
+
+RECORD_DTYPE = np.dtype([("guid", "V16"), ("project", "<u4"), ("year", "<u2")])
+NO_PROJECT = np.iinfo(np.uint32).max
+MANIFEST_NAME = "manifest.json"
+
+
+def hash_key(object_key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(object_key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hash_keys(object_keys: Sequence[str]) -> np.ndarray:
+    return np.fromiter((hash_key(k) for k in object_keys), dtype=np.uint64, count=len(object_keys))
+
+
+def _row_fingerprint(row: tuple) -> int:
+    return int.from_bytes(hashlib.blake2b(repr(tuple(row)).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _boundary(rows: Sequence[tuple], max_updated: Optional[str]) -> np.ndarray:
+    """Fingerprints of the rows whose UpdatedDate equals the watermark."""
+    return np.unique(np.fromiter((_row_fingerprint(r) for r in rows if (r[6] or "") == (max_updated or "")),
+                                 dtype=np.uint64))
+
+
+def _year_value(year: Optional[str]) -> int:
+    return int(year) if year and year.isdigit() else 0
+
+
+class MappingIndex:
+    """Read side of the index: batched lookups against the current generation."""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        generation_dir = os.path.join(index_dir, self.manifest["generation_dir"])
+        self.hashes = np.load(os.path.join(generation_dir, "hashes.npy"), mmap_mode="r")
+        self.records = np.load(os.path.join(generation_dir, "records.npy"), mmap_mode="r")
+        self.projects = self.manifest["projects"]
+        self.overflow = self.manifest.get("overflow", {})
+
+    def __len__(self) -> int:
+        return len(self.hashes) + len(self.overflow)
+
+    def lookup(self, object_keys: Sequence[str]) -> List[Optional[Dict]]:
+        """Resolve a batch of object keys to {guid, project_name, year} (None when unknown)."""
+        if not object_keys:
+            return []
+        hashes = hash_keys(object_keys)
+        positions = np.searchsorted(self.hashes, hashes)
+        positions = np.minimum(positions, max(len(self.hashes) - 1, 0))
+        found = (self.hashes[positions] == hashes) if len(self.hashes) else np.zeros(len(hashes), dtype=bool)
+        records = self.records[positions] if len(self.records) else None
+
+        projects = self.projects
+        overflow = self.overflow
+        guid_hex = records["guid"].tobytes().hex() if records is not None else ""
+        project_ids = records["project"].tolist() if records is not None else []
+        years = records["year"].tolist() if records is not None else []
+
+        results = []
+        for i, (key, hit) in enumerate(zip(object_keys, found.tolist())):
+            if overflow and key in overflow:
+                guid, project, year = overflow[key]
+                results.append({"guid": guid, "project_name": project, "year": year})
+            elif hit:
+                h = guid_hex[32 * i:32 * i + 32]
+                project = project_ids[i]
+                results.append({
+                    "guid": f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}",
+                    "project_name": None if project == NO_PROJECT else projects[project],
+                    "year": str(years[i]) if years[i] else None,
+                })
+            else:
+                results.append(None)
+        return results
+
+
+def _write_generation(index_dir: str, manifest: Dict, hashes: np.ndarray, records: np.ndarray,
+                      boundary: np.ndarray) -> Dict:
+    """Write a new generation and atomically point the manifest at it."""
+    os.makedirs(index_dir, exist_ok=True)
+    generation = manifest.get("generation", 0) + 1
+    generation_dir = f"gen-{generation:06d}"
+    path = os.path.join(index_dir, generation_dir)
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "hashes.npy"), hashes)
+    np.save(os.path.join(path, "records.npy"), records)
+    np.save(os.path.join(path, "boundary.npy"), boundary)
+
+    previous_dir = manifest.get("generation_dir")
+    manifest = dict(manifest, generation=generation, generation_dir=generation_dir, row_count=len(hashes))
+    fd, tmp_path = tempfile.mkstemp(dir=index_dir, prefix=".manifest-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(index_dir, MANIFEST_NAME))
+
+    # Keep the previous generation for readers that still have it mapped; drop older ones.
+    for name in os.listdir(index_dir):
+        if name.startswith("gen-") and name not in (generation_dir, previous_dir):
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+    return manifest
+
+
+def _merge(hashes: np.ndarray, records: np.ndarray, manifest: Dict, rows: Sequence[tuple]) -> tuple:
+    """Merge (rowid, Id, ObjectKey, ProjectName, Year, IsActive, UpdatedDate) rows into the arrays."""
+    projects = manifest["projects"]
+    project_ids = {name: i for i, name in enumerate(projects)}
+    overflow = manifest["overflow"]
+
+    # Later rows win when the same key appears more than once in a delta.
+    latest = {}
+    for row in rows:
+        latest[row[2]] = row
+        manifest["max_rowid"] = max(manifest["max_rowid"], row[0])
+        manifest["max_updated"] = max(manifest["max_updated"] or "", row[6] or "")
+
+    keys = list(latest)
+    delta_hashes = hash_keys(keys)
+    keep = ~np.isin(hashes, delta_hashes)
+    for key in keys:
+        overflow.pop(key, None)
+
+    active = [(h, latest[k]) for h, k in zip(delta_hashes.tolist(), keys) if latest[k][5]]
+    new_hashes = np.fromiter((h for h, _ in active), dtype=np.uint64, count=len(active))
+    new_records = np.empty(len(active), dtype=RECORD_DTYPE)
+    for i, (_, row) in enumerate(active):
+        project = row[3]
+        if project is not None and project not in project_ids:
+            project_ids[project] = len(projects)
+            projects.append(project)
+        new_records[i] = (uuid.UUID(row[1]).bytes, NO_PROJECT if project is None else project_ids[project],
+                          _year_value(row[4]))
+
+    hashes = np.concatenate([hashes[keep], new_hashes])
+    records = np.concatenate([records[keep], new_records])
+    order = np.argsort(hashes, kind="stable")
+    hashes, records = hashes[order], records[order]
+
+    # Two distinct keys with the same 64-bit hash: move every such entry to the overflow map.
+    if len(hashes) > 1:
+        duplicate = np.zeros(len(hashes), dtype=bool)
+        same = hashes[1:] == hashes[:-1]
+        duplicate[1:] |= same
+        duplicate[:-1] |= same
+        if duplicate.any():
+            colliding, counts = np.unique(hashes[duplicate], return_counts=True)
+            remaining = dict(zip(colliding.tolist(), counts.tolist()))
+            for key in keys:
+                row = latest[key]
+                h = hash_key(key)
+                if row[5] and h in remaining:
+                    overflow[key] = [str(uuid.UUID(row[1])), row[3], row[4]]
+                    remaining[h] -= 1
+            hashes, records = hashes[~duplicate], records[~duplicate]
+            # Entries not accounted for by this delta belong to keys from a previous
+            # generation; the caller has to look those keys up in the database.
+            return hashes, records, {h for h, left in remaining.items() if left > 0}
+    return hashes, records, set()
+
+
+def build_index(db_path: str, index_dir: str) -> Dict:
+    """Build a fresh index from every active row of ImageMappings."""
+    manifest = {"projects": [], "overflow": {}, "max_rowid": 0, "max_updated": None}
+    if os.path.exists(os.path.join(index_dir, MANIFEST_NAME)):
+        with open(os.path.join(index_dir, MANIFEST_NAME)) as f:
+            manifest["generation"] = json.load(f).get("generation", 0)
+    conn = connect(db_path)
+    try:
+        rows = list(iter_mappings(conn, ("rowid", "Id", "ObjectKey", "ProjectName", "Year", "IsActive",
+                                         "UpdatedDate")))
+    finally:
+        conn.close()
+    hashes, records, _ = _merge(np.empty(0, dtype=np.uint64), np.empty(0, dtype=RECORD_DTYPE), manifest, rows)
+    return _write_generation(index_dir, manifest, hashes, records, _boundary(rows, manifest["max_updated"]))
+
+
+def update_index(db_path: str, index_dir: str) -> Dict:
+    """Merge rows added or updated since the last build/update into a new generation.
+
+    Falls back to build_index when rows were deleted from ImageMappings since the last run.
+    """
+    with open(os.path.join(index_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    columns = ("rowid", "Id", "ObjectKey", "ProjectName", "Year", "IsActive", "UpdatedDate")
+    boundary_path = os.path.join(index_dir, manifest["generation_dir"], "boundary.npy")
+    seen = set(np.load(boundary_path).tolist()) if os.path.exists(boundary_path) else set()
+    previous_max = manifest["max_updated"]
+    conn = connect(db_path)
+    try:
+        rows = [row for row in iter_mappings(conn, columns, where="rowid > ? OR UpdatedDate >= ?",
+                                             params=(manifest["max_rowid"], previous_max or ""))
+                if not (row[0] <= manifest["max_rowid"] and (row[6] or "") == (previous_max or "")
+                        and _row_fingerprint(row) in seen)]
+        active = conn.execute('SELECT COUNT(*) FROM "ImageMappings" WHERE IsActive = 1').fetchone()[0]
+        manifest["delta_rows"] = len(rows)
+        if not rows and manifest["row_count"] + len(manifest["overflow"]) == active:
+            return manifest
+
+        index = MappingIndex(index_dir)
+        hashes, records, unresolved = _merge(np.array(index.hashes), np.array(index.records), manifest, rows)
+        del index
+        if unresolved:
+            # Extremely rare 64-bit hash collision with an older key: find it with one table scan.
+            for row in iter_mappings(conn, columns, where="IsActive = 1"):
+                if hash_key(row[2]) in unresolved:
+                    manifest["overflow"][row[2]] = [str(uuid.UUID(row[1])), row[3], row[4]]
+    finally:
+        conn.close()
+    if len(hashes) + len(manifest["overflow"]) != active:
+        # Every active row has been merged, so any extra keys belong to rows deleted from the table.
+        delta_rows = manifest["delta_rows"]
+        return dict(build_index(db_path, index_dir), delta_rows=delta_rows, rebuilt=True)
+    boundary = _boundary(rows, manifest["max_updated"])
+    if manifest["max_updated"] == previous_max:
+        boundary = np.union1d(np.fromiter(seen, dtype=np.uint64, count=len(seen)), boundary)
+    return _write_generation(index_dir, manifest, hashes, records, boundary)
+
+
+def _synthetic_rows(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    projects = [f"Project{i:03d}" for i in range(200)]
+    for i in range(count):
+        project = projects[i % len(projects)]
+        year = 2015 + (i % 10)
+        key = f"{year}-{1 + i % 12:02d}-{1 + i % 28:02d}/{project}/RawFiles/Roll{i % 50:02d}/IMG_{i:07d}.jpg"
+        yield {
+            "Id": str(uuid.UUID(int=rng.getrandbits(128), version=4)).upper(),
+            "ObjectKey": key, "FileName": key.rsplit("/", 1)[1], "ProjectName": project,
+            "UploadDate": "2025-01-01 00:00:00", "FileSize": 1000, "ContentType": "image/jpeg",
+            "DirectoryName": f"Roll{i % 50:02d}", "Year": str(year), "IsActive": 1,
+            "UpdatedDate": "2025-01-01 00:00:00",
+        }
+
+
+def run_benchmark(rows: int = 1_000_000, queries: int = 10_000, work_dir: Optional[str] = None) -> Dict:
+    """Compare per-row SQLite lookups against batched index lookups on a synthetic table."""
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="mapping-index-bench-")
+    try:
+        db_path = os.path.join(work_dir, "photoflow.db")
+        index_dir = os.path.join(work_dir, "index")
+        conn = connect(db_path, create=True)
+        start = time.perf_counter()
+        insert_mappings(conn, _synthetic_rows(rows))
+        populate_seconds = time.perf_counter() - start
+        keys = [k for (k,) in conn.execute('SELECT ObjectKey FROM "ImageMappings" ORDER BY random() LIMIT ?',
+                                           (queries,))]
+
+        start = time.perf_counter()
+        for key in keys:
+            conn.execute('SELECT Id, ProjectName, Year FROM "ImageMappings" WHERE ObjectKey = ? AND IsActive = 1',
+                         (key,)).fetchone()
+        per_row_seconds = time.perf_counter() - start
+        conn.close()
+
+        start = time.perf_counter()
+        build_index(db_path, index_dir)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = MappingIndex(index_dir)
+        results = index.lookup(keys)
+        batch_seconds = time.perf_counter() - start
+        assert all(r is not None for r in results)
+
+        index_bytes = sum(os.path.getsize(os.path.join(dirpath, f))
+                          for dirpath, _, files in os.walk(index_dir) for f in files)
+        return {
+            "rows": rows,
+            "queries": len(keys),
+            "populate_seconds": round(populate_seconds, 3),
+            "build_seconds": round(build_seconds, 3),
+            "index_bytes": index_bytes,
+            "per_row_seconds": round(per_row_seconds, 4),
+            "per_row_lookups_per_second": round(len(keys) / per_row_seconds),
+            "batched_seconds": round(batch_seconds, 4),
+            "batched_lookups_per_second": round(len(keys) / batch_seconds),
+            "speedup": round(per_row_seconds / batch_seconds, 1),
+        }
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Object key → GUID lookup index for photoflow.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("build", "update"):
+        p = sub.add_parser(name, help=f"{name.capitalize()} the index from photoflow.db")
+        p.add_argument("--db", default="photoflow.db", help="Path to photoflow.db")
+        p.add_argument("--index", default="mapping-index", help="Index directory")
+    p = sub.add_parser("lookup", help="Resolve object keys using the index")
+    p.add_argument("--index", default="mapping-index", help="Index directory")
+    p.add_argument("keys", nargs="+", help="Object keys to resolve")
+    p = sub.add_parser("benchmark", help="Benchmark against per-row SQLite queries on synthetic data")
+    p.add_argument("--rows", type=int, default=1_000_000, help="Synthetic ImageMappings rows")
+    p.add_argument("--queries", type=int, default=10_000, help="Keys to resolve")
+    p.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build_index(args.db, args.index)
+        print(f"✅ Built index generation {manifest['generation']} with {manifest['row_count']} keys")
+    elif args.command == "update":
+        manifest = update_index(args.db, args.index)
+        rebuilt = " (rows were deleted: rebuilt in full)" if manifest.get("rebuilt") else ""
+        print(f"✅ Merged {manifest['delta_rows']} changed rows; index has {manifest['row_count']} keys{rebuilt}")
+    elif args.command == "lookup":
+        index = MappingIndex(args.index)
+        for key, result in zip(args.keys, index.lookup(args.keys)):
+            print(json.dumps({"object_key": key, **(result or {"guid": None})}))
+    else:
+        print(f"⏱️  Benchmarking {args.queries} lookups against {args.rows} synthetic rows...")
+        results = run_benchmark(args.rows, args.queries)
+        print(json.dumps(results, indent=2))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Per-year Qdrant collections behind a query router, for date-filtered search at scale.
+
+QdrantVectorStore writes every image into one collection, so its HNSW graph grows with
+the whole library even though most searches filter by year (SearchController passes
+`year` and `project_name` as match filters). Here the library is split into one
+collection per year of the object key:
+
+    {base}-2024, {base}-2025, {base}-undated              one bucket per year
+    {base}-2025, {base}-2025-1, {base}-2025-2             a year split into 3 size buckets
+
+The partition map is the collection list itself, so nothing else needs to be kept in
+sync. A point's bucket within its year is a hash of its id modulo the year's bucket
+count, so upserting the same point again always lands in the same collection.
+
+PartitionedCollections has the upsert_points / search / count signature of
+QdrantRestClient. A search whose filter pins `year` goes to that year's buckets only;
+any other search fans out to every partition. Each partition returns its own top
+`limit` and the router merges them, so results match a single collection's.
+
+`rebalance` copies a monolithic collection into partitions and splits years that
+outgrew --max-points into more buckets, moving only the points whose bucket changed.
+New partitions are provisioned like the base collection (provision_qdrant.py).
+
+Usage:
+    python3 scripts/data/partitioned_collections.py rebalance --env-file .env --source images --max-points 2000000
+    python3 scripts/data/partitioned_collections.py list --env-file .env
+    python3 scripts/data/partitioned_collections.py benchmark --sizes 10000 30000 100000
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+import numpy as np  # noqa: E402
+
+from provision_qdrant import PAYLOAD_INDEXES, provision  # noqa: E402
+from qdrant_rest import FakeQdrant, QdrantRestClient, client_from_env_file, image_payload  # noqa: E402
+
+UNDATED = "undated"
+DEFAULT_MAX_POINTS = 2_000_000
+# Qdrant scores these as distances: smaller is better.
+DISTANCE_METRICS = {"Euclid", "Manhattan"}
+
+
+def partition_name(base: str, year: str, bucket: int = 0) -> str:
+    name = f"{base}-{year}"
+    return name if bucket == 0 else f"{name}-{bucket}"
+
+
+def parse_partition(base: str, name: str) -> Optional[Tuple[str, int]]:
+    """(year, bucket) of a partition collection of base, or None for any other collection."""
+    if not name.startswith(base + "-"):
+        return None
+    parts = name[len(base) + 1:].split("-")
+    year = parts[0]
+    if not ((len(year) == 4 and year.isdigit()) or year == UNDATED) or len(parts) > 2:
+        return None
+    if len(parts) == 2:
+        return (year, int(parts[1])) if parts[1].isdigit() and int(parts[1]) > 0 else None
+    return year, 0
+
+
+def point_year(point: Dict) -> str:
+    payload = point.get("payload") or {}
+    year = payload.get("year") or image_payload(payload.get("object_key") or payload.get("path") or "", "").get("year")
+    return str(year) if year else UNDATED
+
+
+def bucket_of(point_id: Any, buckets: int) -> int:
+    digest = hashlib.blake2b(str(point_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % buckets
+
+
+def filter_years(filter: Optional[Dict]) -> Optional[Set[str]]:
+    """The years a filter's `must` clauses pin results to, or None if it can match any year."""
+    years = None
+    for condition in (filter or {}).get("must") or []:
+        if condition.get("key") != "year":
+            continue
+        match = condition.get("match", {})
+        values = {str(match["value"])} if "value" in match else {str(v) for v in match.get("any", [])}
+        years = values if years is None else years & values
+    return years
+
+
+def spec_from_collection(info: Dict) -> Dict:
+    """A provision_qdrant spec that recreates a collection's vector, HNSW, optimizer and index settings."""
+    config = info["config"]
+    schema = info.get("payload_schema") or {}
+    return {
+        "vectors": config["params"]["vectors"],
+        "hnsw_config": config.get("hnsw_config") or {},
+        "optimizers_config": config.get("optimizer_config") or {},
+        "on_disk_payload": config["params"].get("on_disk_payload", True),
+        "quantization_config": config.get("quantization_config"),
+        "payload_indexes": {field: value.get("data_type", "keyword") for field, value in schema.items()}
+        or dict(PAYLOAD_INDEXES),
+    }
+
+
+class PartitionedCollections:
+    """Routes upserts, searches and counts for `base` to its per-year partition collections."""
+
+    def __init__(self, client: QdrantRestClient, base: str, spec: Optional[Dict] = None, workers: int = 8):
+        self.client = client
+        self.base = base
+        self.spec = spec
+        self.workers = workers
+        self.partitions: Dict[str, List[str]] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Re-read the partition map from the collection list."""
+        found: Dict[str, Dict[int, str]] = {}
+        for name in self.client.list_collections():
+            parsed = parse_partition(self.base, name)
+            if parsed:
+                found.setdefault(parsed[0], {})[parsed[1]] = name
+        self.partitions = {}
+        for year, buckets in found.items():
+            if sorted(buckets) != list(range(len(buckets))):
+                raise ValueError(f"Partitions of {self.base} for {year} are not numbered 0..n-1: {sorted(buckets)}")
+            self.partitions[year] = [buckets[i] for i in range(len(buckets))]
+
+    def _spec(self) -> Dict:
+        if self.spec is None:
+            template = self.client.get_collection(self.base)
+            if template is None:
+                existing = [names[0] for names in self.partitions.values()]
+                template = self.client.get_collection(existing[0]) if existing else None
+            if template is None:
+                raise ValueError(f"No collection '{self.base}' or partition to copy settings from; "
+                                 "provision it first (provision_qdrant.py)")
+            self.spec = spec_from_collection(template)
+        return self.spec
+
+    def ensure_buckets(self, year: str, buckets: int) -> List[str]:
+        """Create the year's partitions up to `buckets` (never removes any)."""
+        names = self.partitions.setdefault(year, [])
+        for bucket in range(len(names), buckets):
+            name = partition_name(self.base, year, bucket)
+            provision(self.client, name, self._spec())
+            names.append(name)
+        return names
+
+    def collection_for(self, point: Dict) -> str:
+        year = point_year(point)
+        names = self.partitions.get(year) or self.ensure_buckets(year, 1)
+        return names[bucket_of(point["id"], len(names))]
+
+    def collections_for(self, filter: Optional[Dict] = None) -> List[str]:
+        years = filter_years(filter)
+        return [name for year, names in sorted(self.partitions.items()) if years is None or year in years
+                for name in names]
+
+    def upsert_points(self, name: str, points: List[Dict], wait: bool = True) -> None:
+        # A long-running writer must see buckets that a rebalance added since it started, or it
+        # would keep writing points to the bucket they are being moved out of.
+        self.refresh()
+        groups: Dict[str, List[Dict]] = {}
+        for point in points:
+            groups.setdefault(self.collection_for(point), []).append(point)
+        for collection, group in groups.items():
+            self.client.upsert_points(collection, group, wait)
+
+    def _fan_out(self, collections: List[str], call) -> List:
+        if len(collections) <= 1:
+            return [call(name) for name in collections]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(collections))) as pool:
+            return list(pool.map(call, collections))
+
+    def search(self, name: str, vector: List[float], limit: int = 10, filter: Optional[Dict] = None,
+               score_threshold: Optional[float] = None, with_payload: Any = True) -> List[Dict]:
+        """Top-`limit` hits over the partitions the filter can match, merged by score.
+
+        While a rebalance moves a point, it briefly exists in two buckets; each id is returned once.
+        """
+        collections = self.collections_for(filter)
+        results = self._fan_out(collections, lambda collection: self.client.search(
+            collection, vector, limit, filter, score_threshold, with_payload))
+        distance = self._spec()["vectors"].get("distance") if collections else None
+        pick = heapq.nsmallest if distance in DISTANCE_METRICS else heapq.nlargest
+        hits: Dict[Any, Dict] = {}
+        for hit in pick(limit * len(results), (hit for partial in results for hit in partial),
+                        key=lambda hit: hit["score"]):
+            hits.setdefault(hit["id"], hit)
+        return list(hits.values())[:limit]
+
+    def count(self, name: str, filter: Optional[Dict] = None, exact: bool = True) -> int:
+        return sum(self._fan_out(self.collections_for(filter),
+                                 lambda collection: self.client.count(collection, filter, exact)))
+
+    def sizes(self) -> Dict[str, int]:
+        return {name: self.client.count(name, exact=False) for names in self.partitions.values() for name in names}
+
+
+def _move(client: QdrantRestClient, source: str, points: List[Dict], router: PartitionedCollections,
+          delete: bool) -> int:
+    router.upsert_points(router.base, [{"id": p["id"], "vector": p["vector"], "payload": p.get("payload") or {}}
+                                       for p in points])
+    if delete:
+        client.delete_points(source, [p["id"] for p in points])
+    return len(points)
+
+
+def _scroll_pages(client: QdrantRestClient, collection: str, page_size: int, with_payload: Any = True,
+                  with_vector: bool = True) -> Iterable[List[Dict]]:
+    offset = None
+    while True:
+        page = client.scroll(collection, page_size, offset, with_payload=with_payload, with_vector=with_vector)
+        yield page["points"]
+        offset = page.get("next_page_offset")
+        if offset is None:
+            return
+
+
+def rebalance(client: QdrantRestClient, base: str, max_points: int = DEFAULT_MAX_POINTS,
+              source: Optional[str] = None, drop_source: bool = False, page_size: int = 1000,
+              spec: Optional[Dict] = None) -> Dict:
+    """Copy `source` into partitions, then split every year holding more than max_points into more buckets."""
+    started = time.perf_counter()
+    router = PartitionedCollections(client, base, spec)
+    stats = {"copied": 0, "moved": 0, "split_years": {}}
+    if source:
+        if router.spec is None and client.get_collection(base) is None:
+            router.spec = spec_from_collection(client.get_collection(source))
+        # Size the buckets for the incoming points before any are written, so they land once.
+        per_year: Dict[str, int] = {}
+        for page in _scroll_pages(client, source, page_size):
+            for point in page:
+                year = point_year(point)
+                per_year[year] = per_year.get(year, 0) + 1
+        sizes = router.sizes()
+        for year, incoming in per_year.items():
+            existing = sum(sizes.get(name, 0) for name in router.partitions.get(year, []))
+            router.ensure_buckets(year, max(1, math.ceil((existing + incoming) / max_points)))
+        for page in _scroll_pages(client, source, page_size):
+            if page:
+                stats["copied"] += _move(client, source, page, router, delete=False)
+
+    sizes = router.sizes()
+    for year, names in sorted(router.partitions.items()):
+        total = sum(sizes.get(name, 0) for name in names)
+        wanted = math.ceil(total / max_points)
+        if wanted <= len(names):
+            continue
+        old_names = list(names)
+        router.ensure_buckets(year, wanted)
+        stats["split_years"][year] = [len(old_names), wanted]
+        for name in old_names:
+            # Collect only the ids first (deleting while scrolling would shift the pages), then
+            # fetch vectors and payloads a page at a time, so a split of millions of points
+            # never holds more than one page of vectors.
+            leaving = [point["id"] for page in _scroll_pages(client, name, page_size, False, False) for point in page
+                       if bucket_of(point["id"], wanted) != old_names.index(name)]
+            for start in range(0, len(leaving), page_size):
+                points = client.retrieve_points(name, leaving[start:start + page_size], with_vector=True)
+                stats["moved"] += _move(client, name, points, router, delete=True)
+
+    if source and drop_source:
+        if router.count(base) < client.count(source):
+            raise ValueError(f"Partitions hold fewer points than '{source}'; not dropping it")
+        client.delete_collection(source)
+        stats["dropped_source"] = source
+    stats["partitions"] = router.sizes()
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def _load_direct(fake: FakeQdrant, collection: str, points: List[Dict]) -> None:
+    """Insert straight into the fake's store; the benchmark only times queries over HTTP."""
+    fake.handle("PUT", f"/collections/{collection}/points", {"points": points})
+
+
+def run_benchmark(sizes: List[int], dimension: int = 128, years: int = 10, queries: int = 50) -> List[Dict]:
+    """Filtered and unfiltered search latency, one collection vs per-year partitions, as the library grows."""
+    rng = np.random.default_rng(0)
+    body = {"vectors": {"size": dimension, "distance": "Cosine"}}
+    results = []
+    for size in sizes:
+        with FakeQdrant() as fake:
+            client = QdrantRestClient(fake.url)
+            client.create_collection("images", body)
+            client.create_payload_index("images", "year")
+            router = PartitionedCollections(client, "images-parts", spec_from_collection(client.get_collection("images")))
+            for start in range(0, size, 5000):
+                vectors = rng.standard_normal((min(5000, size - start), dimension)).astype(np.float32)
+                points = []
+                for i, vector in enumerate(vectors.tolist(), start):
+                    key = f"{2025 - i % years}-05-13/Project{i % 23}/RawFiles/CameraA/IMG_{i:07d}.jpg"
+                    points.append({"id": i, "vector": vector, "payload": image_payload(key, str(i))})
+                _load_direct(fake, "images", points)
+                groups: Dict[str, List[Dict]] = {}
+                for point in points:
+                    groups.setdefault(router.collection_for(point), []).append(point)
+                for name, group in groups.items():
+                    _load_direct(fake, name, group)
+
+            query_vectors = rng.standard_normal((queries, dimension)).astype(np.float32).tolist()
+            year_filter = {"must": [{"key": "year", "match": {"value": "2024"}}]}
+            row = {"points": size, "partitions": len(router.collections_for())}
+            for label, store, collection, filter in (
+                    ("single_filtered_ms", client, "images", year_filter),
+                    ("partitioned_filtered_ms", router, "images-parts", year_filter),
+                    ("single_unfiltered_ms", client, "images", None),
+                    ("partitioned_unfiltered_ms", router, "images-parts", None)):
+                latencies = []
+                for vector in query_vectors:
+                    started = time.perf_counter()
+                    store.search(collection, vector, 10, filter, with_payload=False)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                row[label] = round(statistics.median(latencies), 2)
+            results.append(row)
+    return results
+
+
+def _qdrant(args) -> Tuple[QdrantRestClient, str]:
+    return client_from_env_file(args.env_file, args.url, args.base)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-year Qdrant partitions with a query router")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def qdrant_arguments(sub):
+        sub.add_argument("--env-file", default=".env", help="Qdrant settings (QDRANT_HOST/PORT/COLLECTION)")
+        sub.add_argument("--url", help="Qdrant URL (default: from QDRANT_HOST/QDRANT_PORT)")
+        sub.add_argument("--base", help="Partition name prefix (default: QDRANT_COLLECTION or 'images')")
+
+    listing = subparsers.add_parser("list", help="Show partitions and their sizes")
+    qdrant_arguments(listing)
+
+    balance = subparsers.add_parser("rebalance", help="Copy a collection into partitions and split large years")
+    qdrant_arguments(balance)
+    balance.add_argument("--source", help="Monolithic collection to copy in (e.g. the current QDRANT_COLLECTION)")
+    balance.add_argument("--drop-source", action="store_true", help="Delete --source once every point is copied")
+    balance.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS, help="Points per bucket")
+    balance.add_argument("--page-size", type=int, default=1000, help="Points per scroll/upsert request")
+
+    bench = subparsers.add_parser("benchmark", help="Search latency, one collection vs partitions, via FakeQdrant")
+    bench.add_argument("--sizes", type=int, nargs="+", default=[10000, 30000, 100000])
+    bench.add_argument("--dimension", type=int, default=128)
+    bench.add_argument("--years", type=int, default=10)
+    bench.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        print(json.dumps(run_benchmark(args.sizes, args.dimension, args.years, args.queries), indent=2))
+        return
+    client, base = _qdrant(args)
+    if args.command == "list":
+        router = PartitionedCollections(client, base)
+        for name, size in router.sizes().items():
+            print(f"   {name}: {size:,} points")
+        print(f"🗂️  {len(router.collections_for())} partitions of '{base}'")
+    else:
+        stats = rebalance(client, base, args.max_points, args.source, args.drop_source, args.page_size)
+        print(f"🔀 Copied {stats['copied']:,} points, moved {stats['moved']:,} between buckets in {stats['seconds']}s")
+        for year, (before, after) in stats["split_years"].items():
+            print(f"   ✂️  {year}: {before} → {after} buckets")
+
+
+if __name__ == "__main__":
+    main()
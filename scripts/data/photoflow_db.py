@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Helpers for reading and writing the ImageMappings table of photoflow.db from Python tooling.
+
+The schema matches what EF Core creates for PhotoFlowDbContext (see
+backend/AzurePhotoFlow.Api/Data), so synthetic databases built here can be
+opened by the API and vice versa.
+"""
+
+import sqlite3
+from typing import Dict, Iterable, Iterator, Optional
+
+IMAGE_MAPPINGS_DDL = [
+    '''CREATE TABLE IF NOT EXISTS "ImageMappings" (
+    "Id" TEXT NOT NULL CONSTRAINT "PK_ImageMappings" PRIMARY KEY,
+    "ObjectKey" TEXT NOT NULL,
+    "FileName" TEXT NOT NULL,
+    "ProjectName" TEXT NULL,
+    "UploadDate" TEXT NOT NULL DEFAULT (CURRENT_TIMESTAMP),
+    "FileSize" INTEGER NOT NULL,
+    "ContentType" TEXT NOT NULL,
+    "Width" INTEGER NULL,
+    "Height" INTEGER NULL,
+    "DirectoryName" TEXT NULL,
+    "Year" TEXT NULL,
+    "IsActive" INTEGER NOT NULL DEFAULT 1,
+    "UpdatedDate" TEXT NOT NULL DEFAULT (CURRENT_TIMESTAMP),
+    "MetadataJson" TEXT NULL
+)''',
+    'CREATE INDEX IF NOT EXISTS "IX_ImageMappings_IsActive" ON "ImageMappings" ("IsActive")',
+    'CREATE UNIQUE INDEX IF NOT EXISTS "IX_ImageMappings_ObjectKey" ON "ImageMappings" ("ObjectKey")',
+    'CREATE INDEX IF NOT EXISTS "IX_ImageMappings_ProjectName" ON "ImageMappings" ("ProjectName")',
+    'CREATE INDEX IF NOT EXISTS "IX_ImageMappings_ProjectName_Year_IsActive" '
+    'ON "ImageMappings" ("ProjectName", "Year", "IsActive")',
+    'CREATE INDEX IF NOT EXISTS "IX_ImageMappings_UploadDate" ON "ImageMappings" ("UploadDate")',
+    'CREATE INDEX IF NOT EXISTS "IX_ImageMappings_Year" ON "ImageMappings" ("Year")',
+]
+
+IMAGE_MAPPING_COLUMNS = [
+    "Id", "ObjectKey", "FileName", "ProjectName", "UploadDate", "FileSize", "ContentType",
+    "Width", "Height", "DirectoryName", "Year", "IsActive", "UpdatedDate", "MetadataJson",
+]
+
+
+def connect(db_path: str, create: bool = False) -> sqlite3.Connection:
+    """Open photoflow.db, optionally creating the ImageMappings schema."""
+    conn = sqlite3.connect(db_path)
+    if create:
+        with conn:
+            for statement in IMAGE_MAPPINGS_DDL:
+                conn.execute(statement)
+    return conn
+
+
+def insert_mappings(conn: sqlite3.Connection, rows: Iterable[Dict], batch_size: int = 10000) -> int:
+    """Bulk insert ImageMapping rows (dicts keyed by column name); returns the number inserted."""
+    placeholders = ", ".join("?" for _ in IMAGE_MAPPING_COLUMNS)
+    sql = f'INSERT INTO "ImageMappings" ({", ".join(IMAGE_MAPPING_COLUMNS)}) VALUES ({placeholders})'
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(tuple(row.get(column) for column in IMAGE_MAPPING_COLUMNS))
+        if len(batch) >= batch_size:
+            with conn:
+                conn.executemany(sql, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        with conn:
+            conn.executemany(sql, batch)
+        total += len(batch)
+    return total
+
+
+def iter_mappings(conn: sqlite3.Connection, columns: Iterable[str] = ("Id", "ObjectKey", "ProjectName", "Year"),
+                  where: Optional[str] = None, params: tuple = (), order_by: Optional[str] = None,
+                  batch_size: int = 10000) -> Iterator[tuple]:
+    """Stream ImageMappings rows in fetchmany batches without loading the table into memory."""
+    sql = f'SELECT {", ".join(columns)} FROM "ImageMappings"'
+    if where:
+        sql += f" WHERE {where}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
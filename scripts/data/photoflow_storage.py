@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for Python tooling that works on the AzurePhotoFlow object store.
+
+The key layout mirrors MinIODirectoryHelper in AzurePhotoFlow.Shared:
+
+    {yyyy-MM-dd}/{project}/{RawFiles|ProcessedFiles}/{directory}/{relative path}
+
+Objects can be read either from a local directory (a MinIO data directory or an
+`mc mirror` of the bucket, where object keys are relative file paths) or from a
+running MinIO server through the optional `minio` package.
+"""
+
+import importlib.util
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+BUCKET_NAME = "photostore"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".gif")
+CATEGORIES = ("RawFiles", "ProcessedFiles")
+# Sibling of RawFiles/ProcessedFiles that holds derived artifacts (previews, model inputs).
+# GetDirectoryDetailsAsync only walks the two upload categories, so it never lists these.
+DERIVED_CATEGORY = "Derived"
+
+MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".bmp": "image/bmp",
+    ".gif": "image/gif",
+}
+
+
+def is_image_file(file_name: str) -> bool:
+    """Same extension check as MinIODirectoryHelper.IsImageFile."""
+    return os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def get_mime_type(file_name: str) -> str:
+    """Same mapping as MinIODirectoryHelper.GetMimeType."""
+    return MIME_TYPES.get(os.path.splitext(file_name)[1].lower(), "application/octet-stream")
+
+
+def sanitize(value: str) -> str:
+    """Normalise a path segment the same way MinIODirectoryHelper.Sanitize does."""
+    return value.strip().replace("\\", "/").replace("..", "").strip("/").replace("  ", " ")
+
+
+def get_destination_path(timestamp: datetime, project_name: str, directory_name: str, is_raw_files: bool) -> str:
+    """Build the `{date}/{project}/{category}/{directory}` prefix used for uploads."""
+    category = "RawFiles" if is_raw_files else "ProcessedFiles"
+    return f"{timestamp.strftime('%Y-%m-%d')}/{sanitize(project_name)}/{category}/{sanitize(directory_name)}"
+
+
+def parse_object_key(object_key: str) -> Optional[Dict[str, str]]:
+    """Split an object key into its layout components, or return None if it does not match."""
+    parts = object_key.split("/")
+    if len(parts) < 5 or parts[2] not in CATEGORIES:
+        return None
+    date_part = parts[0]
+    try:
+        datetime.strptime(date_part, "%Y-%m-%d")
+    except ValueError:
+        return None
+    return {
+        "date": date_part,
+        "year": date_part[:4],
+        "project_name": parts[1],
+        "category": parts[2],
+        "directory": parts[3],
+        "relative_path": "/".join(parts[4:]),
+        "file_name": parts[-1],
+    }
+
+
+def get_derived_key(object_key: str, variant: str, extension: str) -> Optional[str]:
+    """Map an original object key to the key of one of its derivatives.
+
+    Example:
+        2025-05-13/WeddingSmith/RawFiles/CameraA/IMG_0001.jpg, variant "w256", extension ".jpg"
+        → 2025-05-13/WeddingSmith/Derived/w256/RawFiles/CameraA/IMG_0001.jpg
+    """
+    parts = parse_object_key(object_key)
+    if parts is None:
+        return None
+    stem = os.path.splitext(parts["relative_path"])[0]
+    return (f"{parts['date']}/{parts['project_name']}/{DERIVED_CATEGORY}/{variant}/"
+            f"{parts['category']}/{parts['directory']}/{stem}{extension}")
+
+
+class LocalObjectStore:
+    """Object store backed by a directory whose relative file paths are the object keys."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def list_objects(self, prefix: str = "") -> Iterator[Dict]:
+        """Yield {key, size, last_modified} for every object under prefix, sorted by key."""
+        base = self.root
+        start = base / prefix.rsplit("/", 1)[0] if "/" in prefix else base
+        keys = []
+        for dirpath, _, filenames in os.walk(start):
+            for name in filenames:
+                key = Path(dirpath, name).relative_to(base).as_posix()
+                if key.startswith(prefix) and not name.startswith(".") and "/." not in key:
+                    keys.append(key)
+        for key in sorted(keys):
+            stat = self._path(key).stat()
+            yield {"key": key, "size": stat.st_size, "last_modified": stat.st_mtime}
+
+    def get_object(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        with open(self._path(key), "rb") as f:
+            f.seek(offset)
+            return f.read() if length is None else f.read(length)
+
+    def put_object(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Return a filesystem path for the object so workers can read it directly."""
+        return str(self._path(key))
+
+
+class MinioObjectStore:
+    """Object store backed by a MinIO/S3 server (requires the `minio` package)."""
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket: str = BUCKET_NAME):
+        if importlib.util.find_spec("minio") is None:
+            raise RuntimeError(
+                "minio package is required to read from a MinIO server. Install it via 'pip install minio'."
+            )
+        from minio import Minio
+
+        secure = endpoint.startswith("https://")
+        host = endpoint.split("://", 1)[-1].rstrip("/")
+        self.endpoint = endpoint
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.bucket = bucket
+        self.client = Minio(host, access_key=access_key, secret_key=secret_key, secure=secure)
+
+    def __getstate__(self):
+        # The client holds a connection pool; rebuild it in worker processes.
+        return {"endpoint": self.endpoint, "access_key": self.access_key,
+                "secret_key": self.secret_key, "bucket": self.bucket}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def list_objects(self, prefix: str = "") -> Iterator[Dict]:
+        for obj in self.client.list_objects(self.bucket, prefix=prefix, recursive=True):
+            if obj.is_dir:
+                continue
+            yield {
+                "key": obj.object_name,
+                "size": obj.size,
+                "etag": (obj.etag or "").strip('"'),
+                "last_modified": obj.last_modified.timestamp() if obj.last_modified else None,
+            }
+
+    def get_object(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        response = self.client.get_object(self.bucket, key, offset=offset, length=length or 0)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def put_object(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> None:
+        import io
+        self.client.put_object(self.bucket, key, io.BytesIO(data), len(data), content_type=content_type)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+
+def open_object_store(source: str, bucket: str = BUCKET_NAME):
+    """Open `minio` (using MINIO_* environment variables) or a local directory.
+
+    Without the `minio` package the server is reached through the stdlib S3 client in s3_rest.py.
+    """
+    if source == "minio":
+        credentials = (
+            os.getenv("MINIO_ENDPOINT", "http://localhost:9000"),
+            os.getenv("MINIO_ACCESS_KEY", "minioadmin"),
+            os.getenv("MINIO_SECRET_KEY", "minioadmin"),
+            bucket,
+        )
+        if importlib.util.find_spec("minio") is None:
+            from s3_rest import S3RestClient
+            return S3RestClient(*credentials)
+        return MinioObjectStore(*credentials)
+    return LocalObjectStore(source)
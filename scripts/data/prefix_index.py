@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Prefix-tree index of the photostore bucket for instant project and directory listings.
+
+MinIOImageUploadService.GetProjectsAsync walks the bucket on every call. It makes one
+delimited listing per level, one recursive listing per category and one more per roll
+in CountFilesAsync, so the cost grows with the number of objects. This tool builds the
+same tree once, from a single recursive listing:
+
+    root → {yyyy-MM-dd} → {project} → {RawFiles|ProcessedFiles} → {directory}
+
+Each node holds the object count, total bytes and latest modification time of its
+subtree. Objects below a directory are folded into the directory node, so the index
+grows with the number of rolls, not photos. Keys outside the layout (Derived/ and
+stray files) are only counted at the root.
+
+`update` refreshes the index from new uploads. It takes S3 event records (`mc event`
+or webhook JSON lines) or plain object keys, such as the `uploaded` list in a
+sync_uploads.py report. Every directory they touch is listed again and its node
+replaced, so overwrites and deletes are handled exactly, and only the ancestors of
+those directories are recomputed.
+
+Usage:
+    python3 scripts/data/prefix_index.py build --source minio --index bucket-index.json
+    python3 scripts/data/prefix_index.py update --source minio --index bucket-index.json --events events.jsonl
+    python3 scripts/data/prefix_index.py projects --index bucket-index.json --year 2025
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import unquote_plus
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from photoflow_storage import BUCKET_NAME, CATEGORIES, open_object_store  # noqa: E402
+
+INDEX_VERSION = 1
+TREE_DEPTH = 4  # date, project, category, directory
+
+
+def _node() -> Dict:
+    return {"count": 0, "bytes": 0, "latest": 0.0, "children": {}}
+
+
+def _add(node: Dict, size: int, last_modified: Optional[float]) -> None:
+    node["count"] += 1
+    node["bytes"] += size
+    if last_modified and last_modified > node["latest"]:
+        node["latest"] = last_modified
+
+
+@lru_cache(maxsize=65536)
+def _is_date(value: str) -> bool:
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def tree_path(key: str) -> Optional[List[str]]:
+    """The [date, project, category, directory] path of an object key, or None outside the layout.
+
+    Accepts the same keys as parse_object_key, without building its dict for every object.
+    """
+    parts = key.split("/", TREE_DEPTH)
+    if len(parts) <= TREE_DEPTH or parts[2] not in CATEGORIES or not _is_date(parts[0]):
+        return None
+    return parts[:TREE_DEPTH]
+
+
+class PrefixIndex:
+    """Aggregated counts per bucket prefix, built from listings and saved as JSON."""
+
+    def __init__(self, root: Optional[Dict] = None, unindexed: int = 0, built_at: float = 0.0):
+        self.root = root or _node()
+        self.unindexed = unindexed
+        self.built_at = built_at
+
+    @classmethod
+    def build(cls, objects: Iterable[Dict]) -> "PrefixIndex":
+        """Aggregate a listing per directory first, then roll the totals up the (small) tree."""
+        index = cls(built_at=time.time())
+        directories: Dict[str, List] = {}
+        for obj in objects:
+            size, modified = obj.get("size") or 0, obj.get("last_modified") or 0.0
+            key = obj["key"]
+            prefix = key[:key.rfind("/")]
+            totals = directories.get(prefix)
+            if totals is None:
+                totals = directories[prefix] = [0, 0, 0.0]
+            totals[0] += 1
+            totals[1] += size
+            if modified > totals[2]:
+                totals[2] = modified
+
+        for prefix, (count, size, latest) in directories.items():
+            leaf = {"count": count, "bytes": size, "latest": latest, "children": {}}
+            for node in index._nodes_along(tree_path(prefix + "/_"), leaf):
+                node["count"] += count
+                node["bytes"] += size
+                node["latest"] = max(node["latest"], latest)
+        index.unindexed = index.root["count"] - sum(child["count"] for child in index.root["children"].values())
+        return index
+
+    def _nodes_along(self, path: Optional[List[str]], leaf: Dict) -> List[Dict]:
+        """The root and every node from it to path's directory, created as needed, excluding a new leaf."""
+        nodes = [self.root]
+        if path is None:
+            return nodes
+        for segment in path[:-1]:
+            nodes.append(nodes[-1]["children"].setdefault(segment, _node()))
+        directory = nodes[-1]["children"].get(path[-1])
+        if directory is None:
+            nodes[-1]["children"][path[-1]] = leaf
+        else:
+            nodes.append(directory)
+        return nodes
+
+    def node(self, prefix: str = "") -> Optional[Dict]:
+        """The node for a `date/project/category/directory` prefix (any depth), or None."""
+        node = self.root
+        for segment in [s for s in prefix.split("/") if s]:
+            node = node["children"].get(segment)
+            if node is None:
+                return None
+        return node
+
+    def refresh(self, store, directories: Iterable[str]) -> int:
+        """Re-list each `date/project/category/directory` prefix and replace its node; returns objects listed."""
+        listed = 0
+        for prefix in sorted(set(directories)):
+            path = prefix.strip("/").split("/")
+            if len(path) != TREE_DEPTH:
+                raise ValueError(f"Not a directory prefix: {prefix}")
+            fresh = _node()
+            for obj in store.list_objects(prefix.strip("/") + "/"):
+                _add(fresh, obj.get("size") or 0, obj.get("last_modified"))
+                listed += 1
+            self._replace(path, fresh)
+        self.built_at = time.time()
+        return listed
+
+    def _replace(self, path: List[str], fresh: Dict) -> None:
+        ancestors = [self.root]
+        for segment in path[:-1]:
+            ancestors.append(ancestors[-1]["children"].setdefault(segment, _node()))
+        children = ancestors[-1]["children"]
+        old = children.get(path[-1], _node())
+        if fresh["count"]:
+            children[path[-1]] = fresh
+        else:
+            children.pop(path[-1], None)
+
+        delta_count, delta_bytes = fresh["count"] - old["count"], fresh["bytes"] - old["bytes"]
+        for depth in range(len(ancestors) - 1, -1, -1):
+            node = ancestors[depth]
+            node["count"] += delta_count
+            node["bytes"] += delta_bytes
+            # A maximum cannot be decremented; take it again from the (few) children. The root also
+            # covers unindexed objects, which have no node, so it only ever moves forward.
+            latest = max([child["latest"] for child in node["children"].values()], default=0.0)
+            node["latest"] = latest if depth else max(latest, node["latest"] if self.unindexed else 0.0)
+            if depth and node["count"] == 0:
+                ancestors[depth - 1]["children"].pop(path[depth - 1], None)
+
+    def projects(self, year: Optional[str] = None, project_name: Optional[str] = None,
+                 timestamp: Optional[str] = None) -> List[Dict]:
+        """GetProjectsAsync's result (ProjectInfo JSON shape) with the same filters, read from the index."""
+        result = []
+        for date, date_node in sorted(self.root["children"].items()):
+            if (year and date[:4] != year) or (timestamp and date != timestamp):
+                continue
+            for project, project_node in sorted(date_node["children"].items()):
+                name = unquote_plus(project)
+                if project_name and name.lower() != project_name.lower():
+                    continue
+                directories: Dict[str, Dict] = {}
+                for category, category_node in project_node["children"].items():
+                    field = "rawFilesCount" if category == "RawFiles" else "processedFilesCount"
+                    for directory, directory_node in category_node["children"].items():
+                        entry = directories.setdefault(directory.lower(), {
+                            "directoryName": directory, "rawFilesCount": 0, "processedFilesCount": 0})
+                        entry[field] = directory_node["count"]
+                result.append({
+                    "projectName": name,
+                    "timestamp": f"{date}T00:00:00",
+                    "directories": sorted(directories.values(), key=lambda d: d["directoryName"]),
+                    "count": project_node["count"],
+                    "bytes": project_node["bytes"],
+                    "latest": project_node["latest"],
+                })
+        return result
+
+    def size(self) -> int:
+        """Number of nodes in the tree."""
+        stack, total = [self.root], 0
+        while stack:
+            node = stack.pop()
+            total += 1
+            stack.extend(node["children"].values())
+        return total
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "built_at": self.built_at, "unindexed": self.unindexed,
+                       "root": self.root}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PrefixIndex":
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {data.get('version')} in {path}")
+        return cls(data["root"], data.get("unindexed", 0), data.get("built_at", 0.0))
+
+
+def directories_from_events(lines: Iterable[str]) -> Set[str]:
+    """Directory prefixes touched by S3 event records (JSON) or plain object keys, one per line."""
+    directories = set()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        keys = [line]
+        if line.startswith("{"):
+            event = json.loads(line)
+            # Object keys in S3 event records are URL-encoded.
+            keys = [unquote_plus(record["s3"]["object"]["key"]) for record in event.get("Records", [])]
+        for key in keys:
+            path = tree_path(key)
+            if path is not None:
+                directories.add("/".join(path))
+    return directories
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefix-tree index of the photostore bucket")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build the index from one listing of the bucket")
+    build.add_argument("--source", required=True, help="Local bucket directory or 'minio'")
+    build.add_argument("--bucket", default=BUCKET_NAME, help=f"Bucket name (default: {BUCKET_NAME})")
+    build.add_argument("--prefix", default="", help="Only index keys under this prefix")
+    build.add_argument("--index", required=True, help="Index file to write")
+
+    update = subparsers.add_parser("update", help="Refresh the directories touched by new uploads")
+    update.add_argument("--source", required=True, help="Local bucket directory or 'minio'")
+    update.add_argument("--bucket", default=BUCKET_NAME, help=f"Bucket name (default: {BUCKET_NAME})")
+    update.add_argument("--index", required=True, help="Index file to update")
+    update.add_argument("--events", default="-", help="S3 event JSON lines or object keys (default: stdin)")
+
+    projects = subparsers.add_parser("projects", help="List projects and directories from the index")
+    projects.add_argument("--index", required=True, help="Index file")
+    projects.add_argument("--year", help="Filter by year")
+    projects.add_argument("--project", help="Filter by project name (case-insensitive)")
+    projects.add_argument("--date", help="Filter by date (yyyy-MM-dd)")
+    projects.add_argument("--json", action="store_true", help="Print the ProjectInfo JSON")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        index = PrefixIndex.build(open_object_store(args.source, args.bucket).list_objects(args.prefix))
+        index.save(args.index)
+        print(f"🌳 Indexed {index.root['count']:,} objects ({index.root['bytes'] / 1e9:.2f} GB) into "
+              f"{index.size():,} nodes in {time.perf_counter() - started:.1f}s "
+              f"({index.unindexed:,} outside the upload layout)")
+    elif args.command == "update":
+        index = PrefixIndex.load(args.index)
+        if args.events == "-":
+            directories = directories_from_events(sys.stdin)
+        else:
+            with open(args.events) as f:
+                directories = directories_from_events(f)
+        listed = index.refresh(open_object_store(args.source, args.bucket), directories)
+        index.save(args.index)
+        print(f"🔄 Refreshed {len(directories)} directories ({listed:,} objects listed)")
+    else:
+        index = PrefixIndex.load(args.index)
+        result = index.projects(args.year, args.project, args.date)
+        if args.json:
+            print(json.dumps(result, indent=2))
+            return
+        built = datetime.fromtimestamp(index.built_at, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+        print(f"📁 {len(result)} projects (index updated {built})")
+        for project in result:
+            print(f"  {project['timestamp'][:10]}  {project['projectName']}: {project['count']:,} objects, "
+                  f"{project['bytes'] / 1e6:.1f} MB")
+            for directory in project["directories"]:
+                print(f"      {directory['directoryName']}: {directory['rawFilesCount']} raw, "
+                      f"{directory['processedFilesCount']} processed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Provision the Qdrant image collection from the embedding configuration in .env.
+
+QdrantClientWrapper creates the collection on first upsert with only a vector size
+and distance. This tool derives the full schema from the same .env settings
+(get_embedding_config): vector size and distance, HNSW parameters, optional int8
+scalar quantization, and keyword payload indexes on the fields QdrantVectorStore
+writes and SearchController filters on (year, project_name, object_key). Without
+those indexes every filtered search reads the payload of every candidate point.
+
+For an existing collection it reports drift from that schema. Drift in indexes,
+HNSW, quantization and optimizer settings is fixed in place. A vector size or
+distance change needs --recreate, which drops the collection and all its points;
+without it nothing is changed, not even the fixable settings.
+
+Usage:
+    python3 scripts/data/provision_qdrant.py --env-file .env
+    python3 scripts/data/provision_qdrant.py --env-file .env --check
+    python3 scripts/data/provision_qdrant.py --env-file .env --quantization int8 --m 32 --ef-construct 200
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+from auto_export_models import get_embedding_config, load_env_file  # noqa: E402
+from qdrant_rest import DEFAULT_COLLECTION, QdrantRestClient, qdrant_url_from_env  # noqa: E402
+
+PAYLOAD_INDEXES = {"year": "keyword", "project_name": "keyword", "object_key": "keyword"}
+# EMBEDDING_DISTANCE_METRIC accepts the .NET-style names; Qdrant calls Euclidean "Euclid".
+DISTANCE_NAMES = {"cosine": "Cosine", "dot": "Dot", "euclidean": "Euclid", "euclid": "Euclid",
+                  "manhattan": "Manhattan"}
+
+
+def collection_spec(env_vars: Dict[str, str], m: int = 16, ef_construct: int = 100,
+                    full_scan_threshold: int = 10000, quantization: str = "none", on_disk_vectors: bool = False,
+                    indexing_threshold: int = 20000) -> Dict:
+    """The desired collection schema for the embedding configuration in env_vars."""
+    config = get_embedding_config(env_vars)
+    distance = DISTANCE_NAMES.get(config["distance_metric"].lower())
+    if distance is None:
+        raise ValueError(f"Unsupported EMBEDDING_DISTANCE_METRIC '{config['distance_metric']}'")
+    spec = {
+        "vectors": {"size": int(config["dimension"]), "distance": distance, "on_disk": on_disk_vectors},
+        "hnsw_config": {"m": m, "ef_construct": ef_construct, "full_scan_threshold": full_scan_threshold},
+        "optimizers_config": {"indexing_threshold": indexing_threshold},
+        "on_disk_payload": True,
+        "quantization_config": None,
+        "payload_indexes": dict(PAYLOAD_INDEXES),
+    }
+    if quantization == "int8":
+        spec["quantization_config"] = {"scalar": {"type": "int8", "quantile": 0.99, "always_ram": True}}
+    return spec
+
+
+def check_drift(info: Dict, spec: Dict) -> List[Dict]:
+    """Compare a collection's info with the spec; each drift item says whether it can be fixed in place."""
+    config = info["config"]
+    drift = []
+
+    def differs(section: str, key: str, actual, expected, fixable: bool):
+        if actual != expected:
+            drift.append({"setting": f"{section}.{key}", "actual": actual, "expected": expected, "fixable": fixable})
+
+    vectors = config["params"]["vectors"]
+    differs("vectors", "size", vectors.get("size"), spec["vectors"]["size"], False)
+    differs("vectors", "distance", vectors.get("distance"), spec["vectors"]["distance"], False)
+    differs("vectors", "on_disk", bool(vectors.get("on_disk")), spec["vectors"]["on_disk"], False)
+    for key, expected in spec["hnsw_config"].items():
+        differs("hnsw_config", key, config["hnsw_config"].get(key), expected, True)
+    for key, expected in spec["optimizers_config"].items():
+        differs("optimizers_config", key, config["optimizer_config"].get(key), expected, True)
+    differs("params", "on_disk_payload", config["params"].get("on_disk_payload"), spec["on_disk_payload"], True)
+    differs("quantization_config", "scalar", (config.get("quantization_config") or {}).get("scalar"),
+            (spec["quantization_config"] or {}).get("scalar"), True)
+
+    schema = info.get("payload_schema") or {}
+    for field, field_type in spec["payload_indexes"].items():
+        differs("payload_index", field, (schema.get(field) or {}).get("data_type"), field_type, True)
+    return drift
+
+
+def _create(client: QdrantRestClient, name: str, spec: Dict) -> None:
+    body = {key: spec[key] for key in ("vectors", "hnsw_config", "optimizers_config", "on_disk_payload")}
+    if spec["quantization_config"]:
+        body["quantization_config"] = spec["quantization_config"]
+    client.create_collection(name, body)
+    for field, schema in spec["payload_indexes"].items():
+        client.create_payload_index(name, field, schema)
+
+
+def _fix(client: QdrantRestClient, name: str, spec: Dict, drift: List[Dict]) -> None:
+    sections = {item["setting"].split(".")[0] for item in drift}
+    patch = {}
+    if "hnsw_config" in sections:
+        patch["hnsw_config"] = spec["hnsw_config"]
+    if "optimizers_config" in sections:
+        patch["optimizers_config"] = spec["optimizers_config"]
+    if "params" in sections:
+        patch["params"] = {"on_disk_payload": spec["on_disk_payload"]}
+    if "quantization_config" in sections:
+        patch["quantization_config"] = spec["quantization_config"] or "Disabled"
+    if patch:
+        client.update_collection(name, patch)
+    for item in drift:
+        if item["setting"].startswith("payload_index."):
+            field = item["setting"].split(".", 1)[1]
+            client.create_payload_index(name, field, spec["payload_indexes"][field])
+
+
+def provision(client: QdrantRestClient, name: str, spec: Dict, apply: bool = True, recreate: bool = False) -> Dict:
+    """Create the collection or bring it in line with the spec; returns what was found and done."""
+    info = client.get_collection(name)
+    if info is None:
+        if apply:
+            _create(client, name, spec)
+        return {"collection": name, "action": "created" if apply else "missing", "drift": []}
+
+    drift = check_drift(info, spec)
+    unfixable = [item for item in drift if not item["fixable"]]
+    result = {"collection": name, "points": info.get("points_count", 0), "drift": drift, "action": "none"}
+    if not drift or not apply:
+        result["action"] = "none" if not drift else "drift"
+    elif unfixable and not recreate:
+        # Leave the collection untouched: the run fails, and --recreate replaces it anyway.
+        result["action"] = "blocked"
+    elif unfixable:
+        client.delete_collection(name)
+        _create(client, name, spec)
+        result["action"] = "recreated"
+    else:
+        _fix(client, name, spec, drift)
+        result["action"] = "updated"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision the Qdrant collection from the embedding configuration")
+    parser.add_argument("--env-file", default=".env", help="Path to .env file (default: .env)")
+    parser.add_argument("--url", help="Qdrant URL (default: from QDRANT_HOST/QDRANT_PORT)")
+    parser.add_argument("--collection", help="Collection name (default: QDRANT_COLLECTION or 'images')")
+    parser.add_argument("--m", type=int, default=16, help="HNSW edges per node (default: 16)")
+    parser.add_argument("--ef-construct", type=int, default=100, help="HNSW build-time beam width (default: 100)")
+    parser.add_argument("--full-scan-threshold", type=int, default=10000,
+                        help="Filtered-search cardinality (KB) below which Qdrant scans instead of HNSW")
+    parser.add_argument("--indexing-threshold", type=int, default=20000, help="Optimizer indexing threshold (KB)")
+    parser.add_argument("--quantization", choices=["none", "int8"], default="none", help="Scalar quantization")
+    parser.add_argument("--on-disk-vectors", action="store_true", help="Keep original vectors on disk")
+    parser.add_argument("--check", action="store_true", help="Only report drift; exit 1 if any")
+    parser.add_argument("--recreate", action="store_true",
+                        help="Drop and recreate the collection when vector size or distance drifted (deletes points)")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    env_vars = load_env_file(args.env_file)
+    env_vars.update({k: v for k, v in os.environ.items() if k.startswith(("QDRANT_", "EMBEDDING_"))})
+    name = args.collection or env_vars.get("QDRANT_COLLECTION", DEFAULT_COLLECTION)
+    client = QdrantRestClient(args.url or qdrant_url_from_env(env_vars), env_vars.get("QDRANT_API_KEY"))
+    spec = collection_spec(env_vars, args.m, args.ef_construct, args.full_scan_threshold, args.quantization,
+                           args.on_disk_vectors, args.indexing_threshold)
+
+    result = provision(client, name, spec, apply=not args.check, recreate=args.recreate)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"🗂️  Collection '{name}' at {client.url}: {result['action']}")
+        for item in result["drift"]:
+            marker = "🔧" if item["fixable"] else "⛔"
+            print(f"   {marker} {item['setting']}: {item['actual']} → {item['expected']}")
+        if result["action"] == "blocked":
+            print("❌ Vector parameters differ; nothing was changed. Rerun with --recreate to drop and recreate "
+                  f"the collection ({result['points']} points would be deleted)")
+    if result["action"] in ("blocked", "missing") or (args.check and result["drift"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
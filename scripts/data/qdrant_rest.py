@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Minimal Qdrant REST client and an in-memory fake Qdrant server for the Python tooling.
+
+The client speaks the same REST API as QdrantClientWrapper (port 6333) using only
+the standard library. FakeQdrant implements the subset of that API the tools use
+(collections, payload indexes, upsert/scroll/search/count/delete/set_payload and
+batch updates) so they can be tested offline. Filters on indexed payload fields are
+answered from an inverted index; every other filter reads each point's payload,
+counted in `payload_reads`.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import uuid
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+from auto_export_models import load_env_file  # noqa: E402
+
+DEFAULT_COLLECTION = "images"
+
+
+class QdrantError(Exception):
+    """A non-2xx response from Qdrant."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Qdrant returned {status}: {message}")
+        self.status = status
+
+
+def qdrant_url_from_env(env_vars: Dict[str, str]) -> str:
+    return f"http://{env_vars.get('QDRANT_HOST', 'localhost')}:{env_vars.get('QDRANT_PORT', '6333')}"
+
+
+def point_id_for_key(object_key: str) -> str:
+    """QdrantVectorStore's point id for a key without an ImageMappings row (GenerateUuidFromObjectKey)."""
+    guid = bytearray(hashlib.sha256(object_key.encode()).digest()[:16])
+    guid[6] = (guid[6] & 0x0F) | 0x40
+    guid[8] = (guid[8] & 0x3F) | 0x80
+    # .NET's Guid(byte[]) reads the first three fields little-endian.
+    return str(uuid.UUID(bytes_le=bytes(guid)))
+
+
+def image_payload(object_key: str, guid: str) -> Dict[str, str]:
+    """The payload QdrantVectorStore.UpsertAsync writes for an image."""
+    payload = {"path": object_key, "object_key": object_key, "guid": guid}
+    parts = [part for part in object_key.split("/") if part]
+    if parts and parts[0][:4].isdigit() and len(parts[0]) >= 4:
+        payload["year"] = parts[0][:4]
+    if len(parts) >= 2:
+        payload["project_name"] = parts[1]
+    return payload
+
+
+class QdrantRestClient:
+    """Thin wrapper over the Qdrant REST endpoints; methods return the response `result`."""
+
+    def __init__(self, url: str = "http://localhost:6333", api_key: Optional[str] = None, timeout: float = 60.0):
+        self.url = url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> Any:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method=method)
+        req.add_header("Content-Type", "application/json")
+        if self.api_key:
+            req.add_header("api-key", self.api_key)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return json.loads(response.read() or b"{}").get("result")
+        except urllib.error.HTTPError as e:
+            payload = e.read().decode(errors="replace")
+            try:
+                message = json.loads(payload).get("status", {}).get("error", payload)
+            except (ValueError, AttributeError):
+                message = payload
+            raise QdrantError(e.code, message) from None
+
+    def list_collections(self) -> List[str]:
+        return [c["name"] for c in self.request("GET", "/collections")["collections"]]
+
+    def get_collection(self, name: str) -> Optional[Dict]:
+        try:
+            return self.request("GET", f"/collections/{name}")
+        except QdrantError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def create_collection(self, name: str, body: Dict) -> None:
+        self.request("PUT", f"/collections/{name}", body)
+
+    def update_collection(self, name: str, body: Dict) -> None:
+        self.request("PATCH", f"/collections/{name}", body)
+
+    def delete_collection(self, name: str) -> None:
+        self.request("DELETE", f"/collections/{name}")
+
+    def create_payload_index(self, name: str, field: str, schema: str = "keyword") -> None:
+        self.request("PUT", f"/collections/{name}/index?wait=true", {"field_name": field, "field_schema": schema})
+
+    def upsert_points(self, name: str, points: List[Dict], wait: bool = True) -> None:
+        self.request("PUT", f"/collections/{name}/points?wait={str(wait).lower()}", {"points": points})
+
+    def set_payload(self, name: str, payload: Dict, ids: List[Any], wait: bool = True) -> None:
+        self.request("POST", f"/collections/{name}/points/payload?wait={str(wait).lower()}",
+                     {"payload": payload, "points": ids})
+
+    def batch_update(self, name: str, operations: List[Dict], wait: bool = True) -> None:
+        """Apply many point operations (e.g. {"set_payload": {...}}) in one request."""
+        self.request("POST", f"/collections/{name}/points/batch?wait={str(wait).lower()}", {"operations": operations})
+
+    def retrieve_points(self, name: str, ids: List[Any], with_payload: Any = True,
+                        with_vector: bool = False) -> List[Dict]:
+        return self.request("POST", f"/collections/{name}/points",
+                            {"ids": ids, "with_payload": with_payload, "with_vector": with_vector})
+
+    def delete_points(self, name: str, ids: List[Any], wait: bool = True) -> None:
+        self.request("POST", f"/collections/{name}/points/delete?wait={str(wait).lower()}", {"points": ids})
+
+    def scroll(self, name: str, limit: int = 1000, offset: Any = None, filter: Optional[Dict] = None,
+               with_payload: Any = True, with_vector: bool = False) -> Dict:
+        body = {"limit": limit, "with_payload": with_payload, "with_vector": with_vector}
+        if offset is not None:
+            body["offset"] = offset
+        if filter:
+            body["filter"] = filter
+        return self.request("POST", f"/collections/{name}/points/scroll", body)
+
+    def iter_points(self, name: str, batch_size: int = 1000, **kwargs) -> Iterator[Dict]:
+        """Scroll through every point, following next_page_offset."""
+        offset = None
+        while True:
+            page = self.scroll(name, batch_size, offset, **kwargs)
+            yield from page["points"]
+            offset = page.get("next_page_offset")
+            if offset is None:
+                return
+
+    def search(self, name: str, vector: List[float], limit: int = 10, filter: Optional[Dict] = None,
+               score_threshold: Optional[float] = None, with_payload: Any = True) -> List[Dict]:
+        body = {"vector": vector, "limit": limit, "with_payload": with_payload}
+        if filter:
+            body["filter"] = filter
+        if score_threshold is not None:
+            body["score_threshold"] = score_threshold
+        return self.request("POST", f"/collections/{name}/points/search", body)
+
+    def count(self, name: str, filter: Optional[Dict] = None, exact: bool = True) -> int:
+        body = {"exact": exact}
+        if filter:
+            body["filter"] = filter
+        return self.request("POST", f"/collections/{name}/points/count", body)["count"]
+
+
+def client_from_env_file(env_file: str = ".env", url: Optional[str] = None,
+                         collection: Optional[str] = None) -> Tuple[QdrantRestClient, str]:
+    """Client and collection name from an .env file; QDRANT_* environment variables and the arguments win."""
+    env_vars = load_env_file(env_file)
+    env_vars.update({k: v for k, v in os.environ.items() if k.startswith("QDRANT_")})
+    client = QdrantRestClient(url or qdrant_url_from_env(env_vars), env_vars.get("QDRANT_API_KEY"))
+    return client, collection or env_vars.get("QDRANT_COLLECTION", DEFAULT_COLLECTION)
+
+
+DEFAULT_HNSW = {"m": 16, "ef_construct": 100, "full_scan_threshold": 10000, "max_indexing_threads": 0,
+                "on_disk": False}
+DEFAULT_OPTIMIZERS = {"deleted_threshold": 0.2, "vacuum_min_vector_number": 1000, "default_segment_number": 0,
+                      "indexing_threshold": 20000, "flush_interval_sec": 5}
+
+
+def _merge(base: Dict, update: Optional[Dict]) -> Dict:
+    merged = dict(base)
+    merged.update(update or {})
+    return merged
+
+
+class _FakeCollection:
+    def __init__(self, body: Dict):
+        vectors = body["vectors"]
+        self.params = {"vectors": {"size": vectors["size"], "distance": vectors["distance"],
+                                   "on_disk": vectors.get("on_disk", False)},
+                       "shard_number": body.get("shard_number", 1),
+                       "replication_factor": body.get("replication_factor", 1),
+                       "on_disk_payload": body.get("on_disk_payload", True)}
+        self.hnsw = _merge(DEFAULT_HNSW, body.get("hnsw_config"))
+        self.optimizers = _merge(DEFAULT_OPTIMIZERS, body.get("optimizers_config"))
+        self.quantization = body.get("quantization_config")
+        self.points: Dict[Any, Dict] = {}
+        self.payload_schema: Dict[str, str] = {}
+        self.inverted: Dict[str, Dict[Any, set]] = {}
+
+    def info(self) -> Dict:
+        return {
+            "status": "green", "optimizer_status": "ok", "vectors_count": len(self.points),
+            "indexed_vectors_count": len(self.points), "points_count": len(self.points), "segments_count": 1,
+            "config": {"params": self.params, "hnsw_config": self.hnsw, "optimizer_config": self.optimizers,
+                       "wal_config": {"wal_capacity_mb": 32, "wal_segments_ahead": 0},
+                       "quantization_config": self.quantization},
+            "payload_schema": {field: {"data_type": schema, "points": sum(len(ids) for ids in
+                                                                           self.inverted[field].values())}
+                               for field, schema in self.payload_schema.items()},
+        }
+
+    def index_point(self, point_id, payload: Dict, add: bool) -> None:
+        for field in self.payload_schema:
+            if field in payload:
+                values = payload[field] if isinstance(payload[field], list) else [payload[field]]
+                for value in values:
+                    ids = self.inverted[field].setdefault(value, set())
+                    (ids.add if add else ids.discard)(point_id)
+
+
+class FakeQdrant:
+    """In-memory Qdrant REST stand-in served on a background thread."""
+
+    def __init__(self):
+        self.collections: Dict[str, _FakeCollection] = {}
+        self.requests: List[tuple] = []
+        self.payload_reads = 0
+        self.lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.url = ""
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeQdrant":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                path = self.path.split("?", 1)[0]
+                with fake.lock:
+                    fake.requests.append((self.command, path))
+                    try:
+                        status, result = fake.handle(self.command, path, body)
+                    except KeyError as e:
+                        status, result = 404, f"Not found: {e.args[0]}"
+                    except ValueError as e:
+                        status, result = 400, str(e)
+                if status >= 400:
+                    payload = {"status": {"error": result}, "time": 0.0}
+                else:
+                    payload = {"result": result, "status": "ok", "time": 0.0}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_PUT = do_POST = do_PATCH = do_DELETE = _dispatch
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- request handling -------------------------------------------------
+
+    def handle(self, method: str, path: str, body: Dict):
+        parts = [p for p in path.split("/") if p]
+        if parts == ["collections"] and method == "GET":
+            return 200, {"collections": [{"name": n} for n in sorted(self.collections)]}
+        if len(parts) < 2 or parts[0] != "collections":
+            raise KeyError(path)
+        name, rest = parts[1], parts[2:]
+
+        if not rest:
+            if method == "GET":
+                return 200, self.collections[name].info()
+            if method == "PUT":
+                if name in self.collections:
+                    return 409, f"Collection `{name}` already exists!"
+                self.collections[name] = _FakeCollection(body)
+                return 200, True
+            if method == "PATCH":
+                collection = self.collections[name]
+                collection.hnsw = _merge(collection.hnsw, body.get("hnsw_config"))
+                collection.optimizers = _merge(collection.optimizers, body.get("optimizers_config"))
+                if "quantization_config" in body:
+                    q = body["quantization_config"]
+                    collection.quantization = None if q == "Disabled" else q
+                if "params" in body:
+                    collection.params.update(body["params"])
+                return 200, True
+            if method == "DELETE":
+                return 200, self.collections.pop(name, None) is not None
+
+        collection = self.collections[name]
+        if rest == ["index"] and method == "PUT":
+            field, schema = body["field_name"], body["field_schema"]
+            collection.payload_schema[field] = schema if isinstance(schema, str) else schema["type"]
+            collection.inverted[field] = {}
+            for point_id, point in collection.points.items():
+                collection.index_point(point_id, point["payload"], True)
+            return 200, {"operation_id": 0, "status": "completed"}
+        if len(rest) == 2 and rest[0] == "index" and method == "DELETE":
+            collection.payload_schema.pop(rest[1], None)
+            collection.inverted.pop(rest[1], None)
+            return 200, {"operation_id": 0, "status": "completed"}
+        if rest == ["points"] and method == "PUT":
+            return 200, self._upsert(collection, body["points"])
+        if rest == ["points"] and method == "POST":
+            ids = body.get("ids", [])
+            return 200, [self._record(collection, i, body.get("with_payload", True), body.get("with_vector", False))
+                         for i in ids if i in collection.points]
+        if rest == ["points", "delete"] and method == "POST":
+            ids = body["points"] if isinstance(body.get("points"), list) else self._matching(collection, body["filter"])
+            for point_id in ids:
+                point = collection.points.pop(point_id, None)
+                if point:
+                    collection.index_point(point_id, point["payload"], False)
+            return 200, {"operation_id": 0, "status": "completed"}
+        if rest == ["points", "payload"] and method == "POST":
+            self._set_payload(collection, body)
+            return 200, {"operation_id": 0, "status": "completed"}
+        if rest == ["points", "batch"] and method == "POST":
+            for operation in body["operations"]:
+                (kind, args), = operation.items()
+                if kind == "set_payload":
+                    self._set_payload(collection, args)
+                elif kind == "upsert":
+                    self._upsert(collection, args["points"])
+                else:
+                    raise ValueError(f"unsupported batch operation {kind}")
+            return 200, [{"operation_id": 0, "status": "completed"} for _ in body["operations"]]
+        if rest == ["points", "scroll"] and method == "POST":
+            return 200, self._scroll(collection, body)
+        if rest == ["points", "search"] and method == "POST":
+            return 200, self._search(collection, body)
+        if rest == ["points", "count"] and method == "POST":
+            return 200, {"count": len(self._matching(collection, body.get("filter")))}
+        raise KeyError(path)
+
+    def _upsert(self, collection: _FakeCollection, points: List[Dict]) -> Dict:
+        size = collection.params["vectors"]["size"]
+        for point in points:
+            vector = np.asarray(point["vector"], dtype=np.float32)
+            if vector.shape != (size,):
+                raise ValueError(f"Wrong input: Vector dimension error: expected dim: {size}, got {vector.size}")
+            old = collection.points.get(point["id"])
+            if old:
+                collection.index_point(point["id"], old["payload"], False)
+            payload = point.get("payload") or {}
+            collection.points[point["id"]] = {"vector": vector, "payload": payload}
+            collection.index_point(point["id"], payload, True)
+        return {"operation_id": 0, "status": "completed"}
+
+    def _set_payload(self, collection: _FakeCollection, body: Dict) -> None:
+        for point_id in body["points"]:
+            point = collection.points[point_id]
+            collection.index_point(point_id, point["payload"], False)
+            point["payload"] = dict(point["payload"], **body["payload"])
+            collection.index_point(point_id, point["payload"], True)
+
+    @staticmethod
+    def _project(payload: Dict, with_payload: Any):
+        if with_payload is True:
+            return payload
+        if isinstance(with_payload, list):
+            return {k: v for k, v in payload.items() if k in with_payload}
+        if isinstance(with_payload, dict) and "include" in with_payload:
+            return {k: v for k, v in payload.items() if k in with_payload["include"]}
+        return None
+
+    def _record(self, collection, point_id, with_payload, with_vector) -> Dict:
+        point = collection.points[point_id]
+        record = {"id": point_id, "payload": self._project(point["payload"], with_payload)}
+        record["vector"] = point["vector"].tolist() if with_vector else None
+        return record
+
+    def _condition_ids(self, collection: _FakeCollection, condition: Dict) -> set:
+        if "has_id" in condition:
+            return set(condition["has_id"]) & set(collection.points)
+        if any(k in condition for k in ("must", "should", "must_not")):
+            return set(self._matching(collection, condition))
+        field, match = condition["key"], condition.get("match", {})
+        wanted = [match["value"]] if "value" in match else match.get("any", [])
+        if field in collection.inverted:
+            ids = set()
+            for value in wanted:
+                ids |= collection.inverted[field].get(value, set())
+            return ids
+        ids = set()
+        for point_id, point in collection.points.items():
+            self.payload_reads += 1
+            value = point["payload"].get(field)
+            values = value if isinstance(value, list) else [value]
+            if any(v in wanted for v in values):
+                ids.add(point_id)
+        return ids
+
+    def _matching(self, collection: _FakeCollection, filter: Optional[Dict]) -> List[Any]:
+        ids = set(collection.points)
+        if not filter:
+            return list(ids)
+        for condition in filter.get("must") or []:
+            ids &= self._condition_ids(collection, condition)
+        if filter.get("should"):
+            ids &= set().union(*(self._condition_ids(collection, c) for c in filter["should"]))
+        for condition in filter.get("must_not") or []:
+            ids -= self._condition_ids(collection, condition)
+        return list(ids)
+
+    def _scroll(self, collection: _FakeCollection, body: Dict) -> Dict:
+        ids = sorted(self._matching(collection, body.get("filter")), key=str)
+        offset = body.get("offset")
+        if offset is not None:
+            ids = [i for i in ids if str(i) >= str(offset)]
+        limit = body.get("limit", 10)
+        page, rest = ids[:limit], ids[limit:]
+        return {"points": [self._record(collection, i, body.get("with_payload", True), body.get("with_vector", False))
+                           for i in page],
+                "next_page_offset": rest[0] if rest else None}
+
+    def _search(self, collection: _FakeCollection, body: Dict) -> List[Dict]:
+        ids = self._matching(collection, body.get("filter"))
+        if not ids:
+            return []
+        matrix = np.stack([collection.points[i]["vector"] for i in ids])
+        query = np.asarray(body["vector"], dtype=np.float32)
+        distance = collection.params["vectors"]["distance"]
+        if distance == "Cosine":
+            scores = (matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)) @ (
+                query / max(np.linalg.norm(query), 1e-12))
+        elif distance == "Dot":
+            scores = matrix @ query
+        else:
+            scores = -np.linalg.norm(matrix - query, axis=1)
+        order = np.argsort(-scores, kind="stable")
+        threshold = body.get("score_threshold")
+        results = []
+        for i in order[:body.get("limit", 10) + body.get("offset", 0)][body.get("offset", 0):]:
+            if threshold is not None and scores[i] < threshold:
+                break
+            point = collection.points[ids[i]]
+            results.append({"id": ids[i], "version": 0, "score": float(scores[i]),
+                            "payload": self._project(point["payload"], body.get("with_payload", False)),
+                            "vector": point["vector"].tolist() if body.get("with_vector") else None})
+        return results
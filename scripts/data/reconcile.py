@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Three-way reconciler between the photostore bucket, photoflow.db and the Qdrant collection.
+
+Drift between the three stores goes unnoticed today. Objects get uploaded without an
+ImageMappings row, mappings are never embedded, and points outlive their images.
+QdrantVectorStore also gives an image a key-derived point id (GenerateUuidFromObjectKey)
+when its mapping is missing. This tool finds all of it without a full re-ingest. Two
+merge joins over sorted streams keep memory constant, whatever the library size:
+
+    bucket listing (key order)        ⋈  active ImageMappings ORDER BY ObjectKey
+    active ImageMappings ORDER BY Id  ⋈  Qdrant scroll (point-id order)
+
+Only rows that differ are looked up again. Those lookups are batched: indexed
+ImageMappings queries, and has_id filters against Qdrant. The results are repair lists
+in --output:
+
+    unmapped_objects.txt   images in the bucket without an active mapping
+    missing_objects.txt    active mappings whose object is gone
+    to_embed.txt           mapped images without a vector   → embed_worker.py enqueue --keys
+    points_to_delete.txt   points with no active mapping    → reconcile.py repair
+                           (key-derived points of unmapped uploads are kept for rekeying)
+    rekey.jsonl            key-derived points whose image now has a mapping (the vector is reused)
+    payload_fixes.jsonl    points whose object_key/path payload disagrees with the mapping
+    report.json            counts and timings
+
+Usage:
+    python3 scripts/data/reconcile.py check --source minio --db photoflow.db --output drift/
+    python3 scripts/data/reconcile.py repair --report drift/ --db photoflow.db --deactivate-missing
+    python3 scripts/data/reconcile.py benchmark --images 1000000
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+from photoflow_storage import BUCKET_NAME, is_image_file, open_object_store, parse_object_key  # noqa: E402
+from qdrant_rest import QdrantRestClient, client_from_env_file, image_payload, point_id_for_key  # noqa: E402
+
+LOOKUP_BATCH = 256
+LIST_FILES = ("unmapped_objects.txt", "missing_objects.txt", "to_embed.txt", "points_to_delete.txt",
+              "rekey.jsonl", "payload_fixes.jsonl")
+
+
+def merge_sorted(left: Iterable, right: Iterable, left_key: Callable = lambda item: item,
+                 right_key: Callable = lambda item: item) -> Iterator[Tuple[Any, Any]]:
+    """Full outer join of two iterables sorted by key, as (left item | None, right item | None) pairs.
+
+    Raises ValueError when either input is out of order, since a collation mismatch
+    between sources would otherwise be reported as drift.
+    """
+    left, right = iter(left), iter(right)
+    done = object()
+    a, b = next(left, done), next(right, done)
+    ka = left_key(a) if a is not done else None
+    kb = right_key(b) if b is not done else None
+    while a is not done or b is not done:
+        if b is done or (a is not done and ka < kb):
+            yield a, None
+            a, previous = next(left, done), ka
+            ka = left_key(a) if a is not done else None
+            if a is not done and ka < previous:
+                raise ValueError(f"Left input is not sorted: {ka!r} after {previous!r}")
+        elif a is done or kb < ka:
+            yield None, b
+            b, previous = next(right, done), kb
+            kb = right_key(b) if b is not done else None
+            if b is not done and kb < previous:
+                raise ValueError(f"Right input is not sorted: {kb!r} after {previous!r}")
+        else:
+            yield a, b
+            a, b = next(left, done), next(right, done)
+            ka = left_key(a) if a is not done else None
+            kb = right_key(b) if b is not done else None
+
+
+def point_order(point_id) -> Tuple:
+    """Qdrant's scroll order: integer ids first, then UUIDs (whose lowercase text sorts like their value)."""
+    return (0, point_id, "") if isinstance(point_id, int) else (1, 0, str(point_id).lower())
+
+
+def bucket_keys(store, prefix: str = "") -> Iterator[str]:
+    """Image keys in the upload layout (Derived/ and stray files are skipped), in key order."""
+    for obj in store.list_objects(prefix):
+        if is_image_file(obj["key"]) and parse_object_key(obj["key"]) is not None:
+            yield obj["key"]
+
+
+def mappings_by_key(conn) -> Iterator[Tuple[str, str]]:
+    """(ObjectKey, id) of active mappings, read in ObjectKey order from its unique index."""
+    yield from conn.execute('SELECT "ObjectKey", lower("Id") FROM "ImageMappings" WHERE "IsActive" = 1 '
+                            'ORDER BY "ObjectKey"')
+
+
+def mappings_by_id(conn) -> Iterator[Tuple[str, str]]:
+    """(id, ObjectKey) of active mappings in point-id order (SQLite sorts in temp storage, not in memory)."""
+    yield from conn.execute('SELECT lower("Id"), "ObjectKey" FROM "ImageMappings" WHERE "IsActive" = 1 '
+                            'ORDER BY lower("Id")')
+
+
+def collection_points(client: QdrantRestClient, collection: str, page_size: int = 1000) -> Iterator[Tuple]:
+    """(id, object key) of every point, in scroll order."""
+    for point in client.iter_points(collection, page_size, with_payload=["object_key", "path"]):
+        payload = point.get("payload") or {}
+        yield point["id"], payload.get("object_key") or payload.get("path")
+
+
+def existing_point_ids(client: QdrantRestClient, collection: str, ids: Sequence[str]) -> set:
+    if not ids:
+        return set()
+    page = client.scroll(collection, limit=len(ids), filter={"must": [{"has_id": list(ids)}]}, with_payload=False)
+    return {str(point["id"]).lower() for point in page["points"]}
+
+
+def active_ids_for_keys(conn, keys: Sequence[str]) -> Dict[str, str]:
+    if not keys:
+        return {}
+    rows = conn.execute(f'SELECT "ObjectKey", lower("Id") FROM "ImageMappings" WHERE "IsActive" = 1 AND '
+                        f'"ObjectKey" IN ({",".join("?" * len(keys))})', list(keys))
+    return dict(rows)
+
+
+class RepairLists:
+    """Line-oriented repair files in one directory, plus a count per list."""
+
+    def __init__(self, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.counts = {name.split(".")[0]: 0 for name in LIST_FILES}
+        self._files = {name.split(".")[0]: open(os.path.join(output_dir, name), "w") for name in LIST_FILES}
+
+    def add(self, name: str, entry) -> None:
+        self._files[name].write((json.dumps(entry) if isinstance(entry, dict) else str(entry)) + "\n")
+        self.counts[name] += 1
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+
+
+def _diff_bucket_and_mappings(keys: Iterable[str], mappings: Iterable[Tuple[str, str]], lists: RepairLists,
+                              totals: Dict[str, int]) -> None:
+    for key, mapping in merge_sorted(keys, mappings, right_key=lambda row: row[0]):
+        if key is not None:
+            totals["objects"] += 1
+        if mapping is None:
+            lists.add("unmapped_objects", key)
+        elif key is None:
+            lists.add("missing_objects", mapping[0])
+
+
+def _object_exists(store, key: str) -> bool:
+    return any(obj["key"] == key for obj in store.list_objects(key))
+
+
+def _diff_mappings_and_points(store, conn, client: QdrantRestClient, collection: str,
+                              mappings: Iterable[Tuple[str, str]], points: Iterable[Tuple], lists: RepairLists,
+                              totals: Dict[str, int], batch_size: int = LOOKUP_BATCH) -> None:
+    unembedded: List[Tuple[str, str]] = []  # (mapping id, key)
+    unmapped: List[Tuple[Any, Optional[str]]] = []  # (point id, payload key)
+
+    def flush_unembedded():
+        # A mapping whose key-derived point exists is repaired by rekeying that point, not by embedding.
+        fallback = existing_point_ids(client, collection, [point_id_for_key(key) for _, key in unembedded])
+        for _, key in unembedded:
+            if point_id_for_key(key) not in fallback:
+                lists.add("to_embed", key)
+        unembedded.clear()
+
+    def flush_unmapped():
+        owners = active_ids_for_keys(conn, [key for _, key in unmapped if key])
+        owned = existing_point_ids(client, collection, sorted(set(owners.values())))
+        for point_id, key in unmapped:
+            owner = owners.get(key)
+            key_derived = bool(key) and str(point_id).lower() == point_id_for_key(key)
+            totals["fallback_id_points"] += key_derived
+            if owner is not None and owner not in owned:
+                lists.add("rekey", {"from": point_id, "to": owner, "object_key": key})
+            elif owner is None and key_derived and _object_exists(store, key):
+                # An unmapped upload (listed in unmapped_objects); keep its vector for rekeying once it is mapped.
+                totals["awaiting_mapping"] += 1
+            else:
+                lists.add("points_to_delete", point_id)
+        unmapped.clear()
+
+    for mapping, point in merge_sorted(mappings, points, lambda row: point_order(row[0]),
+                                       lambda row: point_order(row[0])):
+        if mapping is not None:
+            totals["mappings"] += 1
+        if point is not None:
+            totals["points"] += 1
+        if point is None:
+            unembedded.append(mapping)
+            if len(unembedded) >= batch_size:
+                flush_unembedded()
+        elif mapping is None:
+            unmapped.append(point)
+            if len(unmapped) >= batch_size:
+                flush_unmapped()
+        elif point[1] != mapping[1]:
+            lists.add("payload_fixes", {"id": point[0], "object_key": mapping[1], "found": point[1]})
+    flush_unembedded()
+    flush_unmapped()
+
+
+def reconcile(store, conn, client: QdrantRestClient, collection: str, output_dir: str) -> Dict:
+    """Diff the three stores and write repair lists; returns the report."""
+    started = time.perf_counter()
+    lists = RepairLists(output_dir)
+    totals = {"objects": 0, "mappings": 0, "points": 0, "fallback_id_points": 0, "awaiting_mapping": 0}
+    try:
+        _diff_bucket_and_mappings(bucket_keys(store), mappings_by_key(conn), lists, totals)
+        listed = time.perf_counter()
+        _diff_mappings_and_points(store, conn, client, collection, mappings_by_id(conn),
+                                  collection_points(client, collection), lists, totals)
+    finally:
+        lists.close()
+    report = {**totals, **lists.counts, "bucket_seconds": round(listed - started, 2),
+              "vector_seconds": round(time.perf_counter() - listed, 2),
+              "seconds": round(time.perf_counter() - started, 2)}
+    with open(os.path.join(output_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def _read_list(path: str) -> Iterator:
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line) if path.endswith(".jsonl") else line
+
+
+def _point_id(text: str):
+    return int(text) if text.isdigit() else text
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def repair(report_dir: str, client: QdrantRestClient, collection: str, conn=None, deactivate_missing: bool = False,
+           batch_size: int = 1000) -> Dict:
+    """Apply the vector-store repair lists (and optionally deactivate mappings of missing objects)."""
+    done = {"points_deleted": 0, "points_rekeyed": 0, "payloads_fixed": 0, "mappings_deactivated": 0}
+    for batch in _batches(_read_list(os.path.join(report_dir, "points_to_delete.txt")), batch_size):
+        client.delete_points(collection, [_point_id(point_id) for point_id in batch])
+        done["points_deleted"] += len(batch)
+
+    for batch in _batches(_read_list(os.path.join(report_dir, "rekey.jsonl")), LOOKUP_BATCH):
+        page = client.scroll(collection, limit=len(batch), with_payload=False, with_vector=True,
+                             filter={"must": [{"has_id": [entry["from"] for entry in batch]}]})
+        vectors = {str(point["id"]).lower(): point["vector"] for point in page["points"]}
+        moved = [entry for entry in batch if str(entry["from"]).lower() in vectors]
+        client.upsert_points(collection, [{"id": entry["to"], "vector": vectors[str(entry["from"]).lower()],
+                                           "payload": image_payload(entry["object_key"], entry["to"])}
+                                          for entry in moved])
+        client.delete_points(collection, [entry["from"] for entry in moved])
+        done["points_rekeyed"] += len(moved)
+
+    for batch in _batches(_read_list(os.path.join(report_dir, "payload_fixes.jsonl")), batch_size):
+        client.batch_update(collection, [{"set_payload": {
+            "payload": {"path": entry["object_key"], "object_key": entry["object_key"]}, "points": [entry["id"]]}}
+            for entry in batch])
+        done["payloads_fixed"] += len(batch)
+
+    if deactivate_missing and conn is not None:
+        for batch in _batches(_read_list(os.path.join(report_dir, "missing_objects.txt")), 500):
+            cursor = conn.execute(f'UPDATE "ImageMappings" SET "IsActive" = 0, "UpdatedDate" = CURRENT_TIMESTAMP '
+                                  f'WHERE "ObjectKey" IN ({",".join("?" * len(batch))})', batch)
+            done["mappings_deactivated"] += cursor.rowcount
+        conn.commit()
+    return done
+
+
+def run_benchmark(images: int, drift: float = 0.001) -> Dict:
+    """Merge-join synthetic sorted key streams with drift on both sides; reports rate and peak memory."""
+    import random
+
+    rng = random.Random(0)
+    dropped_left = set(rng.sample(range(images), int(images * drift)))
+    dropped_right = set(rng.sample(range(images), int(images * drift)))
+    left = (f"2025-01-01/Project{i // 100000:03d}/RawFiles/Roll/{i:09d}.jpg" for i in range(images)
+            if i not in dropped_left)
+    right = ((f"2025-01-01/Project{i // 100000:03d}/RawFiles/Roll/{i:09d}.jpg", i) for i in range(images)
+             if i not in dropped_right)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    started = time.perf_counter()
+    only_left = only_right = 0
+    for a, b in merge_sorted(left, right, right_key=lambda row: row[0]):
+        only_left += b is None
+        only_right += a is None
+    seconds = time.perf_counter() - started
+    return {"images": images, "only_left": only_left, "only_right": only_right, "seconds": round(seconds, 2),
+            "keys_per_second": round(images / seconds), "peak_rss_mb": round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1), "rss_before_mb": round(rss_before, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile the bucket, photoflow.db and the Qdrant collection")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    check = subparsers.add_parser("check", help="Diff the three stores and write repair lists")
+    check.add_argument("--source", default="minio", help="Local bucket directory or 'minio'")
+    check.add_argument("--bucket", default=BUCKET_NAME, help=f"Bucket name (default: {BUCKET_NAME})")
+    check.add_argument("--db", required=True, help="photoflow.db")
+    check.add_argument("--env-file", default=".env", help="Qdrant settings (QDRANT_HOST/PORT/COLLECTION)")
+    check.add_argument("--output", required=True, help="Directory for the repair lists")
+
+    fix = subparsers.add_parser("repair", help="Apply the vector-store repair lists of a check")
+    fix.add_argument("--report", required=True, help="Output directory of a check")
+    fix.add_argument("--env-file", default=".env", help="Qdrant settings (QDRANT_HOST/PORT/COLLECTION)")
+    fix.add_argument("--db", help="photoflow.db (needed for --deactivate-missing)")
+    fix.add_argument("--deactivate-missing", action="store_true",
+                     help="Set IsActive = 0 on mappings whose object is gone")
+
+    bench = subparsers.add_parser("benchmark", help="Merge-join throughput on synthetic key streams")
+    bench.add_argument("--images", type=int, default=1000000)
+    bench.add_argument("--drift", type=float, default=0.001, help="Fraction of keys missing from each side")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        print(json.dumps(run_benchmark(args.images, args.drift), indent=2))
+        return
+
+    from photoflow_db import connect
+
+    client, collection = client_from_env_file(args.env_file)
+    if args.command == "check":
+        report = reconcile(open_object_store(args.source, args.bucket), connect(args.db), client, collection,
+                           args.output)
+        print(f"🔍 {report['objects']:,} objects, {report['mappings']:,} mappings, {report['points']:,} points "
+              f"checked in {report['seconds']}s")
+        for name in LIST_FILES:
+            count = report[name.split(".")[0]]
+            print(f"   {'⚠️ ' if count else '✅'} {name}: {count:,}")
+    else:
+        if args.deactivate_missing and not args.db:
+            parser.error("--deactivate-missing needs --db")
+        done = repair(args.report, client, collection, connect(args.db) if args.db else None,
+                      args.deactivate_missing)
+        print(f"🔧 Deleted {done['points_deleted']:,} points, rekeyed {done['points_rekeyed']:,}, fixed "
+              f"{done['payloads_fixed']:,} payloads, deactivated {done['mappings_deactivated']:,} mappings")
+        print(f"   Queue the keys in {os.path.join(args.report, 'to_embed.txt')} with "
+              f"embed_worker.py enqueue --keys")
+
+
+if __name__ == "__main__":
+    main()
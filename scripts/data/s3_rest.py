@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Minimal S3 REST client for the MinIO bucket, and an in-memory S3 stand-in for tests.
+
+Bulk tooling needs streaming listings, conditional uploads and multipart uploads
+against the `photostore` bucket. This client speaks the S3 API directly with
+Signature V4 (path-style requests, as MinIO expects), so those tools run without the
+`minio` package. FakeS3 serves the same subset of the API from memory: ListObjectsV2,
+HEAD/GET/PUT object, DELETE object and multipart uploads. It also checks each
+request's signature.
+"""
+
+import hashlib
+import hmac
+import http.client
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, quote, unquote, urlparse
+from xml.sax.saxutils import escape
+
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class S3Error(Exception):
+    """A non-2xx response from the object store."""
+
+    def __init__(self, status: int, code: str, message: str = ""):
+        super().__init__(f"S3 {status} {code}: {message}")
+        self.status = status
+        self.code = code
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _canonical_query(query: Dict[str, str]) -> str:
+    return "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items()))
+
+
+def sign_v4(method: str, path: str, query: Dict[str, str], headers: Dict[str, str], payload_hash: str,
+            access_key: str, secret_key: str, region: str, amz_date: str) -> str:
+    """The Authorization header value for an S3 request (headers must include host and x-amz-*)."""
+    signed = sorted(name.lower() for name in headers if name.lower() == "host" or name.lower().startswith("x-amz-"))
+    lowered = {name.lower(): str(value).strip() for name, value in headers.items()}
+    canonical_headers = "".join(f"{name}:{lowered[name]}\n" for name in signed)
+    canonical_request = "\n".join([method, _uri_encode(path, safe="/-_.~"), _canonical_query(query),
+                                   canonical_headers, ";".join(signed), payload_hash])
+    scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                                hashlib.sha256(canonical_request.encode()).hexdigest()])
+    key = f"AWS4{secret_key}".encode()
+    for part in (amz_date[:8], region, "s3", "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    return f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={';'.join(signed)}, Signature={signature}"
+
+
+def multipart_etag(part_md5s: List[bytes]) -> str:
+    """The ETag S3 and MinIO assign to a completed multipart upload."""
+    return f"{hashlib.md5(b''.join(part_md5s)).hexdigest()}-{len(part_md5s)}"
+
+
+def _xml_text(element: ET.Element, tag: str) -> Optional[str]:
+    found = element.find(f"{{{S3_NAMESPACE}}}{tag}")
+    return found.text if found is not None else None
+
+
+class S3RestClient:
+    """Thread-safe S3 client for one bucket; each thread keeps its own keep-alive connection."""
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket: str,
+                 region: str = "us-east-1", timeout: float = 120.0):
+        parsed = urlparse(endpoint if "://" in endpoint else f"http://{endpoint}")
+        self.endpoint = f"{parsed.scheme}://{parsed.netloc}"
+        self.host = parsed.netloc
+        self.secure = parsed.scheme == "https"
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.bucket = bucket
+        self.region = region
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Connections are per thread; worker processes open their own.
+        return {name: value for name, value in self.__dict__.items() if name != "_local"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, timeout=self.timeout)
+        return conn
+
+    def request(self, method: str, key: str = "", query: Optional[Dict[str, str]] = None, body: bytes = b"",
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        query = query or {}
+        path = f"/{self.bucket}/{key}" if key else f"/{self.bucket}"
+        amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        payload_hash = hashlib.sha256(body).hexdigest() if body else EMPTY_SHA256
+        all_headers = {"Host": self.host, "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash,
+                       "Content-Length": str(len(body))}
+        all_headers.update(headers or {})
+        all_headers["Authorization"] = sign_v4(method, path, query, all_headers, payload_hash, self.access_key,
+                                               self.secret_key, self.region, amz_date)
+        url = _uri_encode(path, safe="/-_.~") + (f"?{_canonical_query(query)}" if query else "")
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, url, body=body, headers=all_headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # A pooled keep-alive connection the server has closed; retry once on a fresh one.
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        if response.status >= 300:
+            code, message = str(response.status), ""
+            if data:
+                try:
+                    root = ET.fromstring(data)
+                    code, message = root.findtext("Code", code), root.findtext("Message", "")
+                except ET.ParseError:
+                    message = data[:200].decode(errors="replace")
+            raise S3Error(response.status, code, message)
+        return response.status, response_headers, data
+
+    def bucket_exists(self) -> bool:
+        try:
+            self.request("HEAD")
+            return True
+        except S3Error as e:
+            if e.status == 404:
+                return False
+            raise
+
+    def make_bucket(self) -> None:
+        self.request("PUT")
+
+    def list_objects(self, prefix: str = "", page_size: int = 1000, start_after: str = "") -> Iterator[Dict]:
+        """Stream {key, size, etag, last_modified} for every object under prefix, in key order."""
+        token = None
+        while True:
+            query = {"list-type": "2", "prefix": prefix, "max-keys": str(page_size)}
+            if token:
+                query["continuation-token"] = token
+            elif start_after:
+                query["start-after"] = start_after
+            _, _, data = self.request("GET", query=query)
+            root = ET.fromstring(data)
+            for item in root.iter(f"{{{S3_NAMESPACE}}}Contents"):
+                modified = _xml_text(item, "LastModified")
+                yield {
+                    "key": _xml_text(item, "Key"),
+                    "size": int(_xml_text(item, "Size") or 0),
+                    "etag": (_xml_text(item, "ETag") or "").strip('"'),
+                    "last_modified": datetime.fromisoformat(modified.replace("Z", "+00:00")).timestamp()
+                    if modified else None,
+                }
+            if _xml_text(root, "IsTruncated") != "true":
+                return
+            token = _xml_text(root, "NextContinuationToken")
+
+    def head_object(self, key: str) -> Optional[Dict]:
+        try:
+            _, headers, _ = self.request("HEAD", key)
+        except S3Error as e:
+            if e.status == 404:
+                return None
+            raise
+        return {"key": key, "size": int(headers.get("content-length", 0)), "etag": headers.get("etag", "").strip('"'),
+                "content_type": headers.get("content-type")}
+
+    def get_object(self, key: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        headers = {}
+        if offset or length is not None:
+            end = "" if length is None else str(offset + length - 1)
+            headers["Range"] = f"bytes={offset}-{end}"
+        return self.request("GET", key, headers=headers)[2]
+
+    def put_object(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> str:
+        _, headers, _ = self.request("PUT", key, body=data, headers={"Content-Type": content_type})
+        return headers.get("etag", "").strip('"')
+
+    def delete_object(self, key: str) -> None:
+        self.request("DELETE", key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def create_multipart_upload(self, key: str, content_type: str = "application/octet-stream") -> str:
+        _, _, data = self.request("POST", key, query={"uploads": ""}, headers={"Content-Type": content_type})
+        return _xml_text(ET.fromstring(data), "UploadId")
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        _, headers, _ = self.request("PUT", key, query={"partNumber": str(part_number), "uploadId": upload_id},
+                                     body=data)
+        return headers.get("etag", "").strip('"')
+
+    def complete_multipart_upload(self, key: str, upload_id: str, etags: List[str]) -> str:
+        parts = "".join(f"<Part><PartNumber>{number}</PartNumber><ETag>\"{etag}\"</ETag></Part>"
+                        for number, etag in enumerate(etags, 1))
+        body = f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode()
+        _, _, data = self.request("POST", key, query={"uploadId": upload_id}, body=body,
+                                  headers={"Content-Type": "application/xml"})
+        return (_xml_text(ET.fromstring(data), "ETag") or "").strip('"')
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        self.request("DELETE", key, query={"uploadId": upload_id})
+
+
+class FakeS3:
+    """In-memory S3 server for tests; objects live in `buckets[bucket][key]`."""
+
+    def __init__(self, access_key: str = "minioadmin", secret_key: str = "minioadmin", region: str = "us-east-1"):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.buckets: Dict[str, Dict[str, Dict]] = {}
+        self.uploads: Dict[str, Dict] = {}
+        self.requests: List[Tuple[str, str, Dict[str, str]]] = []
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeS3":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self):
+                parsed = urlparse(self.path)
+                query = dict(parse_qsl(parsed.query, keep_blank_values=True))
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+                status, headers, payload = fake.handle(self.command, unquote(parsed.path), query,
+                                                       dict(self.headers.items()), body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if "Content-Length" not in headers:
+                    self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(payload)
+
+            do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _dispatch
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def client(self, bucket: str, **kwargs) -> S3RestClient:
+        return S3RestClient(self.url, self.access_key, self.secret_key, bucket, self.region, **kwargs)
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @staticmethod
+    def _error(status: int, code: str) -> Tuple[int, Dict[str, str], bytes]:
+        return status, {"Content-Type": "application/xml"}, \
+            f"<Error><Code>{code}</Code><Message>{code}</Message></Error>".encode()
+
+    def _authorized(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+                    body: bytes) -> bool:
+        lowered = {name.lower(): value for name, value in headers.items()}
+        authorization = lowered.get("authorization", "")
+        payload_hash = lowered.get("x-amz-content-sha256", "")
+        if payload_hash != hashlib.sha256(body).hexdigest() or f"Credential={self.access_key}/" not in authorization:
+            return False
+        signed = authorization.split("SignedHeaders=", 1)[1].split(",", 1)[0].split(";")
+        expected = sign_v4(method, path, query, {name: lowered[name] for name in signed if name in lowered},
+                           payload_hash, self.access_key, self.secret_key, self.region, lowered.get("x-amz-date", ""))
+        return hmac.compare_digest(expected, authorization)
+
+    def handle(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+               body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        with self._lock:
+            self.requests.append((method, path, query))
+            self.bytes_received += len(body)
+        if not self._authorized(method, path, query, headers, body):
+            return self._error(403, "SignatureDoesNotMatch")
+
+        bucket_name, _, key = path.lstrip("/").partition("/")
+        if not key:
+            if method == "PUT":
+                self.buckets.setdefault(bucket_name, {})
+                return 200, {}, b""
+            if bucket_name not in self.buckets:
+                return self._error(404, "NoSuchBucket")
+            if method == "HEAD":
+                return 200, {}, b""
+            return self._list(self.buckets[bucket_name], query)
+
+        bucket = self.buckets.get(bucket_name)
+        if bucket is None:
+            return self._error(404, "NoSuchBucket")
+        content_type = {name.lower(): value for name, value in headers.items()}.get(
+            "content-type", "application/octet-stream")
+
+        if method == "POST" and "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {"bucket": bucket_name, "key": key, "parts": {}, "content_type": content_type}
+            return 200, {}, (f'<InitiateMultipartUploadResult xmlns="{S3_NAMESPACE}"><Key>{escape(key)}</Key>'
+                             f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>").encode()
+        if "uploadId" in query:
+            upload = self.uploads.get(query["uploadId"])
+            if upload is None:
+                return self._error(404, "NoSuchUpload")
+            if method == "PUT":
+                upload["parts"][int(query["partNumber"])] = body
+                return 200, {"ETag": f'"{hashlib.md5(body).hexdigest()}"'}, b""
+            if method == "DELETE":
+                del self.uploads[query["uploadId"]]
+                return 204, {}, b""
+            numbers = [int(element.text) for element in ET.fromstring(body).iter("PartNumber")]
+            if numbers != sorted(upload["parts"]):
+                return self._error(400, "InvalidPart")
+            parts = [upload["parts"][number] for number in numbers]
+            etag = multipart_etag([hashlib.md5(part).digest() for part in parts])
+            self._store(bucket, key, b"".join(parts), etag, upload["content_type"])
+            del self.uploads[query["uploadId"]]
+            return 200, {}, (f'<CompleteMultipartUploadResult xmlns="{S3_NAMESPACE}"><Key>{escape(key)}</Key>'
+                             f"<ETag>\"{etag}\"</ETag></CompleteMultipartUploadResult>").encode()
+
+        if method == "PUT":
+            etag = hashlib.md5(body).hexdigest()
+            self._store(bucket, key, body, etag, content_type)
+            return 200, {"ETag": f'"{etag}"'}, b""
+        obj = bucket.get(key)
+        if obj is None:
+            return self._error(404, "NoSuchKey")
+        if method == "DELETE":
+            del bucket[key]
+            return 204, {}, b""
+        object_headers = {"ETag": f'"{obj["etag"]}"', "Content-Type": obj["content_type"],
+                          "Last-Modified": formatdate(obj["last_modified"], usegmt=True)}
+        data = obj["data"]
+        if method == "HEAD":
+            object_headers["Content-Length"] = str(len(data))
+            return 200, object_headers, b""
+        range_header = {name.lower(): value for name, value in headers.items()}.get("range")
+        if range_header:
+            start, _, end = range_header.split("=", 1)[1].partition("-")
+            data = data[int(start):int(end) + 1 if end else None]
+            return 206, object_headers, data
+        return 200, object_headers, data
+
+    def _store(self, bucket: Dict, key: str, data: bytes, etag: str, content_type: str) -> None:
+        with self._lock:
+            bucket[key] = {"data": data, "etag": etag, "content_type": content_type, "last_modified": time.time()}
+
+    def _list(self, bucket: Dict, query: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        prefix = query.get("prefix", "")
+        after = query.get("continuation-token") or query.get("start-after", "")
+        limit = int(query.get("max-keys", 1000))
+        keys = sorted(key for key in bucket if key.startswith(prefix) and key > after)
+        page, truncated = keys[:limit], len(keys) > limit
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key><Size>{len(bucket[key]['data'])}</Size>"
+            f"<ETag>\"{bucket[key]['etag']}\"</ETag><LastModified>"
+            f"{datetime.fromtimestamp(bucket[key]['last_modified'], timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')}"
+            f"</LastModified></Contents>" for key in page)
+        token = f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>" if truncated else ""
+        body = (f'<ListBucketResult xmlns="{S3_NAMESPACE}"><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>'
+                f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{token}{contents}</ListBucketResult>")
+        return 200, {"Content-Type": "application/xml"}, body.encode()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Columnar snapshots of the Qdrant image collection, for backup and environment cloning.
+
+Re-embedding the library is the only other way to rebuild a lost collection. `export`
+pages through the collection and writes its vectors and payloads into chunked shards
+of plain .npy columns; `restore` recreates the collection with the same vector, HNSW,
+optimizer and quantization settings and payload indexes, then bulk-upserts the shards
+from memory maps on several threads. Both directions report GB/min.
+
+A snapshot is a directory:
+
+    manifest.json           collection config, dimension, dtype, shard list (written last)
+    shard-00000/
+        ids.npy             (n,) S36     point ids as text (all digits = integer id)
+        vectors.npy         (n, D)       float32, or float16 with --dtype float16
+        object_key.npy      (n,) S       UTF-8 payload columns; b"" = field absent
+        path.npy, guid.npy, year.npy, project_name.npy
+        extra.jsonl         other payload fields (tags, tag_scores), one line per row that has any
+
+`path` and `guid` are only written when they differ from `object_key` and the point
+id somewhere in the shard; QdrantVectorStore writes them equal, so usually they are not.
+
+Usage:
+    python3 scripts/data/snapshot_vectors.py export --env-file .env --output backups/images-2025-06-01
+    python3 scripts/data/snapshot_vectors.py restore --snapshot backups/images-2025-06-01 --url http://staging:6333
+    python3 scripts/data/snapshot_vectors.py restore --snapshot backups/images-2025-06-01 --collection images_copy
+    python3 scripts/data/snapshot_vectors.py benchmark --points 50000
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+
+import numpy as np  # noqa: E402
+
+from qdrant_rest import FakeQdrant, QdrantRestClient, client_from_env_file, image_payload  # noqa: E402
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SHARD_ROWS = 65536
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_BATCH_SIZE = 512
+PAYLOAD_COLUMNS = ("path", "object_key", "guid", "year", "project_name")
+# Column → what it usually equals, so the column can be left out of the shard.
+ALIASES = {"path": "object_key", "guid": "id"}
+
+
+def _string_column(values: Sequence[str]) -> np.ndarray:
+    encoded = [value.encode() for value in values]
+    return np.array(encoded, dtype=f"S{max([len(v) for v in encoded] + [1])}")
+
+
+def _manifest_path(snapshot_dir: str) -> str:
+    return os.path.join(snapshot_dir, "manifest.json")
+
+
+def _rate(size: int, seconds: float) -> float:
+    return round(size / 1e9 / max(seconds, 1e-9) * 60, 2)
+
+
+def write_shard(shard_dir: str, ids: Sequence, vectors: np.ndarray, payloads: Sequence[Dict],
+                dtype: str = "float32") -> Dict:
+    """Write one shard's columns; returns its manifest entry."""
+    os.makedirs(shard_dir, exist_ok=True)
+    for name in os.listdir(shard_dir):  # left by an earlier export to the same directory
+        if name.endswith((".npy", ".jsonl")):
+            os.remove(os.path.join(shard_dir, name))
+    ids = [str(point_id) for point_id in ids]
+    columns = {name: [str(p.get(name, "")) for p in payloads] for name in PAYLOAD_COLUMNS}
+    aliases = {}
+    for name, source in ALIASES.items():
+        if columns[name] == (ids if source == "id" else columns[source]):
+            aliases[name] = source
+            del columns[name]
+
+    np.save(os.path.join(shard_dir, "ids.npy"), _string_column(ids))
+    np.save(os.path.join(shard_dir, "vectors.npy"), np.ascontiguousarray(vectors, dtype=dtype))
+    for name, values in columns.items():
+        np.save(os.path.join(shard_dir, f"{name}.npy"), _string_column(values))
+    extras = [(row, {k: v for k, v in payload.items() if k not in PAYLOAD_COLUMNS})
+              for row, payload in enumerate(payloads)]
+    extras = [(row, extra) for row, extra in extras if extra]
+    if extras:
+        with open(os.path.join(shard_dir, "extra.jsonl"), "w") as f:
+            f.writelines(json.dumps({"row": row, "payload": extra}) + "\n" for row, extra in extras)
+
+    size = sum(os.path.getsize(os.path.join(shard_dir, name)) for name in os.listdir(shard_dir))
+    return {"name": os.path.basename(shard_dir), "rows": len(ids), "columns": sorted(columns),
+            "aliases": aliases, "extra": bool(extras), "bytes": size}
+
+
+class Shard:
+    """One shard opened through memory maps; `points(start, stop)` rebuilds Qdrant points."""
+
+    def __init__(self, snapshot_dir: str, entry: Dict):
+        self.entry = entry
+        directory = os.path.join(snapshot_dir, entry["name"])
+        self.ids = np.load(os.path.join(directory, "ids.npy"), mmap_mode="r")
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                        for name in entry["columns"]}
+        self.extra: Dict[int, Dict] = {}
+        if entry["extra"]:
+            with open(os.path.join(directory, "extra.jsonl")) as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.extra[record["row"]] = record["payload"]
+        if len(self.ids) != entry["rows"] or len(self.vectors) != entry["rows"]:
+            raise ValueError(f"Shard {entry['name']} holds {len(self.ids)} rows, manifest says {entry['rows']}")
+
+    def points(self, start: int, stop: int) -> List[Dict]:
+        ids = [value.decode() for value in self.ids[start:stop]]
+        columns = {name: [value.decode() for value in column[start:stop]] for name, column in self.columns.items()}
+        for name, source in self.entry["aliases"].items():
+            columns[name] = ids if source == "id" else columns[source]
+        vectors = np.asarray(self.vectors[start:stop], dtype=np.float32).tolist()
+        points = []
+        for i, (point_id, vector) in enumerate(zip(ids, vectors)):
+            payload = {name: columns[name][i] for name in PAYLOAD_COLUMNS if columns[name][i]}
+            payload.update(self.extra.get(start + i, {}))
+            points.append({"id": int(point_id) if point_id.isdigit() else point_id, "vector": vector,
+                           "payload": payload})
+        return points
+
+
+def collection_body(info: Dict) -> Dict:
+    """A create-collection body reproducing a collection's config from its info."""
+    config = info["config"]
+    body = {"vectors": config["params"]["vectors"], "hnsw_config": config.get("hnsw_config") or {},
+            "optimizers_config": config.get("optimizer_config") or {},
+            "on_disk_payload": config["params"].get("on_disk_payload", True)}
+    if config.get("quantization_config"):
+        body["quantization_config"] = config["quantization_config"]
+    return body
+
+
+def _submit_shard(writer: ThreadPoolExecutor, futures: List, output_dir: str, ids: List, vectors: np.ndarray,
+                  payloads: List[Dict], dtype: str) -> None:
+    if futures:
+        futures[-1].result()  # at most one shard waits in memory
+    shard_dir = os.path.join(output_dir, f"shard-{len(futures):05d}")
+    futures.append(writer.submit(write_shard, shard_dir, ids, vectors, payloads, dtype))
+
+
+def export_snapshot(client: QdrantRestClient, collection: str, output_dir: str,
+                    shard_rows: int = DEFAULT_SHARD_ROWS, page_size: int = DEFAULT_PAGE_SIZE,
+                    dtype: str = "float32") -> Dict:
+    """Scroll the whole collection into shards; the manifest is written once every shard is on disk."""
+    started = time.perf_counter()
+    info = client.get_collection(collection)
+    if info is None:
+        raise ValueError(f"Collection '{collection}' does not exist")
+    vectors_config = info["config"]["params"]["vectors"]
+    if "size" not in vectors_config:
+        raise ValueError(f"Collection '{collection}' uses named vectors, which snapshots do not support")
+    dimension = int(vectors_config["size"])
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.exists(_manifest_path(output_dir)):
+        os.remove(_manifest_path(output_dir))
+
+    futures = []
+    ids: List[Any] = []
+    payloads: List[Dict] = []
+    block = np.empty((shard_rows, dimension), dtype=np.float32)
+    # Shards are written on a second thread while the next one is scrolled.
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        for point in client.iter_points(collection, page_size, with_payload=True, with_vector=True):
+            if not isinstance(point["vector"], list):
+                raise ValueError(f"Point {point['id']} has named vectors, which snapshots do not support")
+            block[len(ids)] = point["vector"]
+            ids.append(point["id"])
+            payloads.append(point.get("payload") or {})
+            if len(ids) == shard_rows:
+                _submit_shard(writer, futures, output_dir, ids, block, payloads, dtype)
+                ids, payloads, block = [], [], np.empty((shard_rows, dimension), dtype=np.float32)
+        if ids:
+            _submit_shard(writer, futures, output_dir, ids, block[:len(ids)], payloads, dtype)
+    shards = [future.result() for future in futures]
+
+    manifest = {"version": SNAPSHOT_VERSION, "collection": collection, "created_at": time.time(),
+                "count": sum(shard["rows"] for shard in shards), "dimension": dimension, "dtype": dtype,
+                "config": collection_body(info),
+                "payload_indexes": {field: schema.get("data_type", "keyword")
+                                    for field, schema in (info.get("payload_schema") or {}).items()},
+                "shards": shards}
+    tmp_path = _manifest_path(output_dir) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path(output_dir))
+
+    seconds = time.perf_counter() - started
+    size = sum(shard["bytes"] for shard in shards)
+    return {"collection": collection, "points": manifest["count"], "shards": len(shards),
+            "bytes": size, "seconds": round(seconds, 2), "gb_per_min": _rate(size, seconds)}
+
+
+def read_manifest(snapshot_dir: str) -> Dict:
+    if not os.path.exists(_manifest_path(snapshot_dir)):
+        raise ValueError(f"{snapshot_dir} has no manifest.json (incomplete export?)")
+    with open(_manifest_path(snapshot_dir)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')} in {snapshot_dir}")
+    return manifest
+
+
+def _prepare_collection(client: QdrantRestClient, name: str, manifest: Dict, recreate: bool) -> Optional[Dict]:
+    """Create the target collection with indexing paused; returns the optimizer settings to restore after."""
+    info = client.get_collection(name)
+    if info is not None and recreate:
+        client.delete_collection(name)
+        info = None
+    if info is not None:
+        size = info["config"]["params"]["vectors"].get("size")
+        if size != manifest["dimension"]:
+            raise ValueError(f"Collection '{name}' has {size}-D vectors, the snapshot {manifest['dimension']}-D; "
+                             "restore with --recreate to replace it")
+        return None
+    body = copy.deepcopy(manifest["config"])
+    optimizers = dict(body["optimizers_config"])
+    # Bulk load without building HNSW segment by segment; indexing runs once at the end.
+    body["optimizers_config"]["indexing_threshold"] = 0
+    client.create_collection(name, body)
+    return optimizers
+
+
+def restore_snapshot(client: QdrantRestClient, snapshot_dir: str, collection: Optional[str] = None,
+                     workers: int = 4, batch_size: int = DEFAULT_BATCH_SIZE, recreate: bool = False) -> Dict:
+    """Recreate the collection and upsert every shard, batch_size points per request on `workers` threads."""
+    started = time.perf_counter()
+    manifest = read_manifest(snapshot_dir)
+    name = collection or manifest["collection"]
+    optimizers = _prepare_collection(client, name, manifest, recreate)
+
+    shards = [Shard(snapshot_dir, entry) for entry in manifest["shards"]]
+    tasks = [(shard, start, min(start + batch_size, len(shard.ids)))
+             for shard in shards for start in range(0, len(shard.ids), batch_size)]
+
+    def upload(task: Tuple[Shard, int, int]) -> int:
+        shard, start, stop = task
+        client.upsert_points(name, shard.points(start, stop))
+        return stop - start
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        restored = sum(pool.map(upload, tasks))
+
+    if optimizers is not None:
+        client.update_collection(name, {"optimizers_config": {
+            "indexing_threshold": optimizers.get("indexing_threshold", 20000)}})
+    for field, schema in manifest["payload_indexes"].items():
+        client.create_payload_index(name, field, schema)
+
+    seconds = time.perf_counter() - started
+    size = sum(entry["bytes"] for entry in manifest["shards"])
+    return {"collection": name, "points": restored, "count": client.count(name), "bytes": size,
+            "seconds": round(seconds, 2), "gb_per_min": _rate(size, seconds)}
+
+
+def _synthetic_points(count: int, dimension: int, batch: int = 1000) -> Iterator[List[Dict]]:
+    rng = np.random.default_rng(0)
+    for start in range(0, count, batch):
+        vectors = rng.standard_normal((min(batch, count - start), dimension)).astype(np.float32)
+        points = []
+        for i, vector in enumerate(vectors.tolist(), start):
+            key = f"2025-05-{i % 28 + 1:02d}/Project{i % 37}/RawFiles/Camera{i % 3}/IMG_{i:07d}.jpg"
+            point_id = f"{i:08x}-0000-4000-8000-000000000000"
+            points.append({"id": point_id, "vector": vector, "payload": image_payload(key, point_id)})
+        yield points
+
+
+def run_benchmark(points: int, dimension: int, workers: int, output_dir: str, dtype: str = "float32") -> Dict:
+    """Export and restore a synthetic collection through FakeQdrant.
+
+    The fake parses JSON in Python on one thread, so it bounds both rates; shard_decode_gb_per_min
+    is the snapshot side of a restore on its own.
+    """
+    with FakeQdrant() as source, FakeQdrant() as target:
+        client = QdrantRestClient(source.url)
+        client.create_collection("images", {"vectors": {"size": dimension, "distance": "Cosine"}})
+        for field in ("year", "project_name", "object_key"):
+            client.create_payload_index("images", field)
+        for batch in _synthetic_points(points, dimension):
+            client.upsert_points("images", batch)
+        exported = export_snapshot(client, "images", output_dir, dtype=dtype)
+        restored = restore_snapshot(QdrantRestClient(target.url), output_dir, workers=workers)
+    # The same restore without the server: memory-mapped shards → upsert-ready points.
+    started = time.perf_counter()
+    for entry in read_manifest(output_dir)["shards"]:
+        shard = Shard(output_dir, entry)
+        for start in range(0, entry["rows"], DEFAULT_BATCH_SIZE):
+            shard.points(start, start + DEFAULT_BATCH_SIZE)
+    decode_seconds = time.perf_counter() - started
+    json_bytes = points * dimension * 10  # a float in Qdrant's JSON is ~10 characters
+    return {"points": points, "dimension": dimension, "dtype": dtype, "snapshot_mb": round(exported["bytes"] / 1e6, 1),
+            "json_mb": round(json_bytes / 1e6, 1), "export_seconds": exported["seconds"],
+            "export_gb_per_min": exported["gb_per_min"], "restore_seconds": restored["seconds"],
+            "restore_gb_per_min": restored["gb_per_min"], "restored": restored["count"],
+            "shard_decode_gb_per_min": _rate(exported["bytes"], decode_seconds)}
+
+
+def _qdrant(args) -> Tuple[QdrantRestClient, str]:
+    return client_from_env_file(args.env_file, args.url, args.collection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar snapshots of the Qdrant image collection")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def qdrant_arguments(sub):
+        sub.add_argument("--env-file", default=".env", help="Qdrant settings (QDRANT_HOST/PORT/COLLECTION)")
+        sub.add_argument("--url", help="Qdrant URL (default: from QDRANT_HOST/QDRANT_PORT)")
+
+    export = subparsers.add_parser("export", help="Write the collection to a snapshot directory")
+    qdrant_arguments(export)
+    export.add_argument("--collection", help="Collection name (default: QDRANT_COLLECTION or 'images')")
+    export.add_argument("--output", required=True, help="Snapshot directory")
+    export.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS, help="Points per shard")
+    export.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Points per scroll request")
+    export.add_argument("--dtype", choices=["float32", "float16"], default="float32",
+                        help="Stored vector precision (float16 halves the snapshot)")
+
+    restore = subparsers.add_parser("restore", help="Recreate a collection from a snapshot")
+    qdrant_arguments(restore)
+    restore.add_argument("--snapshot", required=True, help="Snapshot directory")
+    restore.add_argument("--collection", help="Target collection (default: the snapshot's collection)")
+    restore.add_argument("--workers", type=int, default=4, help="Parallel upsert requests")
+    restore.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Points per upsert request")
+    restore.add_argument("--recreate", action="store_true", help="Drop the target collection first if it exists")
+
+    bench = subparsers.add_parser("benchmark", help="Export and restore a synthetic collection via FakeQdrant")
+    bench.add_argument("--points", type=int, default=50000)
+    bench.add_argument("--dimension", type=int, default=512)
+    bench.add_argument("--workers", type=int, default=4)
+    bench.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    bench.add_argument("--output", help="Snapshot directory (default: a temporary directory)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        client, collection = _qdrant(args)
+        result = export_snapshot(client, collection, args.output, args.shard_rows, args.page_size, args.dtype)
+        print(f"💾 Exported {result['points']:,} points from '{collection}' into {result['shards']} shards "
+              f"({result['bytes'] / 1e9:.2f} GB) in {result['seconds']}s — {result['gb_per_min']} GB/min")
+    elif args.command == "restore":
+        client, _ = _qdrant(args)
+        result = restore_snapshot(client, args.snapshot, args.collection, args.workers, args.batch_size,
+                                  args.recreate)
+        print(f"♻️  Restored {result['points']:,} points into '{result['collection']}' "
+              f"({result['count']:,} in collection) in {result['seconds']}s — {result['gb_per_min']} GB/min")
+        if result["count"] < result["points"]:
+            sys.exit("❌ Collection holds fewer points than the snapshot")
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result = run_benchmark(args.points, args.dimension, args.workers, args.output or tmp_dir, args.dtype)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Delta-sync a local shoot folder to the photostore bucket, uploading only new or changed photos.
+
+ImageController takes whole zip archives and MinIOImageUploadService re-uploads every
+entry, so re-sending a shoot after editing a few photos transfers all of it again.
+This client sends only the difference:
+
+1. Each `{directory}/{file}` image under --source (the same direct-descendant rule as
+   MinIODirectoryHelper.IsDirectDescendant) maps to the key
+   `{yyyy-MM-dd}/{project}/{RawFiles|ProcessedFiles}/{directory}/{file}`.
+2. A local manifest records size, mtime and content hashes for each file. A file whose
+   size and mtime are unchanged is not read again.
+3. One streaming listing of the destination prefix gives each remote object's size and
+   ETag. A file is skipped when the remote object already has the same content, which
+   means its ETag equals the file's MD5 (or multipart ETag) or the ETag recorded at the
+   last upload of identical content.
+4. New and changed files are uploaded from a thread pool. Files above
+   --multipart-threshold are sent in --part-size parts, read from disk one part at a
+   time instead of being buffered whole.
+
+The objects are written directly to the bucket, so no ImageMappings rows or metadata
+are created for them. Run extract_metadata.py on the prefix afterwards if needed.
+
+Usage:
+    python3 scripts/data/sync_uploads.py --source ./WeddingSmith --project WeddingSmith --date 2025-05-13
+    python3 scripts/data/sync_uploads.py --source ./edits --project WeddingSmith --date 2025-05-13 \
+        --processed --raw-directory CameraA --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from photoflow_storage import BUCKET_NAME, get_destination_path, get_mime_type, is_image_file  # noqa: E402
+from s3_rest import S3RestClient, multipart_etag  # noqa: E402
+
+MANIFEST_NAME = ".photoflow-sync.json"
+MIB = 1024 * 1024
+DEFAULT_PART_SIZE = 16 * MIB
+DEFAULT_MULTIPART_THRESHOLD = 32 * MIB
+READ_CHUNK = MIB
+
+
+def scan_source(source: str, directories: Optional[List[str]] = None) -> List[Tuple[str, str, str]]:
+    """(directory, file name, path) for every image directly inside each directory of source."""
+    names = directories or sorted(entry.name for entry in os.scandir(source)
+                                  if entry.is_dir() and not entry.name.startswith("."))
+    files = []
+    for directory in names:
+        for entry in sorted(os.scandir(os.path.join(source, directory)), key=lambda e: e.name):
+            if entry.is_file() and not entry.name.startswith(".") and is_image_file(entry.name):
+                files.append((directory, entry.name, entry.path))
+    return files
+
+
+def hash_file(path: str, part_size: int, multipart_threshold: int) -> Dict[str, str]:
+    """SHA-256 plus the ETags S3 would assign: whole-file MD5 and, for large files, the multipart ETag."""
+    size = os.path.getsize(path)
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    part_md5s, part, part_filled = [], hashlib.md5(), 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(min(READ_CHUNK, part_size - part_filled))
+            if not chunk:
+                break
+            sha256.update(chunk)
+            md5.update(chunk)
+            part.update(chunk)
+            part_filled += len(chunk)
+            if part_filled == part_size:
+                part_md5s.append(part.digest())
+                part, part_filled = hashlib.md5(), 0
+    if part_filled:
+        part_md5s.append(part.digest())
+    hashes = {"sha256": sha256.hexdigest(), "md5": md5.hexdigest()}
+    if size > multipart_threshold:
+        hashes["multipart_etag"] = multipart_etag(part_md5s)
+    return hashes
+
+
+class SyncManifest:
+    """Per-file hashes and last uploaded ETag, keyed by object key and saved as JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.files = json.load(f).get("files", {})
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self.lock:
+            return self.files.get(key)
+
+    def put(self, key: str, entry: Dict) -> None:
+        with self.lock:
+            self.files[key] = entry
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with self.lock, open(tmp_path, "w") as f:
+            json.dump({"version": 1, "files": self.files}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def is_unchanged(entry: Dict, remote: Optional[Dict]) -> bool:
+    """Whether the remote object already holds the content described by a manifest entry."""
+    if remote is None or remote["size"] != entry["size"]:
+        return False
+    if remote["etag"] in (entry["md5"], entry.get("multipart_etag")):
+        return True
+    # Servers with encryption or other ETag schemes: trust the ETag we saw after uploading this content.
+    return remote["etag"] == entry.get("uploaded_etag") and entry.get("uploaded_sha256") == entry["sha256"]
+
+
+def upload_file(client: S3RestClient, key: str, path: str, size: int, part_size: int,
+                multipart_threshold: int) -> str:
+    """PUT small files in one request; stream large ones as a multipart upload. Returns the ETag."""
+    content_type = get_mime_type(path)
+    if size <= multipart_threshold:
+        with open(path, "rb") as f:
+            return client.put_object(key, f.read(), content_type)
+
+    upload_id = client.create_multipart_upload(key, content_type)
+    try:
+        etags = []
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(part_size)
+                if not data:
+                    break
+                etags.append(client.upload_part(key, upload_id, len(etags) + 1, data))
+        return client.complete_multipart_upload(key, upload_id, etags)
+    except BaseException:
+        client.abort_multipart_upload(key, upload_id)
+        raise
+
+
+def sync(client: S3RestClient, files: List[Tuple[str, str, str]], prefixes: Dict[str, str], manifest: SyncManifest,
+         workers: int = 8, part_size: int = DEFAULT_PART_SIZE, multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+         dry_run: bool = False) -> Dict:
+    """Upload new or changed files; prefixes maps each local directory to its destination prefix."""
+    started = time.perf_counter()
+    remote: Dict[str, Dict] = {}
+    for prefix in sorted(set(prefixes.values())):
+        for obj in client.list_objects(prefix + "/"):
+            remote[obj["key"]] = obj
+    listed = time.perf_counter()
+
+    report = {"files": len(files), "new": 0, "changed": 0, "unchanged": 0, "hashed": 0, "multipart": 0,
+              "bytes_total": 0, "bytes_uploaded": 0, "bytes_avoided": 0, "failed": [], "uploaded": []}
+    report_lock = threading.Lock()
+
+    def sync_one(item: Tuple[str, str, str]) -> None:
+        directory, name, path = item
+        key = f"{prefixes[directory]}/{name}"
+        stat = os.stat(path)
+        entry = manifest.get(key)
+        hashed = False
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            entry = {field: value for field, value in (entry or {}).items() if field.startswith("uploaded_")}
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                         **hash_file(path, part_size, multipart_threshold))
+            hashed = True
+
+        status = "unchanged" if is_unchanged(entry, remote.get(key)) else "changed" if key in remote else "new"
+        error = None
+        if status != "unchanged" and not dry_run:
+            try:
+                entry["uploaded_etag"] = upload_file(client, key, path, stat.st_size, part_size, multipart_threshold)
+                entry["uploaded_sha256"] = entry["sha256"]
+            except Exception as e:
+                error = str(e)
+        if error is None:
+            manifest.put(key, entry)
+
+        with report_lock:
+            report["hashed"] += hashed
+            report["bytes_total"] += stat.st_size
+            if error:
+                report["failed"].append({"key": key, "error": error})
+            elif status == "unchanged":
+                report["unchanged"] += 1
+                report["bytes_avoided"] += stat.st_size
+            else:
+                report[status] += 1
+                report["bytes_uploaded"] += stat.st_size
+                report["multipart"] += stat.st_size > multipart_threshold
+                report["uploaded"].append(key)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(sync_one, files))
+    finally:
+        if not dry_run:
+            manifest.save()
+
+    local_keys = {f"{prefixes[directory]}/{name}" for directory, name, _ in files}
+    elapsed = time.perf_counter() - started
+    report["remote_only"] = sorted(set(remote) - local_keys)
+    report["uploaded"].sort()
+    report["list_seconds"] = round(listed - started, 3)
+    report["seconds"] = round(elapsed, 3)
+    report["upload_mb_per_second"] = round(report["bytes_uploaded"] / MIB / elapsed, 1) if elapsed else 0.0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload only new or changed photos to the photostore bucket")
+    parser.add_argument("--source", required=True, help="Local folder whose subdirectories are the shoot directories")
+    parser.add_argument("--project", required=True, help="Project name")
+    parser.add_argument("--date", default=datetime.now().strftime("%Y-%m-%d"), help="Shoot date (yyyy-MM-dd)")
+    parser.add_argument("--directory", action="append", help="Only sync this directory (repeatable)")
+    parser.add_argument("--processed", action="store_true", help="Upload as ProcessedFiles")
+    parser.add_argument("--raw-directory", help="Raw directory the processed files belong to (with --processed)")
+    parser.add_argument("--manifest", help=f"Manifest path (default: <source>/{MANIFEST_NAME})")
+    parser.add_argument("--bucket", default=BUCKET_NAME, help=f"Bucket name (default: {BUCKET_NAME})")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent uploads (default: 8)")
+    parser.add_argument("--part-size", type=int, default=DEFAULT_PART_SIZE // MIB, help="Multipart part size in MiB")
+    parser.add_argument("--multipart-threshold", type=int, default=DEFAULT_MULTIPART_THRESHOLD // MIB,
+                        help="Use multipart above this size in MiB (default: 32)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be uploaded")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.part_size < 5:
+        parser.error("--part-size must be at least 5 MiB (the S3 minimum)")
+    if args.processed and not args.raw_directory:
+        parser.error("--processed needs --raw-directory")
+
+    client = S3RestClient(os.getenv("MINIO_ENDPOINT", "http://localhost:9000"),
+                          os.getenv("MINIO_ACCESS_KEY", "minioadmin"),
+                          os.getenv("MINIO_SECRET_KEY", "minioadmin"), args.bucket)
+    if not client.bucket_exists():
+        if args.dry_run:
+            parser.error(f"Bucket '{args.bucket}' does not exist")
+        client.make_bucket()
+
+    timestamp = datetime.strptime(args.date, "%Y-%m-%d")
+    files = scan_source(args.source, args.directory)
+    if args.processed:
+        # Same rule as ExtractAndUploadImagesAsync: processed files live under the raw directory's name.
+        raw_prefix = get_destination_path(timestamp, args.project, args.raw_directory, True)
+        if next(client.list_objects(raw_prefix + "/", page_size=1), None) is None:
+            sys.exit(f"❌ Raw files path '{raw_prefix}' does not exist; upload the raw files first")
+        prefixes = {directory: get_destination_path(timestamp, args.project, args.raw_directory, False)
+                    for directory, _, _ in files}
+    else:
+        prefixes = {directory: get_destination_path(timestamp, args.project, directory, True)
+                    for directory, _, _ in files}
+
+    manifest = SyncManifest(args.manifest or os.path.join(args.source, MANIFEST_NAME))
+    report = sync(client, files, prefixes, manifest, args.workers, args.part_size * MIB,
+                  args.multipart_threshold * MIB, args.dry_run)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        verb = "Would upload" if args.dry_run else "Uploaded"
+        print(f"📤 {verb} {report['new']} new and {report['changed']} changed of {report['files']} files "
+              f"({report['bytes_uploaded'] / MIB:.1f} MiB, {report['multipart']} multipart)")
+        print(f"⏭️  Skipped {report['unchanged']} unchanged files, {report['bytes_avoided'] / MIB:.1f} MiB not sent")
+        print(f"⏱️  {report['seconds']}s ({report['hashed']} files hashed, listing {report['list_seconds']}s)")
+        if report["remote_only"]:
+            print(f"ℹ️  {len(report['remote_only'])} objects exist only in the bucket (left untouched)")
+        for failure in report["failed"]:
+            print(f"❌ {failure['key']}: {failure['error']}")
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,19 @@ This script checks existing MicroK8s cluster state and generates deployment deci
 """
 
 import json
+import os
+import random
 import subprocess
 import sys
 import time
 from typing import Dict, List, Optional, Tuple
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-ml"))
+from profiling import add_profile_arguments, profiled_run, stage
+
 class ClusterConfigChecker:
+    EXPECTED_DEPLOYMENTS = ["backend-deployment", "frontend-deployment", "minio-deployment", "qdrant-deployment"]
+
     def __init__(self, ssh_host: str, ssh_user: str, ssh_key: str = None, ssh_port: int = 22):
         self.ssh_host = ssh_host
         self.ssh_user = ssh_user
@@ -29,6 +36,7 @@ class ClusterConfigChecker:
             "recommendations": [],
             "actions_needed": []
         }
+        self.spans: List[Dict] = []
     
     def _build_ssh_cmd(self) -> List[str]:
         """Build base SSH command with options."""
@@ -43,6 +51,18 @@ class ClusterConfigChecker:
     
     def _run_remote_cmd(self, command: str, timeout: int = 30) -> Tuple[bool, str, str]:
         """Execute command on remote server with timeout."""
+        span = {
+            "command": command,
+            "host": self.ssh_host,
+            "start": time.time(),
+            "duration": 0.0,
+            "exit_code": None,
+            "stdout_bytes": 0,
+            "stderr_bytes": 0,
+            "timed_out": False,
+            "timeout": timeout
+        }
+        started = time.perf_counter()
         try:
             full_cmd = self.ssh_base_cmd + [command]
             result = subprocess.run(
@@ -51,11 +71,59 @@ class ClusterConfigChecker:
                 text=True, 
                 timeout=timeout
             )
+            span["exit_code"] = result.returncode
+            span["stdout_bytes"] = len((result.stdout or "").encode())
+            span["stderr_bytes"] = len((result.stderr or "").encode())
             return result.returncode == 0, result.stdout.strip(), result.stderr.strip()
         except subprocess.TimeoutExpired:
+            span["timed_out"] = True
             return False, "", f"Command timed out after {timeout}s"
         except Exception as e:
             return False, "", str(e)
+        finally:
+            span["duration"] = round(time.perf_counter() - started, 6)
+            self.spans.append(span)
+    
+    def probe_summary(self, top: int = 5) -> Dict:
+        """Summarize recorded SSH probes, including the slowest ones."""
+        slowest = sorted(self.spans, key=lambda s: s["duration"], reverse=True)[:top]
+        return {
+            "count": len(self.spans),
+            "total_duration": round(sum(s["duration"] for s in self.spans), 3),
+            "timeouts": sum(1 for s in self.spans if s["timed_out"]),
+            "failures": sum(1 for s in self.spans if s["exit_code"] != 0),
+            "slowest": [
+                {"command": s["command"], "duration": round(s["duration"], 3), "exit_code": s["exit_code"],
+                 "timed_out": s["timed_out"]}
+                for s in slowest
+            ]
+        }
+    
+    def export_trace(self, output_file: str, fmt: str = "jsonl"):
+        """Write recorded probe spans as JSON lines or Chrome trace format."""
+        if fmt == "jsonl":
+            with open(output_file, 'w') as f:
+                for span in self.spans:
+                    f.write(json.dumps(span) + "\n")
+        elif fmt == "chrome":
+            events = [
+                {
+                    "name": span["command"],
+                    "cat": "ssh",
+                    "ph": "X",
+                    "ts": int(span["start"] * 1_000_000),
+                    "dur": int(span["duration"] * 1_000_000),
+                    "pid": span["host"],
+                    "tid": 1,
+                    "args": {k: span[k] for k in ("exit_code", "stdout_bytes", "stderr_bytes", "timed_out", "timeout")}
+                }
+                for span in self.spans
+            ]
+            with open(output_file, 'w') as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        else:
+            raise ValueError(f"Unsupported trace format: {fmt}")
+        print(f"🧵 Probe trace ({len(self.spans)} spans, {fmt}) saved to {output_file}")
     
     def check_basic_connectivity(self) -> bool:
         """Test basic SSH connectivity."""
@@ -343,7 +411,7 @@ class ClusterConfigChecker:
         """Check deployment status."""
         print("🔍 Checking deployments...")
         deployment_info = {}
-        expected_deployments = ["backend-deployment", "frontend-deployment", "minio-deployment", "qdrant-deployment"]
+        expected_deployments = self.EXPECTED_DEPLOYMENTS
         
         if not self.config["namespaces"].get(namespace, {}).get("exists", False):
             print("ℹ️  Skipping deployment check - namespace doesn't exist")
@@ -370,6 +438,104 @@ class ClusterConfigChecker:
         
         return deployment_info
     
+    @staticmethod
+    def _is_replica_status_ready(status: str) -> bool:
+        """Return True when a 'readyReplicas/replicas' string has every replica ready.
+        
+        A deployment scaled to zero replicas ("0/0") is not serving anything, so it
+        is reported as not ready rather than trivially satisfied.
+        """
+        ready, _, desired = status.partition("/")
+        try:
+            ready_count = int(ready or 0)
+            desired_count = int(desired or 0)
+        except ValueError:
+            return False
+        return desired_count > 0 and ready_count >= desired_count
+    
+    def _poll_deployment_statuses(self, namespace: str) -> Optional[Dict[str, str]]:
+        """Fetch 'ready/desired' for every deployment in the namespace with one kubectl call."""
+        success, stdout, _ = self._run_remote_cmd(
+            f"microk8s kubectl get deployments -n {namespace} -o jsonpath="
+            "'{range .items[*]}{.metadata.name}={.status.readyReplicas}/{.spec.replicas}{\"\\n\"}{end}'",
+            timeout=10
+        )
+        if not success:
+            return None
+        
+        statuses = {}
+        for line in stdout.split('\n'):
+            name, sep, status = line.strip().partition("=")
+            if sep:
+                statuses[name] = status
+        return statuses
+    
+    def wait_for_deployments(self, deployments: Optional[List[str]] = None, namespace: str = "azurephotoflow",
+                             timeout: float = 300, initial_interval: float = 1.0,
+                             max_interval: float = 15.0, backoff: float = 2.0) -> Dict:
+        """Wait until all deployments are ready or the deadline passes.
+        
+        Every poll reads the status of the whole namespace in a single kubectl call,
+        so waiting on N deployments costs one SSH round trip per poll rather than N.
+        The delay between polls grows exponentially (with jitter) up to max_interval
+        and is clipped to the remaining time, so the call returns as soon as the last
+        deployment becomes ready or the deadline passes.
+        """
+        deployments = list(deployments or self.EXPECTED_DEPLOYMENTS)
+        print(f"⏳ Waiting up to {timeout:.0f}s for {len(deployments)} deployments in '{namespace}'...")
+        
+        start_time = time.monotonic()
+        deadline = start_time + timeout
+        interval = initial_interval
+        polls = 0
+        results = {
+            name: {"exists": False, "status": "missing", "ready": False, "time_to_ready": None}
+            for name in deployments
+        }
+        
+        while True:
+            statuses = self._poll_deployment_statuses(namespace)
+            polls += 1
+            now = time.monotonic()
+            
+            for name in deployments:
+                info = results[name]
+                if info["ready"] or statuses is None:
+                    continue
+                status = statuses.get(name)
+                if status is None:
+                    continue
+                info["exists"] = True
+                info["status"] = status
+                if self._is_replica_status_ready(status):
+                    info["ready"] = True
+                    info["time_to_ready"] = round(now - start_time, 3)
+                    print(f"✅ Deployment '{name}' ready after {info['time_to_ready']:.1f}s ({status})")
+            
+            pending = [name for name in deployments if not results[name]["ready"]]
+            remaining = deadline - now
+            if not pending or remaining <= 0:
+                break
+            
+            time.sleep(min(remaining, random.uniform(interval / 2, interval)))
+            interval = min(interval * backoff, max_interval)
+        
+        elapsed = time.monotonic() - start_time
+        all_ready = not pending
+        if all_ready:
+            print(f"✅ All deployments ready in {elapsed:.1f}s ({polls} polls)")
+        else:
+            for name in pending:
+                print(f"❌ Deployment '{name}' not ready after {elapsed:.1f}s ({results[name]['status']})")
+        
+        return {
+            "ready": all_ready,
+            "namespace": namespace,
+            "elapsed": round(elapsed, 3),
+            "polls": polls,
+            "deployments": results
+        }
+    
     def check_storage(self) -> Dict:
         """Check storage configuration."""
         print("🔍 Checking storage configuration...")
@@ -443,32 +609,42 @@ class ClusterConfigChecker:
         start_time = time.time()
         
         # Basic connectivity
-        if not self.check_basic_connectivity():
+        with stage("connectivity"):
+            connected = self.check_basic_connectivity()
+        if not connected:
             self.config["cluster_ready"] = False
+            self.config["probe_summary"] = self.probe_summary()
             return self.config
         
         # MicroK8s status
-        microk8s_status = self.check_microk8s_status()
+        with stage("microk8s_status"):
+            microk8s_status = self.check_microk8s_status()
         self.config["microk8s_status"] = microk8s_status
         
         if not microk8s_status["installed"]:
             self.config["cluster_ready"] = False
+            self.config["probe_summary"] = self.probe_summary()
             return self.config
         
         # Addons
-        self.config["addons"] = self.check_addons()
+        with stage("addons"):
+            self.config["addons"] = self.check_addons()
         
         # Namespace
-        self.config["namespaces"]["azurephotoflow"] = self.check_namespace("azurephotoflow")
+        with stage("namespace"):
+            self.config["namespaces"]["azurephotoflow"] = self.check_namespace("azurephotoflow")
         
         # Secrets
-        self.config["secrets"] = self.check_secrets("azurephotoflow")
+        with stage("secrets"):
+            self.config["secrets"] = self.check_secrets("azurephotoflow")
         
         # Deployments
-        self.config["deployments"] = self.check_deployments("azurephotoflow")
+        with stage("deployments"):
+            self.config["deployments"] = self.check_deployments("azurephotoflow")
         
         # Storage
-        self.config["storage"] = self.check_storage()
+        with stage("storage"):
+            self.config["storage"] = self.check_storage()
         
         # Generate recommendations
         self.config["recommendations"] = self.generate_recommendations()
@@ -481,10 +657,16 @@ class ClusterConfigChecker:
         )
         
         elapsed = time.time() - start_time
+        self.config["elapsed"] = round(elapsed, 3)
+        self.config["probe_summary"] = self.probe_summary()
         print(f"✅ Configuration check completed in {elapsed:.1f}s")
         print(f"📊 Cluster ready: {self.config['cluster_ready']}")
         print(f"📋 Actions needed: {len(self.config['actions_needed'])}")
         print(f"💡 Recommendations: {len(self.config['recommendations'])}")
+        print(f"🐢 Slowest probes ({self.config['probe_summary']['count']} total):")
+        for probe in self.config["probe_summary"]["slowest"]:
+            flag = " (timed out)" if probe["timed_out"] else ""
+            print(f"   {probe['duration']:6.2f}s  {probe['command']}{flag}")
         
         return self.config
     
@@ -512,6 +694,12 @@ OPTIONS:
     -p, --port PORT         SSH port (default: 22)
     -k, --key KEY_PATH      Path to SSH private key file
     -o, --output FILE       Output JSON file (default: cluster-config.json)
+    --wait-ready            Wait for all deployments to become ready after the check
+    --wait-timeout SECONDS  Deadline for --wait-ready (default: 300)
+    --trace FILE            Write every SSH probe as a span to FILE
+    --trace-format FORMAT   Trace format: jsonl or chrome (default: jsonl)
+    --profile [MODE]        Profile the run: cprofile (default) or sample, plus tracemalloc peaks
+    --profile-dir DIR       Directory for stage timings and profiles (default: .timings)
     --help                  Show this help message and exit
 
 ENVIRONMENT VARIABLES:
@@ -520,6 +708,8 @@ ENVIRONMENT VARIABLES:
     SSH_PORT                        SSH port (default: 22)
     SSH_KEY                         SSH private key path
     CONFIG_OUTPUT_FILE              Output file path
+    PHOTOFLOW_PROFILE               Default for --profile
+    PHOTOFLOW_TIMINGS_DIR           Default for --profile-dir
 
 EXAMPLES:
     # Using command line arguments
@@ -534,6 +724,12 @@ EXAMPLES:
     
     # Pipeline usage (environment variables set by CI/CD)
     SSH_HOST=10.0.0.2 SSH_USER=loicn python3 check-cluster-config.py
+    
+    # Block until every deployment is ready (replaces fixed sleep loops)
+    python3 check-cluster-config.py -h 10.0.0.2 -u loicn --wait-ready --wait-timeout 600
+    
+    # Record probe timings for chrome://tracing or Perfetto
+    python3 check-cluster-config.py -h 10.0.0.2 -u loicn --trace probes.json --trace-format chrome
 
 OUTPUT:
     - Detailed cluster analysis printed to stdout
@@ -577,14 +773,21 @@ def parse_arguments():
                        help='Path to SSH private key file')
     parser.add_argument('-o', '--output', default='cluster-config.json',
                        help='Output JSON file (default: cluster-config.json)')
+    parser.add_argument('--wait-ready', action='store_true',
+                       help='Wait for all deployments to become ready after the check')
+    parser.add_argument('--wait-timeout', type=float, default=300,
+                       help='Deadline in seconds for --wait-ready (default: 300)')
+    parser.add_argument('--trace',
+                       help='Write every SSH probe as a span to this file')
+    parser.add_argument('--trace-format', choices=['jsonl', 'chrome'], default='jsonl',
+                       help='Trace file format (default: jsonl)')
+    add_profile_arguments(parser)
     parser.add_argument('--help', action='store_true',
                        help='Show help message and exit')
     
     return parser.parse_args()
 
 def main():
-    import os
-    
     # Parse command line arguments
     args = parse_arguments()
     
@@ -614,46 +817,63 @@ def main():
     print("")
     
     # Run configuration check
-    try:
-        checker = ClusterConfigChecker(ssh_host, ssh_user, ssh_key, ssh_port)
-        config = checker.run_full_check()
-        
-        # Save results
-        checker.save_config(output_file)
-        
-        # Print summary
-        print("\n" + "="*60)
-        print("📋 CLUSTER CONFIGURATION SUMMARY")
-        print("="*60)
-        
-        if config["cluster_ready"]:
-            print("✅ Cluster is ready for deployment")
-        else:
-            print("⚠️  Cluster needs preparation")
-        
-        if config["actions_needed"]:
-            print("\n🔧 Actions needed:")
-            for action in config["actions_needed"]:
-                print(f"  - {action}")
-        
-        if config["recommendations"]:
-            print("\n💡 Deployment recommendations:")
-            for rec in config["recommendations"]:
-                print(f"  - {rec}")
-        
-        print(f"\n📄 Detailed results saved to: {output_file}")
-        print("💡 Use this file with smart-deploy.sh for intelligent deployment")
-        
-        # Exit with appropriate code
-        sys.exit(0 if config["cluster_ready"] else 1)
-        
-    except KeyboardInterrupt:
-        print("\n\n⚠️  Operation cancelled by user")
-        sys.exit(1)
-    except Exception as e:
-        print(f"\n❌ Error during cluster analysis: {str(e)}")
-        print("💡 Check your SSH connection and credentials")
-        sys.exit(1)
+    with profiled_run("check-cluster-config", args):
+        try:
+            checker = ClusterConfigChecker(ssh_host, ssh_user, ssh_key, ssh_port)
+            config = checker.run_full_check()
+        
+            # Optionally block until deployments are ready
+            if args.wait_ready and config["namespaces"].get("azurephotoflow", {}).get("exists", False):
+                with stage("wait_ready", timeout=args.wait_timeout):
+                    config["readiness"] = checker.wait_for_deployments(timeout=args.wait_timeout)
+                # Include the readiness polls in the saved probe summary
+                config["probe_summary"] = checker.probe_summary()
+        
+            # Save results
+            checker.save_config(output_file)
+            if args.trace:
+                checker.export_trace(args.trace, args.trace_format)
+        
+            # Print summary
+            print("\n" + "="*60)
+            print("📋 CLUSTER CONFIGURATION SUMMARY")
+            print("="*60)
+        
+            if config["cluster_ready"]:
+                print("✅ Cluster is ready for deployment")
+            else:
+                print("⚠️  Cluster needs preparation")
+        
+            if config["actions_needed"]:
+                print("\n🔧 Actions needed:")
+                for action in config["actions_needed"]:
+                    print(f"  - {action}")
+        
+            if config["recommendations"]:
+                print("\n💡 Deployment recommendations:")
+                for rec in config["recommendations"]:
+                    print(f"  - {rec}")
+        
+            if "readiness" in config:
+                print("\n⏱️  Time to ready:")
+                for name, info in config["readiness"]["deployments"].items():
+                    ttr = f"{info['time_to_ready']:.1f}s" if info["ready"] else "not ready"
+                    print(f"  - {name}: {ttr}")
+        
+            print(f"\n📄 Detailed results saved to: {output_file}")
+            print("💡 Use this file with smart-deploy.sh for intelligent deployment")
+        
+            # Exit with appropriate code
+            deployments_ready = config.get("readiness", {}).get("ready", False) if args.wait_ready else True
+            sys.exit(0 if config["cluster_ready"] and deployments_ready else 1)
+        
+        except KeyboardInterrupt:
+            print("\n\n⚠️  Operation cancelled by user")
+            sys.exit(1)
+        except Exception as e:
+            print(f"\n❌ Error during cluster analysis: {str(e)}")
+            print("💡 Check your SSH connection and credentials")
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
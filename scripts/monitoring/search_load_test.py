@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Asyncio load generator and latency profiler for the SearchController endpoints.
+
+Replays a recorded or synthetic mix of /api/search/semantic, /similarity, /query
+and /get-count requests at a target rate over a pool of keep-alive connections,
+then reports latency percentiles and error rates per endpoint.
+
+Requests are scheduled open-loop: latency is measured from the moment a request
+was due, not from when a connection became free, so a saturated backend shows up
+as growing latency instead of a silently lower request rate.
+
+`fake-backend` starts a local stand-in for the API with configurable per-endpoint
+delays and error rates, so the harness can be exercised without a cluster.
+
+Usage:
+    python3 scripts/monitoring/search_load_test.py run --url http://localhost:5000 --token "$JWT" \
+        --rate 50 --duration 60 --output search-load.json
+    python3 scripts/monitoring/search_load_test.py run --url http://localhost:5000 --mix recorded.jsonl
+    python3 scripts/monitoring/search_load_test.py fake-backend --port 5055 --delay semantic=lognormal:80:0.4
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+ENDPOINTS = {
+    "semantic": ("GET", "/api/search/semantic"),
+    "similarity": ("GET", "/api/search/similarity"),
+    "query": ("POST", "/api/search/query"),
+    "get-count": ("GET", "/api/search/get-count"),
+}
+DEFAULT_WEIGHTS = {"semantic": 0.6, "similarity": 0.2, "query": 0.1, "get-count": 0.1}
+SYNTHETIC_QUERIES = [
+    "dogs playing in water", "sunset over the ocean", "birthday party", "mountain hiking trail",
+    "city lights at night", "wedding ceremony", "family picnic", "snow in the forest",
+    "portrait with soft light", "cars on a highway", "flowers in a garden", "kids at the beach",
+]
+
+
+class HttpConnectionPool:
+    """A bounded pool of HTTP/1.1 keep-alive connections to one host."""
+
+    def __init__(self, base_url: str, size: int = 16, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "localhost"
+        self.tls = parts.scheme == "https"
+        self.port = parts.port or (443 if self.tls else 80)
+        self.size = size
+        self.timeout = timeout
+        self.idle: asyncio.Queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def _open(self):
+        self.opened += 1
+        context = ssl.create_default_context() if self.tls else None
+        return await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    async def request(self, method: str, path: str, headers: Dict[str, str],
+                      body: Optional[bytes] = None) -> Tuple[int, bytes]:
+        async with self.slots:
+            conn = self.idle.get_nowait() if not self.idle.empty() else await self._open()
+            try:
+                status, payload, keep_alive = await asyncio.wait_for(
+                    self._exchange(conn, method, path, headers, body), self.timeout)
+            except BaseException:
+                conn[1].close()
+                raise
+            if keep_alive:
+                self.idle.put_nowait(conn)
+            else:
+                conn[1].close()
+            return status, payload
+
+    async def _exchange(self, conn, method, path, headers, body):
+        reader, writer = conn
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        lines.append(f"Content-Length: {len(body or b'')}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split(b" ", 2)[1])
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            payload = b"".join(chunks)
+        else:
+            payload = await reader.readexactly(int(response_headers.get("content-length", 0)))
+        keep_alive = response_headers.get("connection", "").lower() != "close"
+        return status, payload, keep_alive
+
+    async def close(self) -> None:
+        while not self.idle.empty():
+            _, writer = self.idle.get_nowait()
+            writer.close()
+
+
+def synthetic_mix(count: int, weights: Optional[Dict[str, float]] = None, object_keys: Optional[List[str]] = None,
+                  seed: int = 0) -> List[Dict[str, Any]]:
+    """Build a reproducible request mix; each entry is {endpoint, params, body}."""
+    rng = random.Random(seed)
+    weights = weights or DEFAULT_WEIGHTS
+    object_keys = object_keys or [f"2024-06-01/LoadTest/RawFiles/Set{i % 8}/IMG_{i:04d}.jpg" for i in range(200)]
+    names = list(weights)
+    mix = []
+    for endpoint in rng.choices(names, [weights[n] for n in names], k=count):
+        query, key = rng.choice(SYNTHETIC_QUERIES), rng.choice(object_keys)
+        if endpoint == "semantic":
+            entry = {"params": {"query": query, "limit": 20, "threshold": 0.2}}
+        elif endpoint == "similarity":
+            entry = {"params": {"objectKey": key, "limit": 20, "threshold": 0.5}}
+        elif endpoint == "query":
+            entry = {"body": {"SemanticQuery": query, "SimilarityReferenceKey": key, "Limit": 20,
+                              "Threshold": 0.3, "CombinationMode": "WeightedCombination"}}
+        else:
+            entry = {"params": {"projectName": key.split("/")[1]} if rng.random() < 0.5 else {}}
+        mix.append({"endpoint": endpoint, **entry})
+    return mix
+
+
+def load_mix(path: str) -> List[Dict[str, Any]]:
+    """Read a recorded mix: JSON lines of {"endpoint": ..., "params": {...}} or {..., "body": {...}}."""
+    mix = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("endpoint") not in ENDPOINTS:
+                raise ValueError(f"{path}:{line_no}: unknown endpoint {entry.get('endpoint')!r}")
+            mix.append(entry)
+    return mix
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))], 2)
+
+    return {"p50": pick(50), "p90": pick(90), "p95": pick(95), "p99": pick(99), "max": round(ordered[-1], 2),
+            "mean": round(sum(ordered) / len(ordered), 2)}
+
+
+async def run_load(base_url: str, mix: List[Dict[str, Any]], rate: float, duration: Optional[float] = None,
+                   connections: int = 16, token: Optional[str] = None, timeout: float = 30.0,
+                   poisson: bool = False, seed: int = 0) -> Dict[str, Any]:
+    """Replay the mix (cycling if needed) at `rate` requests/s and collect per-endpoint statistics."""
+    total = int(rate * duration) if duration else len(mix)
+    pool = HttpConnectionPool(base_url, connections, timeout)
+    headers = {"Accept": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    rng = random.Random(seed)
+    samples: List[Tuple[str, float, Optional[int], Optional[str]]] = []
+
+    async def fire(entry, due):
+        method, path = ENDPOINTS[entry["endpoint"]]
+        if entry.get("params"):
+            path += "?" + urlencode(entry["params"])
+        body, request_headers = None, headers
+        if method == "POST":
+            body = json.dumps(entry.get("body") or {}).encode()
+            request_headers = dict(headers, **{"Content-Type": "application/json"})
+        status, error = None, None
+        try:
+            status, _ = await pool.request(method, path, request_headers, body)
+        except Exception as e:
+            error = type(e).__name__
+        samples.append((entry["endpoint"], (time.perf_counter() - due) * 1000, status, error))
+
+    started = time.perf_counter()
+    tasks, offset = [], 0.0
+    for i in range(total):
+        due = started + offset
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(fire(mix[i % len(mix)], due)))
+        offset += rng.expovariate(rate) if poisson else 1.0 / rate
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await pool.close()
+
+    def failed(sample):
+        return sample[3] is not None or sample[2] is None or sample[2] >= 400
+
+    endpoints = {}
+    for name in ENDPOINTS:
+        rows = [s for s in samples if s[0] == name]
+        if not rows:
+            continue
+        errors = sum(1 for s in rows if failed(s))
+        statuses: Dict[str, int] = {}
+        for _, _, status, error in rows:
+            label = str(status) if status is not None else error
+            statuses[label] = statuses.get(label, 0) + 1
+        endpoints[name] = {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4),
+            "status_codes": statuses,
+            "latency_ms": percentiles([s[1] for s in rows if not failed(s)]),
+        }
+    all_errors = sum(e["errors"] for e in endpoints.values())
+    return {
+        "target": base_url,
+        "config": {"rate": rate, "requests": total, "connections": connections, "poisson": poisson},
+        "elapsed_seconds": round(elapsed, 3),
+        "achieved_rate": round(total / elapsed, 2) if elapsed else 0,
+        "connections_opened": pool.opened,
+        "overall": {"requests": total, "errors": all_errors,
+                    "error_rate": round(all_errors / total, 4) if total else 0,
+                    "latency_ms": percentiles([s[1] for s in samples if not failed(s)])},
+        "endpoints": endpoints,
+    }
+
+
+def parse_delay(spec: str) -> Callable[[random.Random], float]:
+    """Turn 'fixed:MS', 'uniform:LO:HI', 'exp:MEAN' or 'lognormal:MEDIAN:SIGMA' into a seconds sampler."""
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        import math
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"invalid delay spec {spec!r}")
+
+
+class FakeSearchBackend:
+    """Local stand-in for the search API with pluggable per-endpoint delays and error rates."""
+
+    def __init__(self, delays: Optional[Dict[str, Callable[[random.Random], float]]] = None,
+                 error_rates: Optional[Dict[str, float]] = None, require_token: bool = False, seed: int = 0):
+        self.delays = delays or {}
+        self.error_rates = error_rates or {}
+        self.require_token = require_token
+        self.rng = random.Random(seed)
+        self.routes = {(method, path): name for name, (method, path) in ENDPOINTS.items()}
+        self.requests: Dict[str, int] = {}
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _response(self, name: str, params: Dict[str, str], body: Dict[str, Any]) -> Dict[str, Any]:
+        if name == "get-count":
+            return {"Count": 1234, "ProjectName": params.get("projectName"), "Year": params.get("year")}
+        limit = int(params.get("limit") or body.get("Limit") or 5)
+        results = [{"ObjectKey": f"2024-06-01/LoadTest/RawFiles/Set0/IMG_{i:04d}.jpg",
+                    "SimilarityScore": round(0.9 - i * 0.01, 2)} for i in range(limit)]
+        response = {"Results": results, "TotalResults": len(results), "ProcessingTimeMs": 0, "Success": True}
+        if name == "semantic":
+            response["Query"] = params.get("query", "")
+        elif name == "query":
+            response["Query"] = body.get("SemanticQuery")
+        return response
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        from urllib.parse import parse_qsl
+
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+
+                path, _, query = target.partition("?")
+                name = self.routes.get((method, path))
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    if name is None:
+                        status, payload = 404, {"error": f"no route for {method} {path}"}
+                    elif self.require_token and not headers.get("authorization", "").startswith("Bearer "):
+                        status, payload = 401, {"error": "missing bearer token"}
+                    else:
+                        self.requests[name] = self.requests.get(name, 0) + 1
+                        if name in self.delays:
+                            await asyncio.sleep(self.delays[name](self.rng))
+                        if self.rng.random() < self.error_rates.get(name, 0.0):
+                            status, payload = 500, {"Success": False, "ErrorMessage": "injected failure"}
+                        else:
+                            status, payload = 200, self._response(name, dict(parse_qsl(query)),
+                                                                  json.loads(raw) if raw else {})
+                finally:
+                    self.in_flight -= 1
+
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        return await asyncio.start_server(self.handle, host, port)
+
+
+def _parse_pairs(values: List[str], convert: Callable[[str], Any]) -> Dict[str, Any]:
+    pairs = {}
+    for value in values or []:
+        name, _, spec = value.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"❌ Unknown endpoint '{name}' (expected one of {', '.join(ENDPOINTS)})")
+        pairs[name] = convert(spec)
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator and latency profiler for the search API")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Replay a query mix against the API")
+    run.add_argument("--url", default="http://localhost:5000", help="API base URL")
+    run.add_argument("--token", help="JWT bearer token (see scripts/generate-swagger-token.sh)")
+    run.add_argument("--rate", type=float, default=20.0, help="Target requests per second")
+    run.add_argument("--duration", type=float, help="Seconds to run (default: one pass over the mix)")
+    run.add_argument("--requests", type=int, default=500, help="Synthetic mix size when --mix is not given")
+    run.add_argument("--mix", help="Recorded mix as JSON lines of {endpoint, params|body}")
+    run.add_argument("--weights", nargs="+", metavar="ENDPOINT=WEIGHT", help="Synthetic mix weights")
+    run.add_argument("--object-keys", help="File with one object key per line for similarity requests")
+    run.add_argument("--connections", type=int, default=16, help="Connection pool size")
+    run.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    run.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of uniform")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--output", help="Write the JSON results to this file")
+
+    fake = sub.add_parser("fake-backend", help="Serve a local stand-in for the search endpoints")
+    fake.add_argument("--host", default="127.0.0.1")
+    fake.add_argument("--port", type=int, default=5055)
+    fake.add_argument("--delay", nargs="+", metavar="ENDPOINT=SPEC",
+                      help="e.g. semantic=lognormal:80:0.4 get-count=fixed:5 query=uniform:50:150")
+    fake.add_argument("--error-rate", nargs="+", metavar="ENDPOINT=RATE", help="e.g. similarity=0.02")
+    fake.add_argument("--require-token", action="store_true", help="Reject requests without a bearer token")
+    args = parser.parse_args()
+
+    if args.command == "fake-backend":
+        backend = FakeSearchBackend(_parse_pairs(args.delay, parse_delay), _parse_pairs(args.error_rate, float),
+                                    args.require_token)
+
+        async def serve():
+            server = await backend.start(args.host, args.port)
+            print(f"🧪 Fake search backend listening on http://{args.host}:{args.port}")
+            async with server:
+                await server.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            print(f"\n👋 Served {sum(backend.requests.values())} requests: {backend.requests}")
+        return
+
+    if args.mix:
+        mix = load_mix(args.mix)
+    else:
+        object_keys = None
+        if args.object_keys:
+            with open(args.object_keys) as f:
+                object_keys = [line.strip() for line in f if line.strip()]
+        weights = _parse_pairs(args.weights, float) if args.weights else None
+        mix = synthetic_mix(args.requests, weights, object_keys, args.seed)
+
+    print(f"🚀 Sending {int(args.rate * args.duration) if args.duration else len(mix)} requests to {args.url} "
+          f"at {args.rate}/s over {args.connections} connections")
+    results = asyncio.run(run_load(args.url, mix, args.rate, args.duration, args.connections, args.token,
+                                   args.timeout, args.poisson, args.seed))
+
+    print(f"📊 {results['achieved_rate']}/s achieved, {results['overall']['error_rate']:.1%} errors")
+    for name, stats in results["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"   • {name:<10} n={stats['requests']:<6} p50={latency.get('p50', '-')}ms "
+              f"p95={latency.get('p95', '-')}ms p99={latency.get('p99', '-')}ms errors={stats['error_rate']:.1%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+    sys.exit(1 if results["overall"]["errors"] == results["overall"]["requests"] else 0)
+
+
+if __name__ == "__main__":
+    main()
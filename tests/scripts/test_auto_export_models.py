@@ -0,0 +1,91 @@
+import importlib.util
+import json
+import os
+import subprocess
+import tempfile
+from unittest import mock
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "ai-ml", "auto_export_models.py")
+
+spec = importlib.util.spec_from_file_location("scripts.auto_export_models", SCRIPT_PATH)
+aem = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(aem)
+
+CONFIG = {"variant": "base", "dimension": "512", "distance_metric": "Cosine"}
+
+
+def _write_bundle(models_dir, files, role=None):
+    for name in files:
+        path = os.path.join(models_dir, name)
+        if name == "tokenizer":
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "vocab.json"), "w") as f:
+                f.write("{}")
+        else:
+            with open(path, "wb") as f:
+                f.write(b"\0" * 1000)
+    with open(os.path.join(models_dir, "model_info.txt"), "w") as f:
+        f.write("variant=base\ndimension=512\n")
+        if role:
+            f.write(f"role={role}\n")
+
+
+def test_each_role_is_verified_on_its_own():
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_bundle(tmp, aem.ROLE_FILES["search"], role="search")
+        assert aem.check_models_exist(tmp, CONFIG, "search")
+        assert not aem.check_models_exist(tmp, CONFIG, "ingest")
+        assert not aem.check_models_exist(tmp, CONFIG, "full")
+
+
+def test_legacy_full_bundle_satisfies_every_role():
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_bundle(tmp, aem.ROLE_FILES["full"])
+        for role in aem.ROLE_FILES:
+            assert aem.check_models_exist(tmp, CONFIG, role)
+        assert not aem.check_models_exist(tmp, dict(CONFIG, variant="large", dimension="768"), "search")
+
+
+def test_get_model_role_prefers_flag_then_env():
+    assert aem.get_model_role({}) == "full"
+    assert aem.get_model_role({"MODEL_ROLE": "ingest"}) == "ingest"
+    assert aem.get_model_role({"MODEL_ROLE": "ingest"}, "search") == "search"
+    assert aem.get_model_role({"MODEL_ROLE": "bogus"}) == "full"
+
+
+def test_export_search_role_exports_text_only_and_records_role():
+    with tempfile.TemporaryDirectory() as tmp:
+        def fake_export(cmd, **kwargs):
+            parts = cmd[cmd.index("--parts") + 1:]
+            assert parts == ["text"]
+            # Leftovers from an earlier full export must be pruned.
+            _write_bundle(tmp, aem.ROLE_FILES["full"])
+            os.symlink("vision_model.onnx", os.path.join(tmp, "model.onnx"))
+            return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+        with mock.patch.object(aem.subprocess, "run", side_effect=fake_export):
+            assert aem.export_models(tmp, CONFIG, force=True, role="search")
+
+        assert sorted(os.listdir(tmp)) == ["model_info.txt", "text_model.onnx", "tokenizer"]
+        info = aem.read_model_info(tmp)
+        assert info["role"] == "search"
+        assert info["files"] == "text_model.onnx,tokenizer"
+        assert aem.check_models_exist(tmp, CONFIG, "search")
+
+
+def test_benchmark_roles_reports_each_bundle():
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_bundle(tmp, aem.ROLE_FILES["search"], role="search")
+        stdout = json.dumps({"import_seconds": 0.2, "load_seconds": 0.5, "max_rss_mb": 310.0})
+        with mock.patch.object(aem.subprocess, "run",
+                               return_value=subprocess.CompletedProcess([], 0, stdout=stdout, stderr="")) as run:
+            results = aem.benchmark_roles(tmp)
+
+        assert run.call_count == 1
+        assert run.call_args.args[0][-2:] == ["text_model.onnx", "tokenizer"]
+        assert results["search"]["max_rss_mb"] == 310.0
+        assert results["search"]["bundle_mb"] == 0.0
+        assert aem.bundle_size(tmp, "search") == 1002
+        assert results["ingest"] == {"error": "bundle files missing"}
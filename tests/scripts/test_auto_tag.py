@@ -0,0 +1,131 @@
+import importlib.util
+import os
+import sqlite3
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "auto_tag.py")
+
+spec = importlib.util.spec_from_file_location("scripts.auto_tag", SCRIPT_PATH)
+auto_tag = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(auto_tag)
+
+from qdrant_rest import FakeQdrant, QdrantRestClient  # noqa: E402
+
+LABELS = ["beach", "mountain", "city", "forest", "dog", "cat", "car", "food"]
+
+
+class HashTextModels:
+    """Stands in for ClipOnnxModels: a deterministic random vector per prompt."""
+
+    def __init__(self, dimension=32):
+        self.dimension = dimension
+        self.prompts = []
+
+    def embed_texts(self, texts):
+        self.prompts.extend(texts)
+        return [np.random.default_rng(sum(map(ord, text))).standard_normal(self.dimension) for text in texts]
+
+
+def _images(label_matrix, count, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, len(label_matrix), count)
+    vectors = label_matrix[labels] * 3 + rng.standard_normal((count, label_matrix.shape[1])) * 0.3
+    return vectors.astype(np.float32), labels
+
+
+def test_labels_are_encoded_once_and_cached(tmp_path):
+    models = HashTextModels()
+    cache = str(tmp_path / "labels.npz")
+    matrix = auto_tag.encode_labels(models, LABELS, cache_path=cache, batch_size=3)
+    assert models.prompts == [f"a photo of {label}" for label in LABELS]
+    assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0)
+
+    assert np.array_equal(auto_tag.encode_labels(models, LABELS, cache_path=cache), matrix)
+    assert len(models.prompts) == len(LABELS)
+    auto_tag.encode_labels(models, LABELS, template="a picture of {label}", cache_path=cache)
+    assert len(models.prompts) == 2 * len(LABELS)
+
+
+def test_blocked_scores_match_brute_force():
+    matrix = auto_tag.encode_labels(HashTextModels(), LABELS)
+    images, truth = _images(matrix, 300)
+    top, scores, probabilities = auto_tag.score_block(images, matrix, 3)
+
+    normalized = images / np.linalg.norm(images, axis=1, keepdims=True)
+    brute = normalized @ matrix.T
+    assert np.array_equal(top, np.argsort(-brute, axis=1)[:, :3])
+    assert np.allclose(scores, np.sort(brute, axis=1)[:, ::-1][:, :3], atol=1e-5)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+    assert np.all((probabilities >= 0) & (probabilities <= 1)) and np.all(probabilities.sum(axis=1) <= 1 + 1e-5)
+    assert (top[:, 0] == truth).mean() > 0.95
+
+
+def test_npy_run_writes_ranked_tags_and_retags_in_place(tmp_path):
+    matrix = auto_tag.encode_labels(HashTextModels(), LABELS)
+    images, truth = _images(matrix, 250)
+    np.save(tmp_path / "embeddings.npy", images)
+    keys = [f"2024-01-01/P/RawFiles/A/{i}.jpg" for i in range(250)]
+    output = str(tmp_path / "tags.db")
+
+    for k in (4, 2):
+        blocks = ((block_keys, block_keys, block) for block_keys, block
+                  in auto_tag.npy_blocks(str(tmp_path / "embeddings.npy"), keys, block_rows=64))
+        writer = auto_tag.SqliteTagWriter(output, k)
+        stats = auto_tag.tag_blocks(blocks, LABELS, matrix, [(writer, 1)], k)
+        writer.close()
+        assert stats["images"] == 250 and stats["blocks"] == 4
+
+    conn = sqlite3.connect(output)
+    assert conn.execute('SELECT COUNT(*) FROM "ImageTags"').fetchone()[0] == 500
+    rows = conn.execute('SELECT "Rank", "Tag", "Score" FROM "ImageTags" WHERE "ObjectKey" = ? ORDER BY "Rank"',
+                        (keys[7],)).fetchall()
+    assert [rank for rank, _, _ in rows] == [0, 1] and rows[0][1] == LABELS[truth[7]] and rows[0][2] >= rows[1][2]
+
+    # Re-tagging some images with k=1 trims only their ranks; the rest keep both.
+    writer = auto_tag.SqliteTagWriter(output, 1)
+    auto_tag.tag_blocks(((block_keys, block_keys, block) for block_keys, block
+                         in auto_tag.npy_blocks(str(tmp_path / "embeddings.npy"), keys, block_rows=64)
+                         if block_keys[0] == keys[0]), LABELS, matrix, [(writer, 1)], 1)
+    writer.close()
+    assert conn.execute('SELECT COUNT(*) FROM "ImageTags"').fetchone()[0] == 500 - 64
+    for wrong in (keys[:-1], keys + ["extra.jpg"]):
+        with pytest.raises(ValueError, match="embedding rows"):
+            auto_tag.npy_blocks(str(tmp_path / "embeddings.npy"), wrong)
+
+
+def test_qdrant_source_and_payload_write_back(tmp_path):
+    matrix = auto_tag.encode_labels(HashTextModels(), LABELS)
+    images, truth = _images(matrix, 120, seed=1)
+    with FakeQdrant() as fake:
+        client = QdrantRestClient(fake.url)
+        client.create_collection("images", {"vectors": {"size": 32, "distance": "Cosine"}})
+        client.upsert_points("images", [{"id": i, "vector": images[i].tolist(),
+                                         "payload": {"object_key": f"k/{i}.jpg", "year": "2024"}}
+                                        for i in range(120)])
+
+        writer = auto_tag.SqliteTagWriter(str(tmp_path / "tags.db"), 2)
+        blocks = auto_tag.qdrant_blocks(client, "images", block_rows=50)
+        stats = auto_tag.tag_blocks(blocks, LABELS, matrix,
+                                    [(writer, 1), (auto_tag.QdrantTagWriter(client, "images"), 0)], k=2)
+        writer.close()
+        assert stats["images"] == 120 and stats["blocks"] == 3
+
+        payload = client.scroll("images", limit=200, with_payload=True)["points"]
+        by_id = {point["id"]: point["payload"] for point in payload}
+        assert by_id[5]["year"] == "2024" and by_id[5]["tags"][0] == LABELS[truth[5]]
+        assert len(by_id[5]["tag_scores"]) == 2
+
+    tagged = sqlite3.connect(tmp_path / "tags.db").execute(
+        'SELECT "Tag" FROM "ImageTags" WHERE "ObjectKey" = ? AND "Rank" = 0', ("k/5.jpg",)).fetchone()
+    assert tagged == (LABELS[truth[5]],)
+
+
+def test_benchmark_reports_throughput():
+    result = auto_tag.run_benchmark(5000, 50, dimension=64, k=3, block_rows=1024)
+    assert result["images"] == 5000 and result["images_per_second"] > 0
@@ -0,0 +1,68 @@
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "build_previews.py")
+
+spec = importlib.util.spec_from_file_location("scripts.build_previews", SCRIPT_PATH)
+bp = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = bp  # worker processes resolve process_one by module name
+assert spec.loader is not None
+spec.loader.exec_module(bp)
+
+import clip_preprocessing  # noqa: E402  (importable once build_previews put scripts/data on sys.path)
+
+KEY = "2024-05-13/Wedding/RawFiles/CameraA/IMG_0001.jpg"
+
+
+def test_derivative_keys_follow_project_layout():
+    keys = bp.derivative_keys(KEY, [512, 256])
+    assert keys == {
+        "w512": "2024-05-13/Wedding/Derived/w512/RawFiles/CameraA/IMG_0001.jpg",
+        "w256": "2024-05-13/Wedding/Derived/w256/RawFiles/CameraA/IMG_0001.jpg",
+        "clip224": "2024-05-13/Wedding/Derived/clip224/RawFiles/CameraA/IMG_0001.npy",
+    }
+
+
+def test_to_model_input_matches_per_pixel_normalisation():
+    pixels = np.random.default_rng(0).integers(0, 256, size=(4, 5, 3), dtype=np.uint8)
+    tensor = clip_preprocessing.to_model_input(pixels)
+    assert tensor.shape == (1, 3, 4, 5)
+    mean, std = [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]
+    for c in range(3):
+        for y in range(4):
+            for x in range(5):
+                expected = (pixels[y, x, c] / 255.0 - mean[c]) / std[c]
+                assert tensor[0, c, y, x] == pytest.approx(expected, abs=1e-5)
+
+
+def test_build_previews_writes_pyramid_once():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, KEY)
+        os.makedirs(os.path.dirname(path))
+        Image.new("RGB", (2000, 1500), (10, 200, 30)).save(path, "JPEG")
+
+        store = bp.open_object_store(root)
+        stats = bp.build_previews(store, sizes=[512, 256], workers=1)
+        assert stats["processed"] == 1
+        assert stats["failed"] == 0
+
+        keys = bp.derivative_keys(KEY, [512, 256])
+        with Image.open(os.path.join(root, keys["w512"])) as preview:
+            assert preview.size == (512, 384)
+        with Image.open(os.path.join(root, keys["w256"])) as preview:
+            assert preview.size == (256, 192)
+        pixels = np.load(io.BytesIO(store.get_object(keys["clip224"])))
+        assert pixels.shape == (224, 224, 3)
+        assert pixels.dtype == np.uint8
+
+        stats = bp.build_previews(store, sizes=[512, 256], workers=1)
+        assert stats["processed"] == 0
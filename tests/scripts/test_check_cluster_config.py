@@ -1,9 +1,12 @@
 import importlib.util
+import json
 import os
+import subprocess
+import tempfile
 from unittest import mock
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "check-cluster-config.py")
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "deployment", "check-cluster-config.py")
 
 spec = importlib.util.spec_from_file_location("scripts.check_cluster_config", SCRIPT_PATH)
 ccc = importlib.util.module_from_spec(spec)
@@ -33,3 +36,112 @@ def test_check_addons_legacy_format():
     assert addons["dns"] == "enabled"
     assert addons["storage"] == "disabled"
     assert addons["ingress"] == "enabled"
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_wait_for_deployments_returns_when_all_ready():
+    checker = ccc.ClusterConfigChecker("host", "user")
+    clock = _FakeClock()
+    polls = [
+        (True, "backend-deployment=/1\nfrontend-deployment=1/1", ""),
+        (True, "backend-deployment=/1\nfrontend-deployment=1/1", ""),
+        (True, "backend-deployment=1/1\nfrontend-deployment=1/1", ""),
+    ]
+    with mock.patch.object(checker, "_run_remote_cmd", side_effect=polls) as mock_run, \
+         mock.patch.object(ccc.time, "monotonic", clock.monotonic), \
+         mock.patch.object(ccc.time, "sleep", clock.sleep):
+        result = checker.wait_for_deployments(["backend-deployment", "frontend-deployment"], timeout=60)
+
+    assert mock_run.call_count == 3
+    assert result["ready"] is True
+    assert result["polls"] == 3
+    assert result["deployments"]["frontend-deployment"]["time_to_ready"] == 0
+    assert result["deployments"]["backend-deployment"]["time_to_ready"] > 0
+    assert result["deployments"]["backend-deployment"]["status"] == "1/1"
+
+
+def test_wait_for_deployments_stops_at_deadline():
+    checker = ccc.ClusterConfigChecker("host", "user")
+    clock = _FakeClock()
+    with mock.patch.object(checker, "_run_remote_cmd", return_value=(True, "backend-deployment=0/1", "")), \
+         mock.patch.object(ccc.time, "monotonic", clock.monotonic), \
+         mock.patch.object(ccc.time, "sleep", clock.sleep):
+        result = checker.wait_for_deployments(["backend-deployment", "qdrant-deployment"], timeout=30,
+                                              max_interval=4)
+
+    assert result["ready"] is False
+    assert clock.now == 30
+    assert result["deployments"]["backend-deployment"]["exists"] is True
+    assert result["deployments"]["qdrant-deployment"] == {
+        "exists": False, "status": "missing", "ready": False, "time_to_ready": None
+    }
+
+
+def test_replica_status_parsing():
+    assert ccc.ClusterConfigChecker._is_replica_status_ready("2/2")
+    assert not ccc.ClusterConfigChecker._is_replica_status_ready("/1")
+    assert not ccc.ClusterConfigChecker._is_replica_status_ready("1/3")
+    assert not ccc.ClusterConfigChecker._is_replica_status_ready("0/0")
+    assert not ccc.ClusterConfigChecker._is_replica_status_ready("/0")
+
+
+def _completed(returncode=0, stdout="", stderr=""):
+    return subprocess.CompletedProcess(args=[], returncode=returncode, stdout=stdout, stderr=stderr)
+
+
+def test_run_remote_cmd_records_spans():
+    checker = ccc.ClusterConfigChecker("host", "user")
+    side_effects = [
+        _completed(0, "SSH_OK\n"),
+        subprocess.TimeoutExpired(cmd="ssh", timeout=5),
+        _completed(1, "", "not found ✗"),
+    ]
+    with mock.patch.object(ccc.subprocess, "run", side_effect=side_effects):
+        checker._run_remote_cmd("echo 'SSH_OK'", timeout=10)
+        checker._run_remote_cmd("sleep 60", timeout=5)
+        checker._run_remote_cmd("which microk8s", timeout=5)
+
+    assert [s["command"] for s in checker.spans] == ["echo 'SSH_OK'", "sleep 60", "which microk8s"]
+    assert checker.spans[0]["exit_code"] == 0
+    assert checker.spans[0]["stdout_bytes"] == 7
+    assert checker.spans[0]["host"] == "host"
+    assert checker.spans[1]["timed_out"] is True
+    assert checker.spans[2]["stderr_bytes"] == len("not found ✗".encode())
+
+    summary = checker.probe_summary(top=2)
+    assert summary["count"] == 3
+    assert summary["timeouts"] == 1
+    assert summary["failures"] == 2
+    assert len(summary["slowest"]) == 2
+
+
+def test_export_trace_formats():
+    checker = ccc.ClusterConfigChecker("host", "user")
+    with mock.patch.object(ccc.subprocess, "run", return_value=_completed(0, "ok")):
+        checker._run_remote_cmd("echo ok")
+        checker._run_remote_cmd("echo again")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        jsonl_path = os.path.join(tmpdir, "trace.jsonl")
+        checker.export_trace(jsonl_path, "jsonl")
+        with open(jsonl_path) as f:
+            lines = [json.loads(line) for line in f]
+        assert [line["command"] for line in lines] == ["echo ok", "echo again"]
+
+        chrome_path = os.path.join(tmpdir, "trace.json")
+        checker.export_trace(chrome_path, "chrome")
+        with open(chrome_path) as f:
+            trace = json.load(f)
+        assert len(trace["traceEvents"]) == 2
+        assert trace["traceEvents"][0]["ph"] == "X"
+        assert trace["traceEvents"][0]["args"]["exit_code"] == 0
@@ -0,0 +1,90 @@
+import importlib.util
+import io
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "benchmark_decode.py")
+
+spec = importlib.util.spec_from_file_location("scripts.benchmark_decode", SCRIPT_PATH)
+bd = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(bd)
+
+import clip_preprocessing as cp  # noqa: E402
+
+
+def _model_pixels(img):
+    return np.asarray(img.resize((64, 64), Image.BICUBIC), dtype=np.float32)
+
+
+def _full_decode(path):
+    with Image.open(path) as img:
+        return img.convert("RGB")
+
+
+class CountingFile(io.FileIO):
+    """Records the largest single read, to check the strip path never reads the image whole."""
+
+    largest = 0
+
+    def readinto(self, buffer):
+        CountingFile.largest = max(CountingFile.largest, len(buffer))
+        return super().readinto(buffer)
+
+
+@pytest.mark.parametrize("bits,big_endian", [(8, False), (16, False), (16, True)])
+def test_strip_tiff_is_reduced_band_by_band(tmp_path, monkeypatch, bits, big_endian):
+    path = str(tmp_path / "scan.tif")
+    bd.write_strip_tiff(path, 1200, 900, bits, big_endian=big_endian)
+    monkeypatch.setattr(cp, "BAND_BYTES", 64 * 1024)
+    CountingFile.largest = 0
+
+    with CountingFile(path, "rb") as f:
+        img = cp.open_image(f, (100, 100))
+    assert img.mode == "RGB" and img.size == (1200 // 9, 900 // 9)
+    assert CountingFile.largest < 1200 * 3 * bits // 8 * 9 * 4
+    assert np.abs(_model_pixels(img) - _model_pixels(_full_decode(path))).mean() < 1.5
+
+
+def test_pyramid_uses_smallest_sufficient_page(tmp_path):
+    path = str(tmp_path / "pyramid.tif")
+    bd.write_strip_tiff(path, 1600, 1200, 8, reduced_pages=(2, 8))
+    # The 800x600 page, then strip-reduced by 2.
+    assert cp.open_image(path, (224, 224)).size == (400, 300)
+    assert cp.open_image(path, (150, 150)).size == (200, 150)
+    assert cp.open_image(path, (900, 900)).size == (1600, 1200)
+
+
+def test_other_formats_and_orientation(tmp_path):
+    pixels = np.concatenate([(band >> 8).astype(np.uint8) for band in bd.synthetic_rows(900, 600)])
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG", exif=exif)
+    img = cp.open_image(buffer.getvalue(), (224, 224))
+    assert img.size == (450, 300) and img.getexif().get(0x0112) == 6
+
+    path = str(tmp_path / "lzw.tif")
+    Image.fromarray(pixels).save(path, "TIFF", compression="tiff_lzw")
+    assert cp.open_image(path, (224, 224)).size == (450, 300)
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG")
+    assert cp.open_image(buffer.getvalue(), (224, 224)).size == (450, 300)
+    assert cp.open_image(buffer.getvalue(), (1000, 1000)).size == (900, 600)
+
+
+def test_benchmark_runs_each_format_in_a_fresh_process(tmp_path):
+    results = bd.run_benchmark(str(tmp_path), ["tiff-raw8", "tiff-pyramid"], megapixels=0.5)
+    by_format = {row["format"]: row for row in results}
+    assert set(by_format) == {"tiff-raw8", "tiff-pyramid"}
+    for row in results:
+        assert row["full"]["decoded_size"] == row["size"]
+        assert row["fast"]["decoded_size"][0] < row["size"][0]
+        assert row["fast"]["peak_rss_mb"] > 0
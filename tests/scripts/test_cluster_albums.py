@@ -0,0 +1,126 @@
+import importlib.util
+import os
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "cluster_albums.py")
+
+spec = importlib.util.spec_from_file_location("scripts.cluster_albums", SCRIPT_PATH)
+cluster_albums = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(cluster_albums)
+
+from qdrant_rest import FakeQdrant, QdrantRestClient  # noqa: E402
+
+HOUR = 3600.0
+
+
+def _photos(count, centers, seed=0):
+    rng = np.random.default_rng(seed)
+    truth = rng.integers(0, len(centers), count)
+    vectors = centers[truth] + rng.standard_normal((count, centers.shape[1])) * 0.05
+    return vectors.astype(np.float32), truth
+
+
+def test_segment_events_splits_on_gaps_and_merges_bridged_events():
+    albums = np.array([0, 0, 0, 1, 0, 1])
+    times = np.array([0, 1, 10, 2, 11, np.nan]) * HOUR
+    first = cluster_albums.segment_events(albums, times, 6 * HOUR)
+    assert first["event_of_point"].tolist() == [0, 0, 1, 2, 1, -1]
+    assert first["events"]["counts"].tolist() == [2, 2, 1] and first["next_id"] == 3
+
+    # A photo at 5h bridges album 0's events 0 (0-1h) and 1 (10-11h); album 1 gains a new event.
+    second = cluster_albums.segment_events(np.array([0, 1]), np.array([5, 30]) * HOUR, 6 * HOUR,
+                                           first["events"], first["next_id"])
+    assert second["event_of_point"].tolist() == [0, 3] and second["merged"] == {1: 0}
+    events = dict(zip(second["events"]["ids"].tolist(), second["events"]["counts"].tolist()))
+    assert events == {0: 5, 2: 1, 3: 1} and second["next_id"] == 4
+
+
+def test_fit_then_assign_new_uploads_incrementally(tmp_path):
+    centers = cluster_albums.normalize(np.random.default_rng(7).standard_normal((4, 16)))
+    vectors, truth = _photos(400, centers)
+    keys = [f"2024-05-{1 + label * 5:02d}/Trip/RawFiles/Cam/IMG_{i}.jpg" for i, label in enumerate(truth)]
+    metadata = sqlite3.connect(tmp_path / "metadata.db")
+    metadata.execute("CREATE TABLE CameraGeneratedMetadata (ObjectKey TEXT PRIMARY KEY, DateTimeOriginal TEXT, "
+                     "DateTimeDigitized TEXT)")
+    metadata.execute("INSERT INTO CameraGeneratedMetadata VALUES (?, NULL, ?)", (keys[0], keys[0][:10] + "T03:30:00"))
+    metadata.commit()
+    times = cluster_albums.capture_times(keys, str(tmp_path / "metadata.db"))
+    assert times[0] == np.datetime64(keys[0][:10] + "T03:30:00").astype(np.int64)
+    assert times[1] == np.datetime64(keys[1][:10]).astype("datetime64[s]").astype(np.int64)
+
+    model_dir = str(tmp_path / "albums")
+    stats = cluster_albums.fit(model_dir, keys, keys, vectors, times, albums=4, iterations=50)
+    assert stats["images"] == 400 and stats["albums"] == 4 and stats["events"] == 4
+    conn = sqlite3.connect(os.path.join(model_dir, "clusters.db"))
+    albums = dict(conn.execute('SELECT "ObjectKey", "AlbumId" FROM "ImageClusters"'))
+    assert cluster_albums.normalized_mutual_information(truth, [albums[k] for k in keys]) == pytest.approx(1.0)
+    conn.close()
+
+    # New uploads: one per existing album (a day later, so same event) and one unlike anything seen.
+    outlier = cluster_albums.normalize(np.random.default_rng(8).standard_normal((1, 16)))
+    new_vectors = np.concatenate([_photos(4, centers, seed=1)[0], outlier])
+    new_keys = [f"new/{i}.jpg" for i in range(5)]
+    new_times = np.concatenate([times[[np.nonzero(truth == label)[0][0] for label in
+                                       _photos(4, centers, seed=1)[1]]] + HOUR, [np.nan]])
+    before = np.load(os.path.join(model_dir, "centroids.npy"))
+    added = cluster_albums.assign(model_dir, new_keys + keys[:3], new_keys + keys[:3],
+                                  np.concatenate([new_vectors, vectors[:3]]), np.concatenate([new_times, times[:3]]))
+    assert added["added"] == 5 and added["skipped"] == 3 and added["new_albums"] == 1
+    model = cluster_albums.load_model(model_dir)
+    assert model["albums"] == 5 and model["images"] == 405 and model["counts"].sum() == 405
+    assert not np.allclose(model["centroids"][:4], before)
+
+    conn = sqlite3.connect(os.path.join(model_dir, "clusters.db"))
+    rows = {k: (a, e) for k, a, e in conn.execute('SELECT "ObjectKey", "AlbumId", "EventId" FROM "ImageClusters"')}
+    assert rows["new/4.jpg"] == (4, None)
+    for i in range(4):
+        same_day = next(k for k in keys if albums[k] == rows[f"new/{i}.jpg"][0])
+        assert rows[f"new/{i}.jpg"] == rows[same_day]
+    assert conn.execute('SELECT SUM("Images") FROM "ClusterEvents"').fetchone()[0] == 404
+
+    with FakeQdrant() as fake:
+        client = QdrantRestClient(fake.url)
+        client.create_collection("images", {"vectors": {"size": 16, "distance": "Cosine"}})
+        client.upsert_points("images", [{"id": i, "vector": vectors[i].tolist(), "payload": {"object_key": keys[i]}}
+                                        for i in range(3)])
+        conn.execute('UPDATE "ImageClusters" SET "PointId" = ? WHERE "ObjectKey" = ?', ("2", keys[2]))
+        written = cluster_albums.write_qdrant(client, "images", conn, 'WHERE "ObjectKey" = ?', (keys[2],))
+        payload = {p["id"]: p["payload"] for p in client.scroll("images", limit=10, with_payload=True)["points"]}
+    conn.close()
+    assert written == 1 and payload[2]["album_id"] == albums[keys[2]] and payload[2]["object_key"] == keys[2]
+    assert "album_id" not in payload[0]
+
+
+def test_load_source_resolves_key_list_ids_through_image_mappings(tmp_path):
+    from argparse import Namespace
+
+    from photoflow_db import connect, insert_mappings
+    from qdrant_rest import point_id_for_key
+
+    db_path = str(tmp_path / "photoflow.db")
+    conn = connect(db_path, create=True)
+    insert_mappings(conn, [{"Id": "3F2504E0-4F89-11D3-9A0C-0305E82C3301", "ObjectKey": "2025/mapped.jpg",
+                            "FileName": "mapped.jpg", "FileSize": 1, "ContentType": "image/jpeg",
+                            "UploadDate": "2025-01-01 00:00:00", "UpdatedDate": "2025-01-01 00:00:00",
+                            "IsActive": 1}])
+    conn.close()
+    keys_path = tmp_path / "keys.txt"
+    keys_path.write_text("2025/mapped.jpg\n2025/unmapped.jpg\n")
+    embeddings = str(tmp_path / "new.npy")
+    np.save(embeddings, np.eye(2, 4, dtype=np.float32))
+
+    args = Namespace(qdrant=False, embeddings=embeddings, keys=str(keys_path), db=None, env_file=".env")
+    with pytest.raises(SystemExit):
+        cluster_albums.load_source(args)
+
+    args.db = db_path
+    ids, keys, vectors = cluster_albums.load_source(args)
+    assert keys == ["2025/mapped.jpg", "2025/unmapped.jpg"]
+    assert ids == ["3f2504e0-4f89-11d3-9a0c-0305e82c3301", point_id_for_key("2025/unmapped.jpg")]
+    assert vectors.shape == (2, 4)
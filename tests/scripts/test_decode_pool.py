@@ -0,0 +1,54 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL.Image")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "decode_pool.py")
+
+spec = importlib.util.spec_from_file_location("scripts.decode_pool", SCRIPT_PATH)
+dp = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = dp  # worker processes resolve _decode_into by module name
+assert spec.loader is not None
+spec.loader.exec_module(dp)
+
+import clip_preprocessing as cp  # noqa: E402
+
+
+def _reference(sources):
+    return np.concatenate([cp.to_model_input(cp.resize_for_model(cp.open_image(s), cp.INPUT_SIZE)) for s in sources])
+
+
+def test_normalize_into_matches_the_reference_formula_in_place():
+    pixels = np.random.default_rng(1).integers(0, 256, (2, 5, 7, 3), dtype=np.uint8)
+    expected = ((pixels.astype(np.float32) / 255.0 - cp.IMAGE_MEAN) / cp.IMAGE_STD).transpose(0, 3, 1, 2)
+    out = np.full((2, 3, 5, 7), np.nan, dtype=np.float32)
+    assert cp.normalize_into(pixels, out) is out
+    np.testing.assert_allclose(out, expected, atol=1e-6)
+    assert cp.to_model_input(pixels[0]).shape == (1, 3, 5, 7)
+    np.testing.assert_allclose(dp.naive_model_input(dp.synthetic_jpegs(1, (64, 48))[0]),
+                               _reference(dp.synthetic_jpegs(1, (64, 48))), atol=1e-5)
+
+
+def test_pool_decodes_bytes_and_paths_into_reused_batches(tmp_path):
+    images = dp.synthetic_jpegs(7, (320, 240))
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(images[0])
+    sources = [str(path)] + images[1:] + [b"not an image"]
+
+    with dp.DecodePool(workers=2, batch_size=3, prefetch=1) as pool:
+        batches = [(tensor.copy(), errors) for tensor, errors in pool.imap_batches(sources)]
+        assert [len(t) for t, _ in batches] == [3, 3, 2]
+        assert batches[2][1].keys() == {1} and "UnidentifiedImageError" in batches[2][1][1]
+        np.testing.assert_array_equal(np.concatenate([t for t, _ in batches])[:7], _reference(sources[:7]))
+        assert np.allclose(batches[2][0][1], cp.to_model_input(np.zeros((1, 224, 224, 3), np.uint8))[0])
+
+        tensor, errors = pool.decode_batch(images[:2])
+        assert errors == {} and tensor.base is pool.tensors[0]
+        np.testing.assert_array_equal(tensor, _reference(images[:2]))
+        with pytest.raises(ValueError):
+            pool.decode_batch(images[:4])
@@ -0,0 +1,163 @@
+import base64
+import importlib.util
+import json
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "embed_worker.py")
+
+spec = importlib.util.spec_from_file_location("scripts.embed_worker", SCRIPT_PATH)
+ew = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(ew)
+
+from azure_queue_rest import FakeAzureQueue, QueueError, QueueRestClient, parse_connection_string  # noqa: E402
+from photoflow_storage import LocalObjectStore  # noqa: E402
+from qdrant_rest import FakeQdrant  # noqa: E402
+
+PREFIX = "2025-05-13/WeddingSmith/RawFiles/CameraA"
+
+
+def _embed(pixels):
+    """Mean colour per image, padded to 4 dimensions, so vectors are checkable."""
+    means = pixels.reshape(len(pixels), -1, 3).mean(axis=1)
+    return np.concatenate([means, np.ones((len(pixels), 1))], axis=1)
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    for i in range(10):
+        path = tmp_path / PREFIX / f"IMG_{i}.jpg"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGB", (320, 240), (i * 20, 100, 200)).save(path)
+    return LocalObjectStore(str(tmp_path))
+
+
+@pytest.fixture
+def services():
+    with FakeAzureQueue() as queues, FakeQdrant() as qdrant:
+        client = ew.QdrantRestClient(qdrant.url)
+        client.create_collection("images", {"vectors": {"size": 4, "distance": "Cosine"}})
+        yield queues, qdrant, client
+
+
+def _worker(queues, qdrant_client, store, embed=_embed, **kwargs):
+    queue = queues.client(ew.DEFAULT_QUEUE)
+    queue.create_queue()
+    poison = queues.client(ew.DEFAULT_QUEUE + ew.POISON_SUFFIX)
+    poison.create_queue()
+    return queue, poison, ew.EmbedWorker(queue, store, embed, qdrant_client, "images", poison, **kwargs)
+
+
+def test_queue_client_visibility_and_pop_receipts():
+    assert parse_connection_string("UseDevelopmentStorage=true")["endpoint"] == "http://127.0.0.1:10001/devstoreaccount1"
+    with FakeAzureQueue() as fake:
+        queue = QueueRestClient.from_connection_string(fake.connection_string, "jobs")
+        queue.create_queue()
+        queue.create_queue()
+        for i in range(40):
+            queue.send_message(f"<job {i} & more>")
+        assert queue.approximate_count() == 40
+
+        first = queue.receive_messages(32, visibility_timeout=30)
+        assert len(first) == 32 and first[0]["text"] == "<job 0 & more>" and first[0]["dequeue_count"] == 1
+        assert len(queue.receive_messages(32)) == 8
+        assert queue.receive_messages(32) == []
+
+        renewed = queue.update_message(first[0]["id"], first[0]["pop_receipt"], 60)
+        with pytest.raises(QueueError) as error:
+            queue.delete_message(first[0]["id"], first[0]["pop_receipt"])
+        assert error.value.code == "PopReceiptMismatch"
+        fake.advance(31)
+        again = queue.receive_messages(32)
+        assert again[0]["dequeue_count"] == 2 and first[0]["id"] not in {m["id"] for m in again}
+        queue.delete_message(first[0]["id"], renewed)
+        assert queue.approximate_count() == 39
+
+        with pytest.raises(QueueError) as error:
+            QueueRestClient(fake.url, fake.account, base64.b64encode(b"wrong").decode(), "jobs").create_queue()
+        assert error.value.status == 403
+
+
+def test_message_formats():
+    metadata = ew.metadata_message(f"{PREFIX}/IMG_1.jpg")
+    assert ew.object_keys_from_message(metadata) == [f"{PREFIX}/IMG_1.jpg"]
+    assert ew.object_keys_from_message(base64.b64encode(metadata.encode()).decode()) == [f"{PREFIX}/IMG_1.jpg"]
+    assert ew.object_keys_from_message(json.dumps([{"blobUri": "s3://photostore/a/b.jpg"}, {"objectKey": "c.jpg"}])) \
+        == ["a/b.jpg", "c.jpg"]
+    assert ew.object_keys_from_message(f"{PREFIX}/IMG_2.jpg") == [f"{PREFIX}/IMG_2.jpg"]
+    assert ew.object_keys_from_message(json.dumps([f"{PREFIX}/IMG_3.jpg", {"objectKey": "c.jpg"}])) \
+        == [f"{PREFIX}/IMG_3.jpg", "c.jpg"]
+    with pytest.raises(ValueError):
+        ew.object_keys_from_message("[42]")
+
+
+def test_worker_embeds_batches_and_acknowledges(services, bucket):
+    queues, qdrant, client = services
+    batches = []
+
+    def embed(pixels):
+        batches.append(len(pixels))
+        return _embed(pixels)
+
+    queue, _, worker = _worker(queues, client, bucket, embed, batch_size=4, fetch_workers=3)
+    lookup = {f"{PREFIX}/IMG_0.jpg": "11111111-2222-3333-4444-555555555555"}
+    worker.lookup_guids = lambda keys: {key: lookup[key] for key in keys if key in lookup}
+    assert ew.enqueue_objects(queue, bucket, PREFIX) == 10
+
+    stats = worker.run(stop_when_empty=True)
+    assert (stats["messages"], stats["images"], stats["failed"]) == (10, 10, 0)
+    assert batches == [4, 4, 2]
+    assert queue.approximate_count() == 0
+
+    assert client.count("images") == 10
+    point = client.scroll("images", filter={"must": [{"key": "object_key", "match": {"value": f"{PREFIX}/IMG_3.jpg"}}]},
+                          with_vector=True)["points"][0]
+    assert point["id"] == ew.point_id_for_key(f"{PREFIX}/IMG_3.jpg")
+    assert point["payload"] == {"path": f"{PREFIX}/IMG_3.jpg", "object_key": f"{PREFIX}/IMG_3.jpg",
+                                "guid": point["id"], "year": "2025", "project_name": "WeddingSmith"}
+    assert client.scroll("images", filter={"must": [{"key": "guid", "match": {"value": lookup[f"{PREFIX}/IMG_0.jpg"]}}]}
+                         )["points"]
+
+
+def test_failed_messages_retry_then_go_to_poison_queue(services, bucket):
+    queues, qdrant, client = services
+    queue, poison, worker = _worker(queues, client, bucket, batch_size=8, max_dequeue=2, retry_delay=10)
+    bad = [ew.metadata_message(f"{PREFIX}/missing.jpg"), '{"uploadedBy": "Admin"}', "[[1]]", '{"blobUri": 5}']
+    for text in [ew.metadata_message(f"{PREFIX}/IMG_1.jpg")] + bad:
+        queue.send_message(text)
+
+    stats = worker.run(stop_when_empty=True)
+    assert (stats["images"], stats["failed"], stats["poisoned"]) == (1, 4, 0)
+    assert queue.receive_messages(32) == []  # retried messages are hidden for retry_delay
+
+    queues.advance(11)
+    stats = worker.run(stop_when_empty=True)
+    assert stats["poisoned"] == 4
+    assert queue.approximate_count() == 0
+    assert sorted(m["text"] for m in poison.receive_messages(32)) == sorted(bad)
+
+
+def test_leases_are_renewed_while_a_slow_batch_is_embedded(services, bucket):
+    queues, qdrant, client = services
+    other = queues.client(ew.DEFAULT_QUEUE)
+    stolen = []
+
+    def slow_embed(pixels):
+        time.sleep(1.6)
+        queues.advance(1.0)  # past the original 2 s timeout, even on a slow machine
+        stolen.extend(other.receive_messages(32))
+        return _embed(pixels)
+
+    queue, _, worker = _worker(queues, client, bucket, slow_embed, batch_size=10, visibility_timeout=2)
+    ew.enqueue_objects(queue, bucket, PREFIX)
+    stats = worker.run(stop_when_empty=True)
+    assert stats["renewals"] >= 10 and stats["lost"] == 0
+    assert stolen == []
+    assert stats["images"] == 10 and queue.approximate_count() == 0
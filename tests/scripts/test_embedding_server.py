@@ -0,0 +1,160 @@
+import asyncio
+import importlib.util
+import json
+import os
+import tempfile
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "ai-ml", "embedding_server.py")
+
+spec = importlib.util.spec_from_file_location("scripts.embedding_server", SCRIPT_PATH)
+es = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(es)
+
+
+class FakeModels:
+    """Stand-in for ClipOnnxModels: a fixed per-call overhead plus a small per-item cost."""
+
+    def __init__(self, call_overhead=0.01):
+        self.call_overhead = call_overhead
+        self.calls = []
+
+    def _embed(self, items):
+        self.calls.append(len(items))
+        time.sleep(self.call_overhead + 0.0001 * len(items))
+        return [[float(len(item)), 1.0] for item in items]
+
+    def embed_images(self, images):
+        return self._embed(images)
+
+    def embed_texts(self, texts):
+        return self._embed(texts)
+
+
+def test_burst_is_gathered_into_bounded_batches():
+    models = FakeModels()
+    result = asyncio.run(es.run_benchmark(models.embed_texts, ["x" * i for i in range(40)], max_batch_size=16))
+    assert sum(models.calls) == 40
+    assert max(models.calls) <= 16
+    assert len(models.calls) <= 4
+    assert result["requests"] == 40
+    assert result["batch_size_histogram"]["16"] >= 2
+    assert set(result["latency_ms"]) == {"p50", "p90", "p99", "max"}
+
+
+def test_batching_beats_batch_one_under_burst():
+    items = ["text"] * 64
+    single = asyncio.run(es.run_benchmark(FakeModels(0.005).embed_texts, items, max_batch_size=1))
+    batched = asyncio.run(es.run_benchmark(FakeModels(0.005).embed_texts, items, max_batch_size=32))
+    assert batched["requests_per_second"] > 3 * single["requests_per_second"]
+
+
+def test_batch_failure_propagates_to_every_request():
+    def broken(items):
+        raise RuntimeError("session crashed")
+
+    async def run():
+        batcher = es.MicroBatcher(broken, max_batch_size=4, max_wait_ms=1)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True), batcher
+        finally:
+            await batcher.stop()
+
+    results, batcher = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.metrics.errors == 3
+
+
+def test_undecodable_image_fails_only_its_own_request():
+    import io
+
+    from PIL import Image
+
+    class FakeSession:
+        def run(self, _, feeds):
+            return [feeds["input"].mean(axis=(2, 3))]
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 10, 10)).save(buffer, "JPEG")
+    models = object.__new__(es.ClipOnnxModels)
+    models.vision_session = FakeSession()
+
+    async def run():
+        batcher = es.MicroBatcher(models.embed_images, max_batch_size=4, max_wait_ms=20)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(item) for item in (buffer.getvalue(), b"junk",
+                                                                             buffer.getvalue())),
+                                        return_exceptions=True), batcher
+        finally:
+            await batcher.stop()
+
+    (good, bad, other), batcher = asyncio.run(run())
+    assert isinstance(bad, ValueError) and "could not decode image" in str(bad)
+    assert len(good) == 3 and good == other
+    assert batcher.metrics.errors == 1 and batcher.metrics.batch_sizes == {3: 1}
+
+
+def test_stop_cancels_requests_still_queued():
+    async def run():
+        batcher = es.MicroBatcher(lambda items: time.sleep(0.05) or items, max_batch_size=1, max_wait_ms=0)
+        batcher.start()
+        tasks = [asyncio.ensure_future(batcher.submit(i)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+
+
+async def _request(socket_path, method, path, body=b""):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                 + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(payload)
+
+
+def test_http_api_over_unix_socket():
+    models = FakeModels(0.001)
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            socket_path = os.path.join(tmp, "clip.sock")
+            server = es.EmbeddingServer(models, max_batch_size=8, max_wait_ms=5)
+            listener = await server.serve(unix_socket=socket_path)
+            try:
+                texts = await asyncio.gather(*(
+                    _request(socket_path, "POST", "/embed/text", json.dumps({"text": "a" * i}).encode())
+                    for i in range(1, 6)
+                ))
+                image = await _request(socket_path, "POST", "/embed/image", b"\xff\xd8fake")
+                bad = await _request(socket_path, "POST", "/embed/text", b"not json")
+                missing = await _request(socket_path, "GET", "/nope")
+                metrics = await _request(socket_path, "GET", "/metrics")
+            finally:
+                listener.close()
+                await listener.wait_closed()
+                await server.stop()
+            return texts, image, bad, missing, metrics
+
+    texts, image, bad, missing, metrics = asyncio.run(run())
+    assert [status for status, _ in texts] == [200] * 5
+    assert sorted(body["embedding"][0] for _, body in texts) == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert image == (200, {"embedding": [6.0, 1.0]})
+    assert bad[0] == 400 and missing[0] == 404
+    status, body = metrics
+    assert body["text"]["requests"] == 5
+    assert body["text"]["queue_depth"] == 0
+    assert body["image"]["batch_size_histogram"] == {"1": 1}
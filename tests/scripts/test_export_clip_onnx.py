@@ -7,7 +7,7 @@ import os
 import sys
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-EXPORT_PATH = os.path.join(ROOT_DIR, "scripts", "export_clip_onnx.py")
+EXPORT_PATH = os.path.join(ROOT_DIR, "scripts", "ai-ml", "export_clip_onnx.py")
 
 spec = importlib.util.spec_from_file_location("scripts.export_clip_onnx", EXPORT_PATH)
 exp = importlib.util.module_from_spec(spec)
@@ -17,16 +17,17 @@ with mock.patch.dict(sys.modules, {"torch": mock.Mock(), "transformers": mock.Mo
 
 
 def test_export_calls_torch_export():
-    with tempfile.NamedTemporaryFile() as tmp:
+    with tempfile.TemporaryDirectory() as tmp:
         with mock.patch.object(exp.importlib.util, "find_spec", return_value=object()), \
              mock.patch.object(exp, "CLIPModel") as mock_model_cls, \
+             mock.patch.object(exp, "CLIPTokenizer"), \
              mock.patch.object(exp, "torch") as mock_torch, \
              mock.patch.object(exp.os, "makedirs") as mock_makedirs:
             model_instance = mock.Mock()
             model_instance.vision_model = object()
             mock_model_cls.from_pretrained.return_value = model_instance
 
-            exp.export_clip_model(tmp.name, model_name="a/b")
+            exp.export_clip_model(tmp, model_name="a/b")
 
             mock_model_cls.from_pretrained.assert_called_with(
                 "a/b", use_safetensors=True, attn_implementation="eager"
@@ -44,3 +45,18 @@ def test_export_requires_onnx():
             with pytest.raises(RuntimeError):
                 exp.export_clip_model(tmp.name)
 
+
+
+def test_export_text_part_only():
+    with tempfile.TemporaryDirectory() as tmp:
+        with mock.patch.object(exp.importlib.util, "find_spec", return_value=object()), \
+             mock.patch.object(exp, "CLIPModel"), \
+             mock.patch.object(exp, "CLIPTokenizer"), \
+             mock.patch.object(exp, "torch") as mock_torch:
+            exp.export_clip_model(tmp, model_name="a/b", parts=["text"])
+
+            exported = [call.args[2] for call in mock_torch.onnx.export.call_args_list]
+            assert exported == [os.path.join(tmp, "text_model.onnx")]
+            assert not os.path.lexists(os.path.join(tmp, "model.onnx"))
+            with open(os.path.join(tmp, "model_info.txt")) as f:
+                assert "exports=text_model.onnx,tokenizer/" in f.read()
@@ -0,0 +1,92 @@
+import importlib.util
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+TiffImagePlugin = pytest.importorskip("PIL.TiffImagePlugin")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "extract_metadata.py")
+
+spec = importlib.util.spec_from_file_location("scripts.extract_metadata", SCRIPT_PATH)
+em = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = em  # worker processes resolve extract_one by module name
+assert spec.loader is not None
+spec.loader.exec_module(em)
+
+
+def _write_jpeg(path, size=(64, 48), noise=False):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    img = Image.effect_noise(size, 64).convert("RGB") if noise else Image.new("RGB", size, (120, 30, 200))
+    exif = Image.Exif()
+    exif[0x010F] = "Nikon"
+    exif[0x0110] = "FM2"
+    exif[0x0112] = 6
+    exif[0x8769] = {0x9003: "2022:09:20 10:11:12", 0x8827: 400, 0x829A: TiffImagePlugin.IFDRational(1, 250)}
+    img.save(path, "JPEG", exif=exif, quality=95)
+
+
+def test_parse_metadata_reads_exif_fields():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "img.jpg")
+        _write_jpeg(path)
+        with open(path, "rb") as f:
+            metadata = em.parse_metadata(f.read(), "img.jpg")
+
+    assert metadata["CameraMake"] == "Nikon"
+    assert metadata["CameraModel"] == "FM2"
+    assert metadata["Orientation"] == "Right side, top (Rotate 90 CW)"
+    assert metadata["DateTimeOriginal"] == "2022-09-20T10:11:12"
+    assert metadata["Iso"] == 400
+    assert metadata["ExposureTime"] == "1/250"
+    assert (metadata["ImageWidth"], metadata["ImageHeight"]) == (64, 48)
+    assert metadata["CompressionType"] == "Baseline"
+    assert metadata["NumberOfComponents"] == 3
+    assert metadata["DetectedMimeType"] == "image/jpeg"
+    assert metadata["ExpectedFileNameExtension"] == "jpg"
+    assert set(metadata) == set(em.METADATA_FIELDS)
+
+
+def test_extract_metadata_bulk_writes_sqlite_from_headers_only():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = os.path.join(tmpdir, "photostore")
+        prefix = "2024-05-13/Wedding/RawFiles/CameraA"
+        for i in range(3):
+            _write_jpeg(os.path.join(root, prefix, f"IMG_{i}.jpg"), size=(800, 600), noise=True)
+        with open(os.path.join(root, prefix, "notes.txt"), "w") as f:
+            f.write("not an image")
+        with open(os.path.join(root, prefix, "broken.jpg"), "wb") as f:
+            f.write(b"not a jpeg")
+
+        store = em.open_object_store(root)
+        db_path = os.path.join(tmpdir, "metadata.db")
+        writer = em.SqliteMetadataWriter(db_path)
+        stats = em.extract_metadata(store, writer, workers=2, header_bytes=4096, batch_size=2)
+        writer.close()
+
+        assert stats["processed"] == 4
+        assert stats["failed"] == 1
+        assert stats["bytes_read"] <= 4 * 4096
+
+        conn = sqlite3.connect(db_path)
+        rows = dict(conn.execute("SELECT ObjectKey, CameraModel FROM CameraGeneratedMetadata WHERE Error IS NULL"))
+        assert rows == {f"{prefix}/IMG_{i}.jpg": "FM2" for i in range(3)}
+
+        writer = em.SqliteMetadataWriter(db_path)
+        stats = em.extract_metadata(store, writer, workers=1, skip_existing=True)
+        writer.close()
+        assert stats["skipped"] == 3
+        assert stats["processed"] == 1
+
+        # Keys already extracted outside --prefix are not counted as skipped
+        other = "2024-06-01/Portraits/RawFiles/CameraA"
+        _write_jpeg(os.path.join(root, other, "IMG_9.jpg"))
+        writer = em.SqliteMetadataWriter(db_path)
+        stats = em.extract_metadata(store, writer, prefix=other, workers=1, skip_existing=True)
+        writer.close()
+        assert stats["skipped"] == 0
+        assert stats["processed"] == 1
@@ -0,0 +1,86 @@
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import zipfile
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL.Image")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "generate_dataset.py")
+
+spec = importlib.util.spec_from_file_location("scripts.generate_dataset", SCRIPT_PATH)
+gd = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(gd)
+
+from photoflow_storage import parse_object_key  # noqa: E402
+
+
+def test_plan_is_reproducible_and_follows_key_layout():
+    records = list(gd.plan_dataset(103, projects=4, directories=3, seed=7))
+    assert records == list(gd.plan_dataset(103, projects=4, directories=3, seed=7))
+    assert [r["index"] for r in records] == list(range(103))
+    assert len({r["object_key"] for r in records}) == 103
+    assert len({r["id"] for r in records}) == 103
+    for record in records:
+        parsed = parse_object_key(record["object_key"])
+        assert parsed["project_name"] == record["project_name"]
+        assert parsed["category"] == "RawFiles"
+        assert parsed["year"] == record["year"]
+    assert list(gd.plan_dataset(103, projects=4, directories=3, seed=8))[0]["id"] != records[0]["id"]
+
+
+def test_generate_small_dataset():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = gd.generate_dataset(tmp, 60, projects=3, directories=2, dimension=768, embeddings="clustered",
+                                       clusters=4, unique_images=5, image_size=32, seed=1)
+
+        uploads = [json.loads(line) for line in open(os.path.join(tmp, "zips", "uploads.jsonl"))]
+        assert len(uploads) == manifest["outputs"]["zips"]["zips"] == 6
+        entries = 0
+        for upload in uploads:
+            with zipfile.ZipFile(os.path.join(tmp, "zips", upload["zip"])) as archive:
+                for name in archive.namelist():
+                    # MinIODirectoryHelper.IsDirectDescendant: "{directory}/{file}", exactly two segments.
+                    assert name.split("/")[0] == upload["directoryName"]
+                    assert len(name.split("/")) == 2
+                    entries += 1
+        assert entries == 60
+
+        conn = sqlite3.connect(os.path.join(tmp, "photoflow.db"))
+        rows = conn.execute('SELECT ObjectKey, ProjectName, Year, FileSize FROM "ImageMappings" ORDER BY rowid').fetchall()
+        conn.close()
+        planned = list(gd.plan_dataset(60, 3, 2, seed=1))
+        assert [r[0] for r in rows] == [p["object_key"] for p in planned]
+        assert all(r[3] > 0 for r in rows)
+
+        vectors = np.load(os.path.join(tmp, "embeddings.npy"), mmap_mode="r")
+        labels = np.load(os.path.join(tmp, "clusters.npy"))
+        assert vectors.shape == (60, 768) and vectors.dtype == np.float32
+        assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+        assert set(labels) <= set(range(4))
+        # Members of the same cluster are much closer than members of different clusters.
+        same = vectors[labels == labels[0]]
+        other = vectors[labels != labels[0]]
+        assert (same @ vectors[0]).mean() > (other @ vectors[0]).mean() + 0.5
+
+        with open(os.path.join(tmp, "manifest.json")) as f:
+            assert json.load(f)["spec"]["dimension"] == 768
+
+
+def test_embeddings_are_reproducible_across_chunks(monkeypatch):
+    monkeypatch.setattr(gd, "EMBEDDING_CHUNK_ROWS", 16)
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = os.path.join(tmp, "a.npy"), os.path.join(tmp, "b.npy")
+        info = gd.write_embeddings(a, 50, 8, seed=3)
+        gd.write_embeddings(b, 50, 8, seed=3)
+        assert info["shape"] == [50, 8]
+        assert np.array_equal(np.load(a), np.load(b))
+        gd.write_embeddings(b, 50, 8, seed=4)
+        assert not np.array_equal(np.load(a), np.load(b))
@@ -0,0 +1,92 @@
+import importlib.util
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "knn_graph.py")
+
+spec = importlib.util.spec_from_file_location("scripts.knn_graph", SCRIPT_PATH)
+kg = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(kg)
+
+from qdrant_rest import FakeQdrant  # noqa: E402
+
+
+def _vectors(count, dimension=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((8, dimension))
+    return (centers[rng.integers(0, 8, count)] + rng.standard_normal((count, dimension)) * 0.3).astype(np.float32)
+
+
+def _brute_force(vectors, k):
+    unit = kg.normalize(np.asarray(vectors, dtype=np.float16).astype(np.float32))
+    scores = unit @ unit.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k], np.sort(scores, axis=1)[:, ::-1][:, :k]
+
+
+def _assert_matches_brute_force(graph, vectors, k):
+    expected_ids, expected_scores = _brute_force(vectors, k)
+    np.testing.assert_allclose(graph.scores.astype(np.float32), expected_scores, atol=2e-3)
+    # Neighbour sets agree except where float16 rounding makes scores tie.
+    agree = np.mean([len(set(a) & set(b)) / k for a, b in zip(graph.neighbors, expected_ids)])
+    assert agree > 0.98
+
+
+def test_blocked_build_matches_brute_force(tmp_path):
+    vectors = _vectors(300)
+    keys = [f"2025-01-04/Shoot/RawFiles/Roll1/{i}.jpg" for i in range(len(vectors))]
+    result = kg.build_graph(str(tmp_path / "knn"), keys, vectors, k=5, block_rows=64, block_cols=70, workers=3)
+    assert result["rows"] == 300
+
+    graph = kg.KnnGraph(str(tmp_path / "knn"))
+    assert graph.neighbors.dtype == np.int32 and graph.scores.dtype == np.float16
+    assert os.path.getsize(tmp_path / "knn" / "neighbors.i32") == 300 * 5 * 4
+    assert not (graph.neighbors == np.arange(300)[:, None]).any()
+    _assert_matches_brute_force(graph, vectors, 5)
+
+    similar = graph.similar(keys[0], limit=3)
+    assert [key for key, _ in similar] == [keys[n] for n in graph.neighbors[0][:3]]
+    assert similar[0][1] >= similar[1][1] >= similar[2][1]
+    assert graph.similar("missing.jpg") is None
+
+
+def test_incremental_add_equals_full_rebuild(tmp_path):
+    vectors = _vectors(400, seed=1)
+    keys = [f"img/{i}.jpg" for i in range(len(vectors))]
+    kg.build_graph(str(tmp_path / "knn"), keys[:350], vectors[:350], k=6, block_rows=50, block_cols=128)
+
+    result = kg.add_to_graph(str(tmp_path / "knn"), keys[340:], vectors[340:], block_rows=50, block_cols=128,
+                             workers=2)
+    assert (result["added"], result["skipped"], result["rows"]) == (50, 10, 400)
+    assert result["existing_rows_updated"] > 0
+
+    graph = kg.KnnGraph(str(tmp_path / "knn"))
+    assert graph.keys == keys
+    _assert_matches_brute_force(graph, vectors, 6)
+    assert kg.add_to_graph(str(tmp_path / "knn"), keys[:5], vectors[:5])["added"] == 0
+
+
+def test_small_graph_pads_missing_neighbours(tmp_path):
+    vectors = _vectors(3)
+    kg.build_graph(str(tmp_path / "knn"), ["a", "b", "c"], vectors, k=4)
+    graph = kg.KnnGraph(str(tmp_path / "knn"))
+    assert (graph.neighbors[:, 2:] == -1).all()
+    assert [len(graph.similar(key)) for key in "abc"] == [2, 2, 2]
+
+
+def test_qdrant_fallback_for_keys_outside_the_graph():
+    vectors = _vectors(20)
+    with FakeQdrant() as fake:
+        client = kg.QdrantRestClient(fake.url)
+        client.create_collection("images", {"vectors": {"size": 16, "distance": "Cosine"}})
+        client.upsert_points("images", [{"id": i, "vector": v.tolist(), "payload": {"object_key": f"k{i}"}}
+                                        for i, v in enumerate(vectors)])
+        found = kg.qdrant_similar(client, "images", "k3", limit=4)
+        expected_ids, _ = _brute_force(vectors, 4)
+        assert [key for key, _ in found] == [f"k{n}" for n in expected_ids[3]]
+        assert kg.qdrant_similar(client, "images", "nope") == []
@@ -0,0 +1,126 @@
+import importlib.util
+import os
+import tempfile
+from unittest import mock
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "mapping_index.py")
+
+spec = importlib.util.spec_from_file_location("scripts.mapping_index", SCRIPT_PATH)
+mi = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(mi)
+
+
+def _row(i, project="Wedding", year="2024", active=1, updated="2025-01-01 00:00:00"):
+    return {
+        "Id": f"0000000{i}-0000-0000-0000-000000000000".upper(),
+        "ObjectKey": f"{year}-05-13/{project}/RawFiles/CameraA/IMG_{i}.jpg",
+        "FileName": f"IMG_{i}.jpg", "ProjectName": project, "FileSize": 1, "ContentType": "image/jpeg",
+        "Year": year, "IsActive": active, "UploadDate": updated, "UpdatedDate": updated,
+    }
+
+
+def test_build_and_batched_lookup():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "photoflow.db")
+        index_dir = os.path.join(tmpdir, "index")
+        conn = mi.connect(db_path, create=True)
+        mi.insert_mappings(conn, [_row(1), _row(2, project="Portraits", year="2023"), _row(3, active=0)])
+        conn.close()
+
+        manifest = mi.build_index(db_path, index_dir)
+        assert manifest["row_count"] == 2
+
+        index = mi.MappingIndex(index_dir)
+        portraits = _row(2, project="Portraits", year="2023")["ObjectKey"]
+        results = index.lookup([portraits, "missing/key.jpg", _row(1)["ObjectKey"], _row(3)["ObjectKey"]])
+        assert results[0] == {"guid": "00000002-0000-0000-0000-000000000000",
+                              "project_name": "Portraits", "year": "2023"}
+        assert results[1] is None
+        assert results[2]["project_name"] == "Wedding"
+        assert results[3] is None
+
+
+def test_incremental_update_merges_new_and_changed_rows():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "photoflow.db")
+        index_dir = os.path.join(tmpdir, "index")
+        conn = mi.connect(db_path, create=True)
+        mi.insert_mappings(conn, [_row(1), _row(2)])
+        mi.build_index(db_path, index_dir)
+
+        mi.insert_mappings(conn, [_row(3, project="Travel", updated="2025-02-01 00:00:00")])
+        with conn:
+            conn.execute('UPDATE "ImageMappings" SET IsActive = 0, UpdatedDate = ? WHERE ObjectKey = ?',
+                         ("2025-02-02 00:00:00", _row(1)["ObjectKey"]))
+        conn.close()
+
+        manifest = mi.update_index(db_path, index_dir)
+        assert manifest["delta_rows"] == 2
+        assert manifest["generation"] == 2
+        assert sorted(n for n in os.listdir(index_dir) if n.startswith("gen-")) == ["gen-000001", "gen-000002"]
+
+        index = mi.MappingIndex(index_dir)
+        results = index.lookup([_row(1)["ObjectKey"], _row(2)["ObjectKey"], _row(3, project="Travel")["ObjectKey"]])
+        assert results[0] is None
+        assert results[1]["guid"].startswith("00000002")
+        assert results[2]["project_name"] == "Travel"
+
+        assert mi.update_index(db_path, index_dir)["delta_rows"] == 0
+
+
+def test_hash_collisions_fall_back_to_overflow():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "photoflow.db")
+        index_dir = os.path.join(tmpdir, "index")
+        conn = mi.connect(db_path, create=True)
+        mi.insert_mappings(conn, [_row(1), _row(2), _row(3)])
+        conn.close()
+
+        with mock.patch.object(mi, "hash_key", lambda key: 7 if key.endswith(("IMG_1.jpg", "IMG_2.jpg")) else 9):
+            mi.build_index(db_path, index_dir)
+            index = mi.MappingIndex(index_dir)
+            results = index.lookup([_row(1)["ObjectKey"], _row(2)["ObjectKey"], _row(3)["ObjectKey"]])
+
+        assert [r["guid"][:8] for r in results] == ["00000001", "00000002", "00000003"]
+        assert len(index.overflow) == 2
+
+
+def test_benchmark_reports_both_paths():
+    results = mi.run_benchmark(rows=2000, queries=200)
+    assert results["queries"] == 200
+    assert results["per_row_lookups_per_second"] > 0
+    assert results["batched_lookups_per_second"] > 0
+
+
+def test_update_sees_same_timestamp_changes_and_rebuilds_after_deletes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "photoflow.db")
+        index_dir = os.path.join(tmpdir, "index")
+        conn = mi.connect(db_path, create=True)
+        mi.insert_mappings(conn, [_row(1), _row(2)])
+        mi.build_index(db_path, index_dir)
+
+        # Changed after the build, but within the timestamp the build already recorded.
+        with conn:
+            conn.execute('UPDATE "ImageMappings" SET ProjectName = ? WHERE ObjectKey = ?',
+                         ("Portraits", _row(2)["ObjectKey"]))
+        manifest = mi.update_index(db_path, index_dir)
+        assert manifest["delta_rows"] == 1 and not manifest.get("rebuilt")
+        assert mi.MappingIndex(index_dir).lookup([_row(2)["ObjectKey"]])[0]["project_name"] == "Portraits"
+        assert mi.update_index(db_path, index_dir)["delta_rows"] == 0
+
+        with conn:
+            conn.execute('DELETE FROM "ImageMappings" WHERE ObjectKey = ?', (_row(1)["ObjectKey"],))
+        mi.insert_mappings(conn, [_row(3, updated="2025-03-01 00:00:00")])
+        conn.close()
+        manifest = mi.update_index(db_path, index_dir)
+        assert manifest["rebuilt"] and manifest["row_count"] == 2 and manifest["delta_rows"] == 1
+        index = mi.MappingIndex(index_dir)
+        assert index.lookup([_row(1)["ObjectKey"]]) == [None] and len(index) == 2
+        assert mi.update_index(db_path, index_dir)["delta_rows"] == 0
@@ -0,0 +1,112 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL.Image")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "ai-ml", "model_regression.py")
+
+spec = importlib.util.spec_from_file_location("scripts.model_regression", SCRIPT_PATH)
+mr = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(mr)
+
+from clip_preprocessing import open_image, resize_for_model  # noqa: E402
+
+
+class ProjectionModels:
+    """Deterministic stand-in for ClipOnnxModels: fixed random projections of pixels and query hashes."""
+
+    def __init__(self, seed=0, noise=0.0, dtype=np.float32):
+        rng = np.random.default_rng(seed)
+        self.image_weights = rng.standard_normal((16 * 16 * 3, 64)).astype(dtype)
+        self.text_weights = rng.standard_normal((256, 64)).astype(dtype)
+        self.noise = noise
+        self.rng = np.random.default_rng(seed + 1000)
+
+    def _finish(self, vectors):
+        vectors = vectors.astype(np.float32)
+        vectors += self.noise * np.abs(vectors).mean() * self.rng.standard_normal(vectors.shape)
+        return mr.l2_normalize(vectors).tolist()
+
+    def embed_images(self, images):
+        pixels = np.stack([resize_for_model(open_image(data), 16).reshape(-1) / 255.0 - 0.5 for data in images])
+        return self._finish(pixels @ self.image_weights.astype(np.float32))
+
+    def embed_texts(self, texts):
+        features = np.zeros((len(texts), 256), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in text.split():
+                features[i, sum(token.encode()) % 256] += 1
+        return self._finish(features @ self.text_weights.astype(np.float32))
+
+
+@pytest.fixture(scope="module")
+def golden():
+    images = mr.synthetic_images(32, size=(96, 72))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "golden.npz")
+        summary = mr.record_golden(ProjectionModels(), images, mr.DEFAULT_QUERIES, path)
+        assert summary == {"images": 32, "queries": len(mr.DEFAULT_QUERIES), "dimension": 64,
+                           "reference_seconds": summary["reference_seconds"]}
+        yield mr.load_golden(path), images
+
+
+def test_synthetic_corpus_is_deterministic():
+    assert mr.synthetic_images(3, size=(64, 48)) == mr.synthetic_images(3, size=(64, 48))
+    assert mr.synthetic_images(3, seed=1, size=(64, 48)) != mr.synthetic_images(3, size=(64, 48))
+
+
+def test_identical_model_scores_perfectly(golden):
+    gold, images = golden
+    report = mr.check_candidate(gold, ProjectionModels(), images, reference=ProjectionModels())
+    assert report["passed"]
+    assert report["cosine"]["min"] == pytest.approx(1.0, abs=1e-5)
+    assert report["topk"] == {"k": 5, "text_to_image": 1.0, "image_to_image": 1.0}
+    assert report["reference_timed"] == "now"
+    assert report["timing"]["speedup"] > 0
+
+
+def test_half_precision_candidate_passes(golden):
+    gold, images = golden
+    report = mr.check_candidate(gold, ProjectionModels(dtype=np.float16), images)
+    assert report["passed"], report["failures"]
+    assert report["reference_timed"] == "golden"
+
+
+def test_drifted_candidate_is_rejected(golden):
+    gold, images = golden
+    report = mr.check_candidate(gold, ProjectionModels(noise=0.5), images)
+    assert not report["passed"]
+    assert any("cosine" in failure for failure in report["failures"])
+    assert report["topk"]["image_to_image"] < 1.0
+
+
+def test_speedup_threshold_is_optional_gate(golden):
+    gold, images = golden
+    report = mr.check_candidate(gold, ProjectionModels(), images, min_speedup=1000.0)
+    assert report["failures"] == [f"speedup {report['timing']['speedup']}x < 1000.0x"]
+
+
+def test_shape_mismatch_is_an_error(golden):
+    gold, _ = golden
+    with pytest.raises(ValueError):
+        mr.score_candidate(gold, gold["image_embeddings"][:, :32], gold["text_embeddings"])
+
+
+@pytest.mark.skipif(not os.environ.get("CLIP_GOLDEN_VECTORS") or not os.environ.get("CLIP_CANDIDATE_MODELS"),
+                    reason="set CLIP_GOLDEN_VECTORS and CLIP_CANDIDATE_MODELS to gate a real artifact")
+def test_candidate_artifact_matches_golden_vectors():
+    pytest.importorskip("onnxruntime")
+    gold = mr.load_golden(os.environ["CLIP_GOLDEN_VECTORS"])
+    images = mr.synthetic_images(len(gold["image_names"]))
+    # The golden file must have been recorded from this exact synthetic corpus.
+    assert len(images) == len(gold["image_names"]) == len(gold["image_embeddings"])
+    assert [name for name, _ in images] == [str(name) for name in gold["image_names"]]
+    report = mr.check_candidate(gold, mr.ClipOnnxModels(os.environ["CLIP_CANDIDATE_MODELS"]), images)
+    assert report["passed"], report["failures"]
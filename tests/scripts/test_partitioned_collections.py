@@ -0,0 +1,118 @@
+import importlib.util
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "partitioned_collections.py")
+
+spec = importlib.util.spec_from_file_location("scripts.partitioned_collections", SCRIPT_PATH)
+pc = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(pc)
+
+from qdrant_rest import FakeQdrant, QdrantRestClient, image_payload  # noqa: E402
+
+
+def _points(count, years=("2023", "2024", "2025")):
+    rng = np.random.default_rng(2)
+    points = []
+    for i in range(count):
+        key = f"{years[i % len(years)]}-05-13/Project{i % 4}/RawFiles/CameraA/IMG_{i}.jpg"
+        point_id = f"{i:08d}-0000-4000-8000-000000000000"
+        points.append({"id": point_id, "vector": rng.standard_normal(8).tolist(), "payload": image_payload(key, point_id)})
+    points[-1]["payload"] = {"object_key": "inbox/scan.jpg"}
+    return points
+
+
+@pytest.fixture
+def qdrant():
+    with FakeQdrant() as fake:
+        client = QdrantRestClient(fake.url)
+        client.create_collection("images", {"vectors": {"size": 8, "distance": "Cosine"}, "hnsw_config": {"m": 24}})
+        for field in ("year", "project_name"):
+            client.create_payload_index("images", field)
+        yield fake, client
+
+
+def test_names_and_filters():
+    assert pc.partition_name("image-embeddings", "2025", 2) == "image-embeddings-2025-2"
+    assert pc.parse_partition("image-embeddings", "image-embeddings-2025-2") == ("2025", 2)
+    assert pc.parse_partition("images", "images-undated") == ("undated", 0)
+    assert pc.parse_partition("images", "images-copy") is None and pc.parse_partition("images", "images") is None
+    assert pc.filter_years({"must": [{"key": "year", "match": {"any": ["2024", "2025"]}},
+                                     {"key": "year", "match": {"value": "2025"}}]}) == {"2025"}
+    assert pc.filter_years({"must": [{"key": "project_name", "match": {"value": "X"}}]}) is None
+    assert pc.point_year({"payload": {"path": "2019-01-01/P/RawFiles/A/x.jpg"}}) == "2019"
+
+
+def test_router_fans_out_only_to_matching_years_and_merges_top_k(qdrant):
+    fake, client = qdrant
+    points = _points(40)
+    client.upsert_points("images", points)
+    router = pc.PartitionedCollections(client, "images")
+    router.upsert_points("images", points)
+    router.upsert_points("images", points[:5])  # re-upserts land in the same partition
+
+    assert router.collections_for() == ["images-2023", "images-2024", "images-2025", "images-undated"]
+    assert router.count("images") == 40
+    info = client.get_collection("images-2024")
+    assert info["config"]["hnsw_config"]["m"] == 24 and set(info["payload_schema"]) == {"year", "project_name"}
+
+    year_filter = {"must": [{"key": "year", "match": {"value": "2024"}},
+                            {"key": "project_name", "match": {"value": "Project1"}}]}
+    fake.requests.clear()
+    hits = router.search("images", points[0]["vector"], 5, year_filter)
+    assert {path for _, path in fake.requests} == {"/collections/images-2024/points/search"}
+    expected = client.search("images", points[0]["vector"], 5, year_filter)
+    assert [h["id"] for h in hits] == [h["id"] for h in expected]
+    assert router.count("images", year_filter) == client.count("images", year_filter)
+
+    unfiltered = router.search("images", points[7]["vector"], 10)
+    assert [h["id"] for h in unfiltered] == [h["id"] for h in client.search("images", points[7]["vector"], 10)]
+
+
+def test_rebalance_copies_source_and_splits_large_years(qdrant):
+    _, client = qdrant
+    points = _points(61, years=("2024", "2025"))
+    client.upsert_points("images", points)
+
+    stats = pc.rebalance(client, "images", max_points=20, source="images", page_size=7)
+    assert stats["copied"] == 61 and stats["moved"] == 0
+    router = pc.PartitionedCollections(client, "images")
+    assert {year: len(names) for year, names in router.partitions.items()} == {"2024": 2, "2025": 2, "undated": 1}
+    assert router.count("images") == 61
+
+    stats = pc.rebalance(client, "images", max_points=8, source=None, page_size=7, drop_source=False)
+    assert stats["split_years"] == {"2024": [2, 4], "2025": [2, 4]} and stats["moved"] > 0
+    router.refresh()
+    assert router.count("images") == 61
+    for name in router.collections_for():
+        for point in client.iter_points(name, 50):
+            assert router.collection_for(point) == name
+
+    pc.rebalance(client, "images", max_points=8, source="images", drop_source=True)
+    assert "images" not in client.list_collections() and router.count("images") == 61
+
+
+def test_writer_started_before_a_split_routes_to_the_new_buckets(qdrant):
+    _, client = qdrant
+    points = [p for p in _points(40, years=("2024",)) if pc.point_year(p) == "2024"]
+    client.upsert_points("images", points)
+    pc.rebalance(client, "images", max_points=100, source="images")
+    worker = pc.PartitionedCollections(client, "images")  # e.g. an embed_worker --partition-by-year
+    assert len(worker.partitions["2024"]) == 1
+
+    pc.rebalance(client, "images", max_points=10, page_size=3)
+    worker.upsert_points("images", points)
+    assert len(worker.partitions["2024"]) == 4
+    assert sum(client.count(name) for name in worker.partitions["2024"]) == len(points)
+
+    # A point caught mid-move sits in two buckets; search still returns it once.
+    moved = points[0]
+    other = next(name for name in worker.partitions["2024"] if name != worker.collection_for(moved))
+    client.upsert_points(other, [moved])
+    hits = worker.search("images", moved["vector"], 5)
+    assert [h["id"] for h in hits].count(moved["id"]) == 1 and len(hits) == 5
@@ -0,0 +1,100 @@
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "prefix_index.py")
+
+spec = importlib.util.spec_from_file_location("scripts.prefix_index", SCRIPT_PATH)
+pi = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(pi)
+
+from photoflow_storage import LocalObjectStore  # noqa: E402
+from s3_rest import FakeS3  # noqa: E402
+
+KEYS = {
+    "2024-06-01/Wedding+Smith/RawFiles/CameraA/IMG_1.jpg": 100,
+    "2024-06-01/Wedding+Smith/RawFiles/CameraA/IMG_2.jpg": 200,
+    "2024-06-01/Wedding+Smith/RawFiles/CameraA/sub/IMG_3.jpg": 300,
+    "2024-06-01/Wedding+Smith/ProcessedFiles/CameraA/IMG_1.jpg": 50,
+    "2024-06-01/Wedding+Smith/RawFiles/CameraB/IMG_9.tif": 1000,
+    "2024-06-01/Wedding+Smith/Derived/w256/RawFiles/CameraA/IMG_1.jpg": 7,
+    "2025-01-04/Portraits/RawFiles/Roll1/a.jpg": 10,
+    "2025-01-04/Portraits/RawFiles/Roll1/b.jpg": 20,
+    "stray.txt": 1,
+}
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    for key, size in KEYS.items():
+        path = tmp_path / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+    return LocalObjectStore(str(tmp_path))
+
+
+def test_build_aggregates_every_level(bucket):
+    index = pi.PrefixIndex.build(bucket.list_objects())
+    assert index.root["count"] == len(KEYS) and index.root["bytes"] == sum(KEYS.values())
+    assert index.unindexed == 2
+    assert index.node("2024-06-01/Wedding+Smith")["count"] == 5
+    assert index.node("2024-06-01/Wedding+Smith/RawFiles/CameraA")["bytes"] == 600
+    assert index.node("2024-06-01/Wedding+Smith/RawFiles/CameraA")["children"] == {}
+    assert index.node("2024-06-01/Nope") is None
+    assert index.size() == 1 + 2 + 2 + 3 + 4
+
+
+def test_projects_match_get_projects_shape_and_filters(bucket, tmp_path):
+    index = pi.PrefixIndex.build(bucket.list_objects())
+    index.save(str(tmp_path / "index.json"))
+    index = pi.PrefixIndex.load(str(tmp_path / "index.json"))
+
+    wedding = index.projects(project_name="wedding smith")
+    assert len(wedding) == 1 and wedding[0]["timestamp"] == "2024-06-01T00:00:00"
+    assert wedding[0]["directories"] == [
+        {"directoryName": "CameraA", "rawFilesCount": 3, "processedFilesCount": 1},
+        {"directoryName": "CameraB", "rawFilesCount": 1, "processedFilesCount": 0},
+    ]
+    assert [p["projectName"] for p in index.projects(year="2025")] == ["Portraits"]
+    assert index.projects(timestamp="2025-01-05") == []
+
+
+def test_update_relists_only_touched_directories(tmp_path):
+    with FakeS3() as fake:
+        client = fake.client("photostore")
+        client.make_bucket()
+        for key, size in KEYS.items():
+            client.put_object(key, b"x" * size)
+        index = pi.PrefixIndex.build(client.list_objects())
+
+        client.put_object("2025-01-04/Portraits/RawFiles/Roll1/c.jpg", b"x" * 5)
+        client.put_object("2025-01-04/Portraits/RawFiles/Roll1/a.jpg", b"x" * 15)  # overwrite
+        client.delete_object("2024-06-01/Wedding+Smith/RawFiles/CameraB/IMG_9.tif")
+        client.put_object("2025-02-02/New Shoot/RawFiles/Roll7/z.jpg", b"x" * 3)
+        events = [
+            json.dumps({"Records": [{"s3": {"object": {"key": "2025-01-04/Portraits/RawFiles/Roll1/c.jpg"}}},
+                                    {"s3": {"object": {"key": "2025-01-04/Portraits/RawFiles/Roll1/a.jpg"}}}]}),
+            json.dumps({"Records": [{"s3": {"object": {
+                "key": "2024-06-01/Wedding%2BSmith/RawFiles/CameraB/IMG_9.tif"}}}]}),
+            "2025-02-02/New Shoot/RawFiles/Roll7/z.jpg",
+            "stray.txt",
+        ]
+        directories = pi.directories_from_events(events)
+        assert directories == {"2025-01-04/Portraits/RawFiles/Roll1", "2024-06-01/Wedding+Smith/RawFiles/CameraB",
+                               "2025-02-02/New Shoot/RawFiles/Roll7"}
+
+        fake.requests.clear()
+        assert index.refresh(client, directories) == 4
+        assert len(fake.requests) == 3
+
+        rebuilt = pi.PrefixIndex.build(client.list_objects())
+        for prefix in ("", "2025-01-04/Portraits", "2024-06-01/Wedding+Smith", "2025-02-02"):
+            assert (index.node(prefix)["count"], index.node(prefix)["bytes"]) == \
+                   (rebuilt.node(prefix)["count"], rebuilt.node(prefix)["bytes"])
+        assert index.node("2024-06-01/Wedding+Smith/RawFiles/CameraB") is None
+        assert index.projects() == rebuilt.projects()
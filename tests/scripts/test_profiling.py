@@ -0,0 +1,106 @@
+import argparse
+import importlib.util
+import json
+import os
+import time
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "ai-ml", "profiling.py")
+
+spec = importlib.util.spec_from_file_location("scripts.profiling", SCRIPT_PATH)
+profiling = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(profiling)
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in ("PHOTOFLOW_PROFILE", "PHOTOFLOW_TIMINGS_DIR", "PHOTOFLOW_RUN_ID"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def _timings(directory):
+    [path] = [p for p in os.listdir(directory) if p.endswith(".timings.json")]
+    with open(os.path.join(directory, path)) as f:
+        return json.load(f)
+
+
+def test_timings_are_written_even_when_the_run_exits(tmp_path):
+    with profiling.stage("outside") as record:  # no active run: a no-op
+        assert record == {}
+
+    with pytest.raises(SystemExit):
+        with profiling.profiled_run("tool", output_dir=str(tmp_path)):
+            with profiling.stage("load", model="a/b"):
+                with profiling.stage("inner"):
+                    time.sleep(0.01)
+            with pytest.raises(ValueError):
+                with profiling.stage("broken"):
+                    raise ValueError("bad input")
+            raise SystemExit(3)
+
+    timings = _timings(tmp_path)
+    assert timings["status"] == "exit" and timings["exit_code"] == 3 and timings["profile"] is None
+    stages = {s["name"]: s for s in timings["stages"]}
+    assert [s["name"] for s in timings["stages"]] == ["total", "load", "inner", "broken"]
+    assert stages["load"]["model"] == "a/b" and stages["inner"]["depth"] == 2
+    assert stages["load"]["seconds"] >= stages["inner"]["seconds"] >= 0.01
+    assert stages["broken"]["status"] == "error" and stages["broken"]["error"] == "ValueError: bad input"
+    assert os.environ["PHOTOFLOW_RUN_ID"] == timings["run_id"]
+    assert profiling.current() is None
+
+
+def test_cprofile_mode_writes_profile_and_memory_peaks(tmp_path):
+    parser = argparse.ArgumentParser()
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args(["--profile", "--profile-dir", str(tmp_path)])
+    assert args.profile == "cprofile"
+
+    with profiling.profiled_run("tool", args):
+        with profiling.stage("allocate"):
+            with profiling.stage("small"):
+                small = bytearray(1_000_000)
+            big = bytearray(8_000_000)
+            del big, small
+        with profiling.stage("after"):
+            pass
+
+    timings = _timings(tmp_path)
+    stages = {s["name"]: s for s in timings["stages"]}
+    assert stages["allocate"]["peak_mb"] >= 8 > stages["small"]["peak_mb"] >= 1
+    assert stages["total"]["peak_mb"] >= stages["allocate"]["peak_mb"] > stages["after"]["peak_mb"]
+    assert set(timings["files"]) == {"cprofile", "top", "memory"}
+    with open(timings["files"]["top"]) as f:
+        assert "cumulative" in f.read()
+    assert os.environ["PHOTOFLOW_PROFILE"] == "cprofile"
+
+
+def test_sample_mode_collects_collapsed_stacks(tmp_path):
+    def busy_wait(seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    with profiling.profiled_run("tool", output_dir=str(tmp_path), mode="sample") as run:
+        busy_wait(0.2)
+
+    with open(run.stem + ".stacks.txt") as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy_wait" in line for line in lines)
+    with pytest.raises(ValueError):
+        profiling.RunProfile("tool", mode="perf")
+
+
+def test_plain_runs_write_no_timings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with profiling.profiled_run("tool") as run:
+        with profiling.stage("load"):
+            pass
+    assert not run.enabled
+    assert not os.path.exists(tmp_path / profiling.DEFAULT_DIR)
+    assert "PHOTOFLOW_TIMINGS_DIR" not in os.environ
+    assert [s["name"] for s in run.stages] == ["load", "total"]
+    assert profiling.current() is None
@@ -0,0 +1,124 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "provision_qdrant.py")
+
+spec = importlib.util.spec_from_file_location("scripts.provision_qdrant", SCRIPT_PATH)
+pq = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(pq)
+
+from qdrant_rest import FakeQdrant, QdrantError, QdrantRestClient  # noqa: E402
+
+ENV = {"EMBEDDING_DIMENSION": "512", "EMBEDDING_MODEL_VARIANT": "base", "EMBEDDING_DISTANCE_METRIC": "Cosine"}
+
+
+@pytest.fixture
+def qdrant():
+    with FakeQdrant() as fake:
+        yield fake, QdrantRestClient(fake.url)
+
+
+def _points(count, dimension, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{"id": i, "vector": rng.standard_normal(dimension).tolist(),
+             "payload": {"object_key": f"2024-01-0{1 + i % 3}/P{i % 4}/RawFiles/A/{i}.jpg",
+                         "project_name": f"P{i % 4}", "year": str(2020 + i % 3)}} for i in range(count)]
+
+
+def test_spec_follows_embedding_config():
+    spec = pq.collection_spec({"EMBEDDING_MODEL_VARIANT": "large", "EMBEDDING_DIMENSION": "768",
+                               "EMBEDDING_DISTANCE_METRIC": "Euclidean"}, quantization="int8")
+    assert spec["vectors"] == {"size": 768, "distance": "Euclid", "on_disk": False}
+    assert spec["quantization_config"]["scalar"]["type"] == "int8"
+    assert set(spec["payload_indexes"]) == {"year", "project_name", "object_key"}
+    with pytest.raises(ValueError):
+        pq.collection_spec(dict(ENV, EMBEDDING_DISTANCE_METRIC="Hamming"))
+
+
+def test_creates_collection_with_indexes_and_is_then_drift_free(qdrant):
+    fake, client = qdrant
+    spec = pq.collection_spec(ENV, m=32, quantization="int8")
+    assert pq.provision(client, "images", spec)["action"] == "created"
+
+    info = client.get_collection("images")
+    assert info["config"]["hnsw_config"]["m"] == 32
+    assert set(info["payload_schema"]) == {"year", "project_name", "object_key"}
+    assert pq.check_drift(info, spec) == []
+    assert pq.provision(client, "images", spec) == {"collection": "images", "points": 0, "drift": [],
+                                                    "action": "none"}
+
+
+def test_ad_hoc_collection_is_brought_in_line(qdrant):
+    fake, client = qdrant
+    # What QdrantClientWrapper.EnsureCollectionExists creates on first upsert.
+    client.create_collection("images", {"vectors": {"size": 512, "distance": "Cosine"}})
+    client.upsert_points("images", _points(40, 512))
+    spec = pq.collection_spec(ENV, ef_construct=200)
+
+    result = pq.provision(client, "images", spec, apply=False)
+    assert result["action"] == "drift"
+    settings = {item["setting"] for item in result["drift"]}
+    assert {"payload_index.year", "payload_index.project_name", "payload_index.object_key",
+            "hnsw_config.ef_construct"} <= settings
+    assert all(item["fixable"] for item in result["drift"])
+
+    assert pq.provision(client, "images", spec)["action"] == "updated"
+    assert pq.check_drift(client.get_collection("images"), spec) == []
+    assert client.count("images") == 40
+
+
+def test_vector_drift_needs_recreate(qdrant):
+    fake, client = qdrant
+    client.create_collection("images", {"vectors": {"size": 768, "distance": "Cosine"}})
+    client.upsert_points("images", _points(5, 768))
+    spec = pq.collection_spec(ENV)
+
+    result = pq.provision(client, "images", spec)
+    assert result["action"] == "blocked"
+    assert [i["setting"] for i in result["drift"] if not i["fixable"]] == ["vectors.size"]
+    # Nothing was changed, not even the fixable settings, and the points were kept.
+    info = client.get_collection("images")
+    assert not info.get("payload_schema")
+    assert info["points_count"] == 5
+
+    assert pq.provision(client, "images", spec, recreate=True)["action"] == "recreated"
+    info = client.get_collection("images")
+    assert info["config"]["params"]["vectors"]["size"] == 512 and info["points_count"] == 0
+
+
+def test_filtered_search_uses_payload_index_instead_of_scanning(qdrant):
+    fake, client = qdrant
+    client.create_collection("images", {"vectors": {"size": 16, "distance": "Cosine"}})
+    client.upsert_points("images", _points(200, 16))
+    project_filter = {"must": [{"key": "project_name", "match": {"value": "P1"}},
+                               {"key": "year", "match": {"value": "2021"}}]}
+    query = [1.0] * 16
+
+    unindexed = client.search("images", query, limit=5, filter=project_filter)
+    assert fake.payload_reads == 400
+
+    fake.payload_reads = 0
+    spec = pq.collection_spec(dict(ENV, EMBEDDING_DIMENSION="16"))
+    spec["vectors"]["size"] = 16
+    pq.provision(client, "images", spec)
+    indexed = client.search("images", query, limit=5, filter=project_filter)
+    assert fake.payload_reads == 0
+    assert [p["id"] for p in indexed] == [p["id"] for p in unindexed]
+    assert all(p["payload"]["project_name"] == "P1" for p in indexed)
+
+
+def test_client_surfaces_errors(qdrant):
+    fake, client = qdrant
+    assert client.get_collection("missing") is None
+    client.create_collection("images", {"vectors": {"size": 4, "distance": "Dot"}})
+    with pytest.raises(QdrantError) as error:
+        client.upsert_points("images", [{"id": 1, "vector": [0.0] * 3}])
+    assert error.value.status == 400
+    assert client.list_collections() == ["images"]
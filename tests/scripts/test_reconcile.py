@@ -0,0 +1,121 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "reconcile.py")
+
+spec = importlib.util.spec_from_file_location("scripts.reconcile", SCRIPT_PATH)
+rc = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(rc)
+
+from photoflow_db import connect, insert_mappings  # noqa: E402
+from photoflow_storage import LocalObjectStore  # noqa: E402
+from qdrant_rest import (FakeQdrant, QdrantRestClient, client_from_env_file, image_payload,  # noqa: E402
+                         point_id_for_key)
+
+PREFIX = "2025-05-13/WeddingSmith/RawFiles/CameraA"
+A, B, C, D, E, F = (f"{PREFIX}/{name}.jpg" for name in "ABCDEF")
+IDS = {key: f"{i:08d}-0000-4000-8000-000000000000" for i, key in enumerate([A, B, C, E, F, "inactive"], 1)}
+
+
+def _mapping(key, active=True, guid=None):
+    return {"Id": (guid or IDS[key]).upper(), "ObjectKey": key, "FileName": key.rsplit("/", 1)[-1], "FileSize": 1,
+            "ContentType": "image/jpeg", "UploadDate": "2025-05-13", "UpdatedDate": "2025-05-13",
+            "IsActive": int(active), "Year": "2025"}
+
+
+def _read(directory, name):
+    with open(os.path.join(directory, name)) as f:
+        return [json.loads(line) if name.endswith(".jsonl") else line.strip() for line in f if line.strip()]
+
+
+@pytest.fixture
+def stores(tmp_path):
+    for key in (A, B, C, D, E, "2025-05-13/WeddingSmith/Derived/w256/RawFiles/CameraA/A.jpg", "stray.txt"):
+        path = tmp_path / "bucket" / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"jpeg")
+    conn = connect(str(tmp_path / "photoflow.db"), create=True)
+    insert_mappings(conn, [_mapping(k) for k in (A, B, C, E, F)] + [_mapping("inactive", active=False)])
+
+    with FakeQdrant() as fake:
+        client = QdrantRestClient(fake.url)
+        client.create_collection("images", {"vectors": {"size": 2, "distance": "Cosine"}})
+        points = [
+            (IDS[A], A),                     # in sync
+            (IDS[B], "old/B.jpg"),           # payload names another key
+            (point_id_for_key(D), D),        # unmapped upload embedded under its key-derived id
+            (point_id_for_key(E), E),        # embedded before E was mapped → rekey
+            (IDS[F], F),                     # object gone, mapping still active
+            (IDS["inactive"], "inactive"),   # mapping deactivated
+            (point_id_for_key(A), A),        # duplicate of A under the key-derived id
+            ("ffffffff-0000-4000-8000-000000000000", "gone.jpg"),
+        ]
+        client.upsert_points("images", [{"id": point_id, "vector": [1.0, float(i)],
+                                         "payload": image_payload(key, point_id)}
+                                        for i, (point_id, key) in enumerate(points)])
+        yield LocalObjectStore(str(tmp_path / "bucket")), conn, client
+
+
+def test_merge_sorted_is_a_full_outer_join_and_rejects_unsorted_input():
+    pairs = list(rc.merge_sorted(["a", "c", "d"], [("b", 1), ("c", 2), ("e", 3)], right_key=lambda r: r[0]))
+    assert pairs == [("a", None), (None, ("b", 1)), ("c", ("c", 2)), ("d", None), (None, ("e", 3))]
+    with pytest.raises(ValueError):
+        list(rc.merge_sorted(["a", "c", "b"], ["a"]))
+    assert sorted([7, "B0000000-0000", "a0000000-0000"], key=rc.point_order) == [7, "a0000000-0000", "B0000000-0000"]
+
+
+def test_check_finds_every_kind_of_drift(stores, tmp_path):
+    store, conn, client = stores
+    out = str(tmp_path / "drift")
+    report = rc.reconcile(store, conn, client, "images", out)
+
+    assert (report["objects"], report["mappings"], report["points"]) == (5, 5, 8)
+    assert _read(out, "unmapped_objects.txt") == [D]
+    assert _read(out, "missing_objects.txt") == [F]
+    assert _read(out, "to_embed.txt") == [C]
+    assert sorted(_read(out, "points_to_delete.txt")) == sorted(
+        [IDS["inactive"], point_id_for_key(A), "ffffffff-0000-4000-8000-000000000000"])
+    assert _read(out, "rekey.jsonl") == [{"from": point_id_for_key(E), "to": IDS[E], "object_key": E}]
+    assert _read(out, "payload_fixes.jsonl") == [{"id": IDS[B], "object_key": B, "found": "old/B.jpg"}]
+    assert (report["fallback_id_points"], report["awaiting_mapping"]) == (3, 1)
+    with open(os.path.join(out, "report.json")) as f:
+        assert json.load(f)["to_embed"] == 1
+
+
+def test_repair_then_recheck_converges(stores, tmp_path):
+    store, conn, client = stores
+    rc.reconcile(store, conn, client, "images", str(tmp_path / "first"))
+    done = rc.repair(str(tmp_path / "first"), client, "images", conn, deactivate_missing=True)
+    assert done == {"points_deleted": 3, "points_rekeyed": 1, "payloads_fixed": 1, "mappings_deactivated": 1}
+
+    d_id = "0000000d-0000-4000-8000-000000000000"
+    insert_mappings(conn, [_mapping(D, guid=d_id)])
+    report = rc.reconcile(store, conn, client, "images", str(tmp_path / "second"))
+    assert _read(str(tmp_path / "second"), "rekey.jsonl") == [
+        {"from": point_id_for_key(D), "to": d_id, "object_key": D}]
+    assert _read(str(tmp_path / "second"), "points_to_delete.txt") == [IDS[F]]
+    assert report["payload_fixes"] == report["unmapped_objects"] == report["missing_objects"] == 0
+
+    rc.repair(str(tmp_path / "second"), client, "images")
+    report = rc.reconcile(store, conn, client, "images", str(tmp_path / "third"))
+    assert _read(str(tmp_path / "third"), "to_embed.txt") == [C]
+    assert sum(report[name.split(".")[0]] for name in rc.LIST_FILES) == 1
+    point = client.scroll("images", filter={"must": [{"has_id": [IDS[E]]}]}, with_vector=True)["points"][0]
+    assert point["payload"]["guid"] == IDS[E] and point["vector"][1] > 0
+
+
+def test_client_from_env_file_prefers_environment_and_arguments(tmp_path, monkeypatch):
+    env_file = tmp_path / ".env"
+    env_file.write_text("QDRANT_HOST=qdrant.local\nQDRANT_PORT=6333\nQDRANT_COLLECTION=photos\n")
+    for name in [k for k in os.environ if k.startswith("QDRANT_")]:
+        monkeypatch.delenv(name)
+    monkeypatch.setenv("QDRANT_PORT", "7333")
+    client, collection = client_from_env_file(str(env_file))
+    assert client.url == "http://qdrant.local:7333" and collection == "photos"
+    client, collection = client_from_env_file(str(env_file), "http://other:1", "images-2024")
+    assert client.url == "http://other:1" and collection == "images-2024"
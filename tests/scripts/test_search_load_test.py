@@ -0,0 +1,108 @@
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import tempfile
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "monitoring", "search_load_test.py")
+
+spec = importlib.util.spec_from_file_location("scripts.search_load_test", SCRIPT_PATH)
+slt = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(slt)
+
+
+def _run_against(backend, mix, **kwargs):
+    async def run():
+        server = await backend.start()
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await slt.run_load(f"http://127.0.0.1:{port}", mix, **kwargs)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+def test_synthetic_mix_is_reproducible_and_weighted():
+    mix = slt.synthetic_mix(1000, seed=3)
+    assert mix == slt.synthetic_mix(1000, seed=3)
+    counts = {name: sum(1 for e in mix if e["endpoint"] == name) for name in slt.ENDPOINTS}
+    assert 520 < counts["semantic"] < 680
+    assert all(counts.values())
+    assert all("body" in e for e in mix if e["endpoint"] == "query")
+
+
+def test_fake_backend_returns_the_requested_number_of_results():
+    backend = slt.FakeSearchBackend()
+    for entry in slt.synthetic_mix(50, seed=2):
+        if entry["endpoint"] == "get-count":
+            continue
+        response = backend._response(entry["endpoint"], entry.get("params", {}), entry.get("body", {}))
+        assert len(response["Results"]) == response["TotalResults"] == 20
+    assert len(backend._response("semantic", {"query": "dog", "limit": "25"}, {})["Results"]) == 25
+
+
+def test_parse_delay_specs():
+    rng = random.Random(0)
+    assert slt.parse_delay("fixed:20")(rng) == 0.02
+    assert 0.01 <= slt.parse_delay("uniform:10:50")(rng) <= 0.05
+    assert slt.parse_delay("lognormal:80:0.3")(rng) > 0
+    with pytest.raises(ValueError):
+        slt.parse_delay("gamma:1")
+
+
+def test_load_reports_per_endpoint_latency_and_errors():
+    backend = slt.FakeSearchBackend(
+        delays={"semantic": slt.parse_delay("fixed:30"), "get-count": slt.parse_delay("fixed:2")},
+        error_rates={"similarity": 1.0},
+        require_token=True,
+    )
+    mix = slt.synthetic_mix(120, seed=1)
+    results = _run_against(backend, mix, rate=400, connections=8, token="test-token")
+
+    endpoints = results["endpoints"]
+    assert results["overall"]["requests"] == 120
+    assert sum(backend.requests.values()) == 120
+    assert endpoints["semantic"]["latency_ms"]["p50"] >= 30
+    assert endpoints["get-count"]["latency_ms"]["p50"] < endpoints["semantic"]["latency_ms"]["p50"]
+    assert endpoints["similarity"]["error_rate"] == 1.0
+    assert endpoints["similarity"]["status_codes"] == {"500": endpoints["similarity"]["requests"]}
+    assert endpoints["query"]["errors"] == 0
+    # The pool bounds concurrency and reuses connections.
+    assert backend.max_in_flight <= 8
+    assert results["connections_opened"] == backend.connections <= 8
+
+
+def test_missing_token_and_unreachable_host_count_as_errors():
+    backend = slt.FakeSearchBackend(require_token=True)
+    results = _run_against(backend, slt.synthetic_mix(10), rate=200)
+    assert results["overall"]["error_rate"] == 1.0
+
+    unreachable = asyncio.run(slt.run_load("http://127.0.0.1:1", slt.synthetic_mix(3), rate=100, timeout=2))
+    assert unreachable["overall"]["errors"] == 3
+    assert "200" not in json.dumps(unreachable["endpoints"])
+
+
+def test_recorded_mix_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "mix.jsonl")
+        with open(path, "w") as f:
+            f.write(json.dumps({"endpoint": "semantic", "params": {"query": "dogs"}}) + "\n\n")
+            f.write(json.dumps({"endpoint": "get-count"}) + "\n")
+        mix = slt.load_mix(path)
+        assert [e["endpoint"] for e in mix] == ["semantic", "get-count"]
+
+        results = _run_against(slt.FakeSearchBackend(), mix, rate=50, duration=0.1)
+        assert results["overall"]["requests"] == 5
+        assert results["endpoints"]["semantic"]["requests"] == 3
+
+        with open(path, "a") as f:
+            f.write(json.dumps({"endpoint": "upload"}) + "\n")
+        with pytest.raises(ValueError):
+            slt.load_mix(path)
@@ -5,8 +5,10 @@ from pathlib import Path
 from unittest import mock
 import tempfile
 
+import pytest
+
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-SETUP_PATH = os.path.join(ROOT_DIR, "scripts", "setup_venv.py")
+SETUP_PATH = os.path.join(ROOT_DIR, "scripts", "ai-ml", "setup_venv.py")
 
 spec = importlib.util.spec_from_file_location("scripts.setup_venv", SETUP_PATH)
 setup_mod = importlib.util.module_from_spec(spec)
@@ -27,3 +29,62 @@ def test_create_venv_runs_expected_commands():
             mock.call([str(pip), "install", "torch>=2.1.0", "--extra-index-url", "https://download.pytorch.org/whl/cpu"]),
         ]
         assert mock_call.mock_calls == expected_calls
+
+
+class FakeInstaller:
+    """Stands in for venv creation and pip: writes a script with the venv's prefix and one wheel per group."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, cmd):
+        self.calls.append(cmd)
+        if cmd[1:3] == ["-m", "venv"]:
+            bin_dir = Path(cmd[3]) / ("Scripts" if os.name == "nt" else "bin")
+            bin_dir.mkdir(parents=True)
+            (bin_dir / "pip").write_text(f"#!{Path(cmd[3]).resolve()}/bin/python\n")
+            (Path(cmd[3]) / "pyvenv.cfg").write_text("home = /usr/bin\n")
+        elif cmd[1] == "wheel":
+            wheel_dir = Path(cmd[cmd.index("--wheel-dir") + 1])
+            wheel_dir.mkdir(parents=True)
+            (wheel_dir / f"{cmd[-1].split('>')[0]}-1.0-py3-none-any.whl").write_bytes(b"wheel")
+
+    def kinds(self):
+        return [cmd[1] if cmd[1] != "-m" else "venv" for cmd in self.calls]
+
+
+def test_cached_venv_builds_then_reuses_wheels_and_environments(tmp_path):
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("# export deps\ntorch\ntransformers\nPillow\n")
+    cache = tmp_path / "cache"
+    fake = FakeInstaller()
+    with mock.patch.object(setup_mod.subprocess, "check_call", side_effect=fake), \
+         mock.patch.object(setup_mod.shutil, "which", return_value=sys.executable):
+        with pytest.raises(SystemExit):
+            setup_mod.create_venv(str(tmp_path / "a"), str(requirements), str(cache), offline=True)
+
+        built = setup_mod.create_venv(str(tmp_path / "a"), str(requirements), str(cache), ["onnxruntime==1.17.3"])
+        assert built["source"] == "built" and fake.kinds() == ["venv", "wheel", "wheel", "wheel", "install", "install"]
+        groups = [cmd[cmd.index(setup_mod.TORCH_INDEX_URL) + 1:] for cmd in fake.calls if cmd[1] == "wheel"]
+        assert groups == [["pip", "torch>=2.1.0"], ["onnxruntime==1.17.3"], ["transformers", "Pillow"]]
+        assert all("--no-index" in cmd for cmd in fake.calls if cmd[1] == "install")
+
+        fake.calls.clear()
+        again = setup_mod.create_venv(str(tmp_path / "a"), str(requirements), str(cache), ["onnxruntime==1.17.3"])
+        assert again["source"] == "up-to-date" and fake.calls == []
+
+        restored = setup_mod.create_venv(str(tmp_path / "b"), str(requirements), str(cache), ["onnxruntime==1.17.3"],
+                                         offline=True)
+        assert restored["source"] == "env-cache" and fake.calls == []
+        assert (tmp_path / "b" / "bin" / "pip").read_text() == f"#!{(tmp_path / 'b').resolve()}/bin/python\n"
+        key = built["key"]
+        assert (cache / "envs" / key / "bin" / "pip").read_text() == f"#!{(tmp_path / 'a').resolve()}/bin/python\n"
+
+        for cached_env in (cache / "envs").iterdir():
+            setup_mod.shutil.rmtree(cached_env)
+        from_wheels = setup_mod.create_venv(str(tmp_path / "c"), str(requirements), str(cache),
+                                            ["onnxruntime==1.17.3"], offline=True)
+        assert from_wheels["source"] == "wheelhouse" and fake.kinds() == ["venv", "install", "install"]
+
+        requirements.write_text("torch\ntransformers\n")
+        assert setup_mod.environment_key(sys.executable, str(requirements), ["onnxruntime==1.17.3"]) != key
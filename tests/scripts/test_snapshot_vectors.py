@@ -0,0 +1,106 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "snapshot_vectors.py")
+
+spec = importlib.util.spec_from_file_location("scripts.snapshot_vectors", SCRIPT_PATH)
+sv = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(sv)
+
+from qdrant_rest import FakeQdrant, QdrantRestClient, image_payload  # noqa: E402
+
+PREFIX = "2025-05-13/WeddingSmith/RawFiles/CameraA"
+
+
+def _points():
+    rng = np.random.default_rng(1)
+    points = []
+    for i in range(10):
+        point_id = f"{i:08d}-0000-4000-8000-000000000000"
+        points.append({"id": point_id, "vector": rng.standard_normal(8).astype(np.float32).tolist(),
+                       "payload": image_payload(f"{PREFIX}/IMG_{i}.jpg", point_id)})
+    points[3]["payload"].update(tags=["beach", "sunset"], tag_scores=[0.31, 0.27])
+    points[6]["payload"]["path"] = "legacy/path/IMG_6.jpg"
+    points[7] = {"id": 42, "vector": points[7]["vector"], "payload": {"object_key": "notes/übersicht.jpg"}}
+    return points
+
+
+@pytest.fixture
+def source():
+    with FakeQdrant() as fake:
+        client = QdrantRestClient(fake.url)
+        client.create_collection("images", {"vectors": {"size": 8, "distance": "Cosine"},
+                                            "hnsw_config": {"m": 32, "ef_construct": 200},
+                                            "optimizers_config": {"indexing_threshold": 5000},
+                                            "quantization_config": {"scalar": {"type": "int8", "quantile": 0.99}}})
+        client.create_payload_index("images", "project_name")
+        client.upsert_points("images", _points())
+        yield client
+
+
+def _all_points(client, collection="images"):
+    return {p["id"]: p for p in client.iter_points(collection, 3, with_payload=True, with_vector=True)}
+
+
+def test_export_writes_columnar_shards_and_a_manifest(source, tmp_path):
+    result = sv.export_snapshot(source, "images", str(tmp_path), shard_rows=4, page_size=3)
+    assert (result["points"], result["shards"]) == (10, 3)
+    manifest = sv.read_manifest(str(tmp_path))
+    assert [s["rows"] for s in manifest["shards"]] == [4, 4, 2]
+    assert manifest["payload_indexes"] == {"project_name": "keyword"}
+    assert manifest["config"]["hnsw_config"]["m"] == 32
+
+    first, second, third = manifest["shards"]
+    assert first["aliases"] == {"path": "object_key", "guid": "id"} and first["extra"]
+    assert "path" in second["columns"] and second["aliases"] == {"guid": "id"}
+    assert "guid" in third["columns"]  # point 42 has no guid
+    keys = np.load(tmp_path / "shard-00000" / "object_key.npy")
+    assert keys.dtype.kind == "S" and keys[2].decode() == f"{PREFIX}/IMG_2.jpg"
+    assert np.load(tmp_path / "shard-00000" / "vectors.npy").shape == (4, 8)
+    with open(tmp_path / "shard-00000" / "extra.jsonl") as f:
+        assert [json.loads(line)["row"] for line in f] == [3]
+
+
+def test_restore_reproduces_points_and_collection_config(source, tmp_path):
+    sv.export_snapshot(source, "images", str(tmp_path), shard_rows=4)
+    with FakeQdrant() as fake:
+        target = QdrantRestClient(fake.url)
+        result = sv.restore_snapshot(target, str(tmp_path), workers=3, batch_size=3)
+        assert result["points"] == result["count"] == 10
+
+        restored, original = _all_points(target), _all_points(source)
+        assert restored.keys() == original.keys() and 42 in restored
+        for point_id, point in original.items():
+            assert restored[point_id]["payload"] == point["payload"]
+            np.testing.assert_array_equal(restored[point_id]["vector"], point["vector"])
+
+        info = target.get_collection("images")
+        assert info["config"]["hnsw_config"]["m"] == 32
+        assert info["config"]["optimizer_config"]["indexing_threshold"] == 5000
+        assert info["config"]["quantization_config"]["scalar"]["type"] == "int8"
+        assert info["payload_schema"]["project_name"]["data_type"] == "keyword"
+
+
+def test_restore_into_existing_collection_needs_matching_dimension(source, tmp_path):
+    sv.export_snapshot(source, "images", str(tmp_path / "half"), dtype="float16")
+    full = sv.export_snapshot(source, "images", str(tmp_path / "full"))
+    half = sv.read_manifest(str(tmp_path / "half"))
+    assert sum(s["bytes"] for s in half["shards"]) < full["bytes"]
+
+    source.create_collection("other", {"vectors": {"size": 4, "distance": "Cosine"}})
+    with pytest.raises(ValueError):
+        sv.restore_snapshot(source, str(tmp_path / "half"), "other")
+    sv.restore_snapshot(source, str(tmp_path / "half"), "other", recreate=True)
+    copy = _all_points(source, "other")
+    np.testing.assert_allclose(copy[42]["vector"], _all_points(source)[42]["vector"], atol=1e-2)
+
+    os.remove(tmp_path / "full" / "manifest.json")
+    with pytest.raises(ValueError):
+        sv.restore_snapshot(source, str(tmp_path / "full"), "other")
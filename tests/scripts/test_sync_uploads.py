@@ -0,0 +1,117 @@
+import importlib.util
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "data", "sync_uploads.py")
+
+spec = importlib.util.spec_from_file_location("scripts.sync_uploads", SCRIPT_PATH)
+su = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(su)
+
+from s3_rest import FakeS3, S3Error  # noqa: E402
+
+KIB = 1024
+PREFIX_A = "2025-05-13/WeddingSmith/RawFiles/CameraA"
+
+
+def _write(path, size, seed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(bytes((seed * 31 + i) % 251 for i in range(size)))
+
+
+@pytest.fixture
+def shoot(tmp_path):
+    source = tmp_path / "WeddingSmith"
+    for i in range(6):
+        _write(str(source / "CameraA" / f"IMG_{i:04d}.jpg"), 3 * KIB + i, i)
+    _write(str(source / "CameraB" / "PANO.tif"), 70 * KIB, 99)
+    _write(str(source / "CameraA" / "notes.txt"), 10, 1)
+    _write(str(source / "CameraA" / "nested" / "deep.jpg"), 10, 2)
+    return source
+
+
+def _run(client, source, **kwargs):
+    files = su.scan_source(str(source))
+    prefixes = {d: su.get_destination_path(datetime(2025, 5, 13), "WeddingSmith", d, True) for d, _, _ in files}
+    manifest = su.SyncManifest(str(source / su.MANIFEST_NAME))
+    return su.sync(client, files, prefixes, manifest, workers=4, part_size=16 * KIB,
+                   multipart_threshold=32 * KIB, **kwargs)
+
+
+def test_hash_file_matches_server_etags(tmp_path):
+    path = str(tmp_path / "big.tif")
+    _write(path, 70 * KIB, 5)
+    hashes = su.hash_file(path, 16 * KIB, 32 * KIB)
+    with FakeS3() as fake:
+        client = fake.client("photostore")
+        client.make_bucket()
+        with open(path, "rb") as f:
+            data = f.read()
+        assert client.put_object("single", data) == hashes["md5"]
+        assert su.upload_file(client, "multi", path, len(data), 16 * KIB, 32 * KIB) == hashes["multipart_etag"]
+        assert hashes["multipart_etag"].endswith("-5")
+        assert fake.buckets["photostore"]["multi"]["data"] == data
+        assert client.get_object("multi", offset=10, length=5) == data[10:15]
+
+
+def test_first_sync_uploads_layout_and_second_sends_nothing(shoot):
+    with FakeS3() as fake:
+        client = fake.client("photostore")
+        client.make_bucket()
+        first = _run(client, shoot)
+        assert (first["new"], first["changed"], first["unchanged"], first["multipart"]) == (7, 0, 0, 1)
+        assert sorted(fake.buckets["photostore"]) == [
+            f"{PREFIX_A}/IMG_{i:04d}.jpg" for i in range(6)] + ["2025-05-13/WeddingSmith/RawFiles/CameraB/PANO.tif"]
+        assert fake.buckets["photostore"][f"{PREFIX_A}/IMG_0000.jpg"]["content_type"] == "image/jpeg"
+
+        received = fake.bytes_received
+        second = _run(client, shoot)
+        assert second["unchanged"] == 7 and second["hashed"] == 0 and second["bytes_uploaded"] == 0
+        assert second["bytes_avoided"] == first["bytes_total"]
+        assert fake.bytes_received == received
+
+
+def test_only_edited_files_are_resent(shoot):
+    with FakeS3() as fake:
+        client = fake.client("photostore")
+        client.make_bucket()
+        _run(client, shoot)
+        _write(str(shoot / "CameraA" / "IMG_0002.jpg"), 3 * KIB + 2, 42)
+        _write(str(shoot / "CameraA" / "IMG_0099.jpg"), 2 * KIB, 7)
+        os.utime(shoot / "CameraA" / "IMG_0003.jpg")  # touched but identical content
+
+        report = _run(client, shoot)
+        assert (report["new"], report["changed"], report["unchanged"]) == (1, 1, 6)
+        assert report["uploaded"] == [f"{PREFIX_A}/IMG_0002.jpg", f"{PREFIX_A}/IMG_0099.jpg"]
+        assert report["hashed"] == 3
+        with open(shoot / "CameraA" / "IMG_0002.jpg", "rb") as f:
+            assert fake.buckets["photostore"][f"{PREFIX_A}/IMG_0002.jpg"]["data"] == f.read()
+
+
+def test_existing_objects_are_recognised_without_a_manifest(shoot):
+    with FakeS3() as fake:
+        client = fake.client("photostore")
+        client.make_bucket()
+        _run(client, shoot)
+        os.remove(shoot / su.MANIFEST_NAME)
+        fake.buckets["photostore"]["2025-05-13/WeddingSmith/RawFiles/CameraA/old.jpg"] = dict(
+            fake.buckets["photostore"][f"{PREFIX_A}/IMG_0000.jpg"])
+
+        report = _run(client, shoot, dry_run=True)
+        assert report["unchanged"] == 7 and report["hashed"] == 7
+        assert report["remote_only"] == [f"{PREFIX_A}/old.jpg"]
+        assert not os.path.exists(shoot / su.MANIFEST_NAME)
+
+
+def test_bad_credentials_are_rejected(shoot):
+    with FakeS3() as fake:
+        client = su.S3RestClient(fake.url, fake.access_key, "wrong", "photostore")
+        with pytest.raises(S3Error) as error:
+            client.make_bucket()
+        assert error.value.status == 403
@@ -0,0 +1,77 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SCRIPT_PATH = os.path.join(ROOT_DIR, "scripts", "ai-ml", "tune_onnx_sessions.py")
+
+spec = importlib.util.spec_from_file_location("scripts.tune_onnx_sessions", SCRIPT_PATH)
+tune = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(tune)
+
+HARDWARE = {"cpus": 8, "cpu_model": "AMD EPYC 7B13", "caches_kb": {"L1": 32, "L2": 512, "L3": 32768}}
+
+
+def synthetic_throughput(options):
+    """Peaks at 4 intra-op threads, extended optimisation, parallel mode and no arena."""
+    score = 100.0 / (1 + abs(options["intra_op_num_threads"] - 4))
+    score *= {"disable": 0.5, "basic": 0.8, "extended": 1.2, "all": 1.0}[options["graph_optimization_level"]]
+    if options["execution_mode"] == "parallel":
+        score *= 1.1 if options["inter_op_num_threads"] == 2 else 1.05
+    score *= 1.08 if not options["enable_cpu_mem_arena"] else 1.0
+    score *= 1.01 if not options["enable_mem_pattern"] else 1.0  # within noise: must not be kept
+    return score
+
+
+def test_search_space_and_coordinate_search():
+    assert tune.thread_counts(6) == [1, 2, 4, 6] and tune.thread_counts(1) == [1]
+    assert tune.search_space(1)["inter_op_num_threads"] == [0]
+
+    calls = []
+    found = tune.coordinate_search(lambda o: calls.append(o) or synthetic_throughput(o), tune.search_space(8))
+    assert found["options"] == {"intra_op_num_threads": 4, "inter_op_num_threads": 2, "execution_mode": "parallel",
+                                "graph_optimization_level": "extended", "enable_cpu_mem_arena": False,
+                                "enable_mem_pattern": True}
+    assert found["trials"] == len(calls) < 40  # the full grid is 4 x 4 x 2 x 3 x 2 x 2 = 384
+    assert found["score"] > found["baseline_score"]
+
+
+def test_config_is_written_per_node_and_looked_up_by_node_or_hardware(tmp_path):
+    models = tmp_path / "models"
+    models.mkdir()
+    (models / "vision_model.onnx").write_bytes(b"x" * 100)
+    (models / "model_info.txt").write_text("variant=base\ndimension=512\nrole=ingest\n")
+
+    measure_factory = lambda path, batch_size: synthetic_throughput  # noqa: E731
+    results = tune.tune_models(str(models), ["vision_model.onnx"], 8, 0.03, measure_factory)
+    assert results["vision_model.onnx"]["model_bytes"] == 100 and results["vision_model.onnx"]["speedup"] > 1
+    tune.write_node_config(str(models), "worker-1", HARDWARE, results)
+    other = {"vision_model.onnx": dict(results["vision_model.onnx"], options={"intra_op_num_threads": 2})}
+    tune.write_node_config(str(models), "worker-2", dict(HARDWARE, cpus=2), other)
+
+    with open(models / "session_config.json") as f:
+        config = json.load(f)
+    assert set(config["nodes"]) == {"worker-1", "worker-2"} and config["bundle"]["role"] == "ingest"
+
+    assert tune.load_session_config(str(models), "vision_model.onnx", "worker-2") == {"intra_op_num_threads": 2}
+    # An untuned node with the same CPUs as worker-1 borrows its options.
+    assert tune.load_session_config(str(models), "vision_model.onnx", "worker-9", HARDWARE) == \
+        results["vision_model.onnx"]["options"]
+    assert tune.load_session_config(str(models), "vision_model.onnx", "worker-9", dict(HARDWARE, cpus=16)) is None
+    assert tune.load_session_config(str(models), "text_model.onnx", "worker-1") is None
+
+    (models / "vision_model.onnx").write_bytes(b"x" * 200)  # re-exported: tuned options are stale
+    assert tune.load_session_config(str(models), "vision_model.onnx", "worker-1") is None
+
+
+def test_session_options_apply_to_onnxruntime():
+    ort = pytest.importorskip("onnxruntime")
+    options = tune.session_options(ort, {"intra_op_num_threads": 3, "inter_op_num_threads": 2,
+                                         "execution_mode": "parallel", "graph_optimization_level": "basic",
+                                         "enable_cpu_mem_arena": False, "enable_mem_pattern": False})
+    assert options.intra_op_num_threads == 3 and options.execution_mode == ort.ExecutionMode.ORT_PARALLEL
+    assert options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    assert not options.enable_cpu_mem_arena and not options.enable_mem_pattern